@@ -0,0 +1,181 @@
+"""In-process stand-ins for py4lexis `iRODS`/`Datasets` and the LEXIS staging API.
+
+The fakes keep an in-memory model of dataset contents and simulate per-call
+latency and link bandwidth with `time.sleep`/`asyncio.sleep`, so upload,
+sync and hash-verification code paths can be benchmarked without network
+access or credentials.
+"""
+import asyncio
+import os
+import threading
+import time
+import uuid
+from itertools import count
+from typing import Any, Callable, Dict, List, Optional
+
+import httpx
+
+
+class FakeIRODS:
+    """Implements the subset of `py4lexis.lexis_irods.iRODS` used by ida4sims-cli."""
+
+    def __init__(self, latency: float = 0.0, bandwidth_mb_s: Optional[float] = None):
+        self.latency = latency
+        self.bandwidth_mb_s = bandwidth_mb_s
+        self.objects: Dict[str, Dict[str, int]] = {}
+        self.put_calls = 0
+        self.get_calls = 0
+        self._lock = threading.Lock()
+
+    def _simulate_transfer(self, num_bytes: int) -> None:
+        delay = self.latency
+        if self.bandwidth_mb_s:
+            delay += num_bytes / (self.bandwidth_mb_s * 1024 * 1024)
+        if delay > 0:
+            time.sleep(delay)
+
+    def _store(self, dataset_id: str, remote_path: str, size: int) -> None:
+        with self._lock:
+            self.objects.setdefault(dataset_id, {})[remote_path.strip("/")] = size
+
+    @staticmethod
+    def _dataset_dir(dataset_filepath: Optional[str]) -> str:
+        # Absolute (local) parents are passed for single-file uploads; those land in the root.
+        if not dataset_filepath or os.path.isabs(dataset_filepath):
+            return ""
+        normalized = os.path.normpath(dataset_filepath)
+        return "" if normalized == "." else normalized
+
+    def create_dataset(self, **kwargs: Any) -> Dict[str, str]:
+        dataset_id = str(uuid.uuid4())
+        self.objects[dataset_id] = {}
+        return {"dataset_id": dataset_id}
+
+    def put_data_object_to_dataset(self, local_filepath: str, dataset_filepath: str, dataset_id: str, **kwargs: Any) -> None:
+        try:
+            size = os.path.getsize(local_filepath)
+        except OSError:
+            size = 0
+        self._simulate_transfer(size)
+        with self._lock:
+            self.put_calls += 1
+        self._store(dataset_id, os.path.join(self._dataset_dir(dataset_filepath), os.path.basename(local_filepath)), size)
+
+    def upload_directory_to_dataset(self, local_directorypath: str, dataset_id: str, dataset_directorypath: Optional[str] = None, **kwargs: Any) -> None:
+        base = os.path.join(self._dataset_dir(dataset_directorypath), os.path.basename(local_directorypath.rstrip(os.sep)))
+        for dirpath, _, filenames in os.walk(local_directorypath):
+            rel_dir = os.path.relpath(dirpath, local_directorypath)
+            for name in filenames:
+                size = os.path.getsize(os.path.join(dirpath, name))
+                self._simulate_transfer(size)
+                self._store(dataset_id, os.path.normpath(os.path.join(base, rel_dir, name)), size)
+
+    @staticmethod
+    def content(dataset_id: str, remote_path: str, size: int) -> bytes:
+        """Deterministic bytes served for a seeded object."""
+        pattern = f"{dataset_id}:{remote_path}\n".encode()
+        return (pattern * (size // len(pattern) + 1))[:size]
+
+    def download_data_object_from_dataset(self, dataset_id: str, dataset_filepath: str, local_filepath: str, **kwargs: Any) -> None:
+        remote_path = dataset_filepath.strip("/")
+        size = self.objects.get(dataset_id, {}).get(remote_path)
+        if size is None:
+            raise FileNotFoundError(f"{dataset_filepath} not found in dataset {dataset_id}")
+        self._simulate_transfer(size)
+        with self._lock:
+            self.get_calls += 1
+        with open(local_filepath, "wb") as f:
+            f.write(self.content(dataset_id, remote_path, size))
+
+    def seed(self, dataset_id: str, files: Dict[str, int]) -> None:
+        """Pre-populate a dataset with {remote_path: size}."""
+        for path, size in files.items():
+            self._store(dataset_id, path, size)
+
+
+def build_listing(files: Dict[str, int]) -> List[Dict[str, Any]]:
+    """Build a py4lexis-style nested listing from {path: size}."""
+    root: Dict[str, Any] = {}
+    for path, size in files.items():
+        node = root
+        parts = path.strip("/").split("/")
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = size
+
+    def to_items(node: Dict[str, Any]) -> List[Dict[str, Any]]:
+        items = []
+        for name, value in node.items():
+            if isinstance(value, dict):
+                contents = to_items(value)
+                items.append({
+                    "name": name,
+                    "type": "directory",
+                    "size": sum(item["size"] for item in contents),
+                    "contents": contents,
+                })
+            else:
+                items.append({"name": name, "type": "file", "size": value})
+        return items
+
+    return to_items(root)
+
+
+class FakeDatasets:
+    """Implements `get_content_of_dataset` of `py4lexis.ddi.datasets.Datasets` on top of a FakeIRODS."""
+
+    def __init__(self, irods: FakeIRODS, latency: float = 0.0):
+        self.irods = irods
+        self.latency = latency
+        self.listing_calls = 0
+
+    def get_content_of_dataset(self, dataset_id: str, **kwargs: Any) -> Optional[Dict[str, Any]]:
+        if self.latency:
+            time.sleep(self.latency)
+        self.listing_calls += 1
+        files = self.irods.objects.get(dataset_id)
+        if files is None:
+            return None
+        return {"contents": build_listing(files)}
+
+
+def make_staging_transport(
+    latency: float = 0.0,
+    pending_polls: int = 1,
+    fail_every: int = 0,
+    hash_for: Optional[Callable[[str], str]] = None,
+) -> httpx.MockTransport:
+    """Return an httpx transport emulating `/staging/hash` and `/staging/status/{id}`.
+
+    Each hash job reports PENDING for `pending_polls` status calls before it
+    completes. With `fail_every=N`, every N-th job finishes as FAILED.
+    `hash_for(path)` supplies the reported hash (default: "sha2:fake-<path>").
+    """
+    jobs: Dict[str, Dict[str, Any]] = {}
+    ids = count(1)
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        if latency:
+            await asyncio.sleep(latency)
+        if request.url.path.endswith("/staging/hash"):
+            job_number = next(ids)
+            request_id = f"req-{job_number}"
+            path = request.url.params.get("path", "")
+            failed = bool(fail_every) and job_number % fail_every == 0
+            jobs[request_id] = {"path": path, "polls": 0, "failed": failed}
+            return httpx.Response(202, json={"request_id": request_id})
+        if "/staging/status/" in request.url.path:
+            request_id = request.url.path.rsplit("/", 1)[-1]
+            job = jobs.get(request_id)
+            if job is None:
+                return httpx.Response(404, json={"detail": "unknown request"})
+            job["polls"] += 1
+            if job["polls"] <= pending_polls:
+                return httpx.Response(200, json={"status": "PENDING"})
+            if job["failed"]:
+                return httpx.Response(200, json={"status": "FAILED", "result": None})
+            result = hash_for(job["path"]) if hash_for else f"sha2:fake-{job['path']}"
+            return httpx.Response(200, json={"status": "COMPLETED", "result": result})
+        return httpx.Response(404)
+
+    return httpx.MockTransport(handler)
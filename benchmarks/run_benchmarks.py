@@ -0,0 +1,234 @@
+"""Offline performance benchmarks for ida4sims-cli.
+
+Runs tree scanning, sync planning, upload scheduling and hash verification
+against the in-process fakes in `benchmarks/fakes.py` on synthetic trees,
+records the results as JSON (plus an append-only history) and optionally
+compares them against a baseline to catch regressions.
+
+Usage:
+    python -m benchmarks.run_benchmarks --sizes 1000 --sizes 10000
+    python -m benchmarks.run_benchmarks --baseline benchmarks/baseline.json
+"""
+import asyncio
+import contextlib
+import io
+import json
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import click
+import httpx
+
+from benchmarks.fakes import FakeDatasets, FakeIRODS, make_staging_transport
+from ida4sims_cli.functions.event_log import configure_event_log
+from ida4sims_cli.functions.list_directory_contents import list_directory_contents
+from ida4sims_cli.functions.sync_directory_contents import sync_directory_contents
+from ida4sims_cli.functions.transfer_progress import local_totals
+from ida4sims_cli.functions.upload_dataset_content import upload_dataset_content
+from ida4sims_cli.get_dataset_hashes import fetch_hashes_for_dataset
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+DEFAULT_RESULTS_DIR = BENCHMARKS_DIR / "results"
+BENCHMARK_NAMES = ["scan", "sync_planning", "upload_scheduling", "hash_verification"]
+
+
+def synthetic_files(num_files: int, files_per_dir: int = 100, file_size: int = 1024, root: str = "simulation_data") -> Dict[str, int]:
+    """Return {relative_path: size} for a tree of `num_files` files, `files_per_dir` per directory."""
+    files = {}
+    for i in range(num_files):
+        directory = f"{root}/run_{i // files_per_dir:05d}"
+        files[f"{directory}/frame_{i:07d}.nc"] = file_size
+    return files
+
+
+def write_tree(base: Path, files: Dict[str, int]) -> Path:
+    """Materialise `files` under `base` (sparse files, so large sizes are cheap)."""
+    for rel_path, size in files.items():
+        path = base / rel_path
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, "wb") as f:
+            if size:
+                f.truncate(size)
+    return base / next(iter(files)).split("/")[0]
+
+
+def timed(func: Callable[[], Any]) -> float:
+    start = time.perf_counter()
+    with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+        func()
+    return time.perf_counter() - start
+
+
+def result(name: str, num_files: int, seconds: float, num_bytes: int = 0, **extra: Any) -> Dict[str, Any]:
+    entry = {
+        "benchmark": name,
+        "files": num_files,
+        "seconds": round(seconds, 6),
+        "files_per_s": round(num_files / seconds, 2) if seconds > 0 else None,
+    }
+    if num_bytes:
+        entry["mb_per_s"] = round(num_bytes / (1024 * 1024) / seconds, 3) if seconds > 0 else None
+    entry.update(extra)
+    return entry
+
+
+def bench_scan(workdir: Path, num_files: int, params: Dict[str, Any]) -> Dict[str, Any]:
+    files = synthetic_files(num_files, params["files_per_dir"], params["file_size"])
+    tree = write_tree(workdir, files)
+    listing_s = timed(lambda: list_directory_contents(tree))
+    totals_s = timed(lambda: local_totals(tree))
+    return result("scan", num_files, listing_s, list_directory_contents_s=round(listing_s, 6), local_totals_s=round(totals_s, 6))
+
+
+def bench_sync_planning(workdir: Path, num_files: int, params: Dict[str, Any]) -> Dict[str, Any]:
+    # Pure in-memory comparison: remote and local listings differ in ~1% of sizes,
+    # transfers are free, so this measures the planning overhead only.
+    files = synthetic_files(num_files, params["files_per_dir"], params["file_size"])
+    remote_files = {p: (s + 1 if i % 100 == 0 else s) for i, (p, s) in enumerate(files.items())}
+    irods = FakeIRODS()
+    irods.seed("ds", remote_files)
+    datasets = FakeDatasets(irods)
+    remote_listing = datasets.get_content_of_dataset("ds")["contents"]
+    local_irods = FakeIRODS()
+    local_irods.seed("local", files)
+    local_listing = FakeDatasets(local_irods).get_content_of_dataset("local")["contents"]
+    seconds = timed(lambda: sync_directory_contents(irods, remote_listing, local_listing, "ds", str(workdir / "simulation_data"), ""))
+    return result("sync_planning", num_files, seconds, uploads=irods.put_calls)
+
+
+def bench_upload_scheduling(workdir: Path, num_files: int, params: Dict[str, Any]) -> Dict[str, Any]:
+    # Half of the tree already exists remotely; the other half is uploaded file by file
+    # through the sync path with simulated per-call latency and bandwidth.
+    files = synthetic_files(num_files, params["files_per_dir"], params["file_size"])
+    tree = write_tree(workdir, files)
+    irods = FakeIRODS(latency=params["latency"], bandwidth_mb_s=params["bandwidth_mb_s"])
+    irods.seed("ds", {p: s for i, (p, s) in enumerate(files.items()) if i % 2 == 0})
+    datasets = FakeDatasets(irods, latency=params["listing_latency"])
+    seconds = timed(lambda: upload_dataset_content(irods, datasets, str(tree), "ds"))
+    uploaded_bytes = sum(s for i, s in enumerate(files.values()) if i % 2 == 1)
+    return result("upload_scheduling", num_files, seconds, uploaded_bytes, uploads=irods.put_calls)
+
+
+def bench_hash_verification(workdir: Path, num_files: int, params: Dict[str, Any]) -> Dict[str, Any]:
+    files = synthetic_files(num_files, params["files_per_dir"], params["file_size"])
+    irods = FakeIRODS()
+    irods.seed("ds", files)
+    datasets = FakeDatasets(irods)
+    transport = make_staging_transport(latency=params["hash_latency"])
+
+    async def run():
+        async with httpx.AsyncClient(transport=transport) as client:
+            await fetch_hashes_for_dataset(datasets, "ds", "token", http_client=client, poll_interval=0.0)
+
+    seconds = timed(lambda: asyncio.run(run()))
+    return result("hash_verification", num_files, seconds)
+
+
+BENCHMARKS: Dict[str, Callable[[Path, int, Dict[str, Any]], Dict[str, Any]]] = {
+    "scan": bench_scan,
+    "sync_planning": bench_sync_planning,
+    "upload_scheduling": bench_upload_scheduling,
+    "hash_verification": bench_hash_verification,
+}
+
+
+def git_revision() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BENCHMARKS_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(names: List[str], sizes: List[int], params: Dict[str, Any]) -> Dict[str, Any]:
+    """Run the selected benchmarks for each size and return the result record."""
+    # Keep per-file console output out of the measurements.
+    configure_event_log(level="WARNING")
+    results = []
+    for size in sizes:
+        for name in names:
+            workdir = Path(tempfile.mkdtemp(prefix=f"ida4sims-bench-{name}-"))
+            try:
+                entry = BENCHMARKS[name](workdir, size, params)
+            finally:
+                shutil.rmtree(workdir, ignore_errors=True)
+            print(f"{entry['benchmark']:<20} {entry['files']:>9} files {entry['seconds']:>10.3f}s {entry['files_per_s'] or 0:>12.1f} files/s")
+            results.append(entry)
+    return {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": params,
+        "results": results,
+    }
+
+
+def compare_with_baseline(record: Dict[str, Any], baseline: Dict[str, Any], max_regression: float) -> List[str]:
+    """Return a list of regressions (throughput drop larger than `max_regression`)."""
+    base = {(r["benchmark"], r["files"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for entry in record["results"]:
+        reference = base.get((entry["benchmark"], entry["files"]))
+        if not reference or not reference.get("files_per_s") or not entry.get("files_per_s"):
+            continue
+        change = entry["files_per_s"] / reference["files_per_s"] - 1
+        print(f"{entry['benchmark']:<20} {entry['files']:>9} files {change * 100:+7.1f}% vs baseline")
+        if change < -max_regression:
+            regressions.append(f"{entry['benchmark']} ({entry['files']} files): {change * 100:+.1f}%")
+    return regressions
+
+
+@click.command()
+@click.option('--benchmark', 'names', multiple=True, type=click.Choice(BENCHMARK_NAMES), help='Benchmark to run (default: all). Can be used multiple times.')
+@click.option('--sizes', multiple=True, type=int, default=[1000, 10000], show_default=True, help='Number of files in the synthetic tree. Can be used multiple times (10^3-10^6).')
+@click.option('--files-per-dir', type=int, default=100, show_default=True, help='Files per synthetic directory.')
+@click.option('--file-size', type=int, default=1024, show_default=True, help='Size of each synthetic file in bytes.')
+@click.option('--latency', type=float, default=0.0, show_default=True, help='Simulated per-transfer latency in seconds.')
+@click.option('--bandwidth-mb', 'bandwidth_mb_s', type=float, default=None, help='Simulated link bandwidth in MB/s (default: unlimited).')
+@click.option('--listing-latency', type=float, default=0.0, show_default=True, help='Simulated latency of get_content_of_dataset in seconds.')
+@click.option('--hash-latency', type=float, default=0.0, show_default=True, help='Simulated latency of each /staging request in seconds.')
+@click.option('--output', type=click.Path(dir_okay=False, path_type=Path), default=DEFAULT_RESULTS_DIR / "latest.json", show_default=True, help='Where to write the result record.')
+@click.option('--history', type=click.Path(dir_okay=False, path_type=Path), default=DEFAULT_RESULTS_DIR / "history.jsonl", show_default=True, help='Append-only JSON lines file of all runs.')
+@click.option('--baseline', type=click.Path(exists=True, dir_okay=False, path_type=Path), default=None, help='Compare against a previous result record.')
+@click.option('--max-regression', type=float, default=0.2, show_default=True, help='Allowed throughput drop vs baseline before failing (0.2 = 20%).')
+def cli(names, sizes, files_per_dir, file_size, latency, bandwidth_mb_s, listing_latency, hash_latency, output, history, baseline, max_regression):
+    """Run offline benchmarks against in-process LEXIS/iRODS fakes."""
+    params = {
+        "files_per_dir": files_per_dir,
+        "file_size": file_size,
+        "latency": latency,
+        "bandwidth_mb_s": bandwidth_mb_s,
+        "listing_latency": listing_latency,
+        "hash_latency": hash_latency,
+    }
+    record = run_benchmarks(list(names) or BENCHMARK_NAMES, list(sizes), params)
+
+    output.parent.mkdir(parents=True, exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(record, f, indent=2)
+    history.parent.mkdir(parents=True, exist_ok=True)
+    with open(history, "a") as f:
+        f.write(json.dumps(record) + "\n")
+    print(f"Results written to '{output}' (history: '{history}').")
+
+    if baseline:
+        with open(baseline) as f:
+            regressions = compare_with_baseline(record, json.load(f), max_regression)
+        if regressions:
+            print("Performance regressions detected:", file=sys.stderr)
+            for line in regressions:
+                print(f"  {line}", file=sys.stderr)
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,349 @@
+"""Optional local agent keeping a LEXIS session, iRODS/Datasets objects and
+dataset listings warm between ida-* commands.
+
+Commands connect to it over a Unix socket when it is running (see
+functions/agent_client.py) and skip login and py4lexis setup.
+"""
+import json
+import os
+import socketserver
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Optional, Tuple
+
+import click
+
+from ida4sims_cli.functions.agent_client import (
+    AGENT_METHODS,
+    AgentClient,
+    AgentError,
+    connect_agent,
+    default_socket_path,
+    read_message,
+    send_message,
+)
+from ida4sims_cli.functions.event_log import log_event, log_options
+from ida4sims_cli.functions.LexisAuthManager import LexisAuthManager, cache_access_token, refreshed_session
+from ida4sims_cli.functions.token_cache import token_expiry
+from ida4sims_cli.functions.upload_session import UploadSession
+from ida4sims_cli.functions.utils import enable_py4lexis_exceptions
+from ida4sims_cli.helpers.default_data import ACCESS_TOKEN_MIN_VALIDITY, DEFAULT_AGENT_CONNECTIONS
+
+DEFAULT_LISTING_TTL = 30.0
+
+
+class AgentState:
+    """Session, py4lexis object pools and the dataset listing cache shared by all connections.
+
+    `irods` and `datasets` are UploadSession pools (a single object is
+    wrapped in a pool of one). Calls borrow an object from the pool, so a
+    long transfer holds only its own object: token requests, cached
+    listings and other transfers keep being served. No lock is held
+    while a call waits on the network.
+    """
+
+    def __init__(self, session: Any, irods: Any, datasets: Any, listing_ttl: float = DEFAULT_LISTING_TTL):
+        self.session = session
+        # py4lexis objects are not documented as thread-safe; each is used by one call at a time.
+        self.targets = {
+            "irods": irods if isinstance(irods, UploadSession) else UploadSession(lambda: irods),
+            "datasets": datasets if isinstance(datasets, UploadSession) else UploadSession(lambda: datasets),
+        }
+        self.listing_ttl = listing_ttl
+        self.started = time.time()
+        self.requests = 0
+        self._listings: Dict[Tuple[str, str], Tuple[float, Any]] = {}
+        # Bumped by every invalidation, so a listing fetched meanwhile is not cached.
+        self._listing_generation: Dict[str, int] = {}
+        self._listings_lock = threading.Lock()
+        # Only token requests wait for a refresh in progress; they need its result anyway.
+        self._token_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+
+    def access_token(self, force_refresh: bool = False) -> str:
+        with self._token_lock:
+            token = self.session.get_access_token()
+            expires_at = token_expiry(token) if token else None
+            if force_refresh or expires_at is None or expires_at - time.time() < ACCESS_TOKEN_MIN_VALIDITY:
+                self.session = refreshed_session(self.session)
+                token = self.session.get_access_token()
+                cache_access_token(token)
+            return token
+
+    def invalidate(self, dataset_id: Optional[str] = None) -> None:
+        with self._listings_lock:
+            if dataset_id is None:
+                self._listings.clear()
+                for key in self._listing_generation:
+                    self._listing_generation[key] += 1
+            else:
+                for key in [k for k in self._listings if k[0] == dataset_id]:
+                    del self._listings[key]
+                self._listing_generation[dataset_id] = self._listing_generation.get(dataset_id, 0) + 1
+
+    def _listing(self, params: Dict[str, Any]) -> Any:
+        refresh = params.pop("refresh", False)
+        dataset_id = params.get("dataset_id")
+        key = (dataset_id, json.dumps(params, sort_keys=True))
+        with self._listings_lock:
+            cached = self._listings.get(key)
+            if cached and not refresh and time.monotonic() - cached[0] < self.listing_ttl:
+                return cached[1]
+            generation = self._listing_generation.setdefault(dataset_id, 0)
+        with self.targets["datasets"].connection() as datasets:
+            result = datasets.get_content_of_dataset(**params)
+        # Missing datasets are not cached: callers poll until they appear.
+        if result is not None:
+            with self._listings_lock:
+                if self._listing_generation.get(dataset_id) == generation:
+                    self._listings[key] = (time.monotonic(), result)
+        return result
+
+    def call_backend(self, method: str, params: Dict[str, Any]) -> Any:
+        target, _, name = method.partition(".")
+        if name not in AGENT_METHODS.get(target, ()):
+            raise ValueError(f"Unknown method '{method}'")
+        if method == "datasets.get_content_of_dataset":
+            return self._listing(params)
+        if target == "irods":
+            # UploadSession borrows a pooled connection for the call.
+            result = getattr(self.targets["irods"], name)(**params)
+        else:
+            with self.targets[target].connection() as backend:
+                result = getattr(backend, name)(**params)
+        dataset_id = params.get("dataset_id")
+        if dataset_id:
+            self.invalidate(dataset_id)
+        return result
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "pid": os.getpid(),
+            "uptime_s": round(time.time() - self.started, 1),
+            "requests": self.requests,
+            "cached_listings": len(self._listings),
+            "irods_pool": self.targets["irods"].stats(),
+        }
+
+    def handle(self, method: str, params: Dict[str, Any]) -> Any:
+        with self._stats_lock:
+            self.requests += 1
+        if method == "ping":
+            return self.status()
+        if method == "get_access_token":
+            return self.access_token()
+        if method == "refresh_access_token":
+            return self.access_token(force_refresh=True)
+        if method == "invalidate":
+            self.invalidate(params.get("dataset_id"))
+            return None
+        return self.call_backend(method, params)
+
+
+class _AgentHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        server: "AgentServer" = self.server
+        while True:
+            try:
+                request = read_message(self.rfile)
+            except (OSError, ValueError):
+                return
+            if request is None:
+                return
+            method = request.get("method", "")
+            server.touch()
+            if method == "shutdown":
+                send_message(self.connection, {"ok": True, "result": None})
+                threading.Thread(target=server.shutdown, daemon=True).start()
+                return
+            try:
+                response = {"ok": True, "result": server.state.handle(method, request.get("params") or {})}
+            except Exception as e:
+                response = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            try:
+                send_message(self.connection, response)
+            except OSError:
+                return
+
+
+def _check_socket_dir(directory: Path) -> None:
+    """Refuse a socket directory that other users could write to or read from.
+
+    The directory may predate the agent (e.g. the ~/.cache fallback, or a
+    directory created by someone else), so its owner and mode are checked
+    rather than trusted: whoever controls it could replace the socket.
+    """
+    st = os.stat(directory)
+    if st.st_uid != os.getuid() or st.st_mode & 0o077:
+        raise click.ClickException(
+            f"Refusing to use '{directory}' for the agent socket: it must be owned by you with mode 0700 "
+            f"(owner uid {st.st_uid}, mode {oct(st.st_mode & 0o777)})."
+        )
+
+
+class AgentServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, socket_path: Path, state: AgentState, idle_timeout: Optional[float] = None):
+        # Absolute, so the socket can still be removed after a detached agent changed directory.
+        socket_path = Path(socket_path).absolute()
+        socket_path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+        _check_socket_dir(socket_path.parent)
+        if socket_path.exists():
+            socket_path.unlink()
+        self.socket_path = socket_path
+        self.state = state
+        self.idle_timeout = idle_timeout
+        self.last_activity = time.monotonic()
+        old_umask = os.umask(0o077)
+        try:
+            super().__init__(str(socket_path), _AgentHandler)
+        finally:
+            os.umask(old_umask)
+
+    def touch(self) -> None:
+        self.last_activity = time.monotonic()
+
+    def _watch_idle(self) -> None:
+        while not self._stopped.wait(min(self.idle_timeout, 5.0)):
+            if time.monotonic() - self.last_activity > self.idle_timeout:
+                log_event("agent.idle_exit", f"Agent idle for {self.idle_timeout:.0f}s, shutting down.")
+                self.shutdown()
+                return
+
+    def serve(self) -> None:
+        self._stopped = threading.Event()
+        if self.idle_timeout:
+            threading.Thread(target=self._watch_idle, name="ida4sims-agent-idle", daemon=True).start()
+        try:
+            self.serve_forever()
+        finally:
+            self._stopped.set()
+            self.server_close()
+            try:
+                self.socket_path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+def _daemonize() -> Optional[int]:
+    """Move to the background with the usual double fork.
+
+    Returns the pid of the background agent in the calling process and None
+    in the agent itself, which runs in a new session without a controlling
+    terminal, from `/`, with the standard streams on /dev/null.
+    """
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid:
+        os.close(write_fd)
+        os.waitpid(pid, 0)
+        with os.fdopen(read_fd) as pipe:
+            agent_pid = pipe.read()
+        if not agent_pid:
+            raise click.ClickException("The agent failed to start in the background.")
+        return int(agent_pid)
+    try:
+        os.close(read_fd)
+        os.setsid()
+        # The session leader exits, so the agent can never reacquire a terminal.
+        if os.fork():
+            os._exit(0)
+    except BaseException:
+        os._exit(1)
+    os.write(write_fd, str(os.getpid()).encode())
+    os.close(write_fd)
+    os.chdir("/")
+    devnull = os.open(os.devnull, os.O_RDWR)
+    for fd in (0, 1, 2):
+        os.dup2(devnull, fd)
+    return None
+
+
+def build_state(listing_ttl: float, connections: int = DEFAULT_AGENT_CONNECTIONS) -> AgentState:
+    """Log in and create the pools of py4lexis objects the agent serves (up to `connections` of each)."""
+    enable_py4lexis_exceptions()
+    from py4lexis.lexis_irods import iRODS
+    from py4lexis.ddi.datasets import Datasets
+
+    session = LexisAuthManager().login()
+    if not session:
+        raise click.ClickException("Failed to obtain authentication session.")
+    irods = UploadSession(lambda: iRODS(session=session, suppress_print=True, reraise_exceptions=True), size=connections)
+    datasets = UploadSession(lambda: Datasets(session=session, suppress_print=True, reraise_exceptions=True), size=connections)
+    return AgentState(session, irods, datasets, listing_ttl=listing_ttl)
+
+
+@click.group()
+def cli():
+    """Local agent that keeps a LEXIS session warm for ida-* commands."""
+    pass
+
+
+@cli.command()
+@click.option('--socket', 'socket_path', type=click.Path(dir_okay=False, path_type=Path), default=None, help='Socket path (default: $IDA4SIMS_AGENT_SOCKET or $XDG_RUNTIME_DIR/ida4sims/agent.sock).')
+@click.option('--listing-ttl', type=float, default=DEFAULT_LISTING_TTL, show_default=True, help='Seconds a dataset listing is served from cache.')
+@click.option('--idle-timeout', type=float, default=None, help='Exit after this many seconds without requests.')
+@click.option('--connections', type=click.IntRange(min=1), default=DEFAULT_AGENT_CONNECTIONS, show_default=True, help='iRODS (and Datasets) objects kept warm; this many transfers run at once.')
+@click.option('--detach', is_flag=True, default=False, help='Run in the background after logging in.')
+@log_options
+def start(socket_path, listing_ttl, idle_timeout, connections, detach):
+    """Log in and serve requests until stopped."""
+    socket_path = socket_path or default_socket_path()
+    running = connect_agent(socket_path)
+    if running:
+        running.close()
+        raise click.ClickException(f"An agent is already running on '{socket_path}'.")
+
+    state = build_state(listing_ttl, connections)
+    server = AgentServer(socket_path, state, idle_timeout=idle_timeout)
+
+    if detach:
+        pid = _daemonize()
+        if pid:
+            log_event("agent.started", f"Agent started in the background (pid {pid}) on '{server.socket_path}'.", pid=pid, socket=str(server.socket_path))
+            return
+
+    log_event("agent.started", f"Agent listening on '{socket_path}' (pid {os.getpid()}).", pid=os.getpid(), socket=str(socket_path))
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        pass
+    log_event("agent.stopped", "Agent stopped.")
+
+
+def _client_or_exit(socket_path: Optional[Path]) -> AgentClient:
+    client = connect_agent(socket_path)
+    if client is None:
+        print(f"No agent is running on '{socket_path or default_socket_path()}'.", file=sys.stderr)
+        sys.exit(1)
+    return client
+
+
+@cli.command()
+@click.option('--socket', 'socket_path', type=click.Path(dir_okay=False, path_type=Path), default=None, help='Socket path of the agent.')
+def status(socket_path):
+    """Show whether the agent is running."""
+    client = _client_or_exit(socket_path)
+    info = client.call("ping")
+    client.close()
+    print(f"Agent running (pid {info['pid']}), up {info['uptime_s']}s, {info['requests']} requests served, {info['cached_listings']} cached listing(s).")
+
+
+@cli.command()
+@click.option('--socket', 'socket_path', type=click.Path(dir_okay=False, path_type=Path), default=None, help='Socket path of the agent.')
+def stop(socket_path):
+    """Stop a running agent."""
+    client = _client_or_exit(socket_path)
+    try:
+        client.call("shutdown")
+    except AgentError:
+        pass
+    client.close()
+    print("Agent stopped.")
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,396 @@
+"""Python API for uploading and verifying LEXIS datasets.
+
+The `ida-upload-dataset` commands are thin wrappers around `UploadClient`;
+this module never calls `sys.exit` and reports failures with the typed
+exceptions of `ida4sims_cli.exceptions`. One client (and its connection
+pool) can be shared by many uploads, including concurrent ones from
+several threads:
+
+    from ida4sims_cli.api import UploadClient
+
+    with UploadClient(connections=8) as client:
+        result = client.upload("runs/rep1", "Replica 1", {"dataset_type": "simulation"})
+        print(result.dataset_id)
+"""
+from __future__ import annotations
+
+import logging
+import dataclasses
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from ida4sims_cli.exceptions import (
+    AuthenticationError,
+    ConnectionSetupError,
+    DatasetCreationError,
+    Ida4simsError,
+    UploadError,
+    VerificationError,
+)
+from ida4sims_cli.functions.agent_client import AgentDatasets, AgentIRODS, connect_agent
+from ida4sims_cli.functions.concurrency_tuner import AIMDTuner
+from ida4sims_cli.functions.create_dataset import create_lexis_dataset
+from ida4sims_cli.functions.event_log import log_event
+from ida4sims_cli.functions.listing_cache import CachedListingDatasets, invalidate_listing_snapshot
+from ida4sims_cli.functions.profiling import phase
+from ida4sims_cli.functions.transfer_progress import TransferProgress, local_totals
+from ida4sims_cli.functions.upload_dataset_content import upload_dataset_as_files, upload_dataset_content
+from ida4sims_cli.functions.upload_session import UploadSession
+from ida4sims_cli.functions.upload_state import UploadState, UploadStateStore
+from ida4sims_cli.functions.utils import enable_py4lexis_exceptions, wait_for_dataset_contents
+from ida4sims_cli.helpers.default_data import DEFAULT_DOWNLOAD_WORKERS, DEFAULT_UPLOAD_CONNECTIONS
+
+if TYPE_CHECKING:
+    from ida4sims_cli.functions.upload_pipeline import PipelineConfig
+
+
+@dataclass
+class LexisConnection:
+    """The py4lexis objects (or ida-agent proxies) used by the clients.
+
+    `irods` is usually an UploadSession pool; `token_provider` supplies
+    access tokens for the staging API (hash verification).
+    """
+
+    irods: Any
+    datasets: Any
+    token_provider: Any = None
+
+    def close(self) -> None:
+        if isinstance(self.irods, UploadSession):
+            self.irods.close()
+
+
+def connect(connections: int = DEFAULT_UPLOAD_CONNECTIONS, suppress_print: bool = True) -> LexisConnection:
+    """Open a LexisConnection: through a running ida-agent, or by logging in with the stored offline token.
+
+    Raises:
+        AuthenticationError: No session could be obtained.
+        ConnectionSetupError: The iRODS/Datasets objects could not be created.
+    """
+    from ida4sims_cli.functions.token_provider import agent_token_provider, session_token_provider
+
+    agent = connect_agent()
+    if agent is not None:
+        log_event("agent.connected", f"Using ida-agent at '{agent.socket_path}'.", socket=str(agent.socket_path))
+        return LexisConnection(AgentIRODS(agent), AgentDatasets(agent), agent_token_provider(agent))
+
+    # py4lexis is imported here rather than at module level so that `--help`
+    # and argument errors stay fast.
+    enable_py4lexis_exceptions()
+    from py4lexis.lexis_irods import iRODS
+    from py4lexis.ddi.datasets import Datasets
+    from ida4sims_cli.functions.LexisAuthManager import LexisAuthManager
+
+    try:
+        session = LexisAuthManager().login()
+    except Exception as auth_err:
+        raise AuthenticationError(f"Authentication failed: {auth_err}") from auth_err
+    if not session:
+        raise AuthenticationError("Failed to obtain authentication session.")
+
+    try:
+        irods = UploadSession(lambda: iRODS(session=session, suppress_print=suppress_print, reraise_exceptions=True), size=connections)
+        # Open the first connection now so setup failures are reported as such.
+        with irods.connection():
+            pass
+        datasets = Datasets(session=session, suppress_print=suppress_print, reraise_exceptions=True)
+    except Exception as conn_err:
+        raise ConnectionSetupError(f"Failed to initialize iRODS/Datasets connection: {conn_err}") from conn_err
+    return LexisConnection(irods, datasets, session_token_provider(session))
+
+
+def new_transfer_progress(path: str, dataset_type: str, show_progress: bool = True) -> TransferProgress:
+    """Return a TransferProgress for uploading `path` as `dataset_type`."""
+    if dataset_type == "simulation":
+        total_bytes, total_files = local_totals(path)
+        return TransferProgress(total_bytes=total_bytes, total_files=total_files, show_bar=show_progress)
+    # Only the files referenced in metadata are uploaded; they are added as they are found.
+    return TransferProgress(show_bar=show_progress)
+
+
+def transfer_dataset_content(irods, datasets, path: str, dataset_id: str, dataset_type: str, metadata: Dict[str, str], progress: Optional[TransferProgress] = None, state: Optional[UploadState] = None, pipeline: Optional[PipelineConfig] = None, lanes: Optional[int] = None) -> None:
+    """Upload `path` into an existing dataset: the whole tree for simulations, the files named in `metadata` otherwise.
+
+    Uploaded files are recorded in `state`, and files it already records
+    are not uploaded again. `pipeline` applies to simulation uploads;
+    `lanes` caps the concurrent transfers of a sync into a dataset that
+    already has content (default: one per pooled connection).
+    """
+    with phase("upload"):
+        if dataset_type == "simulation":
+            upload_dataset_content(irods, datasets, path, dataset_id, progress=progress, state=state, pipeline=pipeline, lanes=lanes)
+        else:
+            # upload_dataset_as_files expects (irods, local_path, dataset_id, dataset_type, metadata)
+            upload_dataset_as_files(irods, path, dataset_id, dataset_type, metadata, progress=progress, state=state)
+
+
+def verify_uploaded_dataset(datasets, dataset_id: str) -> None:
+    """Raise VerificationError if the dataset looks empty after an upload."""
+    log_event("upload.verify", "Verifying dataset content...", dataset_id=dataset_id)
+    try:
+        with phase("verify"):
+            verify_resp = CachedListingDatasets(datasets, refresh=True).get_content_of_dataset(dataset_id)
+        # If we couldn't fetch the response (None), or the response isn't a dict,
+        # or the 'contents' key is missing/empty, treat it as a verification failure.
+        if verify_resp is None or not isinstance(verify_resp, dict) or not verify_resp.get('contents'):
+            raise VerificationError(
+                "Dataset appears empty after upload. This may indicate a silent failure in the transfer process (e.g., network interruption).",
+                dataset_id=dataset_id,
+            )
+    except Exception as verify_err:
+        log_event("upload.verify_failed", f"ERROR: Upload verification failed: {verify_err}", logging.ERROR, dataset_id=dataset_id, error=str(verify_err))
+        if isinstance(verify_err, VerificationError):
+            raise
+        raise VerificationError(f"Could not list the dataset: {verify_err}", dataset_id=dataset_id) from verify_err
+
+
+@dataclass
+class UploadResult:
+    """Outcome of `UploadClient.upload`."""
+
+    dataset_id: str
+    title: str
+    path: str
+    dataset_type: str
+    # TransferProgress.summary(): bytes, files, rates, slowest files, connection stats.
+    summary: Dict[str, Any] = field(default_factory=dict)
+    # True when an interrupted upload of the same source and title was continued.
+    resumed: bool = False
+    # True when this upload took its dataset ID from the client's dataset_id_file.
+    dataset_id_from_file: bool = False
+
+
+class UploadClient:
+    """Create datasets and upload their content, sharing one connection between calls.
+
+    Args:
+        connection: An open LexisConnection; by default `connect(connections)`
+            is called on first use. A connection passed in is not closed by
+            `close()`.
+        connections: Size of the iRODS connection pool opened by default.
+        state_store: Resume state of the uploads (default: the per-user
+            SQLite database also used by the CLI).
+        dataset_id_file: A dataset_id.txt whose ID is reused for the next
+            upload without recorded state. Off by default: a file left in
+            the working directory would otherwise send the upload into an
+            unrelated dataset. The CLI enables it for compatibility.
+    """
+
+    def __init__(self, connection: Optional[LexisConnection] = None, connections: int = DEFAULT_UPLOAD_CONNECTIONS, state_store: Optional[UploadStateStore] = None, dataset_id_file: Optional[str] = None):
+        self._connection = connection
+        self._owns_connection = connection is None
+        self._connections = connections
+        self._state_store = state_store
+        self.dataset_id_file = dataset_id_file
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self) -> LexisConnection:
+        with self._lock:
+            if self._connection is None:
+                self._connection = connect(self._connections)
+            return self._connection
+
+    @property
+    def state_store(self) -> UploadStateStore:
+        with self._lock:
+            if self._state_store is None:
+                self._state_store = UploadStateStore()
+            return self._state_store
+
+    def create_dataset(self, title: str, metadata: Dict[str, Any], state: Optional[UploadState] = None) -> str:
+        """Create the dataset entry (or reuse the one recorded in `state`) and return its ID."""
+        log_event("dataset.create", "Creating dataset entry...")
+        metadata_filtered = {k: v for k, v in metadata.items() if v is not None}
+        try:
+            dataset_id = create_lexis_dataset(self.connection.irods, title, metadata_filtered, state=state, dataset_id_file=self.dataset_id_file)
+        except Ida4simsError:
+            raise
+        except Exception as e:
+            raise DatasetCreationError(f"Failed to create dataset entry: {e}") from e
+        if not dataset_id:
+            raise DatasetCreationError("Failed to create dataset entry. Dataset ID is missing.")
+        log_event("dataset.created", f"Created dataset entry with preliminary ID: '{dataset_id}'", dataset_id=dataset_id)
+        # The content is about to change; a stored listing would be stale.
+        invalidate_listing_snapshot(dataset_id)
+        return dataset_id
+
+    def wait_until_visible(self, dataset_id: str) -> bool:
+        """Poll until the new dataset is visible in iRODS; False if it still looks empty."""
+        log_event("dataset.wait", "Checking dataset visibility in iRODS before upload...", dataset_id=dataset_id)
+        contents, attempts = wait_for_dataset_contents(self.connection.datasets, dataset_id)
+        if not contents:
+            log_event("dataset.wait", f"Note: dataset '{dataset_id}' appears empty after {attempts} attempt(s); the uploader will still proceed but may retry internally.", dataset_id=dataset_id, attempts=attempts)
+        return bool(contents)
+
+    def upload(self, path: str, title: str, metadata: Dict[str, Any], summary_file: Optional[str] = None, show_progress: bool = False, report: bool = False, pipeline: Optional[PipelineConfig] = None) -> UploadResult:
+        """Create a dataset for `path` and upload its content; resumes an interrupted upload of the same source and title.
+
+        `metadata["dataset_type"]` selects the upload: the whole tree for
+        "simulation", the files named in the metadata otherwise. With
+        `report`, the transfer report is printed (also when the transfer fails).
+        `pipeline` uploads a simulation file by file through
+        `run_upload_pipeline`; with `pipeline.checksum`, files are verified
+        against the server hash using the connection's token.
+
+        Raises:
+            AuthenticationError, ConnectionSetupError: Opening the default connection failed.
+            DatasetCreationError: The dataset entry could not be created.
+            UploadError: The transfer failed; `dataset_id` names the partly filled dataset.
+            VerificationError: The dataset looks empty after the transfer.
+            UploadInterrupted: A stop was requested (see `ida4sims_cli.functions.interrupts`);
+                the resume state records what was uploaded.
+        """
+        dataset_type = metadata.get("dataset_type", "")
+        connection = self.connection
+        if pipeline is not None and pipeline.checksum and pipeline.lexis_token is None:
+            pipeline = dataclasses.replace(pipeline, lexis_token=connection.token_provider)
+        state = self.state_store.source(path, title)
+        resumed = state.dataset_id is not None
+        # As create_lexis_dataset decides: the file is only read without recorded state.
+        from_file = not resumed and bool(self.dataset_id_file) and os.path.exists(self.dataset_id_file)
+
+        dataset_id = self.create_dataset(title, metadata, state=state)
+        self.wait_until_visible(dataset_id)
+
+        log_event("upload.transfer", "Uploading content to dataset...", dataset_id=dataset_id)
+        progress = new_transfer_progress(path, dataset_type, show_progress)
+        try:
+            transfer_dataset_content(connection.irods, connection.datasets, path, dataset_id, dataset_type, metadata, progress, state=state, pipeline=pipeline)
+        except Ida4simsError:
+            raise
+        except Exception as e:
+            raise UploadError(str(e), dataset_id=dataset_id, path=path) from e
+        finally:
+            if isinstance(connection.irods, UploadSession):
+                progress.connections = connection.irods.stats()
+            progress.close()
+            if report:
+                progress.print_report()
+            if summary_file:
+                progress.write_summary(summary_file)
+
+        verify_uploaded_dataset(connection.datasets, dataset_id)
+
+        log_event("upload.cleanup", "Cleaning up temporary data...")
+        state.clear()
+        return UploadResult(dataset_id=dataset_id, title=title, path=path, dataset_type=dataset_type, summary=progress.summary(), resumed=resumed, dataset_id_from_file=from_file)
+
+    def close(self) -> None:
+        if self._owns_connection and self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __enter__(self) -> "UploadClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+@dataclass
+class VerifyResult:
+    """Outcome of `VerifyClient.verify`; paths are relative to the dataset root."""
+
+    dataset_id: str
+    matched: List[str] = field(default_factory=list)
+    # Local and server sha256 differ.
+    mismatched: List[str] = field(default_factory=list)
+    # The server hash could not be obtained (request failed or timed out).
+    unverified: List[str] = field(default_factory=list)
+    # In the dataset but not under the local path.
+    missing_locally: List[str] = field(default_factory=list)
+    # AIMDTuner.report() of the hash requests when the client auto-tunes.
+    tuning: Optional[Dict[str, Any]] = None
+
+    @property
+    def ok(self) -> bool:
+        return not self.mismatched and not self.unverified and not self.missing_locally
+
+
+class VerifyClient:
+    """Compare a dataset with a local copy using the server-side sha256 (`/staging/hash`).
+
+    Args:
+        connection: An open LexisConnection; by default `connect()` is called on first use.
+        concurrency: Hash requests in flight at once (the upper limit with `auto_tune`).
+        auto_tune: Adapt the number of hash requests in flight to the server (AIMDTuner).
+    """
+
+    def __init__(self, connection: Optional[LexisConnection] = None, concurrency: int = DEFAULT_DOWNLOAD_WORKERS, auto_tune: bool = False):
+        self._connection = connection
+        self._owns_connection = connection is None
+        self.concurrency = concurrency
+        self.auto_tune = auto_tune
+        self._lock = threading.Lock()
+
+    @property
+    def connection(self) -> LexisConnection:
+        with self._lock:
+            if self._connection is None:
+                self._connection = connect(self.concurrency)
+            return self._connection
+
+    async def averify(self, dataset_id: str, local_path: str, client: Any = None, poll_interval: Optional[float] = None) -> VerifyResult:
+        """Async `verify`; `client` is an httpx.AsyncClient to reuse for the staging API."""
+        import asyncio
+        from ida4sims_cli.functions.download_dataset_content import find_checksum_mismatches, flatten_listing
+        from ida4sims_cli.functions.hashing_utils import calculate_sha256
+
+        connection = self.connection
+        try:
+            listing = await asyncio.to_thread(CachedListingDatasets(connection.datasets, refresh=True).get_content_of_dataset, dataset_id)
+        except Exception as e:
+            raise VerificationError(f"Could not list the dataset: {e}", dataset_id=dataset_id, path=local_path) from e
+        if not listing or not listing.get("contents"):
+            raise VerificationError("Dataset is empty or could not be listed.", dataset_id=dataset_id, path=local_path)
+
+        result = VerifyResult(dataset_id=dataset_id)
+        present = []
+        for remote in flatten_listing(listing["contents"]):
+            if (Path(local_path) / remote.path).is_file():
+                present.append(remote)
+            else:
+                result.missing_locally.append(remote.path)
+
+        def hash_local(remote) -> None:
+            remote.sha256 = calculate_sha256(Path(local_path) / remote.path)
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            await asyncio.gather(*(asyncio.wrap_future(pool.submit(hash_local, r)) for r in present))
+
+        tuner = AIMDTuner(maximum=self.concurrency, name="hash requests") if self.auto_tune else None
+        mismatched, unverified = await find_checksum_mismatches(present, dataset_id, connection.token_provider, concurrency=self.concurrency, client=client, poll_interval=poll_interval, tuner=tuner)
+        if tuner is not None:
+            result.tuning = tuner.report()
+        result.mismatched = sorted(r.path for r in mismatched)
+        result.unverified = sorted(r.path for r in unverified)
+        checked = set(result.mismatched) | set(result.unverified)
+        result.matched = sorted(r.path for r in present if r.path not in checked)
+        return result
+
+    def verify(self, dataset_id: str, local_path: str) -> VerifyResult:
+        """Hash every file of the dataset on the server and compare it with `local_path/<dataset path>`.
+
+        Raises:
+            VerificationError: The dataset could not be listed or is empty.
+        """
+        import asyncio
+
+        return asyncio.run(self.averify(dataset_id, local_path))
+
+    def close(self) -> None:
+        if self._owns_connection and self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def __enter__(self) -> "VerifyClient":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
@@ -0,0 +1,216 @@
+import logging
+import sys
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+import click
+
+from ida4sims_cli.api import connect
+from ida4sims_cli.exceptions import AuthenticationError, ConnectionSetupError
+from ida4sims_cli.functions.concurrency_tuner import AIMDTuner, report_tuning
+from ida4sims_cli.functions.download_dataset_content import (
+    RemoteFile,
+    download_dataset_content,
+    filter_files,
+    find_checksum_mismatches,
+    flatten_listing,
+    local_target,
+)
+from ida4sims_cli.functions.event_log import log_event, log_options
+from ida4sims_cli.functions.listing_cache import CachedListingDatasets
+from ida4sims_cli.functions.metrics import metrics_options
+from ida4sims_cli.functions.profiling import phase, profile_options, profiling_session
+from ida4sims_cli.functions.transfer_progress import TransferProgress
+from ida4sims_cli.functions.upload_session import UploadSession
+from ida4sims_cli.helpers.default_data import DEFAULT_DOWNLOAD_WORKERS, DEFAULT_VERIFY_RETRIES
+
+
+def open_download_connection(workers: int):
+    """Return (irods, datasets, token_provider) for a download, exiting on failure.
+
+    Uses a running ida-agent when available; otherwise logs in and opens a
+    pool of `workers` iRODS connections, one per transfer thread.
+    """
+    try:
+        connection = connect(workers)
+    except AuthenticationError as auth_err:
+        log_event("auth.failed", f"ERROR: {auth_err}", logging.ERROR, error=str(auth_err))
+        sys.exit(1)
+    except ConnectionSetupError as conn_err:
+        log_event("connection.failed", f"ERROR: {conn_err}", logging.ERROR, error=str(conn_err))
+        sys.exit(1)
+    return connection.irods, connection.datasets, connection.token_provider
+
+
+def verify_and_refetch(irods, dataset_id: str, files: List[RemoteFile], dest: Path, lexis_token, workers: int, retries: int, progress: Optional[TransferProgress] = None, tuner: Optional[AIMDTuner] = None) -> List[RemoteFile]:
+    """Check downloaded files against server hashes, fetching mismatches again up to `retries` times.
+
+    Files whose server hash could not be obtained (e.g. the server was still
+    hashing a large file) are kept and only logged as unverified. With a
+    `tuner`, it sets the number of hash requests in flight instead of
+    `workers`. Returns the files that still fail verification.
+    """
+    import asyncio
+
+    log_event("download.verify", f"Verifying checksums of {sum(1 for f in files if f.sha256)} downloaded file(s)...")
+    failed: List[RemoteFile] = []
+    mismatched, unverified = asyncio.run(find_checksum_mismatches(files, dataset_id, lexis_token, concurrency=workers, tuner=tuner))
+    for attempt in range(1, retries + 1):
+        if not mismatched:
+            break
+        log_event("download.refetch", f"Downloading {len(mismatched)} file(s) again after checksum mismatch.", files=len(mismatched), attempt=attempt)
+        for remote in mismatched:
+            local_target(dest, remote.path).unlink(missing_ok=True)
+            remote.sha256 = None
+        refetch_failed = download_dataset_content(irods, dataset_id, mismatched, dest, workers=workers, progress=progress, checksum=True)
+        failed += refetch_failed
+        refetched = [f for f in mismatched if f not in refetch_failed]
+        mismatched, still_unverified = asyncio.run(find_checksum_mismatches(refetched, dataset_id, lexis_token, concurrency=workers, tuner=tuner))
+        unverified += still_unverified
+    if unverified:
+        log_event(
+            "download.unverified",
+            f"WARNING: {len(unverified)} file(s) were kept without checksum verification because the server hash was not available.",
+            logging.WARNING, files=len(unverified), paths=[f.path for f in unverified],
+        )
+    for remote in mismatched:
+        log_event("download.verify_failed", f"ERROR: '{remote.path}' failed checksum verification.", logging.ERROR, path=remote.path)
+        # Removed so that the next run fetches it again instead of skipping it by size.
+        local_target(dest, remote.path).unlink(missing_ok=True)
+    return failed + mismatched
+
+
+class SizeParamType(click.ParamType):
+    """File size such as 1048576, 500K, 20M or 2G (binary units)."""
+
+    name = "size"
+    _units = {"": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3, "T": 1024 ** 4}
+
+    def convert(self, value, param, ctx):
+        if isinstance(value, int):
+            return value
+        text = str(value).strip().upper().removesuffix("B").removesuffix("I")
+        number, unit = (text[:-1], text[-1]) if text and text[-1] in self._units else (text, "")
+        try:
+            return int(float(number) * self._units[unit])
+        except ValueError:
+            self.fail(f"'{value}' is not a valid size (e.g. 500M, 2G)", param, ctx)
+
+
+def download_lexis_dataset(
+    dataset_id: str,
+    dest: Path,
+    workers: int = DEFAULT_DOWNLOAD_WORKERS,
+    summary_file: Optional[str] = None,
+    show_progress: bool = True,
+    include: Sequence[str] = (),
+    exclude: Sequence[str] = (),
+    max_size: Optional[int] = None,
+    max_depth: Optional[int] = None,
+    verify: bool = True,
+    verify_retries: int = DEFAULT_VERIFY_RETRIES,
+    auto_tune: bool = False,
+) -> bool:
+    """Download the (selected) files of a dataset into `dest`. Returns True if every file was downloaded.
+
+    Args:
+        dataset_id (str): ID of the LEXIS dataset.
+        dest (Path): Local directory receiving the dataset tree.
+        workers (int): Number of concurrent file transfers.
+        summary_file (str, optional): Path of a JSON file receiving the transfer summary.
+        show_progress (bool): Render a live progress bar on stderr (only when it is a terminal).
+        include (sequence of str): Only download files matching one of these globs.
+        exclude (sequence of str): Skip files matching any of these globs.
+        max_size (int, optional): Skip files larger than this many bytes.
+        max_depth (int, optional): Skip files nested deeper than this many levels.
+        verify (bool): Compare the sha256 of every downloaded file with the server hash.
+        verify_retries (int): How often files with a checksum mismatch are downloaded again.
+        auto_tune (bool): Adapt the number of concurrent hash requests during verification, up to `workers`.
+    """
+    irods, datasets, lexis_token = open_download_connection(workers)
+
+    log_event("download.list", f"Retrieving content of dataset '{dataset_id}'...", dataset_id=dataset_id)
+    with phase("list_dataset"):
+        # Always fetched, and stored for later commands such as ida-get-dataset-hashes.
+        listing = CachedListingDatasets(datasets, refresh=True).get_content_of_dataset(dataset_id=dataset_id)
+    if not listing or "contents" not in listing:
+        log_event("download.failed", f"ERROR: Could not retrieve the content of dataset '{dataset_id}'.", logging.ERROR, dataset_id=dataset_id)
+        return False
+    all_files = flatten_listing(listing["contents"])
+    files = filter_files(all_files, include=include, exclude=exclude, max_size=max_size, max_depth=max_depth)
+    if len(files) != len(all_files):
+        log_event(
+            "download.filter",
+            f"Selected {len(files)} of {len(all_files)} file(s) ({sum(f.size for f in files)} of {sum(f.size for f in all_files)} bytes).",
+            selected=len(files), total=len(all_files),
+        )
+
+    dest.mkdir(parents=True, exist_ok=True)
+    progress = TransferProgress(total_bytes=sum(f.size for f in files), total_files=len(files), show_bar=show_progress)
+    log_event("download.begin", f"Downloading {len(files)} file(s) to '{dest}' with {workers} concurrent transfer(s)...", dataset_id=dataset_id, files=len(files), dest=str(dest), workers=workers)
+    try:
+        failed = download_dataset_content(irods, dataset_id, files, dest, workers=workers, progress=progress, checksum=verify)
+        if verify:
+            tuner = AIMDTuner(maximum=workers, name="hash requests") if auto_tune else None
+            with report_tuning([tuner] if tuner else []):
+                failed += verify_and_refetch(irods, dataset_id, [f for f in files if f not in failed], dest, lexis_token, workers, verify_retries, progress, tuner=tuner)
+    finally:
+        if isinstance(irods, UploadSession):
+            progress.connections = irods.stats()
+        progress.close()
+        progress.print_report()
+        if summary_file:
+            progress.write_summary(summary_file)
+
+    if failed:
+        log_event("download.failed", f"ERROR: {len(failed)} file(s) failed to download; run the command again to resume.", logging.ERROR, dataset_id=dataset_id, failed=len(failed))
+        return False
+    log_event("download.success", f"Dataset '{dataset_id}' downloaded to '{dest}'.", dataset_id=dataset_id, dest=str(dest))
+    return True
+
+
+@click.command()
+@click.argument('dataset_id', type=str, required=True)
+@click.argument('dest', type=click.Path(file_okay=False, dir_okay=True, path_type=Path), default=Path("."))
+@click.option('--workers', '-j', type=click.IntRange(min=1), default=DEFAULT_DOWNLOAD_WORKERS, show_default=True, help='Number of concurrent file transfers.')
+@click.option('--include', multiple=True, help='Only download files matching this glob. Globs with a "/" match the dataset path (e.g. "sim/traj/frame_*0.nc"), others the file name. Can be used multiple times.')
+@click.option('--exclude', multiple=True, help='Skip files matching this glob (same matching as --include). Can be used multiple times.')
+@click.option('--max-size', type=SizeParamType(), default=None, help='Skip files larger than this (e.g. 500M, 2G).')
+@click.option('--max-depth', type=click.IntRange(min=1), default=None, help='Skip files nested deeper than this many levels (1 = dataset root only).')
+@click.option('--verify/--no-verify', default=True, show_default=True, help='Compare the sha256 of each downloaded file with the server hash.')
+@click.option('--verify-retries', type=click.IntRange(min=0), default=DEFAULT_VERIFY_RETRIES, show_default=True, help='How often a file with a checksum mismatch is downloaded again.')
+@click.option('--auto-tune', 'auto_tune', is_flag=True, default=False, help='Adapt the number of concurrent hash requests during verification, up to --workers.')
+@click.option('--summary-file', type=click.Path(file_okay=True, dir_okay=False, writable=True), required=False, help='Write a JSON transfer summary to this path.')
+@click.option('--no-progress', 'no_progress', is_flag=True, default=False, help='Disable the live progress bar.')
+@profile_options
+@log_options
+@metrics_options("ida-download-dataset")
+def cli(dataset_id, dest, workers, include, exclude, max_size, max_depth, verify, verify_retries, auto_tune, summary_file, no_progress, profile, profile_cpu, profile_memory):
+    """
+    Download a dataset into DEST (default: current directory).
+
+    DATASET_ID: The UUID of the dataset.
+
+    Files are fetched concurrently and written under temporary names that are
+    renamed into place when complete. Files already present with the expected
+    size are skipped, so an interrupted download is resumed by running the
+    same command again.
+
+    Use --include/--exclude/--max-size/--max-depth to fetch only a subset,
+    e.g. the topology and every 10th trajectory frame.
+
+    Downloaded files are checked against the server sha256 (--no-verify to
+    skip); mismatching files are fetched again.
+    """
+    with profiling_session(profile, "ida-download-dataset", cpu=profile_cpu, memory=profile_memory):
+        ok = download_lexis_dataset(
+            dataset_id, dest, workers=workers, summary_file=summary_file, show_progress=not no_progress,
+            include=include, exclude=exclude, max_size=max_size, max_depth=max_depth,
+            verify=verify, verify_retries=verify_retries, auto_tune=auto_tune,
+        )
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,47 @@
+"""Exceptions raised by the ida4sims_cli Python API (`ida4sims_cli.api`)."""
+
+import signal
+from typing import Optional
+
+
+class Ida4simsError(Exception):
+    """Base class of all errors raised by the API."""
+
+
+class AuthenticationError(Ida4simsError):
+    """No LEXIS session could be obtained (missing or rejected offline token)."""
+
+
+class ConnectionSetupError(Ida4simsError):
+    """The py4lexis iRODS/Datasets objects could not be created."""
+
+
+class DatasetCreationError(Ida4simsError):
+    """The dataset entry could not be created."""
+
+
+class UploadError(Ida4simsError):
+    """Transferring the content failed; `dataset_id` is the dataset that may be partly filled."""
+
+    def __init__(self, message: str, dataset_id: Optional[str] = None, path: Optional[str] = None):
+        super().__init__(message)
+        self.dataset_id = dataset_id
+        self.path = path
+
+
+class VerificationError(UploadError):
+    """The dataset does not contain what was uploaded."""
+
+
+class UploadInterrupted(Ida4simsError):
+    """Raised instead of starting a new transfer once SIGINT/SIGTERM (or `request_stop`) was received."""
+
+    def __init__(self, signum: Optional[int] = None):
+        self.signum = signum
+        name = signal.Signals(signum).name if signum else "a stop request"
+        super().__init__(f"Interrupted by {name}")
+
+    @property
+    def exit_code(self) -> int:
+        """Shell convention: 128 + signal number (130 for Ctrl-C, 143 for SIGTERM)."""
+        return 128 + (self.signum or signal.SIGINT)
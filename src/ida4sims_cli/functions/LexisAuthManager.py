@@ -1,78 +1,156 @@
-import keyring
-from py4lexis.session import LexisSession, LexisSessionToken
+import logging
+from typing import Optional
+
 from ida4sims_cli.helpers.default_data import KEYRING_SERVICE_NAME, KEYRING_USERNAME
+from ida4sims_cli.functions.event_log import log_event
+from ida4sims_cli.functions.profiling import phase
+from ida4sims_cli.functions.token_cache import (
+    clear_cached_access_token,
+    load_cached_access_token,
+    store_access_token,
+)
+
+# keyring and py4lexis are imported on first use: both are slow to import and
+# keyring may talk to the OS secret service, which `--help` should never need.
+
+
+def get_stored_token() -> Optional[str]:
+    """Return the offline (refresh) token stored in the keyring, if any."""
+    import keyring
+
+    ### IN CASE OF TOKEN PROBLEM RETURN None HERE
+    return keyring.get_password(KEYRING_SERVICE_NAME, KEYRING_USERNAME)
 
 
-stored_token = keyring.get_password(KEYRING_SERVICE_NAME, KEYRING_USERNAME)
+def cache_access_token(access_token: Optional[str]) -> None:
+    """Cache `access_token` for the next command, tied to the stored offline token."""
+    try:
+        stored_token = get_stored_token()
+    except Exception:
+        return
+    store_access_token(access_token, stored_token)
+
+
+def refreshed_session(session):
+    """Return a py4lexis session holding a fresh access token.
+
+    A session offering a `refresh_token()` method is refreshed in place.
+    Otherwise a new LexisSessionToken is built from the stored offline
+    token, the way `LexisAuthManager.login` creates sessions.
+    """
+    refresh = getattr(session, "refresh_token", None)
+    if callable(refresh):
+        refresh()
+        return session
+    from py4lexis.session import LexisSessionToken
+
+    stored_token = get_stored_token()
+    if not stored_token:
+        raise RuntimeError("No stored LEXIS token to refresh the session with; log in again.")
+    return LexisSessionToken(refresh_token=stored_token, reraise_exceptions=True)
 
-### IN CASE OF TOKEN PROBLEM UNCOMMENT THIS ROW BELOW   
-#stored_token=False
 
 class LexisAuthManager:
     offline_lexis_session = None
 
+    @phase("login")
     def login(self):
-        print("--- Attempting LEXIS Login/Session Creation ---")
-        print(f"Checking for stored token under service='{KEYRING_SERVICE_NAME}', username='{KEYRING_USERNAME}'")
-        print("Stored token found:", "Yes" if stored_token else "No")
+        import keyring
+        from py4lexis.session import LexisSession, LexisSessionToken
+
+        stored_token = get_stored_token()
+        log_event("auth.login", "--- Attempting LEXIS Login/Session Creation ---")
+        log_event("auth.stored_token", f"Checking for stored token under service='{KEYRING_SERVICE_NAME}', username='{KEYRING_USERNAME}'", logging.DEBUG)
+        log_event("auth.stored_token", f"Stored token found: {'Yes' if stored_token else 'No'}", found=bool(stored_token))
 
         self.offline_lexis_session = None
 
-        if stored_token:
-            print("Attempting to create session using stored token (may be refreshed)...")
+        cached_access_token = load_cached_access_token(stored_token) if stored_token else None
+        if cached_access_token:
+            # A previous command obtained an access token that is still valid:
+            # reuse it instead of doing a refresh round trip.
+            log_event("auth.cached_token", "Reusing cached access token.")
+            try:
+                session_attempt = LexisSessionToken(
+                    access_token=cached_access_token, refresh_token=stored_token, reraise_exceptions=True
+                )
+                if session_attempt:
+                    self.offline_lexis_session = session_attempt
+            except Exception as e:
+                log_event("auth.cached_token", f"WARNING: Cached access token could not be used ({e}); refreshing instead.", logging.WARNING, error=str(e))
+                clear_cached_access_token()
+                self.offline_lexis_session = None
+        reused_cached_token = self.offline_lexis_session is not None
+
+        if stored_token and self.offline_lexis_session is None:
+            log_event("auth.refresh", "Attempting to create session using stored token (may be refreshed)...")
             try:
                 session_attempt = LexisSessionToken(refresh_token=stored_token, reraise_exceptions=True)
 
                 if session_attempt:
-                    print("Session created successfully using stored/refreshed token.")
+                    log_event("auth.refresh", "Session created successfully using stored/refreshed token.")
                     self.offline_lexis_session = session_attempt
                 else:
-                    print("Stored token did not result in a valid session (invalid/expired?).")
+                    log_event("auth.refresh_failed", "WARNING: Stored token did not result in a valid session (invalid/expired?).", logging.WARNING)
 
             except Exception as e:
-                print(f"Error initializing session with stored token: {e}")
-                print("Proceeding to perform a new login.")
+                log_event("auth.refresh_failed", f"WARNING: Error initializing session with stored token: {e}. Proceeding to perform a new login.", logging.WARNING, error=str(e))
                 self.offline_lexis_session = None
 
         if self.offline_lexis_session is None:
             if not stored_token:
-                print(f"No valid token found for '{KEYRING_SERVICE_NAME}'. Performing new login...")
+                log_event("auth.new_login", f"No valid token found for '{KEYRING_SERVICE_NAME}'. Performing new login...")
             else:
-                 print("Stored token failed. Performing new login...")
+                 log_event("auth.new_login", "Stored token failed. Performing new login...")
 
             try:
                 lexis_session = LexisSession(offline_access=True, reraise_exceptions=True)
 
                 if lexis_session:
-                    print("New login successful.")
+                    log_event("auth.new_login", "New login successful.")
                     new_offline_token = lexis_session.get_refresh_token()
 
                     if new_offline_token:
-                        print("New offline token obtained.")
+                        log_event("auth.new_login", "New offline token obtained.", logging.DEBUG)
                         keyring.set_password(KEYRING_SERVICE_NAME, KEYRING_USERNAME, new_offline_token)
-                        print(f"Stored new offline token for '{KEYRING_SERVICE_NAME}'.")
+                        log_event("auth.new_login", f"Stored new offline token for '{KEYRING_SERVICE_NAME}'.")
 
                         self.offline_lexis_session = LexisSessionToken(refresh_token=new_offline_token, reraise_exceptions=True)
-                        print("Offline session created with new token.")
+                        log_event("auth.new_login", "Offline session created with new token.", logging.DEBUG)
                     else:
-                        print("Warning: Login succeeded, but failed to retrieve an offline token to store.")
+                        log_event("auth.failed", "WARNING: Login succeeded, but failed to retrieve an offline token to store.", logging.WARNING)
                         self.offline_lexis_session = None
                 else:
-                    print("Error: New login failed or session could not be authenticated.")
+                    log_event("auth.failed", "ERROR: New login failed or session could not be authenticated.", logging.ERROR)
                     self.offline_lexis_session = None
 
             except Exception as e:
-                print(f"An unexpected error occurred during new login: {e}")
+                log_event("auth.failed", f"ERROR: An unexpected error occurred during new login: {e}", logging.ERROR, error=str(e))
                 self.offline_lexis_session = None
 
+        if self.offline_lexis_session and not reused_cached_token:
+            self._cache_access_token()
+
         if self.offline_lexis_session:
-            print("--- LEXIS Login/Session Creation Successful ---")
+            log_event("auth.login", "--- LEXIS Login/Session Creation Successful ---")
         else:
-            print("--- LEXIS Login/Session Creation Failed ---")
+            log_event("auth.login", "--- LEXIS Login/Session Creation Failed ---")
 
         return self.offline_lexis_session
-    
+
+    def _cache_access_token(self) -> None:
+        try:
+            access_token = self.offline_lexis_session.get_access_token()
+        except Exception:
+            return
+        cache_access_token(access_token)
+
     def logout (self):
+        import keyring
+        from py4lexis.session import LexisSessionToken
+
+        stored_token = get_stored_token()
+        clear_cached_access_token()
         self.offline_lexis_session = LexisSessionToken(refresh_token=stored_token, reraise_exceptions=True)
 
         if self.offline_lexis_session:
@@ -0,0 +1,181 @@
+import json
+import os
+import socket
+import threading
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+# Methods the agent exposes on its py4lexis objects. Anything else is rejected.
+AGENT_METHODS = {
+    "irods": {"create_dataset", "put_data_object_to_dataset", "upload_directory_to_dataset", "download_data_object_from_dataset"},
+    "datasets": {"get_content_of_dataset", "get_all_datasets"},
+}
+
+
+class AgentError(RuntimeError):
+    """Raised when the agent reports an error or cannot be reached mid-call."""
+
+
+def default_socket_path() -> Path:
+    """Return the agent socket path ($IDA4SIMS_AGENT_SOCKET, else a per-user runtime dir)."""
+    override = os.environ.get("IDA4SIMS_AGENT_SOCKET")
+    if override:
+        return Path(override)
+    runtime_dir = os.environ.get("XDG_RUNTIME_DIR")
+    base = Path(runtime_dir) / "ida4sims" if runtime_dir else Path.home() / ".cache" / "ida4sims"
+    return base / "agent.sock"
+
+
+def send_message(sock: socket.socket, message: Dict[str, Any]) -> None:
+    sock.sendall(json.dumps(message).encode("utf-8") + b"\n")
+
+
+def read_message(stream) -> Optional[Dict[str, Any]]:
+    line = stream.readline()
+    if not line:
+        return None
+    return json.loads(line)
+
+
+# Idle connections an AgentClient keeps for reuse; threads beyond that open (and then close) their own.
+AGENT_CLIENT_IDLE_CONNECTIONS = 4
+
+
+class AgentClient:
+    """Client for the local ida-agent, speaking JSON lines over a Unix socket.
+
+    Each call uses a connection of its own for the round trip: idle ones
+    are reused, so a command's calls share one connection, while threads
+    calling at the same time (a transfer and a token request, say) do not
+    wait for each other.
+    """
+
+    def __init__(self, socket_path: Optional[Path] = None, timeout: Optional[float] = None):
+        self.socket_path = Path(socket_path) if socket_path else default_socket_path()
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        # Connect right away so a missing agent is noticed by the caller.
+        self._idle: List[Tuple[socket.socket, Any]] = [self._open()]
+
+    def _open(self) -> Tuple[socket.socket, Any]:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        try:
+            sock.connect(str(self.socket_path))
+        except OSError:
+            sock.close()
+            raise
+        return sock, sock.makefile("rb")
+
+    @staticmethod
+    def _close_connection(connection: Tuple[socket.socket, Any]) -> None:
+        sock, stream = connection
+        try:
+            stream.close()
+            sock.close()
+        except OSError:
+            pass
+
+    def set_timeout(self, timeout: Optional[float]) -> None:
+        """Change the socket timeout of this and future connections."""
+        with self._lock:
+            self.timeout = timeout
+            for sock, _ in self._idle:
+                sock.settimeout(timeout)
+
+    def call(self, method: str, **params: Any) -> Any:
+        with self._lock:
+            connection = self._idle.pop() if self._idle else None
+        try:
+            if connection is None:
+                connection = self._open()
+            sock, stream = connection
+            send_message(sock, {"method": method, "params": params})
+            response = read_message(stream)
+        except (OSError, ValueError) as e:
+            if connection is not None:
+                self._close_connection(connection)
+            if isinstance(e, ValueError):
+                raise
+            raise AgentError(f"Lost connection to agent at '{self.socket_path}': {e}") from e
+        if response is None:
+            self._close_connection(connection)
+            raise AgentError(f"Agent at '{self.socket_path}' closed the connection.")
+        with self._lock:
+            keep = len(self._idle) < AGENT_CLIENT_IDLE_CONNECTIONS
+            if keep:
+                self._idle.append(connection)
+        if not keep:
+            self._close_connection(connection)
+        if not response.get("ok"):
+            raise AgentError(response.get("error") or "Unknown agent error")
+        return response.get("result")
+
+    def close(self) -> None:
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for connection in idle:
+            self._close_connection(connection)
+
+
+def connect_agent(socket_path: Optional[Path] = None) -> Optional[AgentClient]:
+    """Return a client if an agent is listening, else None.
+
+    Set IDA4SIMS_NO_AGENT=1 to always run standalone.
+    """
+    if os.environ.get("IDA4SIMS_NO_AGENT"):
+        return None
+    path = Path(socket_path) if socket_path else default_socket_path()
+    if not path.exists():
+        return None
+    try:
+        client = AgentClient(path, timeout=2.0)
+        client.call("ping")
+    except (OSError, AgentError, ValueError):
+        return None
+    # Transfers can take arbitrarily long once connected.
+    client.set_timeout(None)
+    return client
+
+
+class _AgentProxy:
+    """Stands in for a py4lexis object living in the agent process."""
+
+    _target = ""
+
+    def __init__(self, client: AgentClient):
+        self._client = client
+
+    def __getattr__(self, name: str):
+        if name not in AGENT_METHODS[self._target]:
+            raise AttributeError(f"'{name}' is not available through the agent")
+
+        def method(*args: Any, **kwargs: Any) -> Any:
+            if args:
+                raise TypeError("Agent calls take keyword arguments only")
+            return self._client.call(f"{self._target}.{name}", **kwargs)
+
+        return method
+
+
+class AgentIRODS(_AgentProxy):
+    _target = "irods"
+
+    def __getattr__(self, name: str):
+        method = super().__getattr__(name)
+
+        def with_absolute_paths(**kwargs: Any) -> Any:
+            # The agent runs in its own working directory.
+            for key in ("local_filepath", "local_directorypath"):
+                if kwargs.get(key):
+                    kwargs[key] = os.path.abspath(kwargs[key])
+            return method(**kwargs)
+
+        return with_absolute_paths
+
+
+class AgentDatasets(_AgentProxy):
+    _target = "datasets"
+
+    def get_content_of_dataset(self, dataset_id: str, **kwargs: Any) -> Any:
+        return self._client.call("datasets.get_content_of_dataset", dataset_id=dataset_id, **kwargs)
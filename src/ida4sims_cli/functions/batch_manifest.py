@@ -0,0 +1,131 @@
+import csv
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Any, Dict, List
+
+import click
+
+from ida4sims_cli.helpers.creators import parse_creator_strings
+from ida4sims_cli.helpers.default_data import DEFAULT_ACCESS
+
+# Manifest spellings of the dataset types accepted by ida-upload-dataset.
+DATASET_TYPE_ALIASES = {
+    "simulation": "simulation",
+    "forcefield": "force_field",
+    "force_field": "force_field",
+    "experimental": "experimental_data",
+    "experimental_data": "experimental_data",
+}
+
+# Metadata the per-type upload commands require.
+REQUIRED_METADATA = {
+    "simulation": (),
+    "force_field": ("ff_format", "ff_name", "molecule_type", "dat_file", "library_files"),
+    "experimental_data": ("technique",),
+}
+
+# Metadata holding several file names; in CSV manifests they are separated by ';'.
+LIST_METADATA = ("library_files", "frcmod_files", "3j_coupling_files", "noe_files")
+
+
+@dataclass
+class BatchEntry:
+    """One dataset of a batch upload manifest."""
+
+    path: str
+    title: str
+    dataset_type: str
+    access: str = DEFAULT_ACCESS
+    metadata: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def key(self) -> str:
+        """Identifies the entry in the batch state file across runs."""
+        return f"{self.title}\t{os.path.abspath(self.path)}"
+
+
+def _read_rows(manifest_path: str) -> List[Dict[str, Any]]:
+    extension = os.path.splitext(manifest_path)[1].lower()
+    with open(manifest_path, "r", newline="") as f:
+        if extension == ".csv":
+            return [{k.strip(): v for k, v in row.items() if k and v not in (None, "")} for row in csv.DictReader(f)]
+        if extension in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise click.ClickException("YAML manifests need PyYAML: pip install 'ida4sims-cli[yaml]' (or use a CSV manifest).")
+            data = yaml.safe_load(f)
+        elif extension == ".json":
+            data = json.load(f)
+        else:
+            raise click.ClickException(f"Unsupported manifest format '{extension}'; use .csv, .yaml/.yml or .json.")
+    if isinstance(data, dict):
+        data = data.get("datasets")
+    if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+        raise click.ClickException("The manifest must be a list of datasets (or a mapping with a 'datasets' list).")
+    return data
+
+
+def _entry_from_row(row: Dict[str, Any], base_dir: str, number: int) -> BatchEntry:
+    row = dict(row)
+    where = f"Manifest entry {number}"
+    for required in ("path", "title", "type"):
+        if not row.get(required):
+            raise click.ClickException(f"{where}: '{required}' is missing.")
+    dataset_type = DATASET_TYPE_ALIASES.get(str(row.pop("type")).strip().lower())
+    if dataset_type is None:
+        raise click.ClickException(f"{where}: unknown type; use one of {', '.join(sorted(DATASET_TYPE_ALIASES))}.")
+    path = os.path.expanduser(str(row.pop("path")))
+    if not os.path.isabs(path):
+        path = os.path.join(base_dir, path)
+    if not os.path.exists(path):
+        raise click.ClickException(f"{where}: path '{path}' does not exist.")
+    title = str(row.pop("title"))
+    access = str(row.pop("access", DEFAULT_ACCESS))
+
+    # Remaining keys are metadata; nested 'metadata' mappings (YAML/JSON) are merged in.
+    metadata: Dict[str, Any] = dict(row.pop("metadata", None) or {})
+    metadata.update(row)
+    for key in LIST_METADATA:
+        value = metadata.get(key)
+        if isinstance(value, str):
+            metadata[key] = [v.strip() for v in value.split(";") if v.strip()]
+    creators = parse_creator_strings(_as_list(metadata.pop("creator_person", None)), _as_list(metadata.pop("creator_org", None)))
+    if creators:
+        metadata["creators_json"] = json.dumps(creators)
+    missing = [key for key in REQUIRED_METADATA[dataset_type] if not metadata.get(key)]
+    if missing:
+        raise click.ClickException(f"{where} ('{title}'): {dataset_type} datasets need {', '.join(missing)}.")
+    metadata["dataset_type"] = dataset_type
+    if dataset_type == "force_field":
+        metadata.setdefault("feature_state", "persistent")
+    return BatchEntry(path=path, title=title, dataset_type=dataset_type, access=access, metadata=metadata)
+
+
+def _as_list(value: Any) -> List[str]:
+    """Creators may be given as one string, a '|'-separated CSV cell or a list."""
+    if not value:
+        return []
+    if isinstance(value, str):
+        return [v.strip() for v in value.split("|") if v.strip()]
+    return [str(v) for v in value]
+
+
+def read_manifest(manifest_path: str) -> List[BatchEntry]:
+    """Read a CSV, YAML or JSON batch manifest, raising click.ClickException on invalid entries.
+
+    Every entry needs `path`, `title` and `type` (simulation, forcefield or
+    experimental); `access` is optional and all other keys are metadata, as
+    given to the matching `ida-upload-dataset` subcommand (e.g. `ff_name`,
+    `library_files`, `creator_person`). Relative paths are resolved against
+    the manifest's directory.
+    """
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    entries = [_entry_from_row(row, base_dir, number) for number, row in enumerate(_read_rows(manifest_path), start=1)]
+    seen = set()
+    for entry in entries:
+        if entry.key in seen:
+            raise click.ClickException(f"Dataset '{entry.title}' from '{entry.path}' is listed twice in the manifest.")
+        seen.add(entry.key)
+    return entries
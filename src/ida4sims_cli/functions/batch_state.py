@@ -0,0 +1,59 @@
+import json
+import os
+import tempfile
+import threading
+from typing import Any, Dict, Optional
+
+BATCH_STATE_VERSION = 1
+
+
+class BatchState:
+    """Progress of a batch upload, kept in a JSON file next to the manifest.
+
+    Records the dataset created for every manifest entry and whether its
+    upload finished, so an interrupted batch can be run again: finished
+    entries are skipped and created datasets are reused instead of creating
+    duplicates. Updates are written atomically and may come from several
+    threads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.entries: Dict[str, Dict[str, Any]] = {}
+        try:
+            with open(path, "r") as f:
+                data = json.load(f)
+            if data.get("version") == BATCH_STATE_VERSION:
+                self.entries = data.get("entries") or {}
+        except (OSError, ValueError):
+            pass
+
+    def get(self, key: str) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self.entries.get(key) or {})
+
+    def dataset_id(self, key: str) -> Optional[str]:
+        return self.get(key).get("dataset_id")
+
+    def is_done(self, key: str) -> bool:
+        return self.get(key).get("status") == "uploaded"
+
+    def update(self, key: str, **fields: Any) -> None:
+        with self._lock:
+            self.entries.setdefault(key, {}).update(fields)
+            self._write()
+
+    def _write(self) -> None:
+        directory = os.path.dirname(os.path.abspath(self.path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix=".batch-state-", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "w") as f:
+                json.dump({"version": BATCH_STATE_VERSION, "entries": self.entries}, f, indent=1)
+            os.replace(tmp, self.path)
+        except BaseException:
+            try:
+                os.unlink(tmp)
+            except OSError:
+                pass
+            raise
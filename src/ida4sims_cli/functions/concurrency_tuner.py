@@ -0,0 +1,240 @@
+from __future__ import annotations
+
+import contextlib
+import contextvars
+import threading
+import time
+from typing import TYPE_CHECKING, Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from ida4sims_cli.functions.event_log import log_event
+
+if TYPE_CHECKING:
+    import asyncio
+
+    import httpx
+
+# HTTP statuses treated as "slow down" by the server.
+THROTTLE_STATUSES = (429, 503)
+
+
+class Slot:
+    """One running operation; set `units` (bytes, or 1 per request), `throttled` or `failed` before it ends.
+
+    `failed` is for errors the operation handles itself; an exception
+    leaving the slot counts as a failure anyway.
+    """
+
+    def __init__(self, epoch: int, started: float, units: float = 1):
+        self.epoch = epoch
+        self.started = started
+        self.units = units
+        self.throttled = False
+        self.failed = False
+
+
+# The aslot() of the running task, for watch_throttling.
+_current_slot: contextvars.ContextVar[Optional[Slot]] = contextvars.ContextVar("ida4sims_tuner_slot", default=None)
+
+
+class AIMDTuner:
+    """Limit on concurrent operations tuned by additive increase / multiplicative decrease.
+
+    Operations run inside `slot()` (threads) or `aslot()` (asyncio) and
+    wait while `limit` of them are running. After every round of `limit`
+    successful operations the throughput of the round (units per second)
+    is compared with the previous one: while it rises by more than
+    `tolerance` the limit grows by one, up to `maximum`. A failed or
+    throttled operation, or a round whose time per unit exceeds
+    `latency_factor` times the best round seen, multiplies the limit by
+    `decrease_factor` (at least `minimum`). Operations started before a
+    decrease do not cause another one.
+    """
+
+    def __init__(
+        self,
+        maximum: int,
+        minimum: int = 1,
+        initial: Optional[int] = None,
+        decrease_factor: float = 0.5,
+        latency_factor: float = 3.0,
+        tolerance: float = 0.05,
+        name: str = "operations",
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.maximum = max(1, maximum)
+        self.minimum = max(1, min(minimum, self.maximum))
+        self.limit = max(self.minimum, min(initial or self.minimum, self.maximum))
+        self.decrease_factor = decrease_factor
+        self.latency_factor = latency_factor
+        self.tolerance = tolerance
+        self.name = name
+        self._clock = clock
+
+        self.peak = self.limit
+        self.increases = 0
+        self.decreases = 0
+        self.throttled = 0
+        self.errors = 0
+        self.latency_spikes = 0
+        self.history: List[Tuple[float, int]] = [(0.0, self.limit)]
+
+        self._started_at = clock()
+        self._cond = threading.Condition()
+        self._in_flight = 0
+        self._epoch = 0
+        self._round: List[Tuple[float, float]] = []
+        self._round_started = self._started_at
+        self._last_throughput: Optional[float] = None
+        self._best_cost: Optional[float] = None
+        self._async_waiters: List[Tuple[asyncio.AbstractEventLoop, asyncio.Event]] = []
+
+    def _set_limit(self, limit: int) -> None:
+        self.limit = limit
+        self.peak = max(self.peak, limit)
+        self.history.append((round(self._clock() - self._started_at, 3), limit))
+        self._round = []
+        self._round_started = self._clock()
+        self._wake()
+
+    def _decrease(self) -> None:
+        self._epoch += 1
+        self._last_throughput = None
+        self.decreases += 1
+        self._set_limit(max(self.minimum, int(self.limit * self.decrease_factor)))
+
+    def _wake(self) -> None:
+        self._cond.notify_all()
+        waiters, self._async_waiters = self._async_waiters, []
+        for loop, event in waiters:
+            loop.call_soon_threadsafe(event.set)
+
+    def record(self, slot: Slot, ok: bool = True) -> None:
+        """Feed the outcome of a finished operation into the limit."""
+        duration = self._clock() - slot.started
+        with self._cond:
+            if slot.throttled or slot.failed or not ok:
+                if slot.throttled:
+                    self.throttled += 1
+                else:
+                    self.errors += 1
+                if slot.epoch == self._epoch:
+                    self._decrease()
+                return
+            if slot.epoch != self._epoch:
+                return
+            self._round.append((duration, max(slot.units, 1)))
+            if len(self._round) < max(2, self.limit):
+                return
+            elapsed = self._clock() - self._round_started
+            throughput = sum(units for _, units in self._round) / elapsed if elapsed > 0 else float("inf")
+            # Time per unit over the whole round, so a few small files do not look like a spike.
+            cost = sum(d for d, _ in self._round) / sum(units for _, units in self._round)
+            if self._best_cost is None or cost < self._best_cost:
+                self._best_cost = cost
+            if self._best_cost > 0 and cost > self.latency_factor * self._best_cost:
+                self.latency_spikes += 1
+                self._decrease()
+                return
+            rising = self._last_throughput is None or throughput > self._last_throughput * (1 + self.tolerance)
+            self._last_throughput = throughput
+            if rising and self.limit < self.maximum:
+                self.increases += 1
+                self._set_limit(self.limit + 1)
+            else:
+                self._round = []
+                self._round_started = self._clock()
+
+    def _release(self) -> None:
+        with self._cond:
+            self._in_flight -= 1
+            self._wake()
+
+    @contextlib.contextmanager
+    def slot(self, units: float = 1) -> Iterator[Slot]:
+        """Run one operation once fewer than `limit` are running (blocking)."""
+        with self._cond:
+            while self._in_flight >= self.limit:
+                self._cond.wait()
+            self._in_flight += 1
+            slot = Slot(self._epoch, self._clock(), units)
+        ok = False
+        try:
+            yield slot
+            ok = True
+        finally:
+            self._release()
+            self.record(slot, ok)
+
+    @contextlib.asynccontextmanager
+    async def aslot(self, units: float = 1) -> AsyncIterator[Slot]:
+        """`slot()` for coroutines: waits without blocking the event loop."""
+        import asyncio
+
+        while True:
+            with self._cond:
+                if self._in_flight < self.limit:
+                    self._in_flight += 1
+                    slot = Slot(self._epoch, self._clock(), units)
+                    break
+                event = asyncio.Event()
+                self._async_waiters.append((asyncio.get_running_loop(), event))
+            await event.wait()
+        ok = False
+        token = _current_slot.set(slot)
+        try:
+            yield slot
+            ok = True
+        finally:
+            _current_slot.reset(token)
+            self._release()
+            self.record(slot, ok)
+
+    def report(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "final": self.limit,
+            "peak": self.peak,
+            "minimum": self.minimum,
+            "maximum": self.maximum,
+            "increases": self.increases,
+            "decreases": self.decreases,
+            "throttled": self.throttled,
+            "errors": self.errors,
+            "latency_spikes": self.latency_spikes,
+            "history": self.history[-50:],
+        }
+
+    def log_report(self) -> None:
+        """Log the level the tuner settled on (event 'tuning.report')."""
+        r = self.report()
+        log_event(
+            "tuning.report",
+            f"Auto-tuned concurrency of {self.name}: settled at {r['final']} (peak {r['peak']}, allowed {r['minimum']}-{r['maximum']}); "
+            f"{r['increases']} increase(s), {r['decreases']} decrease(s) after {r['throttled']} throttled, {r['errors']} failed and {r['latency_spikes']} slow round(s).",
+            **{k: v for k, v in r.items() if k != "history"},
+        )
+
+
+@contextlib.contextmanager
+def report_tuning(tuners: List[AIMDTuner]) -> Iterator[None]:
+    """Log the level each tuner settled on when the block ends, also on failure."""
+    try:
+        yield
+    finally:
+        for tuner in tuners:
+            tuner.log_report()
+
+
+def watch_throttling(client: httpx.AsyncClient) -> None:
+    """Mark the current `aslot()` as throttled when `client` receives a 429/503 response.
+
+    Responses are attributed to the slot of the task that made the request.
+    """
+    async def on_response(response: httpx.Response) -> None:
+        slot = _current_slot.get()
+        if slot is not None and response.status_code in THROTTLE_STATUSES:
+            slot.throttled = True
+
+    hooks = dict(client.event_hooks)
+    hooks["response"] = list(hooks.get("response", [])) + [on_response]
+    client.event_hooks = hooks
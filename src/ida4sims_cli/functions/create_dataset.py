@@ -1,22 +1,43 @@
-from typing import Dict
-from typing import cast
+from __future__ import annotations
 
-from py4lexis.lexis_irods import iRODS
-from py4lexis.core.typings.ddi import DatasetType
+from typing import TYPE_CHECKING, Dict, Optional
+from typing import cast
 
+from ida4sims_cli.functions.event_log import log_event
+from ida4sims_cli.functions.profiling import phase
 from ida4sims_cli.helpers.default_data import DEFAULT_ACCESS, PROJECT, DATASET_ID_FILE_NAME, STORAGE_NAME, STORAGE_RESOURCE
 import os
 
-def create_lexis_dataset(irods: iRODS, title: str, metadata: Dict[str, str]) -> str:
+if TYPE_CHECKING:
+    from py4lexis.lexis_irods import iRODS
+    from py4lexis.core.typings.ddi import DatasetType
+
+    from ida4sims_cli.functions.upload_state import UploadState
 
-    if os.path.exists(DATASET_ID_FILE_NAME):
-        with open(DATASET_ID_FILE_NAME, "r") as text_file:
+@phase("create_dataset")
+def create_lexis_dataset(irods: iRODS, title: str, metadata: Dict[str, str], state: Optional[UploadState] = None, dataset_id_file: Optional[str] = DATASET_ID_FILE_NAME) -> str:
+    """Create a dataset, or reuse the one an interrupted upload of the same source created.
+
+    The dataset ID is kept in the upload `state` of the source. A
+    `dataset_id_file` (dataset_id.txt left by older versions or written by
+    hand) is still honoured and moved into the state; without a state it
+    is also where a new ID is saved. With neither, a new dataset is always
+    created.
+    """
+    if state is not None and state.dataset_id:
+        dataset_id = state.dataset_id
+        log_event("dataset.reuse", f"Unfinished upload of '{state.source_path}' found. Using existing dataset ID: {dataset_id}", dataset_id=dataset_id)
+        return dataset_id
+    if dataset_id_file and os.path.exists(dataset_id_file):
+        with open(dataset_id_file, "r") as text_file:
             dataset_id = text_file.read().strip()
-        print(f"Dataset ID file found. Using existing dataset ID: {dataset_id}")
+        log_event("dataset.reuse", f"Dataset ID file found. Using existing dataset ID: {dataset_id}", dataset_id=dataset_id, path=dataset_id_file)
+        if state is not None:
+            state.set_dataset(dataset_id, dataset_type=metadata.get("dataset_type"))
         return dataset_id
     else:
         dataset_type_str = metadata["dataset_type"]
-        dataset_type:  DatasetType = cast(DatasetType, dataset_type_str)
+        dataset_type:  DatasetType = cast("DatasetType", dataset_type_str)
 
         response = irods.create_dataset(
             access=DEFAULT_ACCESS, project=PROJECT, storage_name=STORAGE_NAME, storage_resource=STORAGE_RESOURCE, title=title, additional_metadata=metadata, dataset_type= dataset_type
@@ -24,8 +45,11 @@ def create_lexis_dataset(irods: iRODS, title: str, metadata: Dict[str, str]) ->
         
         dataset_id = response["dataset_id"]
 
-        with open(DATASET_ID_FILE_NAME, "w") as text_file:
-            text_file.write(dataset_id)
+        if state is not None:
+            state.set_dataset(dataset_id, dataset_type=metadata.get("dataset_type"))
+        elif dataset_id_file:
+            with open(dataset_id_file, "w") as text_file:
+                text_file.write(dataset_id)
 
-        print(f"New dataset created with ID: {dataset_id}")
+        log_event("dataset.new", f"New dataset created with ID: {dataset_id}", dataset_id=dataset_id)
         return dataset_id
\ No newline at end of file
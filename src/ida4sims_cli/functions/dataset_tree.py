@@ -0,0 +1,112 @@
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+from ida4sims_cli.functions.transfer_progress import format_bytes
+
+
+@dataclass(slots=True)
+class TreeNode:
+    """A file or directory of a dataset listing; directories carry totals of everything below them."""
+
+    name: str
+    is_dir: bool
+    size: int = 0
+    files: int = 0
+    children: List["TreeNode"] = field(default_factory=list)
+
+
+def build_tree(items: Optional[List[Dict[str, Any]]], name: str = "") -> TreeNode:
+    """Build a TreeNode tree from a `get_content_of_dataset` listing, aggregating sizes and file counts.
+
+    Works with an explicit stack instead of recursion, so very deep or very
+    large listings neither hit the recursion limit nor walk the tree twice:
+    totals are added to each directory when it is finished.
+    """
+    root = TreeNode(name=name, is_dir=True)
+    # (node, parent, pending child items); a node is finished once its items are used up.
+    stack = [(root, None, iter(items or []))]
+    while stack:
+        node, parent, pending = stack[-1]
+        item = next(pending, None)
+        if item is None:
+            stack.pop()
+            if parent is not None:
+                parent.size += node.size
+                parent.files += node.files
+            continue
+        if not isinstance(item, dict) or not item.get("name"):
+            continue
+        if item.get("type") == "directory":
+            child = TreeNode(name=item["name"], is_dir=True)
+            node.children.append(child)
+            stack.append((child, node, iter(item.get("contents") or [])))
+        else:
+            size = int(item.get("size") or 0)
+            node.children.append(TreeNode(name=item["name"], is_dir=False, size=size, files=1))
+            node.size += size
+            node.files += 1
+    return root
+
+
+def _sorted_children(node: TreeNode, sort: str) -> List[TreeNode]:
+    if sort == "size":
+        return sorted(node.children, key=lambda c: (-c.size, c.name))
+    if sort == "name":
+        return sorted(node.children, key=lambda c: (not c.is_dir, c.name))
+    return node.children
+
+
+def iter_tree_lines(
+    root: TreeNode,
+    max_depth: Optional[int] = None,
+    sort: str = "name",
+    max_entries: Optional[int] = None,
+    dirs_only: bool = False,
+) -> Iterator[str]:
+    """Yield the lines of a tree view, one per entry, so output can start before the whole tree is rendered.
+
+    Directories below `max_depth` are shown collapsed with their totals. At
+    most `max_entries` children are shown per directory; the rest are
+    summarized in one line.
+    """
+    yield f"{root.name or '/'}  [{format_bytes(root.size)}, {root.files} file(s)]"
+    # (children iterator, prefix, depth, hidden children summary)
+    stack = []
+
+    def push(node: TreeNode, prefix: str, depth: int) -> None:
+        children = _sorted_children(node, sort)
+        if dirs_only:
+            children = [c for c in children if c.is_dir]
+        hidden = children[max_entries:] if max_entries is not None else []
+        shown = children[:max_entries] if max_entries is not None else children
+        stack.append((iter(enumerate(shown)), len(shown), prefix, depth, hidden))
+
+    push(root, "", 1)
+    while stack:
+        children, count, prefix, depth, hidden = stack[-1]
+        entry = next(children, None)
+        if entry is None:
+            stack.pop()
+            if hidden:
+                yield f"{prefix}└── … {len(hidden)} more ({format_bytes(sum(c.size for c in hidden))}, {sum(c.files for c in hidden)} file(s))"
+            continue
+        index, child = entry
+        last = index == count - 1 and not hidden
+        branch = "└── " if last else "├── "
+        if child.is_dir:
+            collapsed = max_depth is not None and depth >= max_depth and child.children
+            yield f"{prefix}{branch}{child.name}/  [{format_bytes(child.size)}, {child.files} file(s)]{' …' if collapsed else ''}"
+            if not collapsed:
+                push(child, prefix + ("    " if last else "│   "), depth + 1)
+        else:
+            yield f"{prefix}{branch}{child.name}  ({format_bytes(child.size)})"
+
+
+def tree_to_dict(node: TreeNode, max_depth: Optional[int] = None, sort: str = "name", depth: int = 0) -> Dict[str, Any]:
+    """Return a JSON-serializable tree; directories deeper than `max_depth` have no `contents`."""
+    data: Dict[str, Any] = {"name": node.name, "type": "directory" if node.is_dir else "file", "size": node.size}
+    if node.is_dir:
+        data["files"] = node.files
+        if max_depth is None or depth < max_depth:
+            data["contents"] = [tree_to_dict(c, max_depth, sort, depth + 1) for c in _sorted_children(node, sort)]
+    return data
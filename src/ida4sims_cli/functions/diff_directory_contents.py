@@ -0,0 +1,86 @@
+from typing import Any, Dict, List, Optional
+
+
+def _files_below(items: Optional[List[Dict[str, Any]]], parent_path: str) -> List[Dict[str, Any]]:
+    files = []
+    for item in items or []:
+        if not isinstance(item, dict) or 'name' not in item:
+            continue
+        path = f"{parent_path}/{item['name']}" if parent_path else item['name']
+        if item.get('type') == 'directory':
+            files.extend(_files_below(item.get('contents'), path))
+        elif item.get('type') == 'file':
+            files.append({'path': path, 'item': item})
+    return files
+
+
+def _extra_below(item: Dict[str, Any], parent_path: str, extra_directories: bool) -> List[Dict[str, Any]]:
+    files = _files_below([item], parent_path)
+    if extra_directories and item.get('type') == 'directory' and files:
+        path = f"{parent_path}/{item['name']}" if parent_path else item['name']
+        return [{'path': path, 'item': item}]
+    return files
+
+
+def diff_directory_contents(contents1, contents2, parent_path: str = '', extra_directories: bool = False) -> Dict[str, List[Dict[str, Any]]]:
+    """Compare two listings (dataset = source 1, local = source 2) file by file, without side effects.
+
+    Items are matched by name per directory and files by size; both
+    `sync_directory_contents` (upload) and the mirror (download) plan their
+    transfers from this result. It is flat and lists files only; missing or
+    extra directories contribute all files below them. A name that is a
+    file on one side and a directory on the other is reported as missing on
+    one side and extra on the other.
+
+    Args:
+        contents1: Dataset listing.
+        contents2: Local listing.
+        parent_path: Dataset path the listings are below.
+        extra_directories: Report a directory that is only in `contents2`
+            as one 'extra_locally' entry (its 'item' being the directory)
+            instead of the files below it. Empty ones are still left out.
+
+    Returns a dict with 'missing_locally', 'extra_locally', 'mismatches' and
+    'matches' lists of {'path', ...} entries, paths being '/'-separated below
+    `parent_path`.
+    """
+    missing: List[Dict[str, Any]] = []
+    extra: List[Dict[str, Any]] = []
+    mismatched: List[Dict[str, Any]] = []
+    matched: List[Dict[str, Any]] = []
+
+    map1 = {item['name']: item for item in contents1 or [] if isinstance(item, dict) and 'name' in item}
+    map2 = {item['name']: item for item in contents2 or [] if isinstance(item, dict) and 'name' in item}
+
+    for name, item1 in map1.items():
+        path = f"{parent_path}/{name}" if parent_path else name
+        item2 = map2.get(name)
+        type1 = item1.get('type')
+        type2 = item2.get('type') if item2 is not None else None
+
+        if item2 is None or type1 != type2:
+            missing.extend(_files_below([item1], parent_path))
+            if item2 is not None:
+                extra.extend(_extra_below(item2, parent_path, extra_directories))
+        elif type1 == 'file':
+            if item1.get('size') != item2.get('size'):
+                mismatched.append({
+                    'path': path,
+                    'item1': item1,
+                    'item2': item2,
+                    'reason': f"Size mismatch: dataset is {item1.get('size')}, local is {item2.get('size')}"
+                })
+            else:
+                matched.append({'path': path, 'item1': item1, 'item2': item2})
+        elif type1 == 'directory':
+            sub_diffs = diff_directory_contents(item1.get('contents'), item2.get('contents'), path, extra_directories)
+            missing.extend(sub_diffs['missing_locally'])
+            extra.extend(sub_diffs['extra_locally'])
+            mismatched.extend(sub_diffs['mismatches'])
+            matched.extend(sub_diffs['matches'])
+
+    for name, item2 in map2.items():
+        if name not in map1:
+            extra.extend(_extra_below(item2, parent_path, extra_directories))
+
+    return {'missing_locally': missing, 'extra_locally': extra, 'mismatches': mismatched, 'matches': matched}
@@ -0,0 +1,254 @@
+import fnmatch
+import logging
+import os
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from ida4sims_cli.functions.concurrency_tuner import AIMDTuner, Slot, watch_throttling
+from ida4sims_cli.functions.event_log import log_event, log_item_event
+from ida4sims_cli.functions.hashing_utils import calculate_sha256, hash_poll_timeout
+from ida4sims_cli.functions.metrics import BYTES_DOWNLOADED, FILES_DOWNLOADED
+from ida4sims_cli.functions.profiling import phase
+from ida4sims_cli.functions.transfer_progress import TransferProgress
+
+PART_SUFFIX = ".part"
+
+
+@dataclass
+class RemoteFile:
+    """A file of a dataset listing; `path` is relative to the dataset root, '/'-separated."""
+
+    path: str
+    size: int
+    # sha256 of the downloaded bytes ("sha2:<base64>", as returned by /staging/hash).
+    sha256: Optional[str] = None
+
+
+def flatten_listing(items: List[Dict[str, Any]], parent: str = "") -> List[RemoteFile]:
+    """Return all files of a nested `get_content_of_dataset` listing."""
+    files: List[RemoteFile] = []
+    for item in items:
+        name = item.get("name")
+        if not name:
+            continue
+        path = f"{parent}/{name}" if parent else name
+        if item.get("type") == "directory":
+            files.extend(flatten_listing(item.get("contents") or [], path))
+        elif item.get("type") == "file":
+            files.append(RemoteFile(path=path.lstrip("/"), size=int(item.get("size") or 0)))
+    return files
+
+
+def _matches(path: str, pattern: str) -> bool:
+    # Patterns with a '/' match the whole dataset path, others only the file name.
+    if "/" in pattern:
+        return fnmatch.fnmatchcase(path, pattern.lstrip("/"))
+    return fnmatch.fnmatchcase(path.rsplit("/", 1)[-1], pattern)
+
+
+def filter_files(
+    files: Iterable[RemoteFile],
+    include: Sequence[str] = (),
+    exclude: Sequence[str] = (),
+    max_size: Optional[int] = None,
+    max_depth: Optional[int] = None,
+) -> List[RemoteFile]:
+    """Select the files of a listing to download.
+
+    A file is kept if it matches any `include` glob (all files when none are
+    given), matches no `exclude` glob, is at most `max_size` bytes and lies at
+    most `max_depth` levels deep (1 = files in the dataset root).
+    """
+    selected = []
+    for remote in files:
+        if include and not any(_matches(remote.path, p) for p in include):
+            continue
+        if any(_matches(remote.path, p) for p in exclude):
+            continue
+        if max_size is not None and remote.size > max_size:
+            continue
+        if max_depth is not None and remote.path.count("/") + 1 > max_depth:
+            continue
+        selected.append(remote)
+    return selected
+
+
+def local_target(dest: Path, remote_path: str) -> Path:
+    """Map a dataset path below `dest`, refusing paths that would escape it."""
+    parts = [p for p in remote_path.split("/") if p not in ("", ".")]
+    if not parts or ".." in parts:
+        raise ValueError(f"Refusing unsafe dataset path '{remote_path}'")
+    return dest.joinpath(*parts)
+
+
+def plan_downloads(files: Iterable[RemoteFile], dest: Path) -> Tuple[List[RemoteFile], List[RemoteFile]]:
+    """Split `files` into (to_download, already_present); files with a matching local size are kept."""
+    to_download, present = [], []
+    for remote in files:
+        target = local_target(dest, remote.path)
+        try:
+            if target.is_file() and target.stat().st_size == remote.size:
+                present.append(remote)
+                continue
+        except OSError:
+            pass
+        to_download.append(remote)
+    return to_download, present
+
+
+def download_file(irods: Any, dataset_id: str, remote: RemoteFile, dest: Path, checksum: bool = False) -> Tuple[int, float]:
+    """Download one file to a temporary name next to its target and rename it into place.
+
+    Returns (bytes, seconds). A partially written file never appears under the
+    final name, so an interrupted run is resumed by the size check. With
+    `checksum`, the sha256 is computed right after the transfer, while the
+    file is still in the page cache, and stored in `remote.sha256`.
+    """
+    target = local_target(dest, remote.path)
+    target.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = target.with_name(f".{target.name}.{uuid.uuid4().hex[:8]}{PART_SUFFIX}")
+    start = time.monotonic()
+    try:
+        irods.download_data_object_from_dataset(
+            dataset_id=dataset_id,
+            dataset_filepath=remote.path,
+            local_filepath=str(tmp_path),
+        )
+        size = tmp_path.stat().st_size
+        if size != remote.size:
+            raise IOError(f"Downloaded {size} bytes for '{remote.path}', expected {remote.size}")
+        if checksum:
+            remote.sha256 = calculate_sha256(tmp_path)
+        os.replace(tmp_path, target)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return size, time.monotonic() - start
+
+
+@phase("transfer")
+def download_dataset_content(
+    irods: Any,
+    dataset_id: str,
+    files: List[RemoteFile],
+    dest: Path,
+    workers: int = 4,
+    progress: Optional[TransferProgress] = None,
+    checksum: bool = False,
+    resume: bool = True,
+) -> List[RemoteFile]:
+    """Download `files` into `dest` with up to `workers` concurrent transfers.
+
+    `irods` is an iRODS object or an UploadSession pool (sized to `workers`
+    so every transfer thread has its own connection). Files already present
+    with the right size are skipped unless `resume` is False. With
+    `checksum`, downloaded files get their `sha256` set. Returns the files
+    that failed.
+    """
+    to_download, present = plan_downloads(files, dest) if resume else (list(files), [])
+    for remote in present:
+        FILES_DOWNLOADED.inc(result="skipped")
+        if progress is not None:
+            progress.record_skipped(remote.path, remote.size)
+    if present:
+        log_event("download.resume", f"Skipping {len(present)} file(s) already present with matching size.", files=len(present))
+
+    failed: List[RemoteFile] = []
+    with ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="ida4sims-download") as pool:
+        futures = {pool.submit(download_file, irods, dataset_id, remote, dest, checksum): remote for remote in to_download}
+        for future in as_completed(futures):
+            remote = futures[future]
+            try:
+                size, duration = future.result()
+            except Exception as e:
+                failed.append(remote)
+                FILES_DOWNLOADED.inc(result="failed")
+                log_event("download.file_failed", f"ERROR: Failed to download '{remote.path}': {e}", logging.ERROR, path=remote.path, error=str(e))
+                if progress is not None:
+                    progress.record_transfer(remote.path, remote.size, 0.0, ok=False, error=str(e))
+                continue
+            BYTES_DOWNLOADED.inc(size)
+            FILES_DOWNLOADED.inc(result="downloaded")
+            log_item_event("download.file_done", f"Downloaded '{remote.path}'", path=remote.path, bytes=size, duration_s=round(duration, 3))
+            if progress is not None:
+                progress.record_transfer(remote.path, size, duration)
+    return failed
+
+
+async def find_checksum_mismatches(
+    files: List[RemoteFile],
+    dataset_id: str,
+    lexis_token: Any,
+    concurrency: int = 4,
+    client: Any = None,
+    poll_interval: Optional[float] = None,
+    tuner: Optional[AIMDTuner] = None,
+    poll_timeout: Optional[float] = None,
+) -> Tuple[List[RemoteFile], List[RemoteFile]]:
+    """Compare the local `sha256` of downloaded files with the server hash from `/staging/hash`.
+
+    `lexis_token` is a bearer token or TokenProvider. Files without a local
+    hash (skipped on resume) are not checked. Returns `(mismatched,
+    unverified)`: the files whose hashes differ, and those whose server hash
+    could not be obtained (request failed, or the server did not finish
+    hashing within `poll_timeout`, by default `hash_poll_timeout(size)`).
+    With a `tuner`, its limit replaces `concurrency` and throttled (429/503)
+    or failed requests lower it.
+    """
+    import asyncio
+    from ida4sims_cli.functions.hashing_utils import get_irods_file_hash_via_poll_async
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    own_client = None
+    if tuner is not None:
+        if client is None:
+            import httpx
+
+            client = own_client = httpx.AsyncClient(timeout=10.0)
+        watch_throttling(client)
+    hash_kwargs: Dict[str, Any] = {}
+    if client is not None:
+        hash_kwargs["client"] = client
+    if poll_interval is not None:
+        hash_kwargs["interval"] = poll_interval
+
+    async def check(remote: RemoteFile) -> str:
+        timeout = poll_timeout if poll_timeout is not None else hash_poll_timeout(remote.size)
+        async with (tuner.aslot() if tuner is not None else semaphore) as slot:
+            with phase("remote_hash"):
+                try:
+                    result = await get_irods_file_hash_via_poll_async(dataset_id, "/" + remote.path, lexis_token, timeout=timeout, **hash_kwargs)
+                    error = None if result is not None else f"no result within {timeout:.0f}s"
+                except Exception as e:
+                    result, error = None, str(e)
+            if result is None and isinstance(slot, Slot):
+                slot.failed = True
+        remote_hash = (result or {}).get("result")
+        if remote_hash is None:
+            error = error or f"hash request ended without a result: {result}"
+            log_event("download.unverified", f"WARNING: Could not get server hash for '{remote.path}' ({error}); left unverified.", logging.WARNING, path=remote.path, error=error)
+            FILES_DOWNLOADED.inc(result="unverified")
+            return "unverified"
+        if remote_hash == remote.sha256:
+            return "ok"
+        log_event(
+            "download.checksum_mismatch",
+            f"WARNING: Checksum mismatch for '{remote.path}' (local {remote.sha256}, server {remote_hash})",
+            logging.WARNING, path=remote.path, local_hash=remote.sha256, remote_hash=remote_hash,
+        )
+        FILES_DOWNLOADED.inc(result="checksum_mismatch")
+        return "mismatched"
+
+    to_check = [f for f in files if f.sha256 is not None]
+    try:
+        results = await asyncio.gather(*(check(f) for f in to_check))
+    finally:
+        if own_client is not None:
+            await own_client.aclose()
+    mismatched = [f for f, outcome in zip(to_check, results) if outcome == "mismatched"]
+    unverified = [f for f, outcome in zip(to_check, results) if outcome == "unverified"]
+    return mismatched, unverified
@@ -0,0 +1,198 @@
+import functools
+import json
+import logging
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional
+
+import click
+
+LOGGER_NAME = "ida4sims_cli"
+logger = logging.getLogger(LOGGER_NAME)
+# Used as a library, events propagate to the application's logging setup;
+# the command line tools install their own handlers with configure_event_log().
+logger.addHandler(logging.NullHandler())
+
+LOG_LEVELS = ["DEBUG", "INFO", "WARNING", "ERROR"]
+
+
+class JsonlFormatter(logging.Formatter):
+    """Formats records as one JSON object per line (ts, level, event, message, fields...)."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "event": getattr(record, "event", "log"),
+            "message": record.getMessage(),
+        }
+        entry.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class _MaxLevelFilter(logging.Filter):
+    def __init__(self, max_level: int):
+        super().__init__()
+        self.max_level = max_level
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        return record.levelno <= self.max_level
+
+
+class _StdStreamHandler(logging.StreamHandler):
+    """StreamHandler writing to the *current* sys.stdout/sys.stderr (works with redirection)."""
+
+    def __init__(self, stream_name: str):
+        self.stream_name = stream_name
+        super().__init__()
+
+    @property
+    def stream(self):
+        return getattr(sys, self.stream_name)
+
+    @stream.setter
+    def stream(self, value):
+        pass
+
+
+class _ItemAggregator:
+    """Counts per-item events in quiet mode and emits them as periodic progress events."""
+
+    def __init__(self, interval: float):
+        self.interval = interval
+        self.counts: Counter = Counter()
+        self.totals: Counter = Counter()
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def add(self, event: str) -> None:
+        with self._lock:
+            self.counts[event] += 1
+            self.totals[event] += 1
+            due = time.monotonic() - self._last_flush >= self.interval
+        if due:
+            self.flush()
+
+    def flush(self, final: bool = False) -> None:
+        with self._lock:
+            if not self.counts and not final:
+                return
+            counts = dict(self.counts)
+            totals = dict(self.totals)
+            self.counts.clear()
+            self._last_flush = time.monotonic()
+        if not totals:
+            return
+        summary = ", ".join(f"{name}={count}" for name, count in sorted(totals.items()))
+        log_event(
+            "progress.final" if final else "progress",
+            f"{'Finished' if final else 'Progress'}: {summary}",
+            since_last=counts,
+            totals=totals,
+        )
+
+
+_aggregator: Optional[_ItemAggregator] = None
+
+
+def configure_event_log(
+    level: str = "INFO",
+    log_file: Optional[str] = None,
+    quiet: bool = False,
+    progress_interval: float = 10.0,
+) -> None:
+    """Set up console output and (optionally) a JSONL event log file.
+
+    Console output keeps the familiar plain-text lines (errors go to stderr).
+    With `quiet`, per-item events (one per file/directory) are not written
+    individually; they are counted and reported as rate-limited 'progress'
+    events instead, both on the console and in the JSONL file. Called by the
+    command line entry points only; records no longer propagate afterwards.
+    """
+    global _aggregator
+
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+    logger.setLevel(getattr(logging, level.upper(), logging.INFO))
+    logger.propagate = False
+
+    plain = logging.Formatter("%(message)s")
+    stdout_handler = _StdStreamHandler("stdout")
+    stdout_handler.setFormatter(plain)
+    stdout_handler.addFilter(_MaxLevelFilter(logging.WARNING))
+    stderr_handler = _StdStreamHandler("stderr")
+    stderr_handler.setFormatter(plain)
+    stderr_handler.setLevel(logging.ERROR)
+    logger.addHandler(stdout_handler)
+    logger.addHandler(stderr_handler)
+
+    if log_file:
+        file_handler = logging.FileHandler(log_file, encoding="utf-8")
+        file_handler.setFormatter(JsonlFormatter())
+        logger.addHandler(file_handler)
+
+    _aggregator = _ItemAggregator(progress_interval) if quiet else None
+
+
+def log_event(event: str, message: str, level: int = logging.INFO, **fields: Any) -> None:
+    """Log a structured event; `fields` end up as keys in the JSONL output."""
+    if logger.isEnabledFor(level):
+        logger.log(level, message, extra={"event": event, "fields": fields})
+
+
+def log_item_event(event: str, message: str, level: int = logging.INFO, **fields: Any) -> None:
+    """Log a per-item (per file/directory) event.
+
+    In quiet mode INFO/DEBUG item events are only counted; warnings and
+    errors are always logged individually.
+    """
+    if _aggregator is not None and level < logging.WARNING:
+        _aggregator.add(event)
+        return
+    log_event(event, message, level, **fields)
+
+
+def flush_item_events() -> None:
+    """Emit the final aggregated counts (quiet mode only)."""
+    if _aggregator is not None:
+        _aggregator.flush(final=True)
+
+
+def log_options(func):
+    """Add --log-level, --log-file and --quiet to a click command and configure logging before it runs."""
+
+    @functools.wraps(func)
+    def wrapper(*args, log_level, log_file, quiet, **kwargs):
+        configure_event_log(level=log_level, log_file=log_file, quiet=quiet)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            flush_item_events()
+
+    wrapper = click.option(
+        '--log-level',
+        type=click.Choice(LOG_LEVELS, case_sensitive=False),
+        default='INFO',
+        show_default=True,
+        help='Minimum level of events to output.',
+    )(wrapper)
+    wrapper = click.option(
+        '--log-file',
+        type=click.Path(file_okay=True, dir_okay=False, writable=True),
+        required=False,
+        help='Append structured events (JSON lines) to this file.',
+    )(wrapper)
+    wrapper = click.option(
+        '--quiet', '-q',
+        is_flag=True,
+        default=False,
+        help='Aggregate per-file events into periodic progress updates.',
+    )(wrapper)
+    return wrapper
+
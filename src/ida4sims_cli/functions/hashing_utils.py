@@ -1,17 +1,23 @@
-import asyncio
+from __future__ import annotations
+
+import base64
 import time
 import hashlib
-from typing import Optional
+from typing import TYPE_CHECKING, Optional, Union
 from pathlib import Path
 
-import httpx
-from py4lexis.core.session import LexisSession
+from ida4sims_cli.functions.metrics import HASH_POLL_LATENCY, HASH_REQUESTS, HASH_REQUESTS_FAILED
+from ida4sims_cli.functions.profiling import phase
+from ida4sims_cli.helpers.default_data import HASH_POLL_MIN_BYTES_PER_S, HASH_POLL_TIMEOUT
+
+if TYPE_CHECKING:
+    import httpx
+    from ida4sims_cli.functions.token_provider import TokenProvider
 
 BASE_URL = "https://api.lexis.tech/api/ddiapi/v2"
 
 
-import base64
-
+@phase("local_hash")
 def calculate_sha256(file_path: Path) -> str:
     """Calculate SHA256 hash of a local file."""
     sha256_hash = hashlib.sha256()
@@ -24,50 +30,73 @@ def calculate_sha256(file_path: Path) -> str:
     return f"sha2:{digest_b64}"
 
 
+def hash_poll_timeout(size: int) -> float:
+    """Seconds to wait for the server hash of a `size`-byte file; large files take the server longer to hash."""
+    return HASH_POLL_TIMEOUT + max(0, size) / HASH_POLL_MIN_BYTES_PER_S
+
 
-async def create_hash_request_async(dataset_id: str, path: str, lexis_token: str, client: Optional[httpx.AsyncClient] = None) -> Optional[str]:
+async def create_hash_request_async(dataset_id: str, path: str, lexis_token: Union[str, TokenProvider], client: Optional[httpx.AsyncClient] = None) -> Optional[str]:
     """
     Call `/staging/hash` and return the `request_id` on success.
+    `lexis_token` is a bearer token or a TokenProvider (refreshed and retried once on 401).
     """
+    from ida4sims_cli.functions.token_provider import authorized_get
+
     close_client = False
     if client is None:
+        import httpx
+
         client = httpx.AsyncClient(timeout=10.0)
         close_client = True
 
+    HASH_REQUESTS.inc()
     try:
-        headers = {"Authorization": f"Bearer {lexis_token}", "Accept": "application/json"}
         params = {"dataset_id": dataset_id, "path": path}
-        resp = await client.get(f"{BASE_URL}/staging/hash", headers=headers, params=params)
+        resp = await authorized_get(client, f"{BASE_URL}/staging/hash", lexis_token, params=params)
         if resp.status_code in (200, 202):
             data = resp.json()
-            return data.get("request_id") or data.get("id")
+            request_id = data.get("request_id") or data.get("id")
+            if not request_id:
+                HASH_REQUESTS_FAILED.inc(stage="create")
+            return request_id
+        HASH_REQUESTS_FAILED.inc(stage="create")
         return None
+    except Exception:
+        HASH_REQUESTS_FAILED.inc(stage="create")
+        raise
     finally:
         if close_client:
             await client.aclose()
 
 
-async def poll_status_async(request_id: str, lexis_token: str, interval: float = 1.0, timeout: float = 30.0, client: Optional[httpx.AsyncClient] = None) -> Optional[dict]:
+async def poll_status_async(request_id: str, lexis_token: Union[str, TokenProvider], interval: float = 1.0, timeout: float = 30.0, client: Optional[httpx.AsyncClient] = None) -> Optional[dict]:
     """
     Poll `/staging/status/{request_id}` until status is completed, failed, or timeout.
     Returns the JSON body when finished or on failure; None on timeout / network error.
     """
     close_client = False
     if client is None:
+        import httpx
+
         client = httpx.AsyncClient(timeout=10.0)
         close_client = True
 
+    import asyncio
+    from ida4sims_cli.functions.token_provider import authorized_get
+
+    started = time.monotonic()
+    failed = True
     try:
-        headers = {"Authorization": f"Bearer {lexis_token}", "Accept": "application/json"}
         url = f"{BASE_URL}/staging/status/{request_id}"
         deadline = time.monotonic() + timeout
 
         while time.monotonic() < deadline:
-            resp = await client.get(url, headers=headers)
+            resp = await authorized_get(client, url, lexis_token)
             if resp.status_code == 200:
                 data = resp.json()
                 status = (data.get("status") or data.get("state") or "").upper()
                 if status in ("COMPLETED", "DONE", "SUCCESS"):
+                    failed = False
                     return data
                 if status in ("FAILED", "ERROR"):
                     return data
@@ -84,16 +113,25 @@ async def poll_status_async(request_id: str, lexis_token: str, interval: float =
             await asyncio.sleep(interval)
         return None
     finally:
+        HASH_POLL_LATENCY.observe(time.monotonic() - started)
+        if failed:
+            HASH_REQUESTS_FAILED.inc(stage="poll")
         if close_client:
             await client.aclose()
 
 
-async def get_irods_file_hash_via_poll_async(dataset_id: str, path: str, lexis_token: str, interval: float = 1.0, timeout: float = 30.0) -> Optional[dict]:
+async def get_irods_file_hash_via_poll_async(dataset_id: str, path: str, lexis_token: Union[str, TokenProvider], interval: float = 1.0, timeout: float = 30.0, client: Optional[httpx.AsyncClient] = None) -> Optional[dict]:
     """
     Convenience: create the hash job, then poll until finished and return final JSON.
+    If `client` is given it is reused (and not closed), otherwise a new client is created.
     """
-    async with httpx.AsyncClient(timeout=10.0) as client:
-        request_id = await create_hash_request_async(dataset_id, path, lexis_token, client=client)
-        if not request_id:
-            return None
-        return await poll_status_async(request_id, lexis_token, interval=interval, timeout=timeout, client=client)
+    if client is None:
+        import httpx
+
+        async with httpx.AsyncClient(timeout=10.0) as own_client:
+            return await get_irods_file_hash_via_poll_async(dataset_id, path, lexis_token, interval, timeout, client=own_client)
+
+    request_id = await create_hash_request_async(dataset_id, path, lexis_token, client=client)
+    if not request_id:
+        return None
+    return await poll_status_async(request_id, lexis_token, interval=interval, timeout=timeout, client=client)
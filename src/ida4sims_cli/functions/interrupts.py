@@ -0,0 +1,131 @@
+import contextlib
+import contextvars
+import os
+import signal
+import threading
+from typing import Iterator, List, Optional, Tuple
+
+from ida4sims_cli.exceptions import UploadInterrupted
+
+
+class StopScope:
+    """Stop request of one `graceful_interrupts()` block.
+
+    Each block gets its own scope, so an upload starting or finishing in
+    the same process (API callers, the agent) neither clears nor inherits
+    the stop request of another one.
+    """
+
+    def __init__(self) -> None:
+        self._stop = threading.Event()
+        self.signum: Optional[int] = None
+
+    def request_stop(self, signum: Optional[int] = None) -> None:
+        self.signum = signum
+        self._stop.set()
+
+    def stop_requested(self) -> bool:
+        return self._stop.is_set()
+
+    def check(self) -> None:
+        """Raise UploadInterrupted if a stop was requested."""
+        if self._stop.is_set():
+            raise UploadInterrupted(self.signum)
+
+
+# Scopes of the graceful_interrupts() blocks currently running, innermost last.
+_active: List[StopScope] = []
+_active_lock = threading.Lock()
+# The scope of the block the calling code runs in; thread pools doing its
+# transfers run their work in a copy of the submitting context.
+_current: contextvars.ContextVar[Optional[StopScope]] = contextvars.ContextVar("ida4sims_stop_scope", default=None)
+
+
+def current_scope() -> Optional[StopScope]:
+    """The scope of the enclosing graceful_interrupts() block.
+
+    Code running in a thread that did not inherit the context (so cannot
+    tell which block it belongs to) gets the only active scope, if exactly
+    one is active.
+    """
+    scope = _current.get()
+    if scope is not None:
+        return scope
+    with _active_lock:
+        return _active[0] if len(_active) == 1 else None
+
+
+def stop_requested() -> bool:
+    scope = current_scope()
+    return scope is not None and scope.stop_requested()
+
+
+def request_stop(signum: Optional[int] = None) -> None:
+    """Ask running transfers to stop as a signal would (e.g. from an orchestrator thread).
+
+    Inside a graceful_interrupts() block only that block is stopped;
+    elsewhere every active block is, like a signal.
+    """
+    scope = _current.get()
+    if scope is not None:
+        scope.request_stop(signum)
+        return
+    with _active_lock:
+        scopes = list(_active)
+    for scope in scopes:
+        scope.request_stop(signum)
+
+
+def interrupt_signal() -> Optional[int]:
+    """The signal that requested the stop, or None."""
+    scope = current_scope()
+    return scope.signum if scope is not None and scope.stop_requested() else None
+
+
+def check_interrupted() -> None:
+    """Raise UploadInterrupted if a stop was requested; called before every new transfer."""
+    scope = current_scope()
+    if scope is not None:
+        scope.check()
+
+
+def _handler(signum, frame) -> None:
+    with _active_lock:
+        scopes = list(_active)
+    if any(scope.stop_requested() for scope in scopes):
+        # Second signal: give up on the transfers in flight too.
+        raise KeyboardInterrupt
+    for scope in scopes:
+        scope.request_stop(signum)
+    # Only async-signal-safe output here; logging takes locks the interrupted code may hold.
+    os.write(2, (
+        f"\nReceived {signal.Signals(signum).name}: finishing transfers in progress and starting no new ones. "
+        "Send it again to stop immediately.\n"
+    ).encode())
+
+
+@contextlib.contextmanager
+def graceful_interrupts(signals: Tuple[int, ...] = (signal.SIGINT, signal.SIGTERM)) -> Iterator[StopScope]:
+    """Turn SIGINT/SIGTERM into a stop request for the duration of the block.
+
+    Transfers already running are left to finish; `check_interrupted()`
+    then raises before the next one starts, so the resume state records
+    exactly what was uploaded. Yields the block's StopScope. Outside the
+    main thread (where handlers cannot be installed) only `request_stop()`
+    works.
+    """
+    scope = StopScope()
+    token = _current.set(scope)
+    with _active_lock:
+        _active.append(scope)
+    previous = {}
+    try:
+        if threading.current_thread() is threading.main_thread():
+            previous = {sig: signal.signal(sig, _handler) for sig in signals}
+        yield scope
+    finally:
+        for sig, handler in previous.items():
+            signal.signal(sig, handler)
+        with _active_lock:
+            _active.remove(scope)
+        _current.reset(token)
@@ -0,0 +1,121 @@
+import csv
+import fnmatch
+import hashlib
+import io
+import json
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from ida4sims_cli.functions.event_log import log_event
+from ida4sims_cli.functions.local_cache import read_json_cache, write_json_cache
+from ida4sims_cli.functions.profiling import phase
+
+# Columns of the table/CSV output, in order.
+DATASET_FIELDS = ("dataset_id", "title", "dataset_type", "project", "access", "created")
+
+
+def _first(record: Dict[str, Any], *keys: str) -> Any:
+    """Return the first non-empty value of the dotted `keys` (e.g. 'metadata.title')."""
+    for key in keys:
+        value: Any = record
+        for part in key.split("."):
+            value = value.get(part) if isinstance(value, dict) else None
+        if value not in (None, ""):
+            return value
+    return None
+
+
+def dataset_summary(record: Dict[str, Any]) -> Dict[str, Any]:
+    """Flatten a py4lexis dataset record into DATASET_FIELDS plus its full `metadata`.
+
+    py4lexis has returned both flat and nested ('location'/'metadata') records,
+    so the common fields are looked up in either place.
+    """
+    metadata = record.get("metadata") if isinstance(record.get("metadata"), dict) else {}
+    additional = metadata.get("additional_metadata") or metadata.get("AdditionalMetadata") or {}
+    return {
+        "dataset_id": _first(record, "dataset_id", "location.internalID", "id", "internalID"),
+        "title": _first(record, "title", "metadata.title"),
+        "dataset_type": _first(record, "dataset_type", "metadata.dataset_type") or (additional.get("dataset_type") if isinstance(additional, dict) else None),
+        "project": _first(record, "project", "location.project", "metadata.project"),
+        "access": _first(record, "access", "location.access", "metadata.access"),
+        "created": _first(record, "created", "creation_date", "metadata.CreationDate", "metadata.created"),
+        "metadata": {**metadata, **(additional if isinstance(additional, dict) else {})},
+    }
+
+
+@phase("list_datasets")
+def fetch_all_datasets(
+    datasets: Any,
+    project: str,
+    access: str,
+    cache_ttl: float = 0.0,
+    refresh: bool = False,
+) -> List[Dict[str, Any]]:
+    """Return the summaries of all datasets of `project` visible with `access`.
+
+    Results are cached on disk for `cache_ttl` seconds (per project and
+    access) so repeated listings within a short time skip the API call;
+    `refresh` bypasses the cache.
+    """
+    cache_key = hashlib.sha1(f"{project}\0{access}".encode()).hexdigest()[:16]
+    cache_name = f"datasets-{cache_key}.json"
+    if cache_ttl > 0 and not refresh:
+        cached = read_json_cache(cache_name, cache_ttl)
+        if cached is not None:
+            log_event("datasets.cache_hit", f"Using dataset list cached less than {cache_ttl:.0f}s ago.", datasets=len(cached))
+            return cached
+
+    records = datasets.get_all_datasets(filter_project=project, filter_access=access) or []
+    summaries = [dataset_summary(record) for record in records if isinstance(record, dict)]
+    if cache_ttl > 0:
+        write_json_cache(cache_name, summaries)
+    return summaries
+
+
+def filter_datasets(
+    summaries: Iterable[Dict[str, Any]],
+    dataset_type: Optional[str] = None,
+    metadata: Sequence[Tuple[str, str]] = (),
+    title: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Keep datasets of `dataset_type` whose metadata has every (key, value) pair and whose title matches the `title` glob.
+
+    Values and the title glob are compared case-insensitively.
+    """
+    selected = []
+    for summary in summaries:
+        if dataset_type and str(summary.get("dataset_type") or "").lower() != dataset_type.lower():
+            continue
+        meta = summary.get("metadata") or {}
+        if any(str(meta.get(key, "")).lower() != value.lower() for key, value in metadata):
+            continue
+        if title and not fnmatch.fnmatch(str(summary.get("title") or "").lower(), title.lower()):
+            continue
+        selected.append(summary)
+    return selected
+
+
+def paginate(items: List[Any], page: int, page_size: int) -> List[Any]:
+    """Return the 1-based `page` of `items`; a `page_size` of 0 returns everything."""
+    if page_size <= 0:
+        return items
+    start = (page - 1) * page_size
+    return items[start:start + page_size]
+
+
+def format_datasets(summaries: List[Dict[str, Any]], output_format: str) -> str:
+    """Render dataset summaries as 'table', 'json' (full records) or 'csv'."""
+    if output_format == "json":
+        return json.dumps(summaries, indent=2, default=str)
+    rows = [[str(s.get(field) if s.get(field) is not None else "") for field in DATASET_FIELDS] for s in summaries]
+    if output_format == "csv":
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerow(DATASET_FIELDS)
+        writer.writerows(rows)
+        return buffer.getvalue().rstrip("\n")
+    widths = [max([len(field)] + [len(row[i]) for row in rows]) for i, field in enumerate(DATASET_FIELDS)]
+    lines = [" | ".join(field.ljust(w) for field, w in zip(DATASET_FIELDS, widths))]
+    lines.append("-+-".join("-" * w for w in widths))
+    lines.extend(" | ".join(value.ljust(w) for value, w in zip(row, widths)) for row in rows)
+    return "\n".join(lines)
@@ -2,6 +2,8 @@ from pathlib import Path
 from typing import List, Dict, Optional, Union, Any
 import json
 
+from ida4sims_cli.functions.profiling import phase
+
 def _get_recursive_contents(dir_path: Path) -> Optional[List[Dict[str, Any]]]:
     
     contents_list = []
@@ -55,6 +57,7 @@ def _get_recursive_contents(dir_path: Path) -> Optional[List[Dict[str, Any]]]:
          return None
 
 
+@phase("scan")
 def list_directory_contents(dir_path: Union[str, Path]) -> Optional[List[Dict[str, Any]]]:
    
     try:
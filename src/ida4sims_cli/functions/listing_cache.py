@@ -0,0 +1,100 @@
+import logging
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from ida4sims_cli.functions.event_log import log_event
+from ida4sims_cli.functions.local_cache import clear_json_cache, read_json_cache, write_json_cache
+from ida4sims_cli.helpers.default_data import LISTING_SNAPSHOT_TTL
+
+# Keys py4lexis may use for a modification time in listing items.
+_MODIFIED_KEYS = ("modified", "last_modified", "modify_time", "mtime")
+
+
+def _snapshot_name(dataset_id: str) -> str:
+    return f"listings/{re.sub(r'[^A-Za-z0-9_.-]', '_', dataset_id)}.json"
+
+
+def listing_fingerprint(items: Optional[List[Dict[str, Any]]]) -> Dict[str, Any]:
+    """Summarize a `get_content_of_dataset` tree as file count, total size and latest modification."""
+    files = 0
+    total_size = 0
+    latest = None
+    stack = list(items or [])
+    while stack:
+        item = stack.pop()
+        if not isinstance(item, dict):
+            continue
+        if item.get("type") == "directory":
+            stack.extend(item.get("contents") or [])
+            continue
+        files += 1
+        total_size += int(item.get("size") or 0)
+        modified = next((item[k] for k in _MODIFIED_KEYS if item.get(k) is not None), None)
+        if modified is not None and (latest is None or str(modified) > str(latest)):
+            latest = str(modified)
+    return {"files": files, "total_size": total_size, "latest_modified": latest}
+
+
+def load_listing_snapshot(dataset_id: str, max_age: float = LISTING_SNAPSHOT_TTL) -> Optional[Dict[str, Any]]:
+    """Return the stored {fetched_at, fingerprint, listing} of `dataset_id` if younger than `max_age` seconds."""
+    return read_json_cache(_snapshot_name(dataset_id), max_age)
+
+
+def store_listing_snapshot(dataset_id: str, listing: Dict[str, Any]) -> Dict[str, Any]:
+    """Persist a listing with its fingerprint and return the fingerprint."""
+    fingerprint = listing_fingerprint(listing.get("contents"))
+    previous = read_json_cache(_snapshot_name(dataset_id), float("inf"))
+    if previous and previous.get("fingerprint") != fingerprint:
+        before = previous.get("fingerprint") or {}
+        log_event(
+            "listing.changed",
+            f"Dataset '{dataset_id}' changed since the previous listing: {before.get('files')} -> {fingerprint['files']} file(s), "
+            f"{before.get('total_size')} -> {fingerprint['total_size']} bytes.",
+            logging.DEBUG, dataset_id=dataset_id, previous=before, current=fingerprint,
+        )
+    write_json_cache(_snapshot_name(dataset_id), {"fetched_at": time.time(), "fingerprint": fingerprint, "listing": listing})
+    return fingerprint
+
+
+def invalidate_listing_snapshot(dataset_id: str) -> None:
+    """Drop the stored listing of a dataset, e.g. before its content is changed."""
+    clear_json_cache(_snapshot_name(dataset_id))
+
+
+class CachedListingDatasets:
+    """Wraps a py4lexis `Datasets` (or agent proxy) and serves `get_content_of_dataset` from local snapshots.
+
+    A snapshot younger than `ttl` seconds is reused instead of fetching the
+    full tree again. With `refresh`, the listing is always fetched, and the
+    snapshot is updated for later commands. Calls with extra arguments and
+    all other methods go straight to the wrapped object.
+    """
+
+    def __init__(self, datasets: Any, ttl: float = LISTING_SNAPSHOT_TTL, refresh: bool = False):
+        self._datasets = datasets
+        self.ttl = ttl
+        self.refresh = refresh
+
+    def get_content_of_dataset(self, dataset_id: str, **kwargs: Any) -> Any:
+        if kwargs:
+            return self._datasets.get_content_of_dataset(dataset_id=dataset_id, **kwargs)
+        if not self.refresh and self.ttl > 0:
+            snapshot = load_listing_snapshot(dataset_id, self.ttl)
+            if snapshot is not None:
+                age = time.time() - snapshot.get("fetched_at", 0)
+                fingerprint = snapshot.get("fingerprint") or {}
+                log_event(
+                    "listing.cache_hit",
+                    f"Using listing of dataset '{dataset_id}' fetched {age:.0f}s ago ({fingerprint.get('files')} file(s); --refresh to fetch it again).",
+                    dataset_id=dataset_id, age_s=round(age, 1), **fingerprint,
+                )
+                return snapshot.get("listing")
+        listing = self._datasets.get_content_of_dataset(dataset_id=dataset_id)
+        # Missing datasets are not stored: callers poll until they appear.
+        if isinstance(listing, dict) and "contents" in listing:
+            store_listing_snapshot(dataset_id, listing)
+        return listing
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._datasets, name)
@@ -0,0 +1,51 @@
+import json
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Optional
+
+
+def cache_dir() -> Path:
+    """Return the per-user cache directory ($IDA4SIMS_CACHE_DIR, else $XDG_CACHE_HOME/ida4sims or ~/.cache/ida4sims)."""
+    override = os.environ.get("IDA4SIMS_CACHE_DIR")
+    if override:
+        return Path(override)
+    base = os.environ.get("XDG_CACHE_HOME")
+    return (Path(base) if base else Path.home() / ".cache") / "ida4sims"
+
+
+def read_json_cache(name: str, max_age: float) -> Optional[Any]:
+    """Return the data cached under `name` if it was written less than `max_age` seconds ago, else None."""
+    path = cache_dir() / name
+    try:
+        if time.time() - path.stat().st_mtime >= max_age:
+            return None
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def write_json_cache(name: str, data: Any) -> None:
+    """Atomically store `data` under `name`, readable by the current user only. Failures are ignored."""
+    path = cache_dir() / name
+    tmp_path = path.with_name(f".{path.name}.{uuid.uuid4().hex[:8]}")
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
+    except OSError:
+        try:
+            tmp_path.unlink()
+        except OSError:
+            pass
+
+
+def clear_json_cache(name: str) -> None:
+    try:
+        (cache_dir() / name).unlink()
+    except OSError:
+        pass
@@ -0,0 +1,174 @@
+import hashlib
+import json
+import re
+import sqlite3
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+from ida4sims_cli.functions.local_cache import cache_dir
+from ida4sims_cli.functions.profiling import phase
+
+INDEX_FILE_NAME = "metadata_index.sqlite"
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS datasets (
+    dataset_id TEXT PRIMARY KEY,
+    title TEXT,
+    dataset_type TEXT,
+    project TEXT,
+    access TEXT,
+    created TEXT,
+    metadata_json TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    indexed_at REAL NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS datasets_fts USING fts5(
+    dataset_id UNINDEXED, title, dataset_type, metadata_text
+);
+"""
+
+
+def index_path() -> Path:
+    return cache_dir() / INDEX_FILE_NAME
+
+
+def open_index(path: Optional[Union[str, Path]] = None) -> sqlite3.Connection:
+    """Open (and create if needed) the metadata index at `path` (default: the per-user cache)."""
+    path = Path(path) if path else index_path()
+    path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+    conn = sqlite3.connect(str(path))
+    conn.row_factory = sqlite3.Row
+    if conn.execute("PRAGMA user_version").fetchone()[0] != SCHEMA_VERSION:
+        conn.executescript("DROP TABLE IF EXISTS datasets; DROP TABLE IF EXISTS datasets_fts;")
+        conn.executescript(_SCHEMA)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+    return conn
+
+
+def _fingerprint(summary: Dict[str, Any]) -> str:
+    return hashlib.sha1(json.dumps(summary, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _metadata_text(metadata: Dict[str, Any]) -> str:
+    # Keys are indexed with their values so that e.g. "stripping_mask WAT" finds the right field.
+    return "\n".join(f"{key} {value}" for key, value in sorted(metadata.items()) if value not in (None, ""))
+
+
+@phase("index_update")
+def update_index(
+    conn: sqlite3.Connection,
+    summaries: Iterable[Dict[str, Any]],
+    project: Optional[str] = None,
+    access: Optional[str] = None,
+) -> Tuple[int, int, int]:
+    """Merge a dataset listing (summaries from `fetch_all_datasets`) into the index.
+
+    Only datasets whose content changed are re-indexed. When `project` and
+    `access` are given, indexed datasets of that project/access missing from
+    the listing are removed. Returns (added, updated, removed).
+    """
+    known = {row["dataset_id"]: row["fingerprint"] for row in conn.execute("SELECT dataset_id, fingerprint FROM datasets")}
+    added = updated = 0
+    seen = set()
+    now = time.time()
+    with conn:
+        for summary in summaries:
+            dataset_id = summary.get("dataset_id")
+            if not dataset_id:
+                continue
+            seen.add(dataset_id)
+            fingerprint = _fingerprint(summary)
+            if known.get(dataset_id) == fingerprint:
+                continue
+            if dataset_id in known:
+                updated += 1
+                conn.execute("DELETE FROM datasets_fts WHERE dataset_id = ?", (dataset_id,))
+            else:
+                added += 1
+            metadata = summary.get("metadata") or {}
+            conn.execute(
+                "INSERT OR REPLACE INTO datasets VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (dataset_id, summary.get("title"), summary.get("dataset_type"), summary.get("project"), summary.get("access"),
+                 summary.get("created"), json.dumps(metadata, default=str), fingerprint, now),
+            )
+            conn.execute(
+                "INSERT INTO datasets_fts (dataset_id, title, dataset_type, metadata_text) VALUES (?, ?, ?, ?)",
+                (dataset_id, summary.get("title") or "", summary.get("dataset_type") or "", _metadata_text(metadata)),
+            )
+
+        removed = 0
+        if project is not None and access is not None:
+            stale = [
+                row["dataset_id"] for row in conn.execute("SELECT dataset_id FROM datasets WHERE project = ? AND access = ?", (project, access))
+                if row["dataset_id"] not in seen
+            ]
+            for dataset_id in stale:
+                conn.execute("DELETE FROM datasets WHERE dataset_id = ?", (dataset_id,))
+                conn.execute("DELETE FROM datasets_fts WHERE dataset_id = ?", (dataset_id,))
+            removed = len(stale)
+    return added, updated, removed
+
+
+def indexed_count(conn: sqlite3.Connection) -> int:
+    return conn.execute("SELECT COUNT(*) FROM datasets").fetchone()[0]
+
+
+def to_fts_query(text: str) -> str:
+    """Turn free text into an FTS5 query: every word must occur, as a prefix.
+
+    Punctuation such as the ':' of ':WAT' is FTS syntax, so words are quoted.
+    """
+    words = re.findall(r"\w+", text)
+    return " ".join(f'"{word}"*' for word in words)
+
+
+@phase("index_search")
+def search_index(
+    conn: sqlite3.Connection,
+    text: str = "",
+    dataset_type: Optional[str] = None,
+    metadata: Sequence[Tuple[str, str]] = (),
+    limit: Optional[int] = None,
+    raw: bool = False,
+) -> List[Dict[str, Any]]:
+    """Return the summaries of indexed datasets matching `text`, best match first.
+
+    `text` is free text (see `to_fts_query`) or, with `raw`, an FTS5 query.
+    `dataset_type` and the (key, value) `metadata` pairs must match exactly
+    (case-insensitive).
+    """
+    query = text if raw else to_fts_query(text)
+    sql = "SELECT d.* FROM datasets d"
+    params: List[Any] = []
+    where = []
+    if query:
+        sql += " JOIN datasets_fts f ON f.dataset_id = d.dataset_id"
+        where.append("datasets_fts MATCH ?")
+        params.append(query)
+    if dataset_type:
+        where.append("lower(d.dataset_type) = lower(?)")
+        params.append(dataset_type)
+    for key, value in metadata:
+        where.append("lower(CAST(json_extract(d.metadata_json, ?) AS TEXT)) = lower(?)")
+        params.extend([f'$."{key}"', value])
+    if where:
+        sql += " WHERE " + " AND ".join(where)
+    sql += " ORDER BY bm25(datasets_fts)" if query else " ORDER BY d.title"
+    if limit:
+        sql += " LIMIT ?"
+        params.append(limit)
+    return [
+        {
+            "dataset_id": row["dataset_id"],
+            "title": row["title"],
+            "dataset_type": row["dataset_type"],
+            "project": row["project"],
+            "access": row["access"],
+            "created": row["created"],
+            "metadata": json.loads(row["metadata_json"]),
+        }
+        for row in conn.execute(sql, params)
+    ]
@@ -0,0 +1,262 @@
+from __future__ import annotations
+
+import functools
+import os
+import sys
+import tempfile
+import threading
+import time
+from typing import TYPE_CHECKING, Dict, List, Optional, Sequence, Tuple
+
+import click
+
+if TYPE_CHECKING:
+    from http.server import ThreadingHTTPServer
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0, 1800.0, 3600.0)
+
+
+def _escape_label_value(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labelnames: Sequence[str], labelvalues: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(labelnames, labelvalues))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"Metric '{self.name}' expects labels {self.labelnames}, got {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def header(self) -> List[str]:
+        return [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+
+
+class Counter(_Metric):
+    """Monotonically increasing counter."""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: str) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}")
+        return lines
+
+
+class Gauge(Counter):
+    """Value that can be set to an arbitrary number."""
+
+    kind = "gauge"
+
+    def set(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram(_Metric):
+    """Cumulative histogram with fixed buckets (seconds)."""
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (float("inf"),)
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._key(labels)
+        with self._lock:
+            counts = self._counts.setdefault(key, [0] * len(self.buckets))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._sums[key] = self._sums.get(key, 0.0) + value
+
+    def count(self, **labels: str) -> int:
+        counts = self._counts.get(self._key(labels))
+        return counts[-1] if counts else 0
+
+    def render(self) -> List[str]:
+        lines = self.header()
+        with self._lock:
+            for key in sorted(self._counts):
+                for bound, count in zip(self.buckets, self._counts[key]):
+                    labels = _format_labels(self.labelnames, key, ("le", _format_value(bound)))
+                    lines.append(f"{self.name}_bucket{labels} {count}")
+                labels = _format_labels(self.labelnames, key)
+                lines.append(f"{self.name}_sum{labels} {_format_value(self._sums[key])}")
+                lines.append(f"{self.name}_count{labels} {self._counts[key][-1]}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[_Metric] = []
+
+    def register(self, metric: _Metric) -> _Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+BYTES_UPLOADED = REGISTRY.register(Counter(
+    "ida4sims_upload_bytes_total", "Bytes uploaded to LEXIS datasets."))
+BYTES_DOWNLOADED = REGISTRY.register(Counter(
+    "ida4sims_download_bytes_total", "Bytes downloaded from LEXIS datasets."))
+FILES_DOWNLOADED = REGISTRY.register(Counter(
+    "ida4sims_files_downloaded_total", "Files processed during download/mirror by result (downloaded, skipped, failed, checksum_mismatch, unverified, deleted).", ["result"]))
+FILES_SYNCED = REGISTRY.register(Counter(
+    "ida4sims_files_synced_total", "Files processed during upload/sync by result (uploaded, skipped, failed).", ["result"]))
+HASH_REQUESTS = REGISTRY.register(Counter(
+    "ida4sims_hash_requests_total", "Hash jobs requested from /staging/hash."))
+HASH_REQUESTS_FAILED = REGISTRY.register(Counter(
+    "ida4sims_hash_requests_failed_total", "Hash jobs that failed, by stage (create, poll).", ["stage"]))
+RETRIES = REGISTRY.register(Counter(
+    "ida4sims_retries_total", "Retried operations, by operation.", ["operation"]))
+PUT_LATENCY = REGISTRY.register(Histogram(
+    "ida4sims_put_data_object_seconds", "Duration of put_data_object_to_dataset calls."))
+CONNECTION_SETUP_LATENCY = REGISTRY.register(Histogram(
+    "ida4sims_connection_setup_seconds", "Time to open a pooled iRODS transfer connection."))
+HASH_POLL_LATENCY = REGISTRY.register(Histogram(
+    "ida4sims_hash_poll_seconds", "Duration of poll_status_async until the hash job finished."))
+RUN_DURATION = REGISTRY.register(Gauge(
+    "ida4sims_run_duration_seconds", "Wall-clock duration of the last command run.", ["command"]))
+RUN_SUCCESS = REGISTRY.register(Gauge(
+    "ida4sims_run_success", "1 if the last command run succeeded, 0 otherwise.", ["command"]))
+RUN_TIMESTAMP = REGISTRY.register(Gauge(
+    "ida4sims_run_last_timestamp_seconds", "Unix time at which the last command run finished.", ["command"]))
+
+
+def write_textfile(path: str, registry: Registry = REGISTRY) -> None:
+    """Atomically write the registry in Prometheus text format (node_exporter textfile collector)."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=".ida4sims_metrics.", dir=directory)
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(registry.render())
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def start_metrics_server(port: int, host: str = "127.0.0.1", registry: Registry = REGISTRY) -> ThreadingHTTPServer:
+    """Serve /metrics on a background thread for the duration of the run."""
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class _Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] not in ("/metrics", "/"):
+                self.send_error(404)
+                return
+            body = registry.render().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), _Handler)
+    thread = threading.Thread(target=server.serve_forever, name="ida4sims-metrics", daemon=True)
+    thread.start()
+    return server
+
+
+def metrics_options(command: str):
+    """Add --metrics-file and --metrics-port to a click command.
+
+    The run duration and success are recorded under `command`; the textfile
+    is written when the command finishes, also on failure.
+    """
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, metrics_file, metrics_port, **kwargs):
+            server = start_metrics_server(metrics_port) if metrics_port else None
+            start = time.monotonic()
+            success = False
+            try:
+                result = func(*args, **kwargs)
+                success = True
+                return result
+            except SystemExit as e:
+                success = e.code in (None, 0)
+                raise
+            finally:
+                RUN_DURATION.set(time.monotonic() - start, command=command)
+                RUN_SUCCESS.set(1 if success else 0, command=command)
+                RUN_TIMESTAMP.set(time.time(), command=command)
+                if metrics_file:
+                    try:
+                        write_textfile(metrics_file)
+                    except OSError as e:
+                        print(f"ERROR: Failed to write metrics file '{metrics_file}': {e}", file=sys.stderr)
+                if server is not None:
+                    server.shutdown()
+                    server.server_close()
+
+        wrapper = click.option(
+            '--metrics-file',
+            type=click.Path(file_okay=True, dir_okay=False, writable=True),
+            envvar='IDA4SIMS_METRICS_FILE',
+            required=False,
+            help='Write Prometheus metrics in text format to this file when the run ends (env: IDA4SIMS_METRICS_FILE).',
+        )(wrapper)
+        wrapper = click.option(
+            '--metrics-port',
+            type=int,
+            required=False,
+            help='Expose Prometheus metrics on http://127.0.0.1:PORT/metrics while the command runs.',
+        )(wrapper)
+        return wrapper
+
+    return decorator
@@ -0,0 +1,152 @@
+import json
+import logging
+import os
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, List
+
+from ida4sims_cli.functions.diff_directory_contents import diff_directory_contents
+from ida4sims_cli.functions.download_dataset_content import PART_SUFFIX, RemoteFile, flatten_listing, local_target
+from ida4sims_cli.functions.event_log import log_event, log_item_event
+from ida4sims_cli.functions.list_directory_contents import list_directory_contents
+from ida4sims_cli.functions.metrics import FILES_DOWNLOADED
+from ida4sims_cli.helpers.default_data import MIRROR_SNAPSHOT_NAME
+
+SNAPSHOT_VERSION = 1
+
+
+@dataclass
+class MirrorPlan:
+    """What a mirror run has to do to make `dest` match the dataset."""
+
+    download: List[RemoteFile] = field(default_factory=list)
+    delete: List[str] = field(default_factory=list)
+    unchanged: List[RemoteFile] = field(default_factory=list)
+
+
+def load_snapshot(dest: Path, dataset_id: str) -> Dict[str, Dict[str, Any]]:
+    """Return the {path: {size, mtime_ns, sha256}} entries of the last mirror of `dataset_id` into `dest`.
+
+    A missing, unreadable or foreign snapshot (another dataset) yields {}.
+    """
+    try:
+        with open(dest / MIRROR_SNAPSHOT_NAME) as f:
+            snapshot = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        log_event("mirror.snapshot_invalid", f"WARNING: Ignoring unreadable mirror snapshot: {e}", logging.WARNING, error=str(e))
+        return {}
+    if snapshot.get("dataset_id") != dataset_id:
+        log_event(
+            "mirror.snapshot_foreign",
+            f"WARNING: '{dest}' was mirrored from dataset '{snapshot.get('dataset_id')}', not '{dataset_id}'; ignoring its snapshot.",
+            logging.WARNING, snapshot_dataset_id=snapshot.get("dataset_id"),
+        )
+        return {}
+    return snapshot.get("files") or {}
+
+
+def save_snapshot(dest: Path, dataset_id: str, files: Dict[str, Dict[str, Any]]) -> None:
+    """Atomically write the mirror snapshot into `dest`."""
+    snapshot = {
+        "version": SNAPSHOT_VERSION,
+        "dataset_id": dataset_id,
+        "updated": datetime.now(timezone.utc).isoformat(),
+        "files": files,
+    }
+    tmp_path = dest / f"{MIRROR_SNAPSHOT_NAME}{PART_SUFFIX}"
+    with open(tmp_path, "w") as f:
+        json.dump(snapshot, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, dest / MIRROR_SNAPSHOT_NAME)
+
+
+def _without_own_files(items: List[Dict[str, Any]], top_level: bool = True) -> List[Dict[str, Any]]:
+    # The snapshot and leftovers of interrupted downloads are not part of the mirror.
+    kept = []
+    for item in items:
+        name = item.get("name", "")
+        if name.endswith(PART_SUFFIX) or (top_level and name == MIRROR_SNAPSHOT_NAME):
+            continue
+        if item.get("type") == "directory":
+            item = dict(item, contents=_without_own_files(item.get("contents") or [], top_level=False))
+        kept.append(item)
+    return kept
+
+
+def _local_contents(dest: Path) -> List[Dict[str, Any]]:
+    if not dest.is_dir():
+        return []
+    listing = list_directory_contents(dest)
+    return _without_own_files(listing[0]["contents"]) if listing else []
+
+
+def plan_mirror(remote_contents: List[Dict[str, Any]], dest: Path, snapshot: Dict[str, Dict[str, Any]]) -> MirrorPlan:
+    """Diff a dataset listing against `dest`, the reverse direction of the upload sync.
+
+    Files missing locally or differing in size are downloaded, local files
+    not in the dataset are candidates for deletion. Files of the same size
+    that were modified locally since the last mirror (mtime differs from the
+    snapshot) are downloaded again.
+    """
+    diffs = diff_directory_contents(remote_contents, _local_contents(dest))
+    remote_files = flatten_listing(remote_contents)
+    changed = {entry["path"] for entry in diffs["missing_locally"] + diffs["mismatches"]}
+
+    plan = MirrorPlan(delete=sorted(entry["path"] for entry in diffs["extra_locally"]))
+    for remote in remote_files:
+        if remote.path in changed:
+            plan.download.append(remote)
+            continue
+        previous = snapshot.get(remote.path)
+        if previous is not None:
+            try:
+                modified = local_target(dest, remote.path).stat().st_mtime_ns != previous.get("mtime_ns")
+            except OSError:
+                modified = True
+            if modified:
+                log_item_event("mirror.modified_locally", f"'{remote.path}' was modified locally since the last mirror.", path=remote.path)
+                plan.download.append(remote)
+                continue
+            remote.sha256 = previous.get("sha256")
+        plan.unchanged.append(remote)
+    return plan
+
+
+def delete_local_extras(dest: Path, paths: List[str]) -> List[str]:
+    """Delete the local files at `paths` and directories left empty by it. Returns the paths that could not be deleted."""
+    failed = []
+    parents = set()
+    for path in paths:
+        target = local_target(dest, path)
+        try:
+            target.unlink()
+        except FileNotFoundError:
+            pass
+        except OSError as e:
+            failed.append(path)
+            log_event("mirror.delete_failed", f"ERROR: Could not delete '{target}': {e}", logging.ERROR, path=path, error=str(e))
+            continue
+        FILES_DOWNLOADED.inc(result="deleted")
+        log_item_event("mirror.deleted", f"Deleted '{path}' (not in the dataset)", path=path)
+        parents.update(p for p in target.parents if dest in p.parents)
+    # Deepest first, so nested empty directories go before their parents.
+    for directory in sorted(parents, key=lambda p: len(p.parts), reverse=True):
+        try:
+            directory.rmdir()
+        except OSError:
+            pass
+    return failed
+
+
+def snapshot_entries(dest: Path, files: List[RemoteFile]) -> Dict[str, Dict[str, Any]]:
+    """Record size, mtime and known sha256 of the mirrored `files` as they are now on disk."""
+    entries = {}
+    for remote in files:
+        try:
+            stat = local_target(dest, remote.path).stat()
+        except OSError:
+            continue
+        entries[remote.path] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": remote.sha256}
+    return entries
@@ -0,0 +1,193 @@
+import contextlib
+import cProfile
+import io
+import json
+import platform
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, Optional, Union
+
+import click
+
+_active_profiler: Optional["RunProfiler"] = None
+
+
+class RunProfiler:
+    """Records wall-clock time per named phase of a command run.
+
+    Optionally the whole run is wrapped in cProfile (CPU) and/or tracemalloc
+    (memory). Phases may nest and may repeat (e.g. one 'transfer' phase per
+    file); the report contains the total, count and maximum per phase name.
+    """
+
+    def __init__(self, command: str, cpu: bool = False, memory: bool = False):
+        self.command = command
+        self.cpu = cpu
+        self.memory = memory
+        self.phases: Dict[str, Dict[str, float]] = {}
+        self._lock = threading.Lock()
+        self._cprofile: Optional[cProfile.Profile] = None
+        self._started_at: Optional[float] = None
+        self._stopped_at: Optional[float] = None
+        self._start_time = datetime.now(timezone.utc)
+        self._memory_peak: Optional[int] = None
+        self._memory_top: list = []
+
+    def start(self) -> None:
+        self._started_at = time.perf_counter()
+        if self.memory:
+            tracemalloc.start()
+        if self.cpu:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    def stop(self) -> None:
+        if self._stopped_at is not None:
+            return
+        if self._cprofile is not None:
+            self._cprofile.disable()
+        if self.memory and tracemalloc.is_tracing():
+            _, self._memory_peak = tracemalloc.get_traced_memory()
+            snapshot = tracemalloc.take_snapshot()
+            self._memory_top = [
+                {"location": str(stat.traceback), "size_bytes": stat.size, "count": stat.count}
+                for stat in snapshot.statistics("lineno")[:20]
+            ]
+            tracemalloc.stop()
+        self._stopped_at = time.perf_counter()
+
+    def add_phase_time(self, name: str, seconds: float) -> None:
+        with self._lock:
+            entry = self.phases.setdefault(name, {"total_s": 0.0, "count": 0, "max_s": 0.0})
+            entry["total_s"] += seconds
+            entry["count"] += 1
+            entry["max_s"] = max(entry["max_s"], seconds)
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase_time(name, time.perf_counter() - start)
+
+    def report(self) -> Dict[str, Any]:
+        """Return the timing report as a JSON-serialisable dict."""
+        end = self._stopped_at if self._stopped_at is not None else time.perf_counter()
+        total = end - self._started_at if self._started_at is not None else 0.0
+        report: Dict[str, Any] = {
+            "command": self.command,
+            "argv": sys.argv,
+            "started_at": self._start_time.isoformat(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "total_s": round(total, 6),
+            "phases": {
+                name: {
+                    "total_s": round(v["total_s"], 6),
+                    "count": int(v["count"]),
+                    "max_s": round(v["max_s"], 6),
+                    "share": round(v["total_s"] / total, 4) if total > 0 else None,
+                }
+                for name, v in sorted(self.phases.items(), key=lambda kv: kv[1]["total_s"], reverse=True)
+            },
+        }
+        if self.memory:
+            report["memory"] = {"peak_bytes": self._memory_peak, "top_allocations": self._memory_top}
+        if self._cprofile is not None:
+            stream = io.StringIO()
+            stats = pstats.Stats(self._cprofile, stream=stream)
+            stats.sort_stats("cumulative")
+            report["cpu_top_cumulative"] = [
+                {
+                    "function": f"{filename}:{lineno}({func})",
+                    "calls": nc,
+                    "total_s": round(tt, 6),
+                    "cumulative_s": round(ct, 6),
+                }
+                for (filename, lineno, func), (cc, nc, tt, ct, _) in sorted(
+                    stats.stats.items(), key=lambda kv: kv[1][3], reverse=True
+                )[:30]
+            ]
+        return report
+
+    def write_report(self, report_path: Union[str, Path]) -> None:
+        """Write the JSON report and, when cProfile was enabled, a matching .pstats file."""
+        report_path = Path(report_path)
+        report = self.report()
+        if self._cprofile is not None:
+            pstats_path = report_path.with_suffix(".pstats")
+            self._cprofile.dump_stats(str(pstats_path))
+            report["pstats_file"] = str(pstats_path)
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"Profiling report written to '{report_path}'.", file=sys.stderr)
+        if "pstats_file" in report:
+            print(f"cProfile statistics written to '{report['pstats_file']}'.", file=sys.stderr)
+
+
+@contextlib.contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Time a phase on the active profiler; a no-op when profiling is disabled."""
+    profiler = _active_profiler
+    if profiler is None:
+        yield
+        return
+    with profiler.phase(name):
+        yield
+
+
+@contextlib.contextmanager
+def profiling_session(report_path: Optional[Union[str, Path]], command: str, cpu: bool = False, memory: bool = False) -> Iterator[Optional[RunProfiler]]:
+    """Profile the enclosed block and write the report to `report_path`.
+
+    When `report_path` is None profiling is disabled and nothing is recorded.
+    The report is also written when the block exits through `sys.exit`.
+    """
+    global _active_profiler
+    if not report_path:
+        yield None
+        return
+
+    profiler = RunProfiler(command, cpu=cpu, memory=memory)
+    _active_profiler = profiler
+    profiler.start()
+    try:
+        yield profiler
+    finally:
+        profiler.stop()
+        _active_profiler = None
+        try:
+            profiler.write_report(report_path)
+        except OSError as e:
+            print(f"ERROR: Failed to write profiling report '{report_path}': {e}", file=sys.stderr)
+
+
+def profile_options(func):
+    """Add --profile, --profile-cpu and --profile-memory options to a click command."""
+    func = click.option(
+        '--profile',
+        'profile',
+        type=click.Path(file_okay=True, dir_okay=False, writable=True),
+        envvar='IDA4SIMS_PROFILE',
+        required=False,
+        help='Write a JSON report with wall-clock time per phase to this path (env: IDA4SIMS_PROFILE).',
+    )(func)
+    func = click.option(
+        '--profile-cpu',
+        is_flag=True,
+        default=False,
+        help='With --profile, also run cProfile and write a .pstats file next to the report.',
+    )(func)
+    func = click.option(
+        '--profile-memory',
+        is_flag=True,
+        default=False,
+        help='With --profile, also trace memory allocations with tracemalloc.',
+    )(func)
+    return func
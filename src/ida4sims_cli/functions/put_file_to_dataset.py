@@ -0,0 +1,116 @@
+from __future__ import annotations
+
+import os
+import time
+from typing import TYPE_CHECKING, Optional
+
+from ida4sims_cli.functions.interrupts import check_interrupted
+from ida4sims_cli.functions.metrics import BYTES_UPLOADED, FILES_SYNCED, PUT_LATENCY
+from ida4sims_cli.functions.profiling import phase
+from ida4sims_cli.functions.transfer_progress import TransferProgress, local_totals
+
+if TYPE_CHECKING:
+    from py4lexis.lexis_irods import iRODS
+
+    from ida4sims_cli.functions.upload_state import UploadState
+
+
+@phase("transfer")
+def put_file_to_dataset(
+    irods: iRODS,
+    local_filepath: str,
+    dataset_filepath: str,
+    dataset_id: str,
+    progress: Optional[TransferProgress] = None,
+    state: Optional[UploadState] = None,
+) -> None:
+    """Upload a single file with `put_data_object_to_dataset` and record its transfer time (and outcome in `state`).
+
+    Raises UploadInterrupted instead of starting once a stop was requested.
+    The file is marked in flight in `state` until the call returns, so a
+    run killed mid-transfer leaves it to be uploaded again.
+    """
+    check_interrupted()
+    try:
+        size = os.path.getsize(local_filepath)
+    except OSError:
+        size = 0
+
+    if state is not None:
+        state.record_file(local_filepath, "in_flight")
+    start = time.monotonic()
+    try:
+        irods.put_data_object_to_dataset(
+            local_filepath=local_filepath,
+            dataset_filepath=dataset_filepath,
+            overwrite=True,
+            dataset_id=dataset_id,
+            use_sqlite_for_handle_management=True,
+            compare_checksums=False,
+            raise_checksum_exception=False
+        )
+    except Exception as e:
+        duration = time.monotonic() - start
+        PUT_LATENCY.observe(duration)
+        FILES_SYNCED.inc(result="failed")
+        if progress is not None:
+            progress.record_transfer(local_filepath, size, duration, ok=False, error=str(e))
+        if state is not None:
+            state.record_file(local_filepath, "failed")
+        raise
+
+    duration = time.monotonic() - start
+    PUT_LATENCY.observe(duration)
+    BYTES_UPLOADED.inc(size)
+    FILES_SYNCED.inc(result="uploaded")
+    if progress is not None:
+        progress.record_transfer(local_filepath, size, duration)
+    if state is not None:
+        state.record_file(local_filepath, "done")
+
+
+@phase("transfer")
+def upload_directory_to_dataset(
+    irods: iRODS,
+    local_directorypath: str,
+    dataset_id: str,
+    dataset_directorypath: Optional[str] = None,
+    progress: Optional[TransferProgress] = None,
+    state: Optional[UploadState] = None,
+) -> None:
+    """Upload a whole directory with `upload_directory_to_dataset` and record it as one transfer.
+
+    py4lexis does not report which files of a failed call arrived, so only
+    a successful call is recorded in `state` (for all files below it).
+    """
+    check_interrupted()
+    size, num_files = local_totals(local_directorypath)
+
+    kwargs = {}
+    if dataset_directorypath is not None:
+        kwargs["dataset_directorypath"] = dataset_directorypath
+
+    if state is not None:
+        state.record_directory(local_directorypath, "in_flight")
+    start = time.monotonic()
+    try:
+        irods.upload_directory_to_dataset(
+            local_directorypath=local_directorypath,
+            dataset_id=dataset_id,
+            use_sqlite_for_handle_management=True,
+            compare_checksums=False,
+            raise_checksum_exception=False,
+            **kwargs
+        )
+    except Exception as e:
+        FILES_SYNCED.inc(num_files, result="failed")
+        if progress is not None:
+            progress.record_transfer(local_directorypath, size, time.monotonic() - start, ok=False, num_files=num_files, error=str(e))
+        raise
+
+    BYTES_UPLOADED.inc(size)
+    FILES_SYNCED.inc(num_files, result="uploaded")
+    if progress is not None:
+        progress.record_transfer(local_directorypath, size, time.monotonic() - start, num_files=num_files)
+    if state is not None:
+        state.record_directory(local_directorypath, "done")
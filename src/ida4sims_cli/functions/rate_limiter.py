@@ -0,0 +1,35 @@
+import threading
+import time
+from typing import Callable
+
+
+class BandwidthLimiter:
+    """Caps the average rate of transfers shared by many threads.
+
+    Each transfer reserves its size before it starts and waits until the
+    bytes reserved before it have "drained" at `bytes_per_second`. Transfers
+    themselves run at full speed, so this bounds the average rate over a run
+    rather than throttling individual reads and writes.
+    """
+
+    def __init__(self, bytes_per_second: float, clock: Callable[[], float] = time.monotonic, sleep: Callable[[float], None] = time.sleep):
+        if bytes_per_second <= 0:
+            raise ValueError("Bandwidth limit must be positive")
+        self.bytes_per_second = bytes_per_second
+        self._clock = clock
+        self._sleep = sleep
+        self._lock = threading.Lock()
+        self._next_start = 0.0
+        self.waited = 0.0
+
+    def acquire(self, nbytes: int) -> float:
+        """Block until a transfer of `nbytes` may start; return the seconds waited."""
+        with self._lock:
+            now = self._clock()
+            start = max(now, self._next_start)
+            self._next_start = start + max(nbytes, 0) / self.bytes_per_second
+            wait = start - now
+            self.waited += wait
+        if wait > 0:
+            self._sleep(wait)
+        return wait
@@ -1,140 +1,96 @@
+from __future__ import annotations
+
+import logging
 import os
-from pathlib import Path
-from py4lexis.lexis_irods import iRODS
+from typing import TYPE_CHECKING, List, Optional
 
+from ida4sims_cli.functions.diff_directory_contents import diff_directory_contents
+from ida4sims_cli.functions.event_log import log_item_event
+from ida4sims_cli.functions.metrics import FILES_SYNCED
+from ida4sims_cli.functions.transfer_progress import TransferProgress, local_totals
+from ida4sims_cli.functions.transfer_scheduler import TransferJob, run_transfers
+from ida4sims_cli.functions.upload_session import UploadSession
 from ida4sims_cli.helpers.default_data import DEFAULT_ACCESS, PROJECT
 
+if TYPE_CHECKING:
+    from py4lexis.lexis_irods import iRODS
 
-def sync_directory_contents(irods: iRODS, contents1, contents2, dataset_id: str, local_path='', parent_path=''):
+    from ida4sims_cli.functions.upload_state import UploadState
 
-    missing = []
-    extra = []
-    mismatched = []
 
-    safe_contents1 = contents1 if contents1 is not None else []
-    safe_contents2 = contents2 if contents2 is not None else []
+def _local_item_path(local_path: str, path: str, parent_path: str) -> str:
+    # Listings start with the synced directory itself, whose name is the last part of `local_path`.
+    relative = path[len(parent_path) + 1:] if parent_path else path
+    parts = relative.split('/')[1:]
+    return os.path.join(local_path, *parts) if parts else local_path
 
-    map1 = {item['name']: item for item in safe_contents1 if isinstance(item, dict) and 'name' in item}
-    map2 = {item['name']: item for item in safe_contents2 if isinstance(item, dict) and 'name' in item}
 
-    for name, item1 in map1.items():
-        path = os.path.join(parent_path, name)
-        if parent_path == '':
-            local_item_full_path = local_path
-        else:
-            local_item_full_path = os.path.join(local_path, name)
+def sync_directory_contents(irods: iRODS, contents1, contents2, dataset_id: str, local_path='', parent_path='', progress: Optional[TransferProgress] = None, state: Optional[UploadState] = None, lanes: Optional[int] = None):
+    """Compare a dataset listing (`contents1`) with the local one (`contents2`) and upload what differs.
 
-        item2 = map2.get(name)
+    The comparison is `diff_directory_contents`, the one the mirror uses in
+    the other direction. Mismatched and extra local files are uploaded (an
+    extra directory in one call), matching files are recorded as skipped.
+    The transfers are started by `run_transfers`: metadata files on their
+    own lane, everything else largest first across the other `lanes`
+    (by default one per connection of the pool; callers sharing the pool
+    pass their share).
+    """
+    diffs = diff_directory_contents(contents1, contents2, parent_path, extra_directories=True)
+    jobs: List[TransferJob] = []
 
-        if item2 is None:
-            print(f"    🔴 MISSING LOCALLY: Dataset item '{name}' not found locally at expected path '{local_item_full_path}' (Dataset path: '{path}')")
-            missing.append({
-                'path': path, 
-                'local_path': local_item_full_path,
-                'item': item1,
-                'reason': 'Missing in local data (source 2)'
-            })
-            if item1.get('type') == 'directory' and item1.get('contents'):
-                print(f"      recursing into MISSING directory '{name}' to mark contents...")
-                sub_diffs = sync_directory_contents(
-                    irods,
-                    item1.get('contents'),
-                    None,
-                    dataset_id,
-                    local_item_full_path,
-                    path
-                )
-                missing.extend(sub_diffs['missing_locally'])
-        else:
-            item1_type = item1.get('type')
-            
-            if item1_type == 'file':
-                item1_size = item1.get('size')
-                item2_size = item2.get('size')
-                if item1_size != item2_size:
-                    print(f"    🟡 MISMATCH: Size difference for file '{name}'. Dataset={item1_size} (at '{path}'), Local={item2_size} (at '{local_item_full_path}')")
-                    mismatched.append({
-                        'path': path,
-                        'local_path': local_item_full_path,
-                        'item1': item1,
-                        'item2': item2,
-                        'reason': f"Size mismatch: dataset is {item1_size}, local is {item2_size}"
-                    })
-                    print(f"Attempting to upload file '{local_item_full_path}' as '{path}'...")
-                    print(dataset_id)
-                    irods.put_data_object_to_dataset(
-                        local_filepath=local_item_full_path,
-                        dataset_filepath=str(Path(path).parent),
-                        overwrite=True,
-                        dataset_id=dataset_id,
-                        use_sqlite_for_handle_management=True,
-                        compare_checksums=False,
-                        raise_checksum_exception=False
-                    )
-                else:
-                    pass
+    missing = []
+    for entry in diffs['missing_locally']:
+        local_item_full_path = _local_item_path(local_path, entry['path'], parent_path)
+        log_item_event(
+            "sync.missing_locally",
+            f"    🔴 MISSING LOCALLY: Dataset item '{entry['path']}' not found locally at expected path '{local_item_full_path}'",
+            logging.DEBUG, dataset_path=entry['path'], local_path=local_item_full_path
+        )
+        missing.append({**entry, 'local_path': local_item_full_path, 'reason': 'Missing in local data (source 2)'})
+
+    mismatched = []
+    for entry in diffs['mismatches']:
+        path = entry['path']
+        local_item_full_path = _local_item_path(local_path, path, parent_path)
+        dataset_size, local_size = entry['item1'].get('size'), entry['item2'].get('size')
+        log_item_event(
+            "sync.mismatch",
+            f"    🟡 MISMATCH: Size difference for file '{path}'. Dataset={dataset_size}, Local={local_size} (at '{local_item_full_path}')",
+            dataset_path=path, local_path=local_item_full_path, dataset_size=dataset_size, local_size=local_size
+        )
+        mismatched.append({**entry, 'local_path': local_item_full_path})
+        jobs.append(TransferJob(local_item_full_path, path.rpartition('/')[0], local_size or 0))
 
-            elif item1_type == 'directory':
-                 print(f"recursing into directory '{name}'...")
-                 sub_diffs = sync_directory_contents(
-                    irods,
-                    item1.get('contents'),
-                    item2.get('contents'),
-                    dataset_id,
-                    local_item_full_path, 
-                    path
-                 )
-                 missing.extend(sub_diffs['missing_locally'])
-                 extra.extend(sub_diffs['extra_locally'])
-                 mismatched.extend(sub_diffs['mismatches'])
+    extra = []
+    for entry in diffs['extra_locally']:
+        path = entry['path']
+        local_item_full_path = _local_item_path(local_path, path, parent_path)
+        item_type = entry['item'].get('type')
+        log_item_event(
+            "sync.extra_locally",
+            f"    🔵 EXTRA LOCALLY {item_type.capitalize()}: Local item '{local_item_full_path}' not found in dataset at expected path '{path}'",
+            item_type=item_type, dataset_path=path, local_path=local_item_full_path
+        )
+        extra.append({**entry, 'local_path': local_item_full_path, 'reason': 'Extra in local data (source 2), not in dataset'})
+        if item_type == 'directory':
+            jobs.append(TransferJob(local_item_full_path, path.rpartition('/')[0], local_totals(local_item_full_path)[0], is_directory=True))
+        else:
+            jobs.append(TransferJob(local_item_full_path, path.rpartition('/')[0], entry['item'].get('size') or 0))
 
-    for name, item2 in map2.items():
-        if name not in map1:
-            file_path = os.path.join(parent_path, name) 
+    matched = [(_local_item_path(local_path, entry['path'], parent_path), entry['item2'].get('size') or 0) for entry in diffs['matches']]
+    if matched:
+        FILES_SYNCED.inc(len(matched), result="skipped")
+    if progress is not None:
+        for local_item_full_path, size in matched:
+            progress.record_skipped(local_item_full_path, size)
+    if state is not None and matched:
+        # One transaction for all of them: a large source may match 100k files.
+        state.record_files((path for path, _ in matched), "done")
 
-            if parent_path == '':
-                 local_item_full_path = local_path 
-            else:
-                 local_item_full_path = os.path.join(local_path, name)
-                 print(local_path)
-                 print(name)        
-        
-            if item2.get('type') == 'directory' and item2.get('contents'):
-                
-                print(f"    🔵 EXTRA LOCALLY Directory: Local item '{name}' not found in dataset at expected path '{path}' (Local path: '{local_item_full_path}')")
-                extra.append({
-                    'path': path,
-                    'local_path': local_item_full_path, 
-                    'item': item2,
-                    'reason': 'Extra in local data (source 2), not in dataset'
-                })
-                
-                irods.upload_directory_to_dataset(
-                    local_directorypath=local_item_full_path,
-                    dataset_id=dataset_id,
-                    dataset_directorypath=parent_path,
-                    use_sqlite_for_handle_management=True,
-                    compare_checksums=False,
-                    raise_checksum_exception=False
-                )
-                
-            elif item2.get('type') == 'file':
-                print(f"    🔵 EXTRA LOCALLY File: Local item '{name}' not found in dataset at expected path '{file_path}' (Local path: '{local_item_full_path}')")
-                extra.append({
-                    'path': file_path,
-                    'local_path': local_item_full_path, 
-                    'item': item2,
-                    'reason': 'Extra in local data (source 2), not in dataset'
-                })
-                print("EXTRA FILE")
-                irods.put_data_object_to_dataset(
-                    local_filepath=local_item_full_path,
-                    dataset_filepath=str(Path(file_path).parent),
-                    overwrite=True,
-                    dataset_id=dataset_id,
-                    use_sqlite_for_handle_management=True,
-                    compare_checksums=False,
-                    raise_checksum_exception=False
-                )
+    if lanes is None:
+        # One lane per pooled connection; other iRODS objects are used from one thread.
+        lanes = irods.size if isinstance(irods, UploadSession) else 1
+    run_transfers(irods, jobs, dataset_id, lanes=lanes, progress=progress, state=state)
 
-    return {'missing_locally': missing, 'extra_locally': extra, 'mismatches': mismatched}
\ No newline at end of file
+    return {'missing_locally': missing, 'extra_locally': extra, 'mismatches': mismatched}
@@ -0,0 +1,98 @@
+import base64
+import hashlib
+import json
+import time
+from typing import Optional
+
+from ida4sims_cli.helpers.default_data import (
+    ACCESS_TOKEN_MIN_VALIDITY,
+    KEYRING_ACCESS_TOKEN_USERNAME,
+    KEYRING_SERVICE_NAME,
+)
+
+
+def token_expiry(access_token: str) -> Optional[float]:
+    """Return the `exp` claim (unix time) of a JWT access token, or None if it cannot be read.
+
+    The signature is not verified; the value is only used to decide whether the
+    token is worth reusing, the server still validates it.
+    """
+    try:
+        payload = access_token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        claims = json.loads(base64.urlsafe_b64decode(payload))
+        return float(claims["exp"])
+    except (IndexError, KeyError, TypeError, ValueError):
+        return None
+
+
+def _fingerprint(refresh_token: str) -> str:
+    return hashlib.sha256(refresh_token.encode()).hexdigest()
+
+
+def load_cached_access_token(refresh_token: str, min_validity: float = ACCESS_TOKEN_MIN_VALIDITY) -> Optional[str]:
+    """Return the cached access token if it is still valid for at least `min_validity` seconds.
+
+    Only a token cached for `refresh_token` is returned, so a token obtained
+    before logging in as another user (or with a revoked offline token) is ignored.
+    """
+    import keyring
+
+    try:
+        raw = keyring.get_password(KEYRING_SERVICE_NAME, KEYRING_ACCESS_TOKEN_USERNAME)
+    except Exception:
+        return None
+    if not raw:
+        return None
+    try:
+        entry = json.loads(raw)
+        access_token = entry["access_token"]
+        expires_at = float(entry["expires_at"])
+        cached_for = entry["refresh_token_sha256"]
+    except (KeyError, TypeError, ValueError):
+        return None
+    if cached_for != _fingerprint(refresh_token):
+        return None
+    if expires_at - time.time() < min_validity:
+        return None
+    return access_token
+
+
+def store_access_token(access_token: Optional[str], refresh_token: Optional[str]) -> bool:
+    """Cache `access_token` with its expiry in the keyring. Returns True if it was stored.
+
+    The entry records a hash of the `refresh_token` it was obtained with; the
+    refresh token itself stays under its own keyring entry.
+    """
+    if not access_token or not refresh_token:
+        return False
+    expires_at = token_expiry(access_token)
+    if expires_at is None:
+        return False
+    import keyring
+
+    try:
+        keyring.set_password(
+            KEYRING_SERVICE_NAME,
+            KEYRING_ACCESS_TOKEN_USERNAME,
+            json.dumps(
+                {
+                    "access_token": access_token,
+                    "expires_at": expires_at,
+                    "refresh_token_sha256": _fingerprint(refresh_token),
+                }
+            ),
+        )
+    except Exception:
+        return False
+    return True
+
+
+def clear_cached_access_token() -> None:
+    """Remove the cached access token from the keyring, if present."""
+    import keyring
+
+    try:
+        keyring.delete_password(KEYRING_SERVICE_NAME, KEYRING_ACCESS_TOKEN_USERNAME)
+    except Exception:
+        pass
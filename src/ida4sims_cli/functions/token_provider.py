@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+import time
+import weakref
+from typing import TYPE_CHECKING, Any, Callable, Optional, Union
+
+from ida4sims_cli.functions.LexisAuthManager import cache_access_token, refreshed_session
+from ida4sims_cli.functions.metrics import RETRIES
+from ida4sims_cli.functions.token_cache import token_expiry
+from ida4sims_cli.helpers.default_data import ACCESS_TOKEN_MIN_VALIDITY
+
+if TYPE_CHECKING:
+    import httpx
+
+
+class TokenProvider:
+    """Access token shared by concurrent requests, refreshed ahead of expiry.
+
+    `refresh` is a blocking callable returning a fresh access token; it runs in
+    a worker thread. Once the current token is within `refresh_margin` seconds
+    of expiring, a single background refresh is started and callers keep
+    using the current token until it finishes. Callers only wait when the
+    token has actually expired (or was rejected with a 401).
+
+    One provider may serve several event loops (e.g. `VerifyClient.verify`
+    runs `asyncio.run` per call): the refresh lock and background task are
+    kept per running loop, while the token itself is shared.
+    """
+
+    def __init__(self, refresh: Callable[[], str], access_token: Optional[str] = None, refresh_margin: float = ACCESS_TOKEN_MIN_VALIDITY, clock: Callable[[], float] = time.time):
+        self._refresh_func = refresh
+        self._token = access_token
+        self._expires_at = token_expiry(access_token) if access_token else None
+        self.refresh_margin = refresh_margin
+        self._clock = clock
+        # asyncio locks and tasks belong to the loop they were used in.
+        self._locks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Lock]" = weakref.WeakKeyDictionary()
+        self._refresh_tasks: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Task]" = weakref.WeakKeyDictionary()
+        self._loops_lock = threading.Lock()
+        self.refresh_count = 0
+
+    def _loop_lock(self) -> asyncio.Lock:
+        loop = asyncio.get_running_loop()
+        with self._loops_lock:
+            lock = self._locks.get(loop)
+            if lock is None:
+                lock = self._locks[loop] = asyncio.Lock()
+            return lock
+
+    @property
+    def _refresh_task(self) -> Optional[asyncio.Task]:
+        """The background refresh started in the running loop, if any."""
+        return self._refresh_tasks.get(asyncio.get_running_loop())
+
+    def _expired(self) -> bool:
+        return self._token is None or (self._expires_at is not None and self._clock() >= self._expires_at)
+
+    def _expiring_soon(self) -> bool:
+        return self._expires_at is not None and self._expires_at - self._clock() < self.refresh_margin
+
+    async def _refresh(self, stale_token: Optional[str]) -> str:
+        async with self._loop_lock():
+            # Another caller may have refreshed while we were waiting for the lock.
+            if self._token is not None and self._token != stale_token and not self._expired():
+                return self._token
+            token = await asyncio.to_thread(self._refresh_func)
+            if not token:
+                raise RuntimeError("Token refresh returned no access token.")
+            self._token = token
+            self._expires_at = token_expiry(token)
+            self.refresh_count += 1
+            return token
+
+    def _start_background_refresh(self) -> None:
+        task = self._refresh_task
+        if task is None or task.done():
+            task = self._refresh_tasks[asyncio.get_running_loop()] = asyncio.ensure_future(self._refresh(self._token))
+            # Failures surface on the next blocking refresh; don't warn about unretrieved exceptions.
+            task.add_done_callback(lambda task: task.cancelled() or task.exception())
+
+    async def get_token(self) -> str:
+        """Return a usable access token, refreshing it if needed."""
+        if self._expired():
+            return await self._refresh(self._token)
+        if self._expiring_soon():
+            self._start_background_refresh()
+        return self._token
+
+    async def invalidate(self, rejected_token: str) -> str:
+        """Refresh after the server rejected `rejected_token`; returns the new token."""
+        return await self._refresh(rejected_token)
+
+
+def session_token_provider(session: Any) -> TokenProvider:
+    """Build a TokenProvider on top of a py4lexis session."""
+    current = [session]
+
+    def refresh() -> str:
+        current[0] = refreshed_session(current[0])
+        token = current[0].get_access_token()
+        # Let the next command reuse it (see token_cache).
+        cache_access_token(token)
+        return token
+
+    return TokenProvider(refresh, access_token=session.get_access_token())
+
+
+def agent_token_provider(agent: Any) -> TokenProvider:
+    """Build a TokenProvider that gets (and refreshes) tokens through a running ida-agent."""
+    return TokenProvider(lambda: agent.call("refresh_access_token"), access_token=agent.call("get_access_token"))
+
+
+async def authorized_get(client: httpx.AsyncClient, url: str, lexis_token: Union[str, TokenProvider], **kwargs: Any) -> httpx.Response:
+    """GET `url` with a bearer token; with a TokenProvider, retry once after a 401."""
+    token = await lexis_token.get_token() if isinstance(lexis_token, TokenProvider) else lexis_token
+    headers = {"Authorization": f"Bearer {token}", "Accept": "application/json"}
+    resp = await client.get(url, headers=headers, **kwargs)
+    if resp.status_code == 401 and isinstance(lexis_token, TokenProvider):
+        RETRIES.inc(operation="token_refresh")
+        token = await lexis_token.invalidate(token)
+        headers["Authorization"] = f"Bearer {token}"
+        resp = await client.get(url, headers=headers, **kwargs)
+    return resp
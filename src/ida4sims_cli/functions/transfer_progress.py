@@ -0,0 +1,282 @@
+import json
+import os
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, List, Optional, TextIO, Tuple, Union
+
+from ida4sims_cli.functions.event_log import log_event
+from ida4sims_cli.functions.profiling import phase
+
+MB = 1024 * 1024
+
+
+def format_bytes(num_bytes: float) -> str:
+    """Return a human readable size (e.g. '1.5 GiB')."""
+    for unit in ("B", "KiB", "MiB", "GiB", "TiB"):
+        if abs(num_bytes) < 1024 or unit == "TiB":
+            return f"{num_bytes:.1f} {unit}" if unit != "B" else f"{int(num_bytes)} B"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} TiB"
+
+
+def format_duration(seconds: Optional[float]) -> str:
+    """Return seconds formatted as HH:MM:SS, or '--:--:--' when unknown."""
+    if seconds is None or seconds < 0:
+        return "--:--:--"
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{(seconds % 3600) // 60:02d}:{seconds % 60:02d}"
+
+
+@phase("scan")
+def local_totals(path: Union[str, Path]) -> Tuple[int, int]:
+    """Return (total_bytes, file_count) of a local file or directory tree, ignoring symlinks."""
+    path = str(path)
+    if os.path.isfile(path):
+        return os.path.getsize(path), 1
+    total_bytes = 0
+    num_files = 0
+    for dirpath, _, filenames in os.walk(path):
+        for f in filenames:
+            fp = os.path.join(dirpath, f)
+            if not os.path.islink(fp):
+                try:
+                    total_bytes += os.path.getsize(fp)
+                    num_files += 1
+                except OSError:
+                    pass
+    return total_bytes, num_files
+
+
+class TransferProgress:
+    """Tracks bytes/files transferred during an upload and renders a live progress bar.
+
+    Transfers are recorded per file (or per directory when py4lexis uploads a whole
+    directory in one call). At the end of the run `summary()` returns throughput
+    figures, per-file durations and the slowest transfers, and `write_summary()`
+    stores them as JSON.
+
+    Transfers may be recorded from several threads at once (pipeline
+    uploaders, sync lanes); the counters and the bar are updated under a lock.
+    """
+
+    def __init__(
+        self,
+        total_bytes: int = 0,
+        total_files: int = 0,
+        show_bar: bool = True,
+        stream: Optional[TextIO] = None,
+        rate_window: float = 10.0,
+        slowest_count: int = 10,
+        refresh_interval: float = 0.5,
+    ):
+        self.total_bytes = total_bytes
+        self.total_files = total_files
+        self.stream = stream if stream is not None else sys.stderr
+        self.show_bar = show_bar and hasattr(self.stream, "isatty") and self.stream.isatty()
+        self.rate_window = rate_window
+        self.slowest_count = slowest_count
+        self.refresh_interval = refresh_interval
+
+        self.bytes_done = 0
+        self.files_done = 0
+        self.files_failed = 0
+        self.files_skipped = 0
+        self.bytes_skipped = 0
+        # Set by the caller to the UploadSession stats when a connection pool is used.
+        self.connections: Optional[Dict[str, Any]] = None
+        # Set to the per-stage figures when the upload ran through the pipeline.
+        self.pipeline: Optional[Dict[str, Any]] = None
+        self.transfers: List[Dict[str, Any]] = []
+
+        self._started_at = time.monotonic()
+        self._finished_at: Optional[float] = None
+        self._window: Deque[Tuple[float, int]] = deque()
+        self._last_render = 0.0
+        # Reentrant: record_*() redraw the bar while holding it.
+        self._lock = threading.RLock()
+
+    def add_expected(self, num_bytes: int, num_files: int = 1) -> None:
+        """Increase the expected totals (used for ETA and percentage)."""
+        with self._lock:
+            self.total_bytes += max(num_bytes, 0)
+            self.total_files += max(num_files, 0)
+
+    def record_transfer(
+        self,
+        path: str,
+        num_bytes: int,
+        duration: float,
+        ok: bool = True,
+        num_files: int = 1,
+        error: Optional[str] = None,
+    ) -> None:
+        """Record a finished (or failed) transfer of `num_bytes` that took `duration` seconds."""
+        now = time.monotonic()
+        entry = {
+            "path": path,
+            "bytes": num_bytes,
+            "files": num_files,
+            "duration_s": round(duration, 6),
+            "mb_per_s": round((num_bytes / MB) / duration, 3) if duration > 0 else None,
+            "ok": ok,
+        }
+        if error:
+            entry["error"] = error
+        with self._lock:
+            self.transfers.append(entry)
+            if ok:
+                self.bytes_done += num_bytes
+                self.files_done += num_files
+                self._window.append((now, num_bytes))
+            else:
+                self.files_failed += num_files
+            self.render()
+
+    def record_skipped(self, path: str, num_bytes: int, num_files: int = 1) -> None:
+        """Record files that already exist remotely and were not transferred."""
+        with self._lock:
+            self.files_skipped += num_files
+            self.bytes_skipped += num_bytes
+            self.render()
+
+    def average_rate(self) -> float:
+        """Average throughput in bytes/s since the tracker was created."""
+        end = self._finished_at if self._finished_at is not None else time.monotonic()
+        elapsed = end - self._started_at
+        return self.bytes_done / elapsed if elapsed > 0 else 0.0
+
+    def instantaneous_rate(self) -> float:
+        """Throughput in bytes/s over the last `rate_window` seconds."""
+        now = time.monotonic()
+        with self._lock:
+            while self._window and now - self._window[0][0] > self.rate_window:
+                self._window.popleft()
+            if not self._window:
+                return 0.0
+            span = max(now - self._window[0][0], 1e-6)
+            # Completions arrive in bursts (one per file), so never report a rate
+            # over a span shorter than one second.
+            return sum(b for _, b in self._window) / max(span, 1.0)
+
+    def eta(self) -> Optional[float]:
+        """Estimated seconds remaining, or None if it cannot be estimated yet."""
+        remaining = self.total_bytes - self.bytes_done - self.bytes_skipped
+        rate = self.average_rate()
+        if remaining <= 0:
+            return 0.0
+        if rate <= 0:
+            return None
+        return remaining / rate
+
+    def render(self, force: bool = False) -> None:
+        """Redraw the progress bar (at most every `refresh_interval` seconds)."""
+        if not self.show_bar:
+            return
+        with self._lock:
+            self._render(force)
+
+    def _render(self, force: bool) -> None:
+        now = time.monotonic()
+        if not force and now - self._last_render < self.refresh_interval:
+            return
+        self._last_render = now
+
+        done = self.bytes_done + self.bytes_skipped
+        fraction = min(done / self.total_bytes, 1.0) if self.total_bytes > 0 else 0.0
+        width = 30
+        filled = int(width * fraction)
+        bar = "#" * filled + "." * (width - filled)
+        files_total = f"/{self.total_files}" if self.total_files else ""
+        line = (
+            f"\r[{bar}] {fraction * 100:5.1f}% "
+            f"{format_bytes(done)}/{format_bytes(self.total_bytes)} "
+            f"{self.files_done + self.files_skipped}{files_total} files "
+            f"{self.instantaneous_rate() / MB:.1f} MB/s (avg {self.average_rate() / MB:.1f} MB/s) "
+            f"ETA {format_duration(self.eta())}"
+        )
+        self.stream.write(line)
+        self.stream.flush()
+
+    def close(self) -> None:
+        """Stop the clock and finish the progress bar line."""
+        if self._finished_at is None:
+            self._finished_at = time.monotonic()
+        if self.show_bar:
+            self.render(force=True)
+            self.stream.write("\n")
+            self.stream.flush()
+
+    def summary(self) -> Dict[str, Any]:
+        """Return the collected metrics as a JSON-serialisable dict."""
+        with self._lock:
+            end = self._finished_at if self._finished_at is not None else time.monotonic()
+            elapsed = end - self._started_at
+            durations = sorted(t["duration_s"] for t in self.transfers if t["ok"])
+            slowest = sorted(self.transfers, key=lambda t: t["duration_s"], reverse=True)
+
+            def percentile(p: float) -> Optional[float]:
+                if not durations:
+                    return None
+                return durations[min(int(p * len(durations)), len(durations) - 1)]
+
+            transfer_time = sum(durations)
+            return {
+                "elapsed_s": round(elapsed, 3),
+                "bytes_total": self.total_bytes,
+                "bytes_transferred": self.bytes_done,
+                "bytes_skipped": self.bytes_skipped,
+                "files_total": self.total_files,
+                "files_transferred": self.files_done,
+                "files_skipped": self.files_skipped,
+                "files_failed": self.files_failed,
+                "average_mb_per_s": round(self.average_rate() / MB, 3),
+                # Throughput while a transfer call was actually running; a large gap
+                # to average_mb_per_s points at time spent outside transfers
+                # (scanning, listing, waiting for the dataset).
+                "transfer_mb_per_s": round((self.bytes_done / MB) / transfer_time, 3) if transfer_time > 0 else None,
+                "file_duration_s": {
+                    "min": durations[0] if durations else None,
+                    "p50": percentile(0.5),
+                    "p95": percentile(0.95),
+                    "max": durations[-1] if durations else None,
+                },
+                "connections": self.connections,
+                "pipeline": self.pipeline,
+                "slowest_transfers": slowest[: self.slowest_count],
+                "transfers": list(self.transfers),
+            }
+
+    def write_summary(self, output_file: Union[str, Path]) -> None:
+        """Write `summary()` as JSON to `output_file`."""
+        with open(output_file, "w") as f:
+            json.dump(self.summary(), f, indent=2)
+        log_event("transfer.summary_written", f"Transfer summary written to '{output_file}'.", path=str(output_file))
+
+    def print_report(self) -> None:
+        """Log a short human readable report of the run (event 'transfer.summary')."""
+        s = self.summary()
+        lines = ["\n--- Transfer Summary ---"]
+        lines.append(f"Transferred: {s['files_transferred']} file(s), {format_bytes(s['bytes_transferred'])}")
+        if s["files_skipped"]:
+            lines.append(f"Skipped (already uploaded): {s['files_skipped']} file(s), {format_bytes(s['bytes_skipped'])}")
+        if s["files_failed"]:
+            lines.append(f"Failed: {s['files_failed']} file(s)")
+        lines.append(f"Elapsed: {format_duration(s['elapsed_s'])}, average {s['average_mb_per_s']:.2f} MB/s")
+        if s["connections"]:
+            c = s["connections"]
+            lines.append(f"Connections: {c['connections_opened']} of {c['pool_size']} iRODS object(s) created in {c['setup_total_s']:.2f}s, reused for {c['calls']} call(s)")
+            if c.get("put_fixed_cost_s") is not None:
+                lines.append(f"Fixed cost per put (handle setup, round trips): ~{c['put_fixed_cost_s'] * 1000:.0f} ms, {c['put_fixed_cost_total_s']:.1f}s over {c['puts']} put(s)")
+        if s["pipeline"]:
+            lines.append("Pipeline stages:")
+            for name, stage in s["pipeline"].items():
+                lines.append(f"  {name:<7} {stage['files']:>6} file(s)  {stage['mb_per_s'] or 0:>9.2f} MB/s  utilization {stage['utilization'] or 0:.0%}  blocked {stage['blocked_s']:.1f}s")
+        if s["slowest_transfers"]:
+            lines.append("Slowest transfers:")
+            for t in s["slowest_transfers"][:5]:
+                lines.append(f"  {t['duration_s']:8.2f}s  {format_bytes(t['bytes']):>10}  {t['path']}")
+        fields = {k: v for k, v in s.items() if k not in ("transfers", "slowest_transfers")}
+        log_event("transfer.summary", "\n".join(lines), **fields)
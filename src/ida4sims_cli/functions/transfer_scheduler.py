@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+import contextvars
+import fnmatch
+import os
+import threading
+from concurrent.futures import FIRST_EXCEPTION, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+from ida4sims_cli.functions.event_log import log_event, log_item_event
+from ida4sims_cli.functions.put_file_to_dataset import put_file_to_dataset, upload_directory_to_dataset
+from ida4sims_cli.functions.transfer_progress import TransferProgress
+from ida4sims_cli.helpers.default_data import METADATA_FILE_PATTERNS, METADATA_LANE_MAX_BYTES
+
+if TYPE_CHECKING:
+    from py4lexis.lexis_irods import iRODS
+
+    from ida4sims_cli.functions.upload_state import UploadState
+
+
+@dataclass
+class TransferJob:
+    """A file (or a directory uploaded in one call) waiting to be transferred."""
+
+    local_path: str
+    # Dataset directory it is uploaded into.
+    dataset_dir: str
+    size: int
+    is_directory: bool = False
+
+
+def is_metadata_file(job: TransferJob) -> bool:
+    """True for small files describing the run (topologies, inputs, mdout), which go to the metadata lane."""
+    if job.is_directory or job.size > METADATA_LANE_MAX_BYTES:
+        return False
+    name = os.path.basename(job.local_path).lower()
+    return any(fnmatch.fnmatchcase(name, pattern) for pattern in METADATA_FILE_PATTERNS)
+
+
+def plan_transfers(jobs: List[TransferJob]) -> Tuple[List[TransferJob], List[TransferJob]]:
+    """Split `jobs` into the metadata lane (smallest first) and the bulk lanes (largest first).
+
+    Starting the largest transfers first and giving each free lane the
+    next largest (longest-processing-time-first) keeps a single huge
+    trajectory from running alone at the end of the upload.
+    """
+    metadata = sorted((j for j in jobs if is_metadata_file(j)), key=lambda j: (j.size, j.local_path))
+    bulk = sorted((j for j in jobs if not is_metadata_file(j)), key=lambda j: (-j.size, j.local_path))
+    return metadata, bulk
+
+
+def _transfer(irods: iRODS, job: TransferJob, dataset_id: str, progress: Optional[TransferProgress], state: Optional[UploadState]) -> None:
+    if job.is_directory:
+        upload_directory_to_dataset(irods, local_directorypath=job.local_path, dataset_id=dataset_id, dataset_directorypath=job.dataset_dir, progress=progress, state=state)
+    else:
+        log_item_event("sync.upload_file", f"Uploading '{job.local_path}' to '{job.dataset_dir}'...", local_path=job.local_path, dataset_id=dataset_id)
+        put_file_to_dataset(irods, local_filepath=job.local_path, dataset_filepath=job.dataset_dir, dataset_id=dataset_id, progress=progress, state=state)
+
+
+def run_transfers(irods: iRODS, jobs: List[TransferJob], dataset_id: str, lanes: int = 1, progress: Optional[TransferProgress] = None, state: Optional[UploadState] = None) -> None:
+    """Transfer `jobs` with a dedicated metadata lane and `lanes - 1` bulk lanes.
+
+    With a single lane everything runs in one thread, metadata files
+    first. The first error stops new transfers from starting and is
+    raised once the running ones have returned.
+    """
+    if not jobs:
+        return
+    metadata, bulk = plan_transfers(jobs)
+    log_event(
+        "sync.schedule",
+        f"Scheduling {len(jobs)} transfer(s): {len(metadata)} metadata file(s) on their own lane, {len(bulk)} largest first on {max(1, lanes - 1)} lane(s).",
+        metadata_files=len(metadata), bulk_transfers=len(bulk), lanes=lanes,
+    )
+    if lanes <= 1:
+        for job in metadata + bulk:
+            _transfer(irods, job, dataset_id, progress, state)
+        return
+
+    failed = threading.Event()
+
+    def drain_metadata() -> None:
+        for job in metadata:
+            if failed.is_set():
+                return
+            _transfer(irods, job, dataset_id, progress, state)
+
+    def bulk_job(job: TransferJob) -> None:
+        if not failed.is_set():
+            _transfer(irods, job, dataset_id, progress, state)
+
+    # The executor hands queued jobs to free threads in submission order, i.e. largest first.
+    with ThreadPoolExecutor(max_workers=1, thread_name_prefix="metadata-lane") as metadata_lane, \
+            ThreadPoolExecutor(max_workers=lanes - 1, thread_name_prefix="bulk-lane") as bulk_lanes:
+        # Lanes run in the caller's context, so check_interrupted() sees its stop scope.
+        futures: List[Future] = [metadata_lane.submit(contextvars.copy_context().run, drain_metadata)]
+        futures += [bulk_lanes.submit(contextvars.copy_context().run, bulk_job, job) for job in bulk]
+        done, _ = wait(futures, return_when=FIRST_EXCEPTION)
+        error = next((f.exception() for f in done if f.exception() is not None), None)
+        if error is not None:
+            failed.set()
+            for future in futures:
+                future.cancel()
+    if error is not None:
+        raise error
@@ -1,96 +1,186 @@
+from __future__ import annotations
+
+import logging
 import os
 import contextlib
 from pathlib import Path
+from typing import TYPE_CHECKING, Optional
 
-from py4lexis.lexis_irods import iRODS
-from py4lexis.ddi.datasets import Datasets
 from ida4sims_cli.functions.sync_directory_contents import sync_directory_contents
 from ida4sims_cli.functions.list_directory_contents import list_directory_contents
 from ida4sims_cli.functions.check_if_dataset_contains_file import check_if_dataset_contains_file
 from ida4sims_cli.functions.check_if_dataset_contains_directory import check_if_dataset_contains_directory
 from ida4sims_cli.functions.utils import wait_for_dataset_contents
+from ida4sims_cli.functions.metrics import FILES_SYNCED
+from ida4sims_cli.functions.event_log import log_event, log_item_event
+from ida4sims_cli.functions.put_file_to_dataset import put_file_to_dataset, upload_directory_to_dataset
+from ida4sims_cli.functions.transfer_progress import TransferProgress
+
+if TYPE_CHECKING:
+    from py4lexis.lexis_irods import iRODS
+    from py4lexis.ddi.datasets import Datasets
+
+    from ida4sims_cli.functions.upload_pipeline import PipelineConfig
+    from ida4sims_cli.functions.upload_state import UploadState
+
+
+def upload_through_pipeline(irods: iRODS, local_path: str, dataset_id: str, config: PipelineConfig, progress: Optional[TransferProgress] = None, state: Optional[UploadState] = None) -> None:
+    """Upload `local_path` file by file with `run_upload_pipeline`; raise VerificationError on server hash mismatches.
+
+    Files whose server hash could not be obtained are only logged.
+    """
+    import asyncio
+    from ida4sims_cli.exceptions import VerificationError
+    from ida4sims_cli.functions.upload_pipeline import run_upload_pipeline
+
+    report = asyncio.run(run_upload_pipeline(irods, local_path, dataset_id, state=state, progress=progress, config=config))
+    if progress is not None:
+        progress.pipeline = report.as_dict()
+    if report.unverified:
+        log_event(
+            "upload.unverified",
+            f"WARNING: {len(report.unverified)} uploaded file(s) could not be checked against the server hash: {', '.join(report.unverified[:5])}",
+            logging.WARNING, files=len(report.unverified), paths=report.unverified,
+        )
+    if report.mismatched:
+        raise VerificationError(f"{len(report.mismatched)} uploaded file(s) differ from the server hash: {', '.join(report.mismatched[:5])}", dataset_id=dataset_id, path=local_path)
+
+
+def resume_upload_from_state(irods: iRODS, local_path: str, dataset_id: str, state: UploadState, progress: Optional[TransferProgress] = None) -> None:
+    """Upload the files of `local_path` not recorded as done in `state`, without listing the dataset.
+
+    Files keep the dataset paths the regular upload gives them: below the
+    source directory's name, or in the dataset root for a single file.
+    """
+    completed = state.completed_files()
+    if os.path.isfile(local_path):
+        local_files = [local_path]
+    else:
+        local_files = sorted(os.path.join(d, n) for d, _, names in os.walk(local_path) for n in names)
+    pending = {f for f in local_files if not state.is_done(f, completed)}
+    in_flight = state.status_counts().get("in_flight", 0)
+    log_event(
+        "upload.resume",
+        f"Resuming from the upload state: {len(local_files) - len(pending)} of {len(local_files)} file(s) already uploaded"
+        + (f", {in_flight} were in flight when the previous run stopped." if in_flight else "."),
+        dataset_id=dataset_id, done=len(local_files) - len(pending), pending=len(pending), in_flight=in_flight,
+    )
+    for local_file in local_files:
+        if local_file not in pending:
+            FILES_SYNCED.inc(result="skipped")
+            if progress is not None:
+                progress.record_skipped(local_file, os.path.getsize(local_file))
+            continue
+        if local_file == local_path:
+            dataset_dir = str(Path(local_path).parent)
+        else:
+            rel_dir = os.path.dirname(os.path.relpath(local_file, local_path))
+            dataset_dir = os.path.normpath(os.path.join(os.path.basename(local_path), rel_dir))
+        log_item_event("upload.file", f"Uploading '{local_file}' to '{dataset_dir}'...", local_path=local_file, dataset_id=dataset_id)
+        put_file_to_dataset(irods, local_filepath=local_file, dataset_filepath=dataset_dir, dataset_id=dataset_id, progress=progress, state=state)
+
 
-def upload_dataset_content(irods: iRODS, datasets: Datasets, local_path: str, dataset_id: str) -> None:
+def upload_dataset_content(irods: iRODS, datasets: Datasets, local_path: str, dataset_id: str, progress: Optional[TransferProgress] = None, state: Optional[UploadState] = None, pipeline: Optional[PipelineConfig] = None, lanes: Optional[int] = None) -> None:
+    """Upload `local_path` into the dataset, syncing with what the dataset already contains.
+
+    With `pipeline`, new and resumed uploads go file by file through
+    `run_upload_pipeline` instead of one directory call (or one file at a
+    time when resuming); syncing with existing content is unchanged.
+    """
 
     local_path = local_path.rstrip(os.sep)
 
-    print(f"Processing local path: '{local_path}' for dataset '{dataset_id}'")
+    log_event("upload.start", f"Processing local path: '{local_path}' for dataset '{dataset_id}'")
 
     if not os.path.exists(local_path):
-        print(f"ERROR: Local path not found: '{local_path}'")
+        log_event("upload.error", f"ERROR: Local path not found: '{local_path}'", logging.ERROR)
         raise FileNotFoundError(f"Local path not found: {local_path}")
 
-    print(f"Fetching current content list for dataset '{dataset_id}' to check for existing items...")
+    # An interrupted run recorded what it uploaded; no need to list and compare the dataset.
+    if state is not None and state.completed_files():
+        if pipeline is not None:
+            log_event("upload.resume", "Resuming from the upload state through the pipeline...", dataset_id=dataset_id)
+            upload_through_pipeline(irods, local_path, dataset_id, pipeline, progress, state)
+        else:
+            resume_upload_from_state(irods, local_path, dataset_id, state, progress)
+        return
+
+    log_event("upload.fetch_contents", f"Fetching current content list for dataset '{dataset_id}' to check for existing items...")
     dataset_content_list, attempts_used = wait_for_dataset_contents(datasets, dataset_id, max_retries=24, retry_delay=5)
     
     if dataset_content_list is None:
-        print(f"WARNING: Could not fetch dataset contents after {attempts_used} attempts. Proceeding without existence checks.")
+        log_event("upload.warning", f"WARNING: Could not fetch dataset contents after {attempts_used} attempts. Proceeding without existence checks.", logging.WARNING)
         dataset_content_list = []
     else:
-        print(f"Dataset content fetch completed after {attempts_used} attempt(s).")
+        log_event("upload.fetch_contents", f"Dataset content fetch completed after {attempts_used} attempt(s).")
 
     should_skip = False
     target_name = os.path.basename(local_path)
 
     if os.path.isfile(local_path):
-        print(f"Path is a file. Target name: '{target_name}'. Checking existence and size...")
+        log_event("upload.check_existing", f"Path is a file. Target name: '{target_name}'. Checking existence and size...")
         if check_if_dataset_contains_file(dataset_content_list, target_name, local_path):
             should_skip = True
+            FILES_SYNCED.inc(result="skipped")
+            if progress is not None:
+                progress.record_skipped(local_path, os.path.getsize(local_path))
 
     elif os.path.isdir(local_path):
-        print(f"Path is a directory. Target name: '{target_name}'. Checking existence and size...")
-        print(f"...................check_if_dataset_contains_directory: {check_if_dataset_contains_directory(dataset_content_list, target_name, local_path)}")
+        log_event("upload.check_existing", f"Path is a directory. Target name: '{target_name}'. Checking existence and size...")
         if check_if_dataset_contains_directory(dataset_content_list, target_name, local_path):
             should_skip = True
             local_dir_content = list_directory_contents(local_path)   
-            print("---------------------------------------sync_directory_contents-----------------------------------: ")
-            sync_directory_contents(irods, dataset_content_list, local_dir_content, dataset_id, local_path)        
+            log_event("sync.start", f"Synchronising '{local_path}' with existing dataset content...")
+            sync_directory_contents(irods, dataset_content_list, local_dir_content, dataset_id, local_path, progress=progress, state=state, lanes=lanes)
 
-    if not should_skip:
+    if not should_skip and pipeline is not None and os.path.exists(local_path):
+        log_event("upload.pipeline", f"Uploading '{local_path}' through the pipeline with {pipeline.workers} transfer worker(s)...", workers=pipeline.workers)
+        upload_through_pipeline(irods, local_path, dataset_id, pipeline, progress, state)
+    elif not should_skip:
         if os.path.isfile(local_path):
-            print(f"Attempting to upload file '{local_path}' as '{target_name}'...")
+            log_event("upload.file", f"Attempting to upload file '{local_path}' as '{target_name}'...")
             try:
-                irods.put_data_object_to_dataset(
+                put_file_to_dataset(
+                    irods,
                     local_filepath=local_path,
                     dataset_filepath=str(Path(local_path).parent),
-                    overwrite=True,
                     dataset_id=dataset_id,
-                    use_sqlite_for_handle_management=True,
-                    compare_checksums=False,
-                    raise_checksum_exception=False
+                    progress=progress,
+                    state=state
                 )
-                print(f"SUCCESS: File '{target_name}' uploaded.")
+                log_event("upload.file_done", f"SUCCESS: File '{target_name}' uploaded.")
             except Exception as e:
-                print(f"ERROR: Failed to upload file '{local_path}': {e}")
+                log_event("upload.error", f"ERROR: Failed to upload file '{local_path}': {e}", logging.ERROR)
                 raise e
         elif os.path.isdir(local_path):
-            print(f"Attempting to upload directory '{local_path}'...")
+            log_event("upload.directory", f"Attempting to upload directory '{local_path}'...")
             try:
-                irods.upload_directory_to_dataset(
+                upload_directory_to_dataset(
+                    irods,
                     local_directorypath=local_path,
                     dataset_id=dataset_id,
-                    use_sqlite_for_handle_management=True,
-                    compare_checksums=False,
-                    raise_checksum_exception=False
+                    progress=progress,
+                    state=state
                 )
-                print(f"SUCCESS: Directory uploaded.")
+                log_event("upload.directory_done", "SUCCESS: Directory uploaded.")
             except Exception as e:
-                print(f"ERROR: Failed to upload directory '{local_path}': {e}")
+                log_event("upload.error", f"ERROR: Failed to upload directory '{local_path}': {e}", logging.ERROR)
                 raise e
         else:
-             print(f"ERROR: Local path '{local_path}' is not a valid file or directory for upload.")
+             log_event("upload.error", f"ERROR: Local path '{local_path}' is not a valid file or directory for upload.", logging.ERROR)
              raise ValueError(f"Local path '{local_path}' is not a file or directory.")
 
 
-def upload_dataset_as_files(irods: iRODS, local_path: str, dataset_id: str, dataset_type: str, metadata: dict) -> None:
+def upload_dataset_as_files(irods: iRODS, local_path: str, dataset_id: str, dataset_type: str, metadata: dict, progress: Optional[TransferProgress] = None, state: Optional[UploadState] = None) -> None:
     """
     Uploads individual files from metadata to the dataset as separate data objects.
     The metadata may contain either file names relative to local_path, or
-    full/relative paths already. Files that are None or do not exist are skipped.
+    full/relative paths already. Files that are None or do not exist are skipped,
+    as are files `state` records as uploaded by an interrupted run.
     """
     if dataset_type == "simulation":
         # This function should not be used for simulation datasets
-        print("upload_dataset_as_files is not intended for dataset_type=simulation")
+        log_event("upload.warning", "upload_dataset_as_files is not intended for dataset_type=simulation", logging.WARNING)
         return
     
     elif dataset_type=="force_field":
@@ -108,7 +198,7 @@ def upload_dataset_as_files(irods: iRODS, local_path: str, dataset_id: str, data
             'noe_files'
         ]
     else:
-        print(f"ERROR: Unsupported dataset type '{dataset_type}' for file upload.")
+        log_event("upload.error", f"ERROR: Unsupported dataset type '{dataset_type}' for file upload.", logging.ERROR)
         return
 
     def resolve_candidate(local_base: str, candidate: str) -> str:
@@ -124,11 +214,13 @@ def upload_dataset_as_files(irods: iRODS, local_path: str, dataset_id: str, data
             return os.path.normpath(candidate)
         return os.path.normpath(os.path.join(local_base, candidate))
 
+    completed = state.completed_files() if state is not None else {}
+
     for key in file_keys:
         filename = metadata.get(key)
         if filename is None:
             # No file specified for this key, skip to next
-            print(f"File '{key}' not specified, skipping.")
+            log_item_event("upload.file_skipped", f"File '{key}' not specified, skipping.")
             continue
         # If the value is a list or tuple (e.g., multiple frcmod files)
         if isinstance(filename, (list, tuple)):
@@ -139,45 +231,52 @@ def upload_dataset_as_files(irods: iRODS, local_path: str, dataset_id: str, data
                 file_path = resolve_candidate(local_path, fname)
                 if not os.path.isfile(file_path):
                     # File does not exist at the constructed path, skip
-                    print(f"File '{file_path}' does not exist, skipping.")
+                    log_item_event("upload.file_skipped", f"File '{file_path}' does not exist, skipping.", local_path=file_path)
                     continue
                 target_name = os.path.basename(file_path)
-                print(f"Uploading file '{file_path}' as '{target_name}' to dataset '{dataset_id}'...")
+                if state is not None and state.is_done(file_path, completed):
+                    log_item_event("upload.file_skipped", f"File '{file_path}' was uploaded by an earlier run, skipping.", local_path=file_path)
+                    continue
+                log_item_event("upload.file", f"Uploading file '{file_path}' as '{target_name}' to dataset '{dataset_id}'...", local_path=file_path, dataset_id=dataset_id)
+                if progress is not None:
+                    progress.add_expected(os.path.getsize(file_path))
                 try:
-                    irods.put_data_object_to_dataset(
+                    put_file_to_dataset(
+                        irods,
                         local_filepath=file_path,
                         dataset_filepath="./",
-                        overwrite=True,
                         dataset_id=dataset_id,
-                        use_sqlite_for_handle_management=True,
-                        compare_checksums=False,
-                        raise_checksum_exception=False
-
+                        progress=progress,
+                        state=state
                     )
-                    print(f"SUCCESS: File '{target_name}' uploaded.")
+                    log_item_event("upload.file_done", f"SUCCESS: File '{target_name}' uploaded.", local_path=file_path, dataset_id=dataset_id)
                 except Exception as e:
-                    print(f"ERROR: Failed to upload file '{file_path}': {e}")
+                    log_event("upload.error", f"ERROR: Failed to upload file '{file_path}': {e}", logging.ERROR, local_path=file_path, error=str(e))
                     raise e
         else:
             # Single file case
             file_path = resolve_candidate(local_path, filename)
             if not os.path.isfile(file_path):
                 # File does not exist at the constructed path, skip
-                print(f"File '{file_path}' does not exist, skipping.")
+                log_item_event("upload.file_skipped", f"File '{file_path}' does not exist, skipping.", local_path=file_path)
                 continue
             target_name = os.path.basename(file_path)
-            print(f"Uploading file '{file_path}' as '{target_name}' to dataset '{dataset_id}'...")
+            if state is not None and state.is_done(file_path, completed):
+                log_item_event("upload.file_skipped", f"File '{file_path}' was uploaded by an earlier run, skipping.", local_path=file_path)
+                continue
+            log_item_event("upload.file", f"Uploading file '{file_path}' as '{target_name}' to dataset '{dataset_id}'...", local_path=file_path, dataset_id=dataset_id)
+            if progress is not None:
+                progress.add_expected(os.path.getsize(file_path))
             try:
-                irods.put_data_object_to_dataset(
+                put_file_to_dataset(
+                    irods,
                     local_filepath=file_path,
                     dataset_filepath="./",
-                    overwrite=True,
                     dataset_id=dataset_id,
-                    use_sqlite_for_handle_management=True,
-                    compare_checksums=False,
-                    raise_checksum_exception=False
+                    progress=progress,
+                    state=state
                 )
-                print(f"SUCCESS: File '{target_name}' uploaded.")
+                log_item_event("upload.file_done", f"SUCCESS: File '{target_name}' uploaded.", local_path=file_path, dataset_id=dataset_id)
             except Exception as e:
-                print(f"ERROR: Failed to upload file '{file_path}': {e}")
+                log_event("upload.error", f"ERROR: Failed to upload file '{file_path}': {e}", logging.ERROR, local_path=file_path, error=str(e))
                 raise e
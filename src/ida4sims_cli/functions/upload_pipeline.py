@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import asyncio
+import contextlib
+import contextvars
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+
+from ida4sims_cli.functions.concurrency_tuner import AIMDTuner, watch_throttling
+from ida4sims_cli.functions.event_log import log_event, log_item_event
+from ida4sims_cli.functions.hashing_utils import calculate_sha256, hash_poll_timeout
+from ida4sims_cli.functions.metrics import FILES_SYNCED
+from ida4sims_cli.functions.put_file_to_dataset import put_file_to_dataset
+from ida4sims_cli.functions.transfer_progress import MB, TransferProgress
+from ida4sims_cli.helpers.default_data import DEFAULT_PIPELINE_QUEUE_SIZE, DEFAULT_UPLOAD_CONNECTIONS
+
+if TYPE_CHECKING:
+    from py4lexis.lexis_irods import iRODS
+
+    from ida4sims_cli.functions.upload_state import UploadState
+
+# Marks the end of a queue; one is put per consumer.
+_DONE = None
+
+
+@dataclass
+class PipelineConfig:
+    """Settings of `run_upload_pipeline`.
+
+    `workers` transfers run at once; each queue between two stages holds
+    at most `queue_size` files, so a slow stage stalls the ones before it
+    instead of letting memory grow. With `checksum` the sha256 of every
+    file is computed before it is uploaded and stored in the upload state;
+    when `lexis_token` is set too, each uploaded file is confirmed against
+    the server-side hash (`/staging/hash`), with as many hash requests in
+    flight as `hash_tuner` allows when one is given. Each server hash is
+    waited for `poll_timeout` seconds, by default `hash_poll_timeout(size)`.
+    """
+
+    workers: int = DEFAULT_UPLOAD_CONNECTIONS
+    queue_size: int = DEFAULT_PIPELINE_QUEUE_SIZE
+    checksum: bool = False
+    lexis_token: Any = None
+    hash_workers: int = 2
+    poll_interval: Optional[float] = None
+    poll_timeout: Optional[float] = None
+    hash_tuner: Optional[AIMDTuner] = None
+
+
+@dataclass
+class PipelineFile:
+    """A file travelling through the pipeline."""
+
+    local_path: str
+    # Directory argument of put_data_object_to_dataset, and the resulting path in the dataset.
+    dataset_dir: str
+    dataset_path: str
+    size: int
+    sha256: Optional[str] = None
+
+
+@dataclass
+class StageStats:
+    """Work done by one stage; `blocked_s` is time spent waiting for room in the next queue."""
+
+    name: str
+    workers: int
+    files: int = 0
+    bytes: int = 0
+    busy_s: float = 0.0
+    blocked_s: float = 0.0
+    started: Optional[float] = None
+    finished: Optional[float] = None
+
+    def add(self, item: PipelineFile, duration: float) -> None:
+        self.files += 1
+        self.bytes += item.size
+        self.busy_s += duration
+
+    def as_dict(self) -> Dict[str, Any]:
+        elapsed = (self.finished or time.monotonic()) - self.started if self.started is not None else 0.0
+        return {
+            "workers": self.workers,
+            "files": self.files,
+            "bytes": self.bytes,
+            "elapsed_s": round(elapsed, 3),
+            "files_per_s": round(self.files / elapsed, 3) if elapsed > 0 else None,
+            "mb_per_s": round((self.bytes / MB) / elapsed, 3) if elapsed > 0 else None,
+            # Share of the stage's worker time spent working; the bottleneck is close to 1.
+            "utilization": round(self.busy_s / (elapsed * self.workers), 3) if elapsed > 0 else None,
+            "blocked_s": round(self.blocked_s, 3),
+        }
+
+
+@dataclass
+class PipelineReport:
+    """Per-stage throughput of a pipeline run and the outcome of the server verification."""
+
+    stages: Dict[str, StageStats] = field(default_factory=dict)
+    # Dataset paths whose server hash differs from the local one.
+    mismatched: List[str] = field(default_factory=list)
+    # Dataset paths whose server hash could not be obtained (request failed or timed out).
+    unverified: List[str] = field(default_factory=list)
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {name: stats.as_dict() for name, stats in self.stages.items()}
+
+
+def _pipeline_file(local_path: str, local_file: str) -> PipelineFile:
+    size = os.path.getsize(local_file)
+    if local_file == local_path:
+        # Single file: the regular upload puts it into the dataset root.
+        return PipelineFile(local_file, str(Path(local_path).parent), os.path.basename(local_file), size)
+    rel_dir = os.path.dirname(os.path.relpath(local_file, local_path))
+    dataset_dir = os.path.normpath(os.path.join(os.path.basename(local_path), rel_dir))
+    return PipelineFile(local_file, dataset_dir, f"{dataset_dir}/{os.path.basename(local_file)}", size)
+
+
+async def _put(queue: asyncio.Queue, item: Optional[PipelineFile], stats: StageStats) -> None:
+    start = time.monotonic()
+    await queue.put(item)
+    stats.blocked_s += time.monotonic() - start
+
+
+async def run_upload_pipeline(
+    irods: iRODS,
+    local_path: str,
+    dataset_id: str,
+    state: Optional[UploadState] = None,
+    progress: Optional[TransferProgress] = None,
+    config: Optional[PipelineConfig] = None,
+) -> PipelineReport:
+    """Upload the files of `local_path` file by file through scan → hash → upload → verify stages.
+
+    The scanner walks the tree one directory at a time and skips files
+    `state` records as uploaded; the hasher (with `config.checksum`)
+    computes sha256 digests in threads; the uploaders call
+    `put_file_to_dataset` on `config.workers` threads; the verifier
+    confirms uploaded files against the server hash and records them in
+    `state`. Stages are connected by bounded queues. The first error
+    (including UploadInterrupted) stops all stages and is raised once
+    the transfers in flight have returned.
+    """
+    config = config or PipelineConfig()
+    report = PipelineReport()
+    stages: List[str] = ["scan"] + (["hash"] if config.checksum else []) + ["upload", "verify"]
+    workers = {"scan": 1, "hash": max(1, config.hash_workers), "upload": max(1, config.workers), "verify": max(1, config.hash_tuner.maximum if config.hash_tuner is not None else config.workers)}
+    queues = {name: asyncio.Queue(maxsize=max(1, config.queue_size)) for name in stages[1:]}
+    for name in stages:
+        report.stages[name] = StageStats(name, workers[name])
+    verify_hashes = config.checksum and config.lexis_token is not None
+    http_client = None
+    if verify_hashes:
+        import httpx
+
+        http_client = httpx.AsyncClient(timeout=10.0)
+        if config.hash_tuner is not None:
+            watch_throttling(http_client)
+
+    async def finish(name: str) -> None:
+        # The last worker of a stage closes the next queue for all of its consumers.
+        stats = report.stages[name]
+        stats.finished = time.monotonic()
+        index = stages.index(name)
+        if index + 1 < len(stages):
+            following = stages[index + 1]
+            for _ in range(workers[following]):
+                await _put(queues[following], _DONE, stats)
+
+    async def scan() -> None:
+        stats = report.stages["scan"]
+        stats.started = time.monotonic()
+        out = queues[stages[1]]
+        completed = state.completed_files() if state is not None else {}
+        single_file = os.path.isfile(local_path)
+        walker = iter([("", [], [local_path])]) if single_file else os.walk(local_path)
+        while True:
+            step = await asyncio.to_thread(next, walker, None)
+            if step is None:
+                break
+            dirpath, dirnames, filenames = step
+            dirnames.sort()
+            for name in sorted(filenames):
+                start = time.monotonic()
+                item = _pipeline_file(local_path, name if single_file else os.path.join(dirpath, name))
+                if state is not None and state.is_done(item.local_path, completed):
+                    FILES_SYNCED.inc(result="skipped")
+                    if progress is not None:
+                        progress.record_skipped(item.local_path, item.size)
+                    continue
+                stats.add(item, time.monotonic() - start)
+                await _put(out, item, stats)
+        await finish("scan")
+
+    async def stage_worker(name: str, process) -> None:
+        stats = report.stages[name]
+        if stats.started is None:
+            stats.started = time.monotonic()
+        index = stages.index(name)
+        inbox = queues[name]
+        out = queues[stages[index + 1]] if index + 1 < len(stages) else None
+        while True:
+            item = await inbox.get()
+            if item is _DONE:
+                break
+            start = time.monotonic()
+            await process(item)
+            stats.add(item, time.monotonic() - start)
+            if out is not None:
+                await _put(out, item, stats)
+        running[name] -= 1
+        if running[name] == 0:
+            await finish(name)
+
+    async def hash_file(item: PipelineFile) -> None:
+        item.sha256 = await asyncio.to_thread(calculate_sha256, Path(item.local_path))
+
+    async def upload_file(item: PipelineFile) -> None:
+        log_item_event("upload.file", f"Uploading '{item.local_path}' to '{item.dataset_dir}'...", local_path=item.local_path, dataset_id=dataset_id)
+        # run_in_executor does not carry the context (and with it the stop scope) over; copy it.
+        await asyncio.get_running_loop().run_in_executor(
+            transfer_pool,
+            contextvars.copy_context().run,
+            lambda: put_file_to_dataset(
+                irods, local_filepath=item.local_path, dataset_filepath=item.dataset_dir, dataset_id=dataset_id,
+                progress=progress, state=state,
+            ),
+        )
+
+    async def verify_file(item: PipelineFile) -> None:
+        if verify_hashes:
+            from ida4sims_cli.functions.hashing_utils import get_irods_file_hash_via_poll_async
+
+            hash_kwargs = {"interval": config.poll_interval} if config.poll_interval is not None else {}
+            timeout = config.poll_timeout if config.poll_timeout is not None else hash_poll_timeout(item.size)
+            gate = config.hash_tuner.aslot() if config.hash_tuner is not None else contextlib.nullcontext()
+            try:
+                async with gate as slot:
+                    result = await get_irods_file_hash_via_poll_async(dataset_id, "/" + item.dataset_path, config.lexis_token, client=http_client, timeout=timeout, **hash_kwargs)
+                    if result is None and slot is not None:
+                        slot.failed = True
+                error = None if result is not None else f"no result within {timeout:.0f}s"
+            except Exception as e:
+                result, error = None, str(e)
+            remote_hash = (result or {}).get("result")
+            if remote_hash is None:
+                # The file is uploaded; only its confirmation is missing, so it is not failed.
+                error = error or f"hash request ended without a result: {result}"
+                log_event("upload.unverified", f"WARNING: Could not get server hash for '{item.dataset_path}' ({error}); left unverified.", logging.WARNING, path=item.dataset_path, error=error)
+                report.unverified.append(item.dataset_path)
+            elif remote_hash != item.sha256:
+                log_event(
+                    "upload.checksum_mismatch",
+                    f"WARNING: Checksum mismatch for '{item.dataset_path}' (local {item.sha256}, server {remote_hash})",
+                    logging.WARNING, path=item.dataset_path, local_hash=item.sha256, remote_hash=remote_hash,
+                )
+                report.mismatched.append(item.dataset_path)
+                if state is not None:
+                    state.record_file(item.local_path, "failed", sha256=item.sha256)
+                return
+        if state is not None and item.sha256:
+            state.record_file(item.local_path, "done", sha256=item.sha256)
+
+    # Own threads for the transfers: as many as workers, and joinable when a stage fails.
+    transfer_pool = ThreadPoolExecutor(max_workers=workers["upload"], thread_name_prefix="upload")
+    processors = {"hash": hash_file, "upload": upload_file, "verify": verify_file}
+    running = {name: workers[name] for name in stages[1:]}
+    tasks = [asyncio.ensure_future(scan())]
+    for name in stages[1:]:
+        tasks += [asyncio.ensure_future(stage_worker(name, processors[name])) for _ in range(workers[name])]
+
+    try:
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_EXCEPTION)
+        error = next((t.exception() for t in done if t.exception() is not None), None)
+        if error is not None:
+            for task in pending:
+                task.cancel()
+            await asyncio.gather(*pending, return_exceptions=True)
+            raise error
+    finally:
+        # Cancelling does not stop transfers already running in threads; wait for them.
+        await asyncio.to_thread(transfer_pool.shutdown, True)
+        if http_client is not None:
+            await http_client.aclose()
+
+    stats = report.as_dict()
+    lines = [f"  {name:<7} {s['files']:>6} file(s)  {s['mb_per_s'] or 0:>9.2f} MB/s  utilization {s['utilization'] or 0:.0%}  blocked {s['blocked_s']:.1f}s" for name, s in stats.items()]
+    log_event("pipeline.report", "Pipeline stages:\n" + "\n".join(lines), logging.DEBUG, stages=stats, mismatched=len(report.mismatched), unverified=len(report.unverified))
+    return report
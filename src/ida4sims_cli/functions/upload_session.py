@@ -0,0 +1,169 @@
+import contextlib
+import os
+import queue
+import threading
+import time
+from typing import Any, Callable, ContextManager, Dict, Iterator, List, Optional
+
+from ida4sims_cli.functions.concurrency_tuner import AIMDTuner
+from ida4sims_cli.functions.event_log import log_event
+from ida4sims_cli.functions.metrics import CONNECTION_SETUP_LATENCY
+from ida4sims_cli.functions.profiling import phase
+from ida4sims_cli.functions.rate_limiter import BandwidthLimiter
+from ida4sims_cli.functions.transfer_progress import local_totals
+
+
+def fixed_cost_per_call(n: int, sum_x: float, sum_y: float, sum_xx: float, sum_xy: float) -> Optional[float]:
+    """Intercept of the least-squares line duration = fixed + size / bandwidth, or None when undetermined.
+
+    Needs calls of at least two different sizes; clamped at zero.
+    """
+    denominator = n * sum_xx - sum_x * sum_x
+    if n < 2 or denominator <= 0:
+        return None
+    slope = (n * sum_xy - sum_x * sum_y) / denominator
+    return max(0.0, (sum_y - slope * sum_x) / n)
+
+
+class UploadSession:
+    """A fixed-size pool of authenticated py4lexis iRODS objects reused for a whole run.
+
+    Objects are created by `factory` on first demand, at most `size` of
+    them, and handed back to the pool after every call, so per-file uploads
+    (and the sync recursion) share them instead of creating (and
+    authenticating) one per object. It exposes the iRODS methods used by
+    the upload code, so it can be passed wherever an `iRODS` object is
+    expected. py4lexis still opens the data handles of every put inside
+    the call; `stats()["put_fixed_cost_s"]` estimates that per-put cost
+    from the measured put durations. With `size` 1 calls are serialized;
+    concurrent transfers need a larger pool.
+
+    With a `rate_limiter`, every upload first reserves its size from it, so
+    all transfers sharing the session stay under one bandwidth cap. With a
+    `tuner`, uploads also wait for one of its slots, so the number of
+    concurrent uploads follows the tuner's limit (at most `size`).
+    """
+
+    def __init__(self, factory: Callable[[], Any], size: int = 1, rate_limiter: Optional[BandwidthLimiter] = None, tuner: Optional[AIMDTuner] = None):
+        if size < 1:
+            raise ValueError("Upload session pool size must be at least 1")
+        self.size = size
+        self._factory = factory
+        self._idle: "queue.LifoQueue[Any]" = queue.LifoQueue()
+        self._all: List[Any] = []
+        self._lock = threading.Lock()
+        self._opening = 0
+        self.setup_durations: List[float] = []
+        self.calls = 0
+        # n, sum(size), sum(duration), sum(size^2), sum(size * duration) of successful puts.
+        self._put_fit = [0, 0.0, 0.0, 0.0, 0.0]
+        self.rate_limiter = rate_limiter
+        self.tuner = tuner
+
+    def _open_connection(self) -> Any:
+        started = time.monotonic()
+        with phase("connect"):
+            connection = self._factory()
+        duration = time.monotonic() - started
+        CONNECTION_SETUP_LATENCY.observe(duration)
+        with self._lock:
+            self.setup_durations.append(duration)
+            self._all.append(connection)
+        log_event("upload.connection_opened", f"Opened transfer connection {len(self._all)}/{self.size} in {duration:.2f}s", duration_s=round(duration, 3))
+        return connection
+
+    @contextlib.contextmanager
+    def connection(self) -> Iterator[Any]:
+        """Borrow a connection from the pool, opening one if the pool is not full yet."""
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            with self._lock:
+                can_open = len(self._all) + self._opening < self.size
+                if can_open:
+                    self._opening += 1
+            if can_open:
+                try:
+                    connection = self._open_connection()
+                finally:
+                    with self._lock:
+                        self._opening -= 1
+            else:
+                connection = self._idle.get()
+        try:
+            with self._lock:
+                self.calls += 1
+            yield connection
+        finally:
+            self._idle.put(connection)
+
+    def create_dataset(self, **kwargs: Any) -> Any:
+        with self.connection() as irods:
+            return irods.create_dataset(**kwargs)
+
+    def _upload_slot(self, size: int) -> ContextManager[Any]:
+        return self.tuner.slot(units=size) if self.tuner is not None else contextlib.nullcontext()
+
+    def put_data_object_to_dataset(self, **kwargs: Any) -> Any:
+        try:
+            size = os.path.getsize(kwargs["local_filepath"])
+        except (KeyError, OSError):
+            size = 0
+        if self.rate_limiter is not None and size:
+            self.rate_limiter.acquire(size)
+        with self._upload_slot(size), self.connection() as irods:
+            started = time.monotonic()
+            result = irods.put_data_object_to_dataset(**kwargs)
+            duration = time.monotonic() - started
+        with self._lock:
+            fit = self._put_fit
+            fit[0] += 1
+            fit[1] += size
+            fit[2] += duration
+            fit[3] += size * size
+            fit[4] += size * duration
+        return result
+
+    def upload_directory_to_dataset(self, **kwargs: Any) -> Any:
+        # Walking the tree is only worth it when the size is used.
+        measure = (self.rate_limiter is not None or self.tuner is not None) and "local_directorypath" in kwargs
+        size = local_totals(kwargs["local_directorypath"])[0] if measure else 0
+        if self.rate_limiter is not None and size:
+            self.rate_limiter.acquire(size)
+        with self._upload_slot(size), self.connection() as irods:
+            return irods.upload_directory_to_dataset(**kwargs)
+
+    def download_data_object_from_dataset(self, **kwargs: Any) -> Any:
+        with self.connection() as irods:
+            return irods.download_data_object_from_dataset(**kwargs)
+
+    def stats(self) -> Dict[str, Any]:
+        """Pool size, iRODS objects created, their setup time, how often they were reused and the fixed cost per put."""
+        durations = self.setup_durations
+        with self._lock:
+            fit = list(self._put_fit)
+        fixed_cost = fixed_cost_per_call(*fit)
+        return {
+            "pool_size": self.size,
+            # py4lexis iRODS objects created by the factory, not the data handles opened per put.
+            "connections_opened": len(durations),
+            "setup_total_s": round(sum(durations), 3),
+            "setup_max_s": round(max(durations), 3) if durations else None,
+            "calls": self.calls,
+            "puts": fit[0],
+            # Estimated time of every put not spent moving bytes (handle setup, round trips).
+            "put_fixed_cost_s": round(fixed_cost, 4) if fixed_cost is not None else None,
+            "put_fixed_cost_total_s": round(fixed_cost * fit[0], 3) if fixed_cost is not None else None,
+            "rate_limit_wait_s": round(self.rate_limiter.waited, 3) if self.rate_limiter is not None else None,
+            "tuner": self.tuner.report() if self.tuner is not None else None,
+        }
+
+    def close(self) -> None:
+        for connection in self._all:
+            close = getattr(connection, "close", None)
+            if callable(close):
+                try:
+                    close()
+                except Exception:
+                    pass
+        self._all.clear()
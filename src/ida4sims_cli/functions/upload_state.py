@@ -0,0 +1,206 @@
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from ida4sims_cli.functions.local_cache import cache_dir
+
+STATE_FILE_NAME = "upload_state.sqlite"
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS sources (
+    source_path TEXT NOT NULL,
+    title TEXT NOT NULL,
+    dataset_id TEXT NOT NULL,
+    dataset_type TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (source_path, title)
+);
+CREATE TABLE IF NOT EXISTS files (
+    source_path TEXT NOT NULL,
+    title TEXT NOT NULL,
+    rel_path TEXT NOT NULL,
+    size INTEGER,
+    mtime_ns INTEGER,
+    sha256 TEXT,
+    status TEXT NOT NULL,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (source_path, title, rel_path)
+);
+"""
+
+
+def state_path() -> Path:
+    return cache_dir() / STATE_FILE_NAME
+
+
+class UploadStateStore:
+    """SQLite database (WAL mode) holding the resume state of unfinished uploads, keyed by source path and title.
+
+    Several processes may upload different sources at the same time: WAL
+    lets readers and one writer work concurrently and writers wait for
+    each other (`busy_timeout`). Within a process, threads share one
+    connection guarded by a lock.
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None):
+        path = Path(path) if path else state_path()
+        path.parent.mkdir(parents=True, exist_ok=True, mode=0o700)
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Each file record is committed; NORMAL keeps that cheap and WAL keeps it crash-safe.
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        if self._schema_version() != SCHEMA_VERSION:
+            self._migrate()
+
+    def _schema_version(self) -> int:
+        return self._conn.execute("PRAGMA user_version").fetchone()[0]
+
+    def _migrate(self) -> None:
+        # Another process may be creating or migrating the same database:
+        # take the write lock first and check again, so that neither drops
+        # the tables the other one just created. (executescript would
+        # commit first, hence one statement at a time.)
+        self._conn.execute("BEGIN IMMEDIATE")
+        try:
+            if self._schema_version() != SCHEMA_VERSION:
+                self._conn.execute("DROP TABLE IF EXISTS sources")
+                self._conn.execute("DROP TABLE IF EXISTS files")
+                for statement in _SCHEMA.split(";"):
+                    if statement.strip():
+                        self._conn.execute(statement)
+                self._conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+            self._conn.commit()
+        except BaseException:
+            self._conn.rollback()
+            raise
+
+    def source(self, source_path: Union[str, Path], title: str = "") -> "UploadState":
+        """Return the state of uploading one source (a local file or directory) as the dataset `title`."""
+        return UploadState(self, os.path.abspath(os.fspath(source_path).rstrip(os.sep) or os.sep), title)
+
+    def execute(self, sql: str, params: Tuple = ()) -> List[sqlite3.Row]:
+        with self._lock, self._conn:
+            return self._conn.execute(sql, params).fetchall()
+
+    def executemany(self, sql: str, rows: List[Tuple]) -> None:
+        with self._lock, self._conn:
+            self._conn.executemany(sql, rows)
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def _walk_files(root: str) -> Iterator[str]:
+    if os.path.isfile(root):
+        yield root
+        return
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            yield os.path.join(dirpath, name)
+
+
+class UploadState:
+    """Resume state of one source path and title: its dataset and which of its files were uploaded.
+
+    The title is part of the key because several datasets may be uploaded
+    from one directory (e.g. force fields picking different files). File paths are stored relative to the source (a file source is stored
+    under its own name) together with the size and mtime they had when
+    uploaded, so a file changed since then is uploaded again.
+    """
+
+    def __init__(self, store: UploadStateStore, source_path: str, title: str = ""):
+        self.store = store
+        self.source_path = source_path
+        self.title = title
+        self._key = (source_path, title)
+
+    @property
+    def dataset_id(self) -> Optional[str]:
+        rows = self.store.execute("SELECT dataset_id FROM sources WHERE source_path = ? AND title = ?", self._key)
+        return rows[0][0] if rows else None
+
+    def set_dataset(self, dataset_id: str, dataset_type: Optional[str] = None) -> None:
+        previous = self.dataset_id
+        if previous is not None and previous != dataset_id:
+            # Files recorded for another dataset say nothing about this one.
+            self.store.execute("DELETE FROM files WHERE source_path = ? AND title = ?", self._key)
+        now = time.time()
+        self.store.execute(
+            "INSERT INTO sources (source_path, title, dataset_id, dataset_type, created_at, updated_at) VALUES (?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT(source_path, title) DO UPDATE SET dataset_id = excluded.dataset_id, "
+            "dataset_type = excluded.dataset_type, updated_at = excluded.updated_at",
+            (*self._key, dataset_id, dataset_type, now, now),
+        )
+
+    def rel_path(self, local_path: str) -> str:
+        local_path = os.path.abspath(local_path)
+        if local_path == self.source_path:
+            return os.path.basename(local_path)
+        return os.path.relpath(local_path, self.source_path)
+
+    def _row(self, local_path: str, status: str, sha256: Optional[str], now: float) -> Tuple:
+        try:
+            st = os.stat(local_path)
+            size, mtime_ns = st.st_size, st.st_mtime_ns
+        except OSError:
+            size = mtime_ns = None
+        return (*self._key, self.rel_path(local_path), size, mtime_ns, sha256, status, now)
+
+    def record_file(self, local_path: str, status: str, sha256: Optional[str] = None) -> None:
+        """Record the status of uploading `local_path`: 'in_flight' while it runs, then 'done' or 'failed'."""
+        self.store.execute(
+            "INSERT OR REPLACE INTO files (source_path, title, rel_path, size, mtime_ns, sha256, status, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            self._row(local_path, status, sha256, time.time()),
+        )
+
+    def record_files(self, local_paths: Iterable[str], status: str) -> None:
+        """Record the same status for all `local_paths` in one transaction."""
+        now = time.time()
+        self.store.executemany(
+            "INSERT OR REPLACE INTO files (source_path, title, rel_path, size, mtime_ns, sha256, status, updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            [self._row(path, status, None, now) for path in local_paths],
+        )
+
+    def record_directory(self, local_dir: str, status: str) -> None:
+        """Record the same outcome for every file below `local_dir` (uploaded in one call)."""
+        self.record_files(_walk_files(local_dir), status)
+
+    def completed_files(self) -> Dict[str, Tuple[Optional[int], Optional[int]]]:
+        """Return {rel_path: (size, mtime_ns)} of the files uploaded so far."""
+        rows = self.store.execute("SELECT rel_path, size, mtime_ns FROM files WHERE source_path = ? AND title = ? AND status = 'done'", self._key)
+        return {row[0]: (row[1], row[2]) for row in rows}
+
+    def status_counts(self) -> Dict[str, int]:
+        """Return {status: number of files}, e.g. to report what an interrupted run left behind."""
+        rows = self.store.execute("SELECT status, COUNT(*) FROM files WHERE source_path = ? AND title = ? GROUP BY status", self._key)
+        return {row[0]: row[1] for row in rows}
+
+    def is_done(self, local_path: str, completed: Optional[Dict[str, Tuple[Optional[int], Optional[int]]]] = None) -> bool:
+        """True if `local_path` was uploaded and has not changed since."""
+        completed = self.completed_files() if completed is None else completed
+        recorded = completed.get(self.rel_path(local_path))
+        if recorded is None:
+            return False
+        try:
+            st = os.stat(local_path)
+        except OSError:
+            return False
+        return recorded == (st.st_size, st.st_mtime_ns)
+
+    def clear(self) -> None:
+        """Forget this source, e.g. after its upload was verified."""
+        self.store.execute("DELETE FROM files WHERE source_path = ? AND title = ?", self._key)
+        self.store.execute("DELETE FROM sources WHERE source_path = ? AND title = ?", self._key)
+
+
+def open_upload_state(source_path: Union[str, Path], title: str = "", path: Optional[Union[str, Path]] = None) -> UploadState:
+    """Open the upload state database and return the state of uploading `source_path` as `title`."""
+    return UploadStateStore(path).source(source_path, title)
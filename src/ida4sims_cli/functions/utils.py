@@ -1,9 +1,31 @@
+from __future__ import annotations
+
+import logging
+import os
 import time
 import contextlib
 import io
-from typing import Optional, List, Any, Tuple
-from py4lexis.ddi.datasets import Datasets
+from typing import TYPE_CHECKING, Optional, List, Any, Tuple
+
+from ida4sims_cli.functions.event_log import log_event
+from ida4sims_cli.functions.interrupts import check_interrupted
+from ida4sims_cli.functions.metrics import RETRIES
+from ida4sims_cli.functions.profiling import phase
+
+if TYPE_CHECKING:
+    from py4lexis.ddi.datasets import Datasets
+
+
+def enable_py4lexis_exceptions() -> None:
+    """Make py4lexis raise exceptions instead of swallowing them.
+
+    Called right before py4lexis is imported, rather than when our modules
+    are, so importing ida4sims_cli (e.g. as a library) leaves the
+    environment of the host process alone.
+    """
+    os.environ["PY4LEXIS_RERAISE_EXCEPTIONS"] = "True"
 
+@phase("wait_for_dataset")
 def wait_for_dataset_contents(datasets: Datasets, dataset_id: str, max_retries: int = 24, retry_delay: int = 5) -> Tuple[Optional[List[Any]], int]:
     """
     Waits for a dataset to be created and propagated in iRODS by polling its content.
@@ -24,7 +46,10 @@ def wait_for_dataset_contents(datasets: Datasets, dataset_id: str, max_retries:
 
     # Use a suppressed-output wrapper around calls to py4lexis to avoid noisy prints
     for attempt in range(1, max_retries + 1):
+        check_interrupted()
         attempts_used = attempt
+        if attempt > 1:
+            RETRIES.inc(operation="wait_for_dataset")
         try:
             # Suppress stdout/stderr produced by py4lexis internals during the call
             with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
@@ -32,24 +57,24 @@ def wait_for_dataset_contents(datasets: Datasets, dataset_id: str, max_retries:
 
             if filelist_response is None:
                 # py4lexis returns None and prints error if dataset doesn't exist yet
-                print(f"  (Attempt {attempt}/{max_retries}) Dataset content not visible yet. Waiting {retry_delay}s...")
+                log_event("dataset.wait", f"  (Attempt {attempt}/{max_retries}) Dataset content not visible yet. Waiting {retry_delay}s...", dataset_id=dataset_id, attempt=attempt, max_retries=max_retries)
                 time.sleep(retry_delay)
                 continue
 
             if isinstance(filelist_response, dict) and 'contents' in filelist_response:
                  dataset_content_list = filelist_response.get('contents')
                  if dataset_content_list:
-                      print(f"  Found {len(dataset_content_list)} item(s) in dataset root (after {attempt} attempt(s)).")
+                      log_event("dataset.visible", f"  Found {len(dataset_content_list)} item(s) in dataset root (after {attempt} attempt(s)).", dataset_id=dataset_id, attempt=attempt, root_items=len(dataset_content_list))
                  else:
-                      print(f"  Dataset root is empty (checked {attempt} time(s)).")
+                      log_event("dataset.visible", f"  Dataset root is empty (checked {attempt} time(s)).", dataset_id=dataset_id, attempt=attempt, root_items=0)
                  break
             else:
-                print(f"  Dataset is currently empty or content could not be retrieved (checked {attempt} time(s)).")
+                log_event("dataset.visible", f"  Dataset is currently empty or content could not be retrieved (checked {attempt} time(s)).", dataset_id=dataset_id, attempt=attempt, root_items=0)
                 dataset_content_list = []
                 break
         except Exception as e:
             # Hide noisy py4lexis output but show concise retry info to user
-            print(f"  WARNING: Could not fetch dataset contents (attempt {attempt}/{max_retries}): {e}. Retrying in {retry_delay}s...")
+            log_event("dataset.wait_error", f"  WARNING: Could not fetch dataset contents (attempt {attempt}/{max_retries}): {e}. Retrying in {retry_delay}s...", logging.WARNING, dataset_id=dataset_id, attempt=attempt, max_retries=max_retries, error=str(e))
             time.sleep(retry_delay)
 
     return dataset_content_list, attempts_used
@@ -1,87 +1,107 @@
 #!/usr/bin/env python3
 """
-Script to get all datasets using py4lexis CLI with stored refresh token.
+List the datasets of the project in-process through py4lexis.
 """
 
-import subprocess
+import contextlib
+import logging
 import sys
-import keyring
-import os
-from py4lexis.session import LexisSession, LexisSessionToken
-from ida4sims_cli.helpers.default_data import KEYRING_SERVICE_NAME, KEYRING_USERNAME
-
-# Ensure py4lexis raises exceptions instead of swallowing them
-os.environ["PY4LEXIS_RERAISE_EXCEPTIONS"] = "True"
-
-def get_refresh_token():
-    stored_token = keyring.get_password(KEYRING_SERVICE_NAME, KEYRING_USERNAME)
-    print("--- Attempting to get LEXIS refresh token ---")
-    print(f"Checking for stored token under service='{KEYRING_SERVICE_NAME}', username='{KEYRING_USERNAME}'")
-    print("Stored token found:", "Yes" if stored_token else "No")
-
-    if stored_token:
-        print("Attempting to refresh session using stored token...")
-        try:
-            session_attempt = LexisSessionToken(refresh_token=stored_token, reraise_exceptions=True)
-            if session_attempt:
-                try:
-                    refreshed_token = session_attempt.get_refresh_token()
-                    if refreshed_token:
-                        print("Token refreshed successfully.")
-                        keyring.set_password(KEYRING_SERVICE_NAME, KEYRING_USERNAME, refreshed_token)
-                        return refreshed_token
-                    else:
-                        print("Failed to refresh token.")
-                except Exception as e:
-                    print(f"Error during token refresh: {e}")
-            else:
-                print("Stored token did not result in a valid session.")
-        except Exception as e:
-            print(f"Error initializing session with stored token: {e}")
-        # If stored token failed, delete it
-        keyring.delete_password(KEYRING_SERVICE_NAME, KEYRING_USERNAME)
-        print("Deleted invalid stored token.")
 
-    print("Performing new login...")
-    try:
-        lexis_session = LexisSession(offline_access=True, reraise_exceptions=True)
-        if lexis_session:
-            print("New login successful.")
-            new_token = lexis_session.get_refresh_token()
-            if new_token:
-                print("New token obtained.")
-                keyring.set_password(KEYRING_SERVICE_NAME, KEYRING_USERNAME, new_token)
-                return new_token
-            else:
-                print("Failed to obtain new token.")
-        else:
-            print("New login failed.")
-    except Exception as e:
-        print(f"Error during new login: {e}")
+import click
 
-    return None
+from ida4sims_cli.functions.agent_client import AgentDatasets, connect_agent
+from ida4sims_cli.functions.event_log import log_event, log_options
+from ida4sims_cli.functions.LexisAuthManager import LexisAuthManager
+from ida4sims_cli.functions.list_datasets import fetch_all_datasets, filter_datasets, format_datasets, paginate
+from ida4sims_cli.functions.utils import enable_py4lexis_exceptions
+from ida4sims_cli.helpers.default_data import DATASET_LIST_CACHE_TTL, DEFAULT_ACCESS, PROJECT
 
-def main():
-    refresh_token = get_refresh_token()
-    if not refresh_token:
-        print("ERROR: Failed to obtain refresh token.", file=sys.stderr)
-        sys.exit(1)
 
-    # Command to run
-    cmd = [
-        "python", "-m", "py4lexis.cli.datasets", "get-all-datasets",
-        "--filter-project", "exa4mind_wp4",
-        "--filter-access", "project",
-        "--users-datasets",
-        "--refresh-token", refresh_token
-    ]
+def open_datasets():
+    """Return a py4lexis Datasets object (or the agent's), exiting on failure."""
+    agent = connect_agent()
+    if agent is not None:
+        log_event("agent.connected", f"Using ida-agent at '{agent.socket_path}'.", socket=str(agent.socket_path))
+        return AgentDatasets(agent)
+
+    enable_py4lexis_exceptions()
+    from py4lexis.ddi.datasets import Datasets
 
-    # Run the command
     try:
-        result = subprocess.run(cmd, check=True)
-    except subprocess.CalledProcessError as e:
-        print(f"ERROR: Command failed with return code {e.returncode}", file=sys.stderr)
+        session = LexisAuthManager().login()
+    except Exception as auth_err:
+        log_event("auth.failed", f"ERROR: Authentication failed: {auth_err}", logging.ERROR, error=str(auth_err))
         sys.exit(1)
+    if not session:
+        log_event("auth.failed", "ERROR: Failed to obtain authentication session. Exiting.", logging.ERROR)
+        sys.exit(1)
+    return Datasets(session=session, suppress_print=True, reraise_exceptions=True)
+
+
+def index_listing(summaries, project: str, access: str) -> None:
+    """Merge a fetched listing into the local search index used by ida-search; failures only warn."""
+    from ida4sims_cli.functions.metadata_index import open_index, update_index
+
+    try:
+        conn = open_index()
+        try:
+            update_index(conn, summaries, project=project, access=access)
+        finally:
+            conn.close()
+    except Exception as e:
+        log_event("search.index_failed", f"WARNING: Could not update the search index: {e}", logging.WARNING, error=str(e))
+
+
+def parse_metadata_filter(ctx, param, values):
+    pairs = []
+    for value in values:
+        key, sep, expected = value.partition("=")
+        if not sep or not key:
+            raise click.BadParameter(f"'{value}' is not of the form KEY=VALUE", ctx=ctx, param=param)
+        pairs.append((key.strip(), expected.strip()))
+    return pairs
+
+
+@click.command()
+@click.option('--project', default=PROJECT, show_default=True, help='Project whose datasets are listed.')
+@click.option('--access', default=DEFAULT_ACCESS, show_default=True, help='Access level of the datasets (user, project, public).')
+@click.option('--type', 'dataset_type', default=None, help='Only datasets of this dataset_type (e.g. forcefield).')
+@click.option('--metadata', 'metadata', multiple=True, callback=parse_metadata_filter, metavar='KEY=VALUE', help='Only datasets whose metadata KEY equals VALUE. Can be used multiple times.')
+@click.option('--title', default=None, help='Only datasets whose title matches this glob (case-insensitive).')
+@click.option('--format', 'output_format', type=click.Choice(['table', 'json', 'csv']), default='table', show_default=True, help='Output format; json contains the full metadata.')
+@click.option('--page', type=click.IntRange(min=1), default=1, show_default=True, help='Page of results to show.')
+@click.option('--page-size', type=click.IntRange(min=0), default=0, show_default=True, help='Datasets per page (0 = all).')
+@click.option('--cache-ttl', type=click.FloatRange(min=0), default=DATASET_LIST_CACHE_TTL, show_default=True, help='Reuse a listing fetched less than this many seconds ago (0 disables the cache).')
+@click.option('--refresh', is_flag=True, default=False, help='Ignore the cached listing.')
+@log_options
+def cli(project, access, dataset_type, metadata, title, output_format, page, page_size, cache_ttl, refresh):
+    """
+    List the datasets of the project.
+
+    The listing is fetched in-process (no py4lexis subprocess) and cached
+    briefly, so filtering and paging through it repeatedly is cheap. Login
+    and status messages go to stderr, keeping --format json/csv output on
+    stdout clean for other tools.
+    """
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            summaries = fetch_all_datasets(open_datasets(), project, access, cache_ttl=cache_ttl, refresh=refresh)
+        except Exception as e:
+            log_event("datasets.failed", f"ERROR: Could not list datasets: {e}", logging.ERROR, error=str(e))
+            sys.exit(1)
+        index_listing(summaries, project, access)
+        selected = filter_datasets(summaries, dataset_type=dataset_type, metadata=metadata, title=title)
+        shown = paginate(selected, page, page_size)
+        if page_size:
+            pages = max(1, -(-len(selected) // page_size))
+            log_event("datasets.page", f"Page {page}/{pages} ({len(shown)} of {len(selected)} dataset(s)).", page=page, pages=pages, total=len(selected))
+        elif len(selected) != len(summaries):
+            log_event("datasets.filter", f"{len(selected)} of {len(summaries)} dataset(s) match.", selected=len(selected), total=len(summaries))
+    click.echo(format_datasets(shown, output_format))
+
+
+# Kept for the console script and existing callers.
+main = cli
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    cli()
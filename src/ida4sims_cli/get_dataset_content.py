@@ -1,65 +1,86 @@
+import contextlib
+import json
 import logging
-from py4lexis.ddi.datasets import Datasets
-from ida4sims_cli.functions.LexisAuthManager import LexisAuthManager
-from ida4sims_cli.helpers.default_data import DATASET_ID_FILE_NAME
+import sys
+from typing import Any, Optional
 
-logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
-lexisAuthManager = LexisAuthManager()
+import click
 
-def print_dataset_content(datasets: Datasets, dataset_id: str):
-    """Retrieves and prints the contents of a dataset."""
-    try:
-        logging.info(f"Attempting to retrieve content for dataset ID: {dataset_id}")
-        filelist = datasets.get_content_of_dataset(dataset_id=dataset_id)
-        print(filelist)
-        print(f"\n--- Contents of dataset {dataset_id} ---")
-        if filelist and 'contents' in filelist and len(filelist['contents']) > 0:
-            for item in filelist['contents']:
-                item_path = item.get('name', 'N/A')
-                item_type = item.get('type', 'N/A')
-                item_size = item.get('size', 'N/A')
+from ida4sims_cli.functions.dataset_tree import build_tree, iter_tree_lines, tree_to_dict
+from ida4sims_cli.functions.event_log import log_event, log_options
+from ida4sims_cli.functions.listing_cache import CachedListingDatasets
+from ida4sims_cli.functions.profiling import phase
+from ida4sims_cli.get_all_datasets import open_datasets
 
-                print(f"  - Path: {item_path}")
-                print(f"    Type: {item_type}, Size: {item_size}")
-                print("-" * 20)
-            print("------------------------------------")
-            return True
 
-        elif filelist and 'contents' in filelist:
-             print("  Dataset is empty.")
-             print("------------------------------------")
-             return True 
-        else:
-            logging.warning("Received empty or invalid response, or 'contents' key missing.")
-            print("  Could not retrieve dataset contents or structure is invalid.")
-            print("------------------------------------")
-            return False
+def show_dataset_content(
+    datasets: Any,
+    dataset_id: str,
+    max_depth: Optional[int] = None,
+    sort: str = "name",
+    max_entries: Optional[int] = None,
+    dirs_only: bool = False,
+    output_format: str = "tree",
+) -> bool:
+    """Print the content of a dataset as a tree (or JSON) with per-directory totals. Returns False if it could not be listed.
 
-    except Exception as e:
-        logging.error(f"Error retrieving/printing dataset contents for {dataset_id}: {e}", exc_info=True)
-        print(f"  Error checking dataset contents: {e}")
-        print("------------------------------------")
+    Args:
+        datasets: py4lexis Datasets object (or a wrapper such as CachedListingDatasets).
+        dataset_id (str): ID of the LEXIS dataset.
+        max_depth (int, optional): Expand directories only this many levels deep.
+        sort (str): 'name' (directories first), 'size' (largest first) or 'none' (listing order).
+        max_entries (int, optional): Show at most this many entries per directory.
+        dirs_only (bool): Hide files, showing only directories with their totals.
+        output_format (str): 'tree' or 'json'.
+    """
+    with contextlib.redirect_stdout(sys.stderr):
+        try:
+            with phase("list_dataset"):
+                listing = datasets.get_content_of_dataset(dataset_id=dataset_id)
+        except Exception as e:
+            log_event("content.failed", f"ERROR: Could not retrieve the content of dataset '{dataset_id}': {e}", logging.ERROR, dataset_id=dataset_id, error=str(e))
+            return False
+    if not isinstance(listing, dict) or "contents" not in listing:
+        log_event("content.failed", f"ERROR: Could not retrieve the content of dataset '{dataset_id}'.", logging.ERROR, dataset_id=dataset_id)
         return False
 
-if __name__ == "__main__":
-    dataset_id = "d56c812e-e30c-11ef-a926-0242ac150006"
-    # try:
-    #     with open(DATASET_ID_FILE_NAME, "r") as text_file:
-    #         dataset_id = text_file.read().strip()
-    #         logging.info(f"Read dataset ID: {dataset_id} from {DATASET_ID_FILE_NAME}")
-    # except FileNotFoundError:
-    #      logging.error(f"Error: Dataset ID file not found at {DATASET_ID_FILE_NAME}")
-    #      exit()
-    # except Exception as e:
-    #      logging.error(f"Error reading dataset ID file: {e}")
-    #      exit()
+    root = build_tree(listing["contents"], name=dataset_id)
+    if output_format == "json":
+        json.dump(tree_to_dict(root, max_depth=max_depth, sort=sort), sys.stdout, indent=1)
+        sys.stdout.write("\n")
+        return True
+    for line in iter_tree_lines(root, max_depth=max_depth, sort=sort, max_entries=max_entries, dirs_only=dirs_only):
+        click.echo(line)
+    return True
+
 
-    session = lexisAuthManager.login()
-    if not session:
-         logging.error("Failed to get LEXIS session. Exiting.")
-         exit()
+@click.command()
+@click.argument('dataset_id', type=str, required=True)
+@click.option('--max-depth', '-d', type=click.IntRange(min=1), default=None, help='Expand directories only this many levels deep; deeper ones are shown with their totals.')
+@click.option('--sort', type=click.Choice(['name', 'size', 'none']), default='name', show_default=True, help='Order of entries within a directory (size: largest first).')
+@click.option('--max-entries', type=click.IntRange(min=1), default=None, help='Show at most this many entries per directory and summarize the rest.')
+@click.option('--dirs-only', is_flag=True, default=False, help='Show directories only.')
+@click.option('--format', 'output_format', type=click.Choice(['tree', 'json']), default='tree', show_default=True, help='Output format.')
+@click.option('--refresh', is_flag=True, default=False, help='Fetch the listing again instead of reusing a recent local snapshot.')
+@log_options
+def cli(dataset_id, max_depth, sort, max_entries, dirs_only, output_format, refresh):
+    """
+    Show the content of a dataset as a tree.
 
-    datasets = Datasets(session=session, suppress_print=False, reraise_exceptions=True)
-    print_dataset_content(datasets, dataset_id)
+    DATASET_ID: The UUID of the dataset.
 
-    logging.info("Script finished.")
+    Every directory shows the total size and number of files below it, so
+    `--max-depth 1 --sort size` gives a quick overview of where the data is.
+    """
+    with contextlib.redirect_stdout(sys.stderr):
+        datasets = CachedListingDatasets(open_datasets(), refresh=refresh)
+    ok = show_dataset_content(
+        datasets, dataset_id, max_depth=max_depth, sort=sort, max_entries=max_entries,
+        dirs_only=dirs_only, output_format=output_format,
+    )
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,14 +1,24 @@
-import asyncio
+from __future__ import annotations
+
 import logging
-from typing import List, Dict, Optional
+from typing import TYPE_CHECKING, List, Dict, Optional, Union
 import sys
 import click
 from pathlib import Path
 import os
 
-from py4lexis.ddi.datasets import Datasets
-from ida4sims_cli.functions.LexisAuthManager import LexisAuthManager
+from ida4sims_cli.functions.concurrency_tuner import AIMDTuner, Slot, report_tuning, watch_throttling
+from ida4sims_cli.functions.event_log import configure_event_log
 from ida4sims_cli.functions.hashing_utils import get_irods_file_hash_via_poll_async, calculate_sha256
+from ida4sims_cli.functions.profiling import phase, profiling_session, profile_options
+from ida4sims_cli.functions.metrics import metrics_options
+from ida4sims_cli.functions.utils import enable_py4lexis_exceptions
+from ida4sims_cli.helpers.default_data import DEFAULT_HASH_REQUESTS
+
+if TYPE_CHECKING:
+    import httpx
+    from py4lexis.ddi.datasets import Datasets
+    from ida4sims_cli.functions.token_provider import TokenProvider
 
 
 logging.basicConfig(level=logging.INFO, format='%(levelname)s: %(message)s')
@@ -29,15 +39,20 @@ def truncate_hash(h: str, length: int = 20) -> str:
 
 import csv
 
-async def fetch_hashes_for_dataset(datasets: Datasets, dataset_id: str, lexis_token: str, compare_with: Optional[Path] = None, output_file: Optional[Path] = None):
+async def fetch_hashes_for_dataset(datasets: Datasets, dataset_id: str, lexis_token: Union[str, TokenProvider], compare_with: Optional[Path] = None, output_file: Optional[Path] = None, http_client: Optional[httpx.AsyncClient] = None, poll_interval: Optional[float] = None, concurrency: int = DEFAULT_HASH_REQUESTS, tuner: Optional[AIMDTuner] = None):
     """
     Retrieves the content of a dataset and fetches hashes for all files.
     If compare_with is provided, compares with local files.
     If output_file is provided, saves hashes to a CSV file.
+    If http_client is provided, it is used for all hash requests (e.g. a shared
+    client or one with a mock transport); poll_interval overrides the status polling interval.
+    Up to `concurrency` hash requests are in flight at once; with a `tuner`,
+    its limit is used instead and throttled (429/503) or failed requests lower it.
     """
     logging.info(f"Retrieving content for dataset ID: {dataset_id}")
     try:
-        content_response = datasets.get_content_of_dataset(dataset_id=dataset_id)
+        with phase("list_dataset"):
+            content_response = datasets.get_content_of_dataset(dataset_id=dataset_id)
     except Exception as e:
         logging.error(f"Failed to get dataset content: {e}")
         return
@@ -121,10 +136,38 @@ async def fetch_hashes_for_dataset(datasets: Datasets, dataset_id: str, lexis_to
     print("-" * border_len)
 
     csv_rows = []
-    
-    for file_path in files_to_hash:
-        result = await get_irods_file_hash_via_poll_async(dataset_id, file_path, lexis_token)
-        
+
+    import asyncio
+
+    semaphore = asyncio.Semaphore(max(1, concurrency))
+    own_client = None
+    if tuner is not None:
+        if http_client is None:
+            import httpx
+
+            http_client = own_client = httpx.AsyncClient(timeout=10.0)
+        watch_throttling(http_client)
+    hash_kwargs = {}
+    if http_client is not None:
+        hash_kwargs["client"] = http_client
+    if poll_interval is not None:
+        hash_kwargs["interval"] = poll_interval
+
+    async def fetch(file_path: str) -> Optional[dict]:
+        async with (tuner.aslot() if tuner is not None else semaphore) as slot:
+            with phase("remote_hash"):
+                result = await get_irods_file_hash_via_poll_async(dataset_id, file_path, lexis_token, **hash_kwargs)
+            if result is None and isinstance(slot, Slot):
+                slot.failed = True
+            return result
+
+    try:
+        results = await asyncio.gather(*(fetch(file_path) for file_path in files_to_hash))
+    finally:
+        if own_client is not None:
+            await own_client.aclose()
+
+    for file_path, result in zip(files_to_hash, results):
         remote_hash = "N/A"
         status = "Unknown"
         
@@ -193,7 +236,12 @@ async def fetch_hashes_for_dataset(datasets: Datasets, dataset_id: str, lexis_to
 @click.argument('dataset_id', type=str, required=True)
 @click.option('--compare-with', type=click.Path(exists=True, file_okay=False, dir_okay=True, path_type=Path), help="Local directory to compare hashes with.")
 @click.option('--output-file', '-o', type=click.Path(file_okay=True, dir_okay=False, path_type=Path), help="Path to save hashes (CSV format).")
-def cli(dataset_id, compare_with, output_file):
+@click.option('--refresh', is_flag=True, default=False, help="Fetch the dataset listing again instead of reusing a recent local snapshot.")
+@click.option('--workers', '-j', type=click.IntRange(min=1), default=DEFAULT_HASH_REQUESTS, show_default=True, help="Number of hash requests in flight at once.")
+@click.option('--auto-tune', 'auto_tune', is_flag=True, default=False, help="Adapt the number of concurrent hash requests to the server, up to --workers.")
+@profile_options
+@metrics_options("ida-get-dataset-hashes")
+def cli(dataset_id, compare_with, output_file, refresh, workers, auto_tune, profile, profile_cpu, profile_memory):
     """
     Get hashes for all files in a dataset.
 
@@ -203,20 +251,50 @@ def cli(dataset_id, compare_with, output_file):
     The script assumes the local directory structure mirrors the dataset structure.
 
     Optionally save results to a CSV file using --output-file / -o.
+
+    Hashes are requested --workers at a time; with --auto-tune the number
+    adapts to the server, backing off when it throttles requests.
+
+    A listing of the dataset fetched by another command in the last few
+    minutes is reused; use --refresh to fetch it again.
+
+    Use --profile REPORT.json to record where the run spends its time.
     """
+    import asyncio
+
+    configure_event_log()
+
     async def main():
-        auth_manager = LexisAuthManager()
-        session = auth_manager.login()
-        if not session:
-            logging.error("Failed to login.")
-            sys.exit(1)
+        from ida4sims_cli.functions.agent_client import AgentDatasets, connect_agent
+        from ida4sims_cli.functions.listing_cache import CachedListingDatasets
+        from ida4sims_cli.functions.token_provider import agent_token_provider, session_token_provider
+
+        agent = connect_agent()
+        if agent is not None:
+            logging.info(f"Using ida-agent at '{agent.socket_path}'.")
+            lexis_token = agent_token_provider(agent)
+            datasets = AgentDatasets(agent)
+        else:
+            enable_py4lexis_exceptions()
+            from py4lexis.ddi.datasets import Datasets
+            from ida4sims_cli.functions.LexisAuthManager import LexisAuthManager
+
+            auth_manager = LexisAuthManager()
+            session = auth_manager.login()
+            if not session:
+                logging.error("Failed to login.")
+                sys.exit(1)
 
-        lexis_token = session.get_access_token()
-        datasets = Datasets(session=session, suppress_print=True) # suppress_print to keep output clean
+            # Shared by all hash requests; refreshed ahead of expiry for long runs.
+            lexis_token = session_token_provider(session)
+            datasets = Datasets(session=session, suppress_print=True) # suppress_print to keep output clean
 
-        await fetch_hashes_for_dataset(datasets, dataset_id, lexis_token, compare_with, output_file)
+        tuner = AIMDTuner(maximum=workers, name="hash requests") if auto_tune else None
+        with report_tuning([tuner] if tuner is not None else []):
+            await fetch_hashes_for_dataset(CachedListingDatasets(datasets, refresh=refresh), dataset_id, lexis_token, compare_with, output_file, concurrency=workers, tuner=tuner)
 
-    asyncio.run(main())
+    with profiling_session(profile, "ida-get-dataset-hashes", cpu=profile_cpu, memory=profile_memory):
+        asyncio.run(main())
 
 if __name__ == "__main__":
     cli()
@@ -6,4 +6,48 @@ DATASET_ID_FILE_NAME = "dataset_id.txt"
 KEYRING_SERVICE_NAME = 'LEXIS_AUTH'
 KEYRING_USERNAME = "offline_token"
 STORAGE_NAME = "iRODS IT4I"
-STORAGE_RESOURCE = "ATR-25-3" 
\ No newline at end of file
+STORAGE_RESOURCE = "ATR-25-3" 
+KEYRING_ACCESS_TOKEN_USERNAME = "access_token"
+# Cached access tokens are reused until this many seconds before they expire.
+ACCESS_TOKEN_MIN_VALIDITY = 60
+
+# Size of the iRODS transfer connection pool used by uploads.
+DEFAULT_UPLOAD_CONNECTIONS = 1
+# py4lexis objects of each kind kept by ida-agent, i.e. its concurrent transfers.
+DEFAULT_AGENT_CONNECTIONS = 4
+# Files uploaded on the dedicated metadata lane during a sync: topologies,
+# inputs, run logs and other small descriptive files (matched on the name).
+METADATA_FILE_PATTERNS = (
+    "*.prmtop", "*.parm7", "*.top", "*.psf", "*.gro", "*.itp", "*.pdb",
+    "*.in", "*.mdin", "*.inpcrd", "*.crd",
+    "mdout*", "*.mdout", "*.out", "*.log", "*.mdinfo",
+    "*.json", "*.yaml", "*.yml", "*.txt", "*.dat", "*.lib", "*.frcmod", "leaprc*",
+)
+# Larger files matching these names are scheduled with the bulk transfers.
+METADATA_LANE_MAX_BYTES = 64 * 1024 * 1024
+# Files waiting between two stages of the --pipeline upload.
+DEFAULT_PIPELINE_QUEUE_SIZE = 64
+
+# Concurrent file transfers used by ida-download-dataset.
+DEFAULT_DOWNLOAD_WORKERS = 4
+# Concurrent /staging/hash requests of ida-get-dataset-hashes.
+DEFAULT_HASH_REQUESTS = 4
+# Re-downloads of a file whose checksum does not match the server hash.
+DEFAULT_VERIFY_RETRIES = 1
+# Waiting for a /staging/hash result: a fixed allowance plus the time the
+# server needs to hash the file at this (pessimistic) rate.
+HASH_POLL_TIMEOUT = 30.0
+HASH_POLL_MIN_BYTES_PER_S = 50 * 1024 * 1024
+
+# Snapshot written into the destination of ida-mirror-dataset.
+MIRROR_SNAPSHOT_NAME = ".ida4sims-mirror.json"
+
+# Seconds a fetched dataset list is reused by ida-get-all-datasets.
+DATASET_LIST_CACHE_TTL = 120
+
+# Seconds a stored dataset content listing is reused instead of fetching it again.
+LISTING_SNAPSHOT_TTL = 300
+
+# ida-upload-batch: datasets created (and awaited) ahead of their upload, and concurrent dataset uploads.
+DEFAULT_BATCH_CREATE_WORKERS = 2
+DEFAULT_BATCH_TRANSFERS = 2
@@ -1,9 +1,8 @@
 from ida4sims_cli.functions.LexisAuthManager import LexisAuthManager
 
-lexisAuthManager = LexisAuthManager()
-
 
 def main():
+    lexisAuthManager = LexisAuthManager()
     lexisAuthManager.logout()
     print("Successfully logged out")
 
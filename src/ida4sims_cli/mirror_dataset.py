@@ -0,0 +1,148 @@
+import logging
+import sys
+from pathlib import Path
+from typing import Optional
+
+import click
+
+from ida4sims_cli.download_dataset import open_download_connection, verify_and_refetch
+from ida4sims_cli.functions.download_dataset_content import download_dataset_content
+from ida4sims_cli.functions.event_log import log_event, log_options
+from ida4sims_cli.functions.listing_cache import CachedListingDatasets
+from ida4sims_cli.functions.metrics import metrics_options
+from ida4sims_cli.functions.mirror_dataset_content import (
+    delete_local_extras,
+    load_snapshot,
+    plan_mirror,
+    save_snapshot,
+    snapshot_entries,
+)
+from ida4sims_cli.functions.profiling import phase, profile_options, profiling_session
+from ida4sims_cli.functions.transfer_progress import TransferProgress
+from ida4sims_cli.functions.upload_session import UploadSession
+from ida4sims_cli.helpers.default_data import DEFAULT_DOWNLOAD_WORKERS, DEFAULT_VERIFY_RETRIES
+
+
+def mirror_lexis_dataset(
+    dataset_id: str,
+    dest: Path,
+    workers: int = DEFAULT_DOWNLOAD_WORKERS,
+    delete: bool = False,
+    dry_run: bool = False,
+    verify: bool = True,
+    verify_retries: int = DEFAULT_VERIFY_RETRIES,
+    summary_file: Optional[str] = None,
+    show_progress: bool = True,
+) -> bool:
+    """Bring `dest` in line with a dataset. Returns True if the local copy now matches it.
+
+    Args:
+        dataset_id (str): ID of the LEXIS dataset.
+        dest (Path): Local directory holding the replica.
+        workers (int): Number of concurrent file transfers.
+        delete (bool): Delete local files that are not in the dataset.
+        dry_run (bool): Only report what would be downloaded and deleted.
+        verify (bool): Compare the sha256 of every downloaded file with the server hash.
+        verify_retries (int): How often files with a checksum mismatch are downloaded again.
+        summary_file (str, optional): Path of a JSON file receiving the transfer summary.
+        show_progress (bool): Render a live progress bar on stderr (only when it is a terminal).
+    """
+    irods, datasets, lexis_token = open_download_connection(workers)
+
+    log_event("mirror.list", f"Retrieving content of dataset '{dataset_id}'...", dataset_id=dataset_id)
+    with phase("list_dataset"):
+        # Always fetched, and stored for later commands such as ida-get-dataset-hashes.
+        listing = CachedListingDatasets(datasets, refresh=True).get_content_of_dataset(dataset_id=dataset_id)
+    if not listing or "contents" not in listing:
+        log_event("mirror.failed", f"ERROR: Could not retrieve the content of dataset '{dataset_id}'.", logging.ERROR, dataset_id=dataset_id)
+        return False
+
+    snapshot = load_snapshot(dest, dataset_id)
+    plan = plan_mirror(listing["contents"], dest, snapshot)
+    log_event(
+        "mirror.plan",
+        f"{len(plan.download)} file(s) to download, {len(plan.delete)} local file(s) not in the dataset, {len(plan.unchanged)} unchanged.",
+        download=len(plan.download), extra=len(plan.delete), unchanged=len(plan.unchanged),
+    )
+    if dry_run:
+        for remote in plan.download:
+            print(f"download  {remote.path}")
+        for path in plan.delete:
+            print(f"{'delete' if delete else 'extra':<8}  {path}")
+        return True
+
+    # Extras go first: this frees space and clears paths that change between file and directory.
+    delete_failed = delete_local_extras(dest, plan.delete) if delete and plan.delete else []
+
+    dest.mkdir(parents=True, exist_ok=True)
+    failed = []
+    if plan.download:
+        progress = TransferProgress(total_bytes=sum(f.size for f in plan.download), total_files=len(plan.download), show_bar=show_progress)
+        try:
+            # The plan already decided which files to fetch, including same-size files modified locally.
+            failed = download_dataset_content(irods, dataset_id, plan.download, dest, workers=workers, progress=progress, checksum=verify, resume=False)
+            if verify:
+                downloaded = [f for f in plan.download if f not in failed]
+                failed += verify_and_refetch(irods, dataset_id, downloaded, dest, lexis_token, workers, verify_retries, progress)
+        finally:
+            if isinstance(irods, UploadSession):
+                progress.connections = irods.stats()
+            progress.close()
+            progress.print_report()
+            if summary_file:
+                progress.write_summary(summary_file)
+
+    mirrored = plan.unchanged + [f for f in plan.download if f not in failed]
+    save_snapshot(dest, dataset_id, snapshot_entries(dest, mirrored))
+
+    if failed or delete_failed:
+        log_event(
+            "mirror.failed",
+            f"ERROR: {len(failed)} file(s) failed to download and {len(delete_failed)} could not be deleted; run the command again to retry.",
+            logging.ERROR, dataset_id=dataset_id, failed=len(failed), delete_failed=len(delete_failed),
+        )
+        return False
+    if plan.delete and not delete:
+        log_event("mirror.extras_kept", f"Kept {len(plan.delete)} local file(s) that are not in the dataset (use --delete to remove them).", extra=len(plan.delete))
+    log_event("mirror.success", f"'{dest}' mirrors dataset '{dataset_id}'.", dataset_id=dataset_id, dest=str(dest), downloaded=len(plan.download))
+    return True
+
+
+@click.command()
+@click.argument('dataset_id', type=str, required=True)
+@click.argument('dest', type=click.Path(file_okay=False, dir_okay=True, path_type=Path), required=True)
+@click.option('--workers', '-j', type=click.IntRange(min=1), default=DEFAULT_DOWNLOAD_WORKERS, show_default=True, help='Number of concurrent file transfers.')
+@click.option('--delete', is_flag=True, default=False, help='Delete local files that are not in the dataset.')
+@click.option('--dry-run', is_flag=True, default=False, help='Only print what would be downloaded and deleted.')
+@click.option('--verify/--no-verify', default=True, show_default=True, help='Compare the sha256 of each downloaded file with the server hash.')
+@click.option('--verify-retries', type=click.IntRange(min=0), default=DEFAULT_VERIFY_RETRIES, show_default=True, help='How often a file with a checksum mismatch is downloaded again.')
+@click.option('--summary-file', type=click.Path(file_okay=True, dir_okay=False, writable=True), required=False, help='Write a JSON transfer summary to this path.')
+@click.option('--no-progress', 'no_progress', is_flag=True, default=False, help='Disable the live progress bar.')
+@profile_options
+@log_options
+@metrics_options("ida-mirror-dataset")
+def cli(dataset_id, dest, workers, delete, dry_run, verify, verify_retries, summary_file, no_progress, profile, profile_cpu, profile_memory):
+    """
+    Keep DEST a local replica of a dataset.
+
+    DATASET_ID: The UUID of the dataset.
+
+    Compares the dataset listing with DEST and downloads only files that are
+    missing or differ in size. A snapshot (.ida4sims-mirror.json in DEST)
+    records what was mirrored, so files changed locally since the last run
+    are fetched again and unchanged files are not re-verified.
+
+    Local files that are not in the dataset are reported; --delete removes them.
+    """
+    with profiling_session(profile, "ida-mirror-dataset", cpu=profile_cpu, memory=profile_memory):
+        ok = mirror_lexis_dataset(
+            dataset_id, dest, workers=workers, delete=delete, dry_run=dry_run,
+            verify=verify, verify_retries=verify_retries,
+            summary_file=summary_file, show_progress=not no_progress,
+        )
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    cli()
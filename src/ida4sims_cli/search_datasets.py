@@ -0,0 +1,69 @@
+import contextlib
+import logging
+import sqlite3
+import sys
+
+import click
+
+from ida4sims_cli.functions.event_log import log_event, log_options
+from ida4sims_cli.functions.list_datasets import fetch_all_datasets, format_datasets
+from ida4sims_cli.functions.metadata_index import indexed_count, open_index, search_index, update_index
+from ida4sims_cli.get_all_datasets import open_datasets, parse_metadata_filter
+from ida4sims_cli.helpers.default_data import DEFAULT_ACCESS, PROJECT
+
+
+def refresh_index(conn: sqlite3.Connection, project: str, access: str) -> None:
+    """Fetch the dataset listing and merge it into the index, exiting on failure."""
+    try:
+        # Always a fresh listing: the point of refreshing is to see new datasets.
+        summaries = fetch_all_datasets(open_datasets(), project, access, refresh=True)
+    except Exception as e:
+        log_event("search.refresh_failed", f"ERROR: Could not list datasets: {e}", logging.ERROR, error=str(e))
+        sys.exit(1)
+    added, updated, removed = update_index(conn, summaries, project=project, access=access)
+    log_event(
+        "search.refreshed",
+        f"Index refreshed: {added} added, {updated} updated, {removed} removed ({indexed_count(conn)} dataset(s) indexed).",
+        added=added, updated=updated, removed=removed,
+    )
+
+
+@click.command()
+@click.argument('query', nargs=-1)
+@click.option('--type', 'dataset_type', default=None, help='Only datasets of this dataset_type (e.g. forcefield).')
+@click.option('--metadata', 'metadata', multiple=True, callback=parse_metadata_filter, metavar='KEY=VALUE', help='Only datasets whose metadata KEY equals VALUE (e.g. molecule_type=RNA). Can be used multiple times.')
+@click.option('--limit', type=click.IntRange(min=0), default=50, show_default=True, help='Maximum number of results (0 = all).')
+@click.option('--format', 'output_format', type=click.Choice(['table', 'json', 'csv']), default='table', show_default=True, help='Output format; json contains the full metadata.')
+@click.option('--raw', is_flag=True, default=False, help='Pass QUERY to SQLite FTS5 unchanged (e.g. \'title:ff19* OR "free energy"\'; columns: title, dataset_type, metadata_text).')
+@click.option('--refresh', is_flag=True, default=False, help='Update the index from LEXIS before searching.')
+@click.option('--project', default=PROJECT, show_default=True, help='Project indexed by --refresh.')
+@click.option('--access', default=DEFAULT_ACCESS, show_default=True, help='Access level indexed by --refresh.')
+@log_options
+def cli(query, dataset_type, metadata, limit, output_format, raw, refresh, project, access):
+    """
+    Search the local index of dataset metadata.
+
+    QUERY: Words that must all appear in the title, type or metadata
+    (prefix match, case-insensitive), e.g. `ida-search amber forcefield`.
+
+    The index lives in ~/.cache/ida4sims and is queried without contacting
+    LEXIS. It is built on first use and updated with --refresh and whenever
+    ida-get-all-datasets fetches the listing; only datasets whose metadata
+    changed are re-indexed.
+    """
+    with contextlib.redirect_stdout(sys.stderr):
+        conn = open_index()
+        if refresh or indexed_count(conn) == 0:
+            refresh_index(conn, project, access)
+        try:
+            results = search_index(conn, " ".join(query), dataset_type=dataset_type, metadata=metadata, limit=limit or None, raw=raw)
+        except sqlite3.OperationalError as e:
+            log_event("search.invalid_query", f"ERROR: Invalid search query: {e}", logging.ERROR, error=str(e))
+            sys.exit(2)
+        conn.close()
+        log_event("search.results", f"{len(results)} dataset(s) found.", results=len(results))
+    click.echo(format_datasets(results, output_format))
+
+
+if __name__ == "__main__":
+    cli()
@@ -0,0 +1,253 @@
+import contextvars
+import json
+import logging
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+
+import click
+
+from ida4sims_cli.api import new_transfer_progress, transfer_dataset_content, verify_uploaded_dataset
+from ida4sims_cli.functions.batch_manifest import BatchEntry, read_manifest
+from ida4sims_cli.functions.batch_state import BatchState
+from ida4sims_cli.functions.create_dataset import create_lexis_dataset
+from ida4sims_cli.functions.event_log import log_event, log_options
+from ida4sims_cli.functions.interrupts import UploadInterrupted, check_interrupted, graceful_interrupts, interrupt_signal, stop_requested
+from ida4sims_cli.functions.listing_cache import invalidate_listing_snapshot
+from ida4sims_cli.functions.metrics import metrics_options
+from ida4sims_cli.functions.profiling import profile_options, profiling_session
+from ida4sims_cli.functions.rate_limiter import BandwidthLimiter
+from ida4sims_cli.functions.transfer_progress import MB, format_bytes, format_duration
+from ida4sims_cli.functions.upload_session import UploadSession
+from ida4sims_cli.functions.upload_state import UploadStateStore
+from ida4sims_cli.functions.utils import wait_for_dataset_contents
+from ida4sims_cli.helpers.default_data import DEFAULT_BATCH_CREATE_WORKERS, DEFAULT_BATCH_TRANSFERS
+from ida4sims_cli.upload_dataset import open_lexis_connection
+
+def prepare_dataset(irods, datasets, entry: BatchEntry, state: BatchState, upload_states: Optional[UploadStateStore] = None) -> str:
+    """Create the dataset of `entry` (or reuse the one from an earlier run) and wait until it is visible."""
+    check_interrupted()
+    upload_state = upload_states.source(entry.path, entry.title) if upload_states is not None else None
+    dataset_id = state.dataset_id(entry.key)
+    if dataset_id:
+        log_event("batch.reuse", f"Reusing dataset '{dataset_id}' created for '{entry.title}' by an earlier run.", dataset_id=dataset_id, title=entry.title)
+        if upload_state is not None and upload_state.dataset_id != dataset_id:
+            upload_state.set_dataset(dataset_id, dataset_type=entry.dataset_type)
+    else:
+        metadata = {k: v for k, v in entry.metadata.items() if v is not None}
+        # No dataset_id.txt: concurrent creations would overwrite it; the batch and upload states track the IDs.
+        dataset_id = create_lexis_dataset(irods, entry.title, metadata, state=upload_state, dataset_id_file=None)
+        if not dataset_id:
+            raise RuntimeError("Dataset ID is missing after creation.")
+        state.update(entry.key, title=entry.title, path=entry.path, dataset_id=dataset_id, status="created")
+        log_event("batch.created", f"Created dataset '{dataset_id}' for '{entry.title}'.", dataset_id=dataset_id, title=entry.title)
+    invalidate_listing_snapshot(dataset_id)
+    contents, attempts = wait_for_dataset_contents(datasets, dataset_id)
+    if contents is None:
+        log_event("batch.not_visible", f"WARNING: Dataset '{dataset_id}' is not visible after {attempts} attempt(s); its upload will keep waiting.", logging.WARNING, dataset_id=dataset_id)
+    return dataset_id
+
+
+def upload_entry(irods, datasets, entry: BatchEntry, dataset_id: str, state: BatchState, upload_states: Optional[UploadStateStore] = None, lanes: Optional[int] = None) -> Dict[str, Any]:
+    """Upload and verify the content of `entry` into its prepared dataset; return the transfer summary.
+
+    `lanes` is the number of concurrent transfers this entry may use.
+    """
+    upload_state = upload_states.source(entry.path, entry.title) if upload_states is not None else None
+    log_event("batch.upload", f"Uploading '{entry.path}' to dataset '{dataset_id}' ({entry.title})...", dataset_id=dataset_id, title=entry.title)
+    # One bar per dataset would garble the terminal when several run at once.
+    progress = new_transfer_progress(entry.path, entry.dataset_type, show_progress=False)
+    try:
+        transfer_dataset_content(irods, datasets, entry.path, dataset_id, entry.dataset_type, entry.metadata, progress, state=upload_state, lanes=lanes)
+    finally:
+        progress.close()
+    verify_uploaded_dataset(datasets, dataset_id)
+    state.update(entry.key, status="uploaded", error=None)
+    if upload_state is not None:
+        upload_state.clear()
+    summary = progress.summary()
+    log_event(
+        "batch.uploaded",
+        f"Uploaded '{entry.title}' to '{dataset_id}': {summary['files_transferred']} file(s), {format_bytes(summary['bytes_transferred'])} in {format_duration(summary['elapsed_s'])}.",
+        dataset_id=dataset_id, title=entry.title, files=summary["files_transferred"], bytes=summary["bytes_transferred"],
+    )
+    return summary
+
+
+def run_batch(
+    irods,
+    datasets,
+    entries: List[BatchEntry],
+    state: BatchState,
+    create_workers: int = DEFAULT_BATCH_CREATE_WORKERS,
+    max_transfers: int = DEFAULT_BATCH_TRANSFERS,
+    upload_states: Optional[UploadStateStore] = None,
+) -> List[Dict[str, Any]]:
+    """Upload all manifest entries and return one result per entry, in manifest order.
+
+    Datasets are created and awaited by `create_workers` threads ahead of the
+    uploads, so propagation waits overlap with other transfers; each
+    prepared dataset is then uploaded by one of `max_transfers` threads.
+    The `max_transfers` connections are shared fairly: each upload runs
+    at most `max_transfers // concurrent uploads` transfers at once, so
+    the pool connections kept for the creations stay free for them.
+    A failing entry is recorded and does not stop the others. With
+    `upload_states`, the files of every entry are recorded as they are
+    uploaded, so a retried entry continues where it stopped.
+
+    After SIGINT/SIGTERM (see `graceful_interrupts`) no further dataset is
+    created or started; uploads in progress stop after their current file
+    and are reported as 'interrupted'.
+    """
+    results: Dict[str, Dict[str, Any]] = {}
+
+    def result(entry: BatchEntry, status: str, dataset_id: Optional[str], started: float, summary: Optional[Dict[str, Any]] = None, error: Optional[str] = None) -> None:
+        results[entry.key] = {
+            "title": entry.title,
+            "path": entry.path,
+            "dataset_type": entry.dataset_type,
+            "dataset_id": dataset_id,
+            "status": status,
+            "files": summary["files_transferred"] if summary else 0,
+            "bytes": summary["bytes_transferred"] if summary else 0,
+            "elapsed_s": round(time.monotonic() - started, 3),
+            "error": error,
+        }
+
+    pending = []
+    for entry in entries:
+        if state.is_done(entry.key):
+            result(entry, "skipped", state.dataset_id(entry.key), time.monotonic())
+        else:
+            pending.append(entry)
+    if len(pending) < len(entries):
+        log_event("batch.resume", f"{len(entries) - len(pending)} dataset(s) already uploaded by an earlier run are skipped.", skipped=len(entries) - len(pending))
+
+    started = {entry.key: time.monotonic() for entry in pending}
+    lanes = max(1, max_transfers // max(1, min(max_transfers, len(pending))))
+    with ThreadPoolExecutor(create_workers, thread_name_prefix="ida-batch-create") as creators, \
+            ThreadPoolExecutor(max_transfers, thread_name_prefix="ida-batch-upload") as transfers:
+        # Workers run in this context so that they see the stop scope of the batch.
+        prepared = {creators.submit(contextvars.copy_context().run, prepare_dataset, irods, datasets, entry, state, upload_states): entry for entry in pending}
+        uploads = {}
+        # Uploads start in the order datasets become ready, not in manifest order.
+        for future in as_completed(prepared):
+            entry = prepared[future]
+            try:
+                dataset_id = future.result()
+            except UploadInterrupted as e:
+                state.update(entry.key, title=entry.title, path=entry.path, status="interrupted")
+                result(entry, "interrupted", state.dataset_id(entry.key), started[entry.key], error=str(e))
+                continue
+            except Exception as e:
+                log_event("batch.create_failed", f"ERROR: Could not create dataset '{entry.title}': {e}", logging.ERROR, title=entry.title, error=str(e))
+                state.update(entry.key, title=entry.title, path=entry.path, status="failed", error=str(e))
+                result(entry, "failed", None, started[entry.key], error=str(e))
+                continue
+            if stop_requested():
+                state.update(entry.key, status="interrupted")
+                result(entry, "interrupted", dataset_id, started[entry.key], error="Not started: interrupted")
+                continue
+            uploads[transfers.submit(contextvars.copy_context().run, upload_entry, irods, datasets, entry, dataset_id, state, upload_states, lanes)] = (entry, dataset_id)
+        for future in as_completed(uploads):
+            entry, dataset_id = uploads[future]
+            try:
+                summary = future.result()
+            except UploadInterrupted as e:
+                state.update(entry.key, status="interrupted")
+                result(entry, "interrupted", dataset_id, started[entry.key], error=str(e))
+                continue
+            except Exception as e:
+                log_event("batch.upload_failed", f"ERROR: Upload of '{entry.title}' to dataset '{dataset_id}' failed: {e}", logging.ERROR, dataset_id=dataset_id, title=entry.title, error=str(e))
+                state.update(entry.key, status="failed", error=str(e))
+                result(entry, "failed", dataset_id, started[entry.key], error=str(e))
+                continue
+            result(entry, "uploaded", dataset_id, started[entry.key], summary)
+    return [results[entry.key] for entry in entries]
+
+
+def print_batch_report(results: List[Dict[str, Any]], elapsed: float) -> None:
+    """Log a table of the batch results (event 'batch.summary')."""
+    lines = ["\n--- Batch Summary ---"]
+    for r in results:
+        lines.append(f"{r['status']:<11} {r['dataset_id'] or '-':<36}  {format_bytes(r['bytes']):>10}  {r['title']}")
+        if r["error"]:
+            lines.append(f"            {r['error']}")
+    counts = {status: sum(1 for r in results if r["status"] == status) for status in ("uploaded", "skipped", "failed", "interrupted")}
+    total = sum(r["bytes"] for r in results)
+    lines.append(
+        f"{counts['uploaded']} uploaded, {counts['skipped']} skipped, {counts['failed']} failed"
+        + (f", {counts['interrupted']} interrupted (run the command again to resume); " if counts["interrupted"] else "; ")
+        + f"{format_bytes(total)} in {format_duration(elapsed)} ({(total / MB) / elapsed if elapsed > 0 else 0:.2f} MB/s)."
+    )
+    log_event("batch.summary", "\n".join(lines), logging.ERROR if counts["failed"] else logging.WARNING if counts["interrupted"] else logging.INFO, elapsed_s=round(elapsed, 3), bytes=total, **counts)
+
+
+@click.command()
+@click.argument('manifest', type=click.Path(exists=True, file_okay=True, dir_okay=False, readable=True))
+@click.option('--create-workers', type=click.IntRange(min=1), default=DEFAULT_BATCH_CREATE_WORKERS, show_default=True, help='Datasets created and awaited concurrently ahead of their upload.')
+@click.option('--max-transfers', type=click.IntRange(min=1), default=DEFAULT_BATCH_TRANSFERS, show_default=True, help='Datasets uploaded concurrently (global limit on concurrent transfers).')
+@click.option('--bandwidth-limit', type=click.FloatRange(min=0, min_open=True), default=None, help='Cap the average upload rate of the whole batch, in MB/s.')
+@click.option('--state-file', type=click.Path(file_okay=True, dir_okay=False, writable=True), default=None, help='Where the progress of the batch is kept [default: MANIFEST.state.json].')
+@click.option('--summary-file', type=click.Path(file_okay=True, dir_okay=False, writable=True), required=False, help='Write the per-dataset results as JSON to this path.')
+@click.option('--dry-run', is_flag=True, default=False, help='Only validate the manifest and list what would be uploaded.')
+@profile_options
+@log_options
+@metrics_options("ida-upload-batch")
+def cli(manifest, create_workers, max_transfers, bandwidth_limit, state_file, summary_file, dry_run, profile, profile_cpu, profile_memory):
+    """
+    Upload the datasets listed in a manifest.
+
+    MANIFEST: A CSV, YAML or JSON file with one dataset per row/item. Each
+    needs `path`, `title` and `type` (simulation, forcefield or
+    experimental); `access` is optional and every other column is metadata,
+    named like the options of ida-upload-dataset (e.g. author_name,
+    ff_name, library_files). In CSV files, several file names are separated
+    by ';' and several creators by '|'.
+
+    All datasets are handled in one session: datasets are created in the
+    background while others upload, and progress is kept in a state file,
+    so running the command again resumes an interrupted batch. On Ctrl-C or
+    SIGTERM no new dataset or file is started, files in flight finish and
+    the state is kept; a second signal stops immediately.
+    """
+    entries = read_manifest(manifest)
+    if dry_run:
+        for entry in entries:
+            click.echo(f"{entry.dataset_type:<18} {entry.title}  <- {entry.path}")
+        return
+    state = BatchState(state_file or f"{manifest}.state.json")
+
+    log_event("batch.begin", f"--- Uploading {len(entries)} dataset(s) from '{manifest}' ---", manifest=manifest, datasets=len(entries))
+    interrupted = None
+    with profiling_session(profile, "ida-upload-batch", cpu=profile_cpu, memory=profile_memory), graceful_interrupts():
+        # Creations borrow connections too; they must not wait for a transfer slot.
+        connection = open_lexis_connection(max_transfers + create_workers)
+        irods, datasets = connection.irods, connection.datasets
+        if bandwidth_limit:
+            if isinstance(irods, UploadSession):
+                irods.rate_limiter = BandwidthLimiter(bandwidth_limit * MB)
+            else:
+                log_event("batch.bandwidth_ignored", "WARNING: --bandwidth-limit is not applied to uploads through ida-agent.", logging.WARNING)
+        started = time.monotonic()
+        try:
+            results = run_batch(irods, datasets, entries, state, create_workers=create_workers, max_transfers=max_transfers, upload_states=UploadStateStore())
+        except KeyboardInterrupt:
+            log_event("batch.interrupted", "Batch stopped; files in flight will be uploaded again when the command is run again.", logging.WARNING)
+            sys.exit(130)
+        if stop_requested():
+            interrupted = UploadInterrupted(interrupt_signal())
+        print_batch_report(results, time.monotonic() - started)
+    if summary_file:
+        with open(summary_file, "w") as f:
+            json.dump({"datasets": results, "connections": irods.stats() if isinstance(irods, UploadSession) else None}, f, indent=2)
+        log_event("batch.summary_written", f"Batch summary written to '{summary_file}'.", path=summary_file)
+    if any(r["status"] == "failed" for r in results):
+        sys.exit(1)
+    if interrupted is not None:
+        sys.exit(interrupted.exit_code)
+
+
+if __name__ == "__main__":
+    cli()
@@ -1,28 +1,23 @@
 import json
-from typing import Dict
+import logging
+from typing import Dict, Optional
 import os
 
 import click
-from ida4sims_cli.functions.LexisAuthManager import LexisAuthManager
-from ida4sims_cli.functions.create_dataset import create_lexis_dataset
-from ida4sims_cli.functions.upload_dataset_content import (
-    upload_dataset_content,
-    upload_dataset_as_files,
-)
-from ida4sims_cli.functions.utils import wait_for_dataset_contents
+from ida4sims_cli.api import LexisConnection, UploadClient, connect
+from ida4sims_cli.exceptions import AuthenticationError, ConnectionSetupError, Ida4simsError, UploadInterrupted
+from ida4sims_cli.functions.concurrency_tuner import AIMDTuner, report_tuning
 from ida4sims_cli.functions.delete_dataset_id import delete_saved_dataset_id
-from py4lexis.lexis_irods import iRODS
-from py4lexis.ddi.datasets import Datasets
-from ida4sims_cli.helpers.default_data import DEFAULT_ACCESS
+from ida4sims_cli.functions.profiling import profiling_session, profile_options
+from ida4sims_cli.functions.event_log import log_event, log_options
+from ida4sims_cli.functions.interrupts import graceful_interrupts
+from ida4sims_cli.functions.metrics import metrics_options
+from ida4sims_cli.functions.upload_session import UploadSession
+from ida4sims_cli.functions.upload_state import open_upload_state
+from ida4sims_cli.helpers.default_data import DATASET_ID_FILE_NAME, DEFAULT_ACCESS, DEFAULT_UPLOAD_CONNECTIONS
 from ida4sims_cli.helpers.creators import parse_creator_strings
 import sys
 
-# Ensure py4lexis raises exceptions instead of swallowing them
-os.environ["PY4LEXIS_RERAISE_EXCEPTIONS"] = "True"
-
-auth_manager = LexisAuthManager()
-
-
 def resolve_path(base_path: str, filename: str) -> str:
     """Return a normalized path for `filename`.
 
@@ -43,101 +38,129 @@ def resolve_path(base_path: str, filename: str) -> str:
     return os.path.normpath(os.path.join(base_path, filename))
 
 
-def upload_lexis_dataset(title: str, path: str, access: str, metadata: Dict[str, str]) -> None:
+def open_lexis_connection(connections: int = DEFAULT_UPLOAD_CONNECTIONS) -> LexisConnection:
+    """Return the LexisConnection for the upload, exiting on failure.
+
+    When an ida-agent is running its warm session is used through proxies;
+    otherwise this logs in and creates the py4lexis objects in-process, with
+    iRODS transfers going through an UploadSession pool of `connections`.
+    """
+    log_event("auth.begin", "\nChecking for refresh token...")
+    try:
+        return connect(connections, suppress_print=False)
+    except AuthenticationError as auth_err:
+        log_event("auth.failed", f"ERROR: {auth_err}", logging.ERROR, error=str(auth_err))
+        sys.exit(1) # Exit if authentication fails
+    except ConnectionSetupError as conn_err:
+        log_event("connection.failed", f"ERROR: {conn_err}", logging.ERROR, error=str(conn_err))
+        sys.exit(1) # Exit if connection fails
+
+
+def upload_lexis_dataset(title: str, path: str, access: str, metadata: Dict[str, str], summary_file: Optional[str] = None, show_progress: bool = True, connections: int = DEFAULT_UPLOAD_CONNECTIONS, pipeline: bool = False, checksum: bool = False, auto_tune: bool = False) -> None:
     """Core function to handle dataset creation and upload to LEXIS.
 
+    Command-line wrapper around `UploadClient.upload` that reports the
+    outcome and exits with a non-zero status on failure.
+
     Args:
         title (str): Dataset title.
         path (str): Local path to upload (file or directory).
         access (str): Access level for the dataset.
         metadata (dict): Additional metadata specific to the dataset type.
+        summary_file (str, optional): Path of a JSON file receiving the transfer summary.
+        show_progress (bool): Render a live progress bar on stderr (only when it is a terminal).
+        connections (int): Size of the iRODS transfer connection pool.
+        pipeline (bool): Upload file by file through the async pipeline, `connections` files at a time.
+        checksum (bool): With `pipeline`, verify every uploaded file against the server-side sha256.
+        auto_tune (bool): Adapt the number of concurrent uploads (and hash requests) up to `connections`.
+            Simulations are then uploaded through the pipeline; other dataset types ignore it.
     """
 
 
     dataset_type = metadata.get('dataset_type', '')  # Default to 'generic' if not specified
-    print(f"--- Starting {dataset_type.capitalize()} Dataset Upload ---")
-    print(f"Processing dataset '{title}' from path '{path}'...")
-    print(f"Access level: {access}")
-
-    print("\nChecking for refresh token...")
-    try:
-        session = auth_manager.login()
-        if not session:
-             print("ERROR: Failed to obtain authentication session. Exiting.", file=sys.stderr)
-             sys.exit(1) # Exit if authentication fails
-
-    except Exception as auth_err:
-        print(f"ERROR: Authentication failed: {auth_err}", file=sys.stderr)
-        sys.exit(1) # Exit if authentication fails
-
-    print("Initializing LEXIS connection...")
-    try:
-        irods = iRODS(session=session, suppress_print=False, reraise_exceptions=True)
-        datasets = Datasets(session=session, suppress_print=False, reraise_exceptions=True)
-    except Exception as conn_err:
-        print(f"ERROR: Failed to initialize iRODS/Datasets connection: {conn_err}", file=sys.stderr)
-        sys.exit(1) # Exit if connection fails
-
-    dataset_id = None
-    try:
-        print("Creating dataset entry...")
-        metadata_filtered = {k: v for k, v in metadata.items() if v is not None}
-        dataset_id = create_lexis_dataset(irods, title, metadata_filtered) # Note: 'access' is not used by this func currently
-        if not dataset_id:
-            print("ERROR: Failed to create dataset entry. Dataset ID is missing.", file=sys.stderr)
-            sys.exit(1)
-
-        print(f"Created dataset entry with preliminary ID: '{dataset_id}'")
-
-        # Wait briefly for the dataset to become visible in iRODS before upload.
-        # This provides immediate feedback to the user and avoids starting
-        # uploads against a dataset that has not yet propagated.
-        print("Checking dataset visibility in iRODS before upload...")
-        pre_contents, pre_attempts = wait_for_dataset_contents(datasets, dataset_id)
-        if not pre_contents:
-            print(f"Note: dataset '{dataset_id}' appears empty after {pre_attempts} attempt(s); the uploader will still proceed but may retry internally.")
-
-        print("Uploading content to dataset...")
-
-        if dataset_type == "simulation":
-            upload_dataset_content(irods, datasets, path, dataset_id)
+    log_event(
+        "upload.begin",
+        f"--- Starting {dataset_type.capitalize()} Dataset Upload ---\n"
+        f"Processing dataset '{title}' from path '{path}'...\n"
+        f"Access level: {access}",
+        dataset_type=dataset_type, title=title, path=path, access=access
+    )
+
+    connection = open_lexis_connection(connections)
+    tuners = []
+    if auto_tune:
+        ignored = None
+        if dataset_type != "simulation":
+            ignored = "force field and experimental uploads send their files one at a time"
+        elif connections < 2:
+            ignored = "there is nothing to tune with --connections 1"
+        if ignored:
+            log_event("upload.auto_tune_ignored", f"WARNING: --auto-tune ignored: {ignored}.", logging.WARNING)
+            auto_tune = False
+        elif not pipeline:
+            # A new dataset is otherwise sent in one directory call, which leaves nothing to tune.
+            log_event("upload.auto_tune", "--auto-tune: uploading file by file through the pipeline so the number of concurrent transfers can adapt.")
+            pipeline = True
+
+    pipeline_config = None
+    if pipeline:
+        from ida4sims_cli.functions.upload_pipeline import PipelineConfig
+
+        pipeline_config = PipelineConfig(workers=connections, checksum=checksum)
+
+    if auto_tune:
+        if isinstance(connection.irods, UploadSession):
+            connection.irods.tuner = AIMDTuner(maximum=connections, name="uploads")
+            tuners.append(connection.irods.tuner)
         else:
-            # upload_dataset_as_files expects (irods, local_path, dataset_id, dataset_type, metadata)
-            upload_dataset_as_files(irods, path, dataset_id, dataset_type, metadata)
+            log_event("upload.auto_tune_ignored", "WARNING: --auto-tune does not apply to uploads through ida-agent.", logging.WARNING)
+        if checksum:
+            pipeline_config.hash_tuner = AIMDTuner(maximum=connections, name="hash requests")
+            tuners.append(pipeline_config.hash_tuner)
 
-        print("Verifying dataset content...")
+    client = UploadClient(connection, dataset_id_file=DATASET_ID_FILE_NAME)
+    with graceful_interrupts(), report_tuning(tuners):
         try:
-            verify_resp = datasets.get_content_of_dataset(dataset_id)
-            # If we couldn't fetch the response (None), or the response isn't a dict,
-            # or the 'contents' key is missing/empty, treat it as a verification failure.
-            if verify_resp is None or not isinstance(verify_resp, dict) or not verify_resp.get('contents'):
-                raise Exception("Dataset appears empty after upload. This may indicate a silent failure in the transfer process (e.g., network interruption).")
-        except Exception as verify_err:
-            print(f"ERROR: Upload verification failed: {verify_err}", file=sys.stderr)
-            raise verify_err # Re-raise to trigger the except block and skip deletion of dataset_id
-
-        print("Cleaning up temporary data...")
-        delete_saved_dataset_id() # Assumes this cleans up temp ID files
-
-        print("\n--- Success ---")
-        print(f"Dataset Type: {dataset_type.capitalize()}")
-        print(f"Dataset Title: '{title}'")
-        print(f"Dataset ID: {dataset_id}")
-        print(f"Source Path: '{path}'")
-        print("Content uploaded successfully.")
-
-    except Exception as e:
-        print(f"\n--- ERROR during Upload/Processing ---", file=sys.stderr)
-        if dataset_id:
-            print(f"Dataset entry '{dataset_id}' might have been created.", file=sys.stderr)
-        else:
-            print("Dataset entry creation might have failed.", file=sys.stderr)
-        print(f"Attempted to upload from: '{path}'", file=sys.stderr)
-        print(f"Error details: {e}", file=sys.stderr)
-        print("\nRecommendation: Check the LEXIS platform.", file=sys.stderr)
-        if dataset_id:
-             print(f"If dataset '{dataset_id}' exists, you may need to manually upload content or delete the dataset.", file=sys.stderr)
-        sys.exit(1) # Indicate failure
+            result = client.upload(path, title, metadata, summary_file=summary_file, show_progress=show_progress, report=True, pipeline=pipeline_config)
+        except (UploadInterrupted, KeyboardInterrupt) as e:
+            state = open_upload_state(path, title)
+            counts = state.status_counts()
+            log_event(
+                "upload.interrupted",
+                f"\n--- Upload interrupted ---\n"
+                f"{counts.get('done', 0)} file(s) uploaded, {counts.get('in_flight', 0)} in flight (will be uploaded again).\n"
+                "Run the same command again to resume.",
+                logging.WARNING, dataset_id=state.dataset_id, path=path, **counts,
+            )
+            sys.exit(e.exit_code if isinstance(e, UploadInterrupted) else 130)
+        except Ida4simsError as e:
+            dataset_id = getattr(e, "dataset_id", None)
+            message = "\n--- ERROR during Upload/Processing ---\n"
+            if dataset_id:
+                message += f"Dataset entry '{dataset_id}' might have been created.\n"
+            else:
+                message += "Dataset entry creation might have failed.\n"
+            message += f"Attempted to upload from: '{path}'\n"
+            message += f"Error details: {e}\n"
+            message += "\nRecommendation: Check the LEXIS platform."
+            if dataset_id:
+                 message += f"\nIf dataset '{dataset_id}' exists, you may need to manually upload content or delete the dataset."
+            log_event("upload.failed", message, logging.ERROR, dataset_id=dataset_id, path=path, error=str(e))
+            sys.exit(1) # Indicate failure
+
+    if result.dataset_id_from_file:
+        delete_saved_dataset_id() # The dataset_id.txt this upload continued
+
+    log_event(
+        "upload.success",
+        "\n--- Success ---\n"
+        f"Dataset Type: {dataset_type.capitalize()}\n"
+        f"Dataset Title: '{title}'\n"
+        f"Dataset ID: {result.dataset_id}\n"
+        f"Source Path: '{path}'\n"
+        "Content uploaded successfully.",
+        dataset_type=dataset_type, title=title, dataset_id=result.dataset_id, path=path
+    )
 
 # --- Click CLI Group ---
 @click.group()
@@ -158,6 +181,50 @@ def common_options(func):
     return func
 
 
+def transfer_options(func):
+    """Add options controlling progress display and the transfer summary."""
+    func = click.option(
+        '--summary-file',
+        type=click.Path(file_okay=True, dir_okay=False, writable=True),
+        required=False,
+        help='Write a JSON transfer summary (bytes, rates, per-file durations, slowest files) to this path.',
+    )(func)
+    func = click.option(
+        '--no-progress',
+        'no_progress',
+        is_flag=True,
+        default=False,
+        help='Disable the live progress bar.',
+    )(func)
+    func = click.option(
+        '--checksum',
+        is_flag=True,
+        default=False,
+        help='With --pipeline, hash files before upload and confirm each one against the server-side sha256.',
+    )(func)
+    func = click.option(
+        '--pipeline',
+        is_flag=True,
+        default=False,
+        help='Upload file by file through a scan/hash/upload/verify pipeline running --connections transfers at once.',
+    )(func)
+    func = click.option(
+        '--auto-tune',
+        'auto_tune',
+        is_flag=True,
+        default=False,
+        help='Adapt the number of concurrent uploads (and --checksum hash requests) to the link and server, up to --connections. Implies --pipeline for simulations.',
+    )(func)
+    func = click.option(
+        '--connections',
+        type=click.IntRange(min=1),
+        default=DEFAULT_UPLOAD_CONNECTIONS,
+        show_default=True,
+        help='Size of the iRODS transfer connection pool reused for all files of the run.',
+    )(func)
+    return func
+
+
 def creator_options(func):
     """Add common creator metadata CLI options.
 
@@ -195,12 +262,16 @@ def creator_options(func):
 @cli.command()
 @common_options
 @creator_options
+@transfer_options
+@profile_options
+@log_options
+@metrics_options("ida-upload-dataset")
 @click.option('--author-name', type=str, required=False, help='Name of the author of the simulation.')
 @click.option('--description', type=str, required=False, help='Description of the simulation.')
 @click.option('--stripping-mask', type=str, required=False, help='Stripping mask for the simulation (e.g., ":WAT;20-30").')
 @click.option('--restraint_file_path', type=str, required=False, help='Path to the restraint file (e.g., "restraints/restraint_file.txt").')
 
-def simulation(path, title, access, creator_person, creator_org, author_name, description, stripping_mask, restraint_file_path):
+def simulation(path, title, access, creator_person, creator_org, summary_file, no_progress, connections, pipeline, checksum, auto_tune, profile, profile_cpu, profile_memory, author_name, description, stripping_mask, restraint_file_path):
     """
     Uploads a SIMULATION dataset to LEXIS.
 
@@ -233,12 +304,17 @@ def simulation(path, title, access, creator_person, creator_org, author_name, de
     if creators:
         metadata['creators_json'] = json.dumps(creators)
 
-    upload_lexis_dataset(title, path, access, metadata)
+    with profiling_session(profile, "ida-upload-dataset simulation", cpu=profile_cpu, memory=profile_memory):
+        upload_lexis_dataset(title, path, access, metadata, summary_file=summary_file, show_progress=not no_progress, connections=connections, pipeline=pipeline, checksum=checksum, auto_tune=auto_tune)
 
 
 @cli.command()
 @common_options
 @creator_options
+@transfer_options
+@profile_options
+@log_options
+@metrics_options("ida-upload-dataset")
 @click.option('--ff-format', type=str, required=True, help='Type of the force field (e.g., GROMAX, CHARMM, AMBER).')
 @click.option('--ff-name', type=str, required=True, help='Name of the force field (e.g., "GROMAX 54A7").')
 @click.option('--molecule-type', type=str, required=True, help='Type of molecule (e.g., R or P or D or W).')
@@ -264,7 +340,7 @@ def simulation(path, title, access, creator_person, creator_org, author_name, de
     help='Display name, used when feature-state is "experimental".',
 )
 
-def forcefield(title, path, access, creator_person, creator_org, ff_format, ff_name, molecule_type, dat_file, library_file, leaprc_file, frcmod_file, fixcommand_file, data_publication_time, reference_article_doi, author_name, display_name):
+def forcefield(title, path, access, creator_person, creator_org, summary_file, no_progress, connections, pipeline, checksum, auto_tune, profile, profile_cpu, profile_memory, ff_format, ff_name, molecule_type, dat_file, library_file, leaprc_file, frcmod_file, fixcommand_file, data_publication_time, reference_article_doi, author_name, display_name):
     """Upload a FORCE FIELD dataset.
 
     TITLE: Dataset title (e.g., "Custom GROMAX force field for lipids").
@@ -296,12 +372,17 @@ def forcefield(title, path, access, creator_person, creator_org, ff_format, ff_n
     if creators:
         metadata['creators_json'] = json.dumps(creators)
 
-    upload_lexis_dataset(title, path, access, metadata)
+    with profiling_session(profile, "ida-upload-dataset forcefield", cpu=profile_cpu, memory=profile_memory):
+        upload_lexis_dataset(title, path, access, metadata, summary_file=summary_file, show_progress=not no_progress, connections=connections, pipeline=pipeline, checksum=checksum, auto_tune=auto_tune)
 
 
 @cli.command()
 @common_options
 @creator_options
+@transfer_options
+@profile_options
+@log_options
+@metrics_options("ida-upload-dataset")
 @click.option('--technique', type=str, required=True, help='Experimental technique used (e.g., NMR, XRD, Cryo-EM).')
 @click.option('--sample-description', type=str, help='Brief description of the sample.')
 @click.option('--data-publication-time', type=str, required=False, help='Publication timestamp of the data (e.g., "2024-06-01T12:00:00Z").')
@@ -311,7 +392,7 @@ def forcefield(title, path, access, creator_person, creator_org, ff_format, ff_n
 @click.option('--3j-coupling', '_3j_couplings', type=str, multiple=True, required=False, help='3J coupling-sugar, 3J coupling-backbone or one file with both.')
 @click.option('--noe', type=str, multiple=True, required=False, help='NOE, UNOE, AMBNOE file or one file with NOE, UNOE and AMBNOE or combination.')
 def experimental(
-    title, path, access, creator_person, creator_org, technique, sample_description, data_publication_time,
+    title, path, access, creator_person, creator_org, summary_file, no_progress, connections, pipeline, checksum, auto_tune, profile, profile_cpu, profile_memory, technique, sample_description, data_publication_time,
     reference_article_doi, author_name, temperature,
     _3j_couplings, noe
 ):
@@ -339,7 +420,8 @@ def experimental(
     # Remove None values if sample_description wasn't provided
     metadata = {k: v for k, v in metadata.items() if v is not None}
 
-    upload_lexis_dataset(title, path, access, metadata)
+    with profiling_session(profile, "ida-upload-dataset experimental", cpu=profile_cpu, memory=profile_memory):
+        upload_lexis_dataset(title, path, access, metadata, summary_file=summary_file, show_progress=not no_progress, connections=connections, pipeline=pipeline, checksum=checksum, auto_tune=auto_tune)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,32 @@
+import base64
+import json
+
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def isolated_cache_dir(tmp_path_factory, monkeypatch):
+    """Keep listing snapshots, dataset lists and the search index out of the real ~/.cache."""
+    monkeypatch.setenv("IDA4SIMS_CACHE_DIR", str(tmp_path_factory.mktemp("cache")))
+
+
+def make_jwt(exp, sub="user"):
+    """Return an unsigned JWT whose payload carries `exp` and `sub`."""
+    def encode(data):
+        return base64.urlsafe_b64encode(json.dumps(data).encode()).rstrip(b"=").decode()
+
+    return f"{encode({'alg': 'RS256'})}.{encode({'exp': exp, 'sub': sub})}.signature"
+
+
+@pytest.fixture
+def make_source(tmp_path):
+    """Build `tmp_path/<name>`: `md.in` (5 bytes) and `traj/md1.nc` .. `traj/md<frames>.nc` (100 bytes times i)."""
+    def make(name="sim_run", frames=1):
+        source = tmp_path / name
+        (source / "traj").mkdir(parents=True)
+        (source / "md.in").write_text("input")
+        for i in range(1, frames + 1):
+            (source / "traj" / f"md{i}.nc").write_bytes(b"x" * (100 * i))
+        return source
+
+    return make
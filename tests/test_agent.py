@@ -0,0 +1,176 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+
+import click
+import pytest
+
+from benchmarks.fakes import FakeDatasets, FakeIRODS
+from ida4sims_cli import agent as agent_module
+from ida4sims_cli.agent import AgentServer, AgentState
+from ida4sims_cli.functions.agent_client import AgentDatasets, AgentError, AgentIRODS, connect_agent
+from ida4sims_cli.functions.upload_session import UploadSession
+
+
+class FakeSession:
+    def __init__(self):
+        self.refreshes = 0
+
+    def get_access_token(self):
+        return f"token-{self.refreshes}"
+
+    def refresh_token(self):
+        self.refreshes += 1
+
+
+@pytest.fixture
+def agent(tmp_path):
+    irods = FakeIRODS()
+    datasets = FakeDatasets(irods)
+    state = AgentState(FakeSession(), irods, datasets, listing_ttl=60)
+    server = AgentServer(tmp_path / "agent.sock", state)
+    thread = threading.Thread(target=server.serve, daemon=True)
+    thread.start()
+    yield server, irods, datasets
+    server.shutdown()
+    thread.join(timeout=5)
+
+
+def test_socket_dir_open_to_other_users_is_refused(tmp_path):
+    shared = tmp_path / "shared"
+    shared.mkdir()
+    shared.chmod(0o755)
+    state = AgentState(FakeSession(), FakeIRODS(), FakeDatasets(FakeIRODS()), listing_ttl=60)
+
+    with pytest.raises(click.ClickException, match="mode 0700"):
+        AgentServer(shared / "agent.sock", state)
+    assert not (shared / "agent.sock").exists()
+
+
+def test_detached_agent_runs_in_its_own_session(tmp_path):
+    report = tmp_path / "daemon.txt"
+    probe = (
+        "import os, sys\n"
+        "from ida4sims_cli.agent import _daemonize\n"
+        "pid = _daemonize()\n"
+        "if pid is None:\n"
+        f"    with open({str(report) + '.tmp'!r}, 'w') as f:\n"
+        "        f.write(f'{os.getpid()} {os.getsid(0)} {os.getcwd()}')\n"
+        f"    os.rename({str(report) + '.tmp'!r}, {str(report)!r})\n"
+        "    os._exit(0)\n"
+        "print(pid)\n"
+    )
+    result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True, timeout=30)
+
+    deadline = time.monotonic() + 10
+    while not report.exists() and time.monotonic() < deadline:
+        time.sleep(0.05)
+    pid, sid, cwd = report.read_text().split()
+    assert pid == result.stdout.strip()
+    # Not a session leader (so it cannot reacquire a terminal), and not in ours.
+    assert int(sid) != int(pid) and int(sid) != os.getsid(0)
+    assert cwd == "/"
+
+
+def test_connect_agent_returns_none_without_agent(tmp_path):
+    assert connect_agent(tmp_path / "missing.sock") is None
+
+
+def test_listings_are_cached_and_invalidated_by_uploads(agent, tmp_path):
+    server, irods, datasets = agent
+    irods.seed("ds", {"data/a.txt": 3})
+    client = connect_agent(server.socket_path)
+    proxy = AgentDatasets(client)
+
+    first = proxy.get_content_of_dataset("ds")
+    assert proxy.get_content_of_dataset(dataset_id="ds") == first
+    assert datasets.listing_calls == 1
+
+    local_file = tmp_path / "b.txt"
+    local_file.write_bytes(b"hello")
+    AgentIRODS(client).put_data_object_to_dataset(local_filepath=str(local_file), dataset_filepath="data", dataset_id="ds")
+
+    names = [item["name"] for item in proxy.get_content_of_dataset("ds")["contents"][0]["contents"]]
+    assert sorted(names) == ["a.txt", "b.txt"]
+    assert datasets.listing_calls == 2
+    client.close()
+
+
+def test_session_without_refresh_method_is_rebuilt(monkeypatch):
+    class OfflineSession:
+        refresh_token = "offline-token"
+
+        def get_access_token(self):
+            return "stale"
+
+    # refreshed_session builds a new LexisSessionToken for sessions like this one.
+    rebuilt = FakeSession()
+    monkeypatch.setattr(agent_module, "refreshed_session", lambda session: rebuilt)
+    state = AgentState(OfflineSession(), FakeIRODS(), FakeDatasets(FakeIRODS()), listing_ttl=60)
+
+    assert state.access_token(force_refresh=True) == "token-0"
+    assert state.session is rebuilt
+
+
+def test_token_refresh_and_errors(agent):
+    server, _, _ = agent
+    client = connect_agent(server.socket_path)
+
+    # Opaque tokens have no readable expiry, so the agent refreshes them.
+    assert client.call("get_access_token") == "token-1"
+    assert client.call("refresh_access_token") == "token-2"
+    with pytest.raises(AgentError):
+        client.call("irods.delete_everything")
+    # connect_agent pings once before the calls above.
+    assert client.call("ping")["requests"] == 5
+    client.close()
+
+
+class GatedIRODS(FakeIRODS):
+    """Uploads wait until `release` is set, counting how many are running at once."""
+
+    def __init__(self):
+        super().__init__()
+        self.release = threading.Event()
+        self.running = 0
+        self.both_running = threading.Event()
+
+    def put_data_object_to_dataset(self, **kwargs):
+        with self._lock:
+            self.running += 1
+            if self.running == 2:
+                self.both_running.set()
+        self.release.wait(5)
+        super().put_data_object_to_dataset(**kwargs)
+
+
+def test_transfers_do_not_block_other_requests(tmp_path):
+    irods = GatedIRODS()
+    irods.seed("other", {"a.txt": 1})
+    state = AgentState(FakeSession(), UploadSession(lambda: irods, size=2), FakeDatasets(irods), listing_ttl=60)
+    server = AgentServer(tmp_path / "agent.sock", state)
+    threading.Thread(target=server.serve, daemon=True).start()
+    client = connect_agent(server.socket_path)
+    local_file = tmp_path / "big.nc"
+    local_file.write_bytes(b"x" * 10)
+
+    def upload(dataset_id):
+        AgentIRODS(client).put_data_object_to_dataset(local_filepath=str(local_file), dataset_filepath="", dataset_id=dataset_id)
+
+    uploads = [threading.Thread(target=upload, args=(ds,)) for ds in ("ds1", "ds2")]
+    for thread in uploads:
+        thread.start()
+    try:
+        # Two transfers run at once on the pool, and the same client still gets answers.
+        assert irods.both_running.wait(5)
+        assert client.call("get_access_token") == "token-1"
+        assert AgentDatasets(client).get_content_of_dataset("other")["contents"]
+    finally:
+        irods.release.set()
+        for thread in uploads:
+            thread.join(5)
+    assert set(irods.objects) >= {"ds1", "ds2"}
+    client.close()
+    server.shutdown()
@@ -0,0 +1,140 @@
+import base64
+import hashlib
+import threading
+
+import httpx
+import pytest
+
+from benchmarks.fakes import FakeDatasets, FakeIRODS, make_staging_transport
+from ida4sims_cli.api import LexisConnection, UploadClient, VerifyClient
+from ida4sims_cli.exceptions import DatasetCreationError, Ida4simsError, UploadError, VerificationError
+from ida4sims_cli.functions.upload_session import UploadSession
+from ida4sims_cli.functions.upload_state import UploadStateStore
+
+SIMULATION = {"dataset_type": "simulation"}
+
+
+def make_client(tmp_path, irods=None):
+    irods = irods or FakeIRODS()
+    connection = LexisConnection(UploadSession(lambda: irods, size=4), FakeDatasets(irods))
+    return UploadClient(connection, state_store=UploadStateStore(tmp_path / "state.sqlite")), irods
+
+
+def test_upload_returns_result(tmp_path, make_source):
+    client, irods = make_client(tmp_path)
+    source = make_source()
+
+    result = client.upload(str(source), "Run", SIMULATION)
+
+    assert set(irods.objects[result.dataset_id]) == {"sim_run/md.in", "sim_run/traj/md1.nc"}
+    assert result.summary["bytes_transferred"] == 105
+    assert not result.resumed
+    assert client.state_store.source(source, "Run").dataset_id is None
+
+
+def test_stray_dataset_id_file_is_ignored(tmp_path, make_source, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "dataset_id.txt").write_text("old-unrelated-dataset")
+    client, irods = make_client(tmp_path)
+
+    result = client.upload(str(make_source()), "Run", SIMULATION)
+
+    assert result.dataset_id != "old-unrelated-dataset"
+    assert "old-unrelated-dataset" not in irods.objects
+    assert (tmp_path / "dataset_id.txt").read_text() == "old-unrelated-dataset"
+
+
+def test_cli_removes_only_the_dataset_id_file_it_used(tmp_path, make_source, monkeypatch):
+    from ida4sims_cli import upload_dataset
+
+    monkeypatch.chdir(tmp_path)
+    irods = FakeIRODS()
+    irods.seed("ds-resumed", {"resumed/traj/md0.nc": 10})
+    irods.seed("legacy-id", {"sim_run/traj/md0.nc": 10})
+    monkeypatch.setattr(upload_dataset, "open_lexis_connection", lambda connections: LexisConnection(irods, FakeDatasets(irods)))
+    id_file = tmp_path / "dataset_id.txt"
+    id_file.write_text("legacy-id")
+    resumed = make_source("resumed")
+    upload_dataset.open_upload_state(str(resumed), "Resumed").set_dataset("ds-resumed")
+
+    # The ID comes from the resume state, so the file belongs to some other upload.
+    upload_dataset.upload_lexis_dataset("Resumed", str(resumed), "project", SIMULATION, show_progress=False)
+    assert "resumed/md.in" in irods.objects["ds-resumed"]
+    assert id_file.read_text() == "legacy-id"
+
+    upload_dataset.upload_lexis_dataset("Legacy", str(make_source()), "project", SIMULATION, show_progress=False)
+    assert "sim_run/md.in" in irods.objects["legacy-id"]
+    assert not id_file.exists()
+
+
+def test_concurrent_uploads_share_one_client(tmp_path, make_source):
+    client, irods = make_client(tmp_path)
+    sources = [make_source(f"rep{i}") for i in range(4)]
+    results = [None] * len(sources)
+
+    def run(i):
+        results[i] = client.upload(str(sources[i]), f"Replica {i}", SIMULATION)
+
+    threads = [threading.Thread(target=run, args=(i,)) for i in range(len(sources))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len({r.dataset_id for r in results}) == 4
+    assert client.connection.irods.stats()["connections_opened"] <= 4
+
+
+def test_failures_raise_typed_exceptions(tmp_path, make_source):
+    class NoCreate(FakeIRODS):
+        def create_dataset(self, **kwargs):
+            raise RuntimeError("quota exceeded")
+
+    client, _ = make_client(tmp_path, NoCreate())
+    with pytest.raises(DatasetCreationError, match="quota exceeded"):
+        client.upload(str(make_source()), "Run", SIMULATION)
+
+    class BrokenTransfer(FakeIRODS):
+        def upload_directory_to_dataset(self, **kwargs):
+            raise OSError("connection reset")
+
+    client, _ = make_client(tmp_path, BrokenTransfer())
+    with pytest.raises(UploadError) as excinfo:
+        client.upload(str(make_source("other")), "Other", SIMULATION)
+    assert excinfo.value.dataset_id is not None
+    assert not isinstance(excinfo.value, VerificationError)
+    # The failed upload keeps its dataset for the next attempt.
+    assert client.state_store.source(tmp_path / "other", "Other").dataset_id == excinfo.value.dataset_id
+
+
+def test_empty_upload_fails_verification(tmp_path):
+    client, _ = make_client(tmp_path)
+    (tmp_path / "empty").mkdir()
+    with pytest.raises(VerificationError) as excinfo:
+        client.upload(str(tmp_path / "empty"), "Empty", SIMULATION)
+    assert isinstance(excinfo.value, Ida4simsError)
+
+
+@pytest.mark.asyncio
+async def test_verify_reports_mismatched_and_missing_files(tmp_path):
+    irods = FakeIRODS()
+    irods.seed("ds", {"sim/md.in": 5, "sim/traj/md1.nc": 10, "sim/traj/md2.nc": 10})
+    local = tmp_path / "copy"
+    for path, size in {"sim/md.in": 5, "sim/traj/md1.nc": 10}.items():
+        (local / path).parent.mkdir(parents=True, exist_ok=True)
+        (local / path).write_bytes(FakeIRODS.content("ds", path, size))
+    (local / "sim/md.in").write_bytes(b"edit!")
+
+    def server_hash(path):
+        remote_path = path.strip("/")
+        data = FakeIRODS.content("ds", remote_path, irods.objects["ds"][remote_path])
+        return "sha2:" + base64.b64encode(hashlib.sha256(data).digest()).decode()
+
+    verifier = VerifyClient(LexisConnection(irods, FakeDatasets(irods), "token"), concurrency=2)
+    async with httpx.AsyncClient(transport=make_staging_transport(pending_polls=0, hash_for=server_hash)) as client:
+        result = await verifier.averify("ds", str(local), client=client, poll_interval=0)
+
+    assert result.matched == ["sim/traj/md1.nc"]
+    assert result.mismatched == ["sim/md.in"]
+    assert result.missing_locally == ["sim/traj/md2.nc"]
+    assert not result.ok
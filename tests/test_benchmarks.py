@@ -0,0 +1,30 @@
+import json
+
+from click.testing import CliRunner
+
+from benchmarks.run_benchmarks import cli, compare_with_baseline
+from ida4sims_cli.functions.event_log import configure_event_log
+
+
+def test_benchmarks_smoke(tmp_path):
+    output = tmp_path / "latest.json"
+    history = tmp_path / "history.jsonl"
+
+    result = CliRunner().invoke(cli, ["--sizes", "20", "--files-per-dir", "5", "--output", str(output), "--history", str(history)])
+    configure_event_log()
+
+    assert result.exit_code == 0, result.output
+    record = json.loads(output.read_text())
+    assert [r["benchmark"] for r in record["results"]] == ["scan", "sync_planning", "upload_scheduling", "hash_verification"]
+    assert {r["files"] for r in record["results"]} == {20}
+    upload = next(r for r in record["results"] if r["benchmark"] == "upload_scheduling")
+    assert upload["uploads"] == 10
+    assert len(history.read_text().splitlines()) == 1
+
+
+def test_compare_with_baseline_flags_regressions():
+    baseline = {"results": [{"benchmark": "scan", "files": 10, "files_per_s": 100.0}]}
+    record = {"results": [{"benchmark": "scan", "files": 10, "files_per_s": 70.0}]}
+
+    assert compare_with_baseline(record, baseline, 0.2) == ["scan (10 files): -30.0%"]
+    assert compare_with_baseline(record, baseline, 0.5) == []
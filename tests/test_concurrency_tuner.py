@@ -0,0 +1,165 @@
+import asyncio
+import threading
+
+import httpx
+import pytest
+
+from ida4sims_cli.functions.concurrency_tuner import AIMDTuner, Slot
+from ida4sims_cli.functions.download_dataset_content import RemoteFile, find_checksum_mismatches
+from ida4sims_cli.functions.upload_session import UploadSession
+from ida4sims_cli.get_dataset_hashes import fetch_hashes_for_dataset
+from benchmarks.fakes import FakeDatasets, FakeIRODS
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def run_round(tuner, clock, seconds, units=100):
+    """Finish one round of `tuner.limit` operations taking `seconds` in total."""
+    slots = [Slot(tuner._epoch, clock.now, units) for _ in range(max(2, tuner.limit))]
+    clock.now += seconds
+    for slot in slots:
+        tuner.record(slot)
+
+
+def test_limit_grows_while_throughput_rises_then_holds():
+    clock = Clock()
+    tuner = AIMDTuner(maximum=8, initial=2, clock=clock)
+    for _ in range(3):
+        run_round(tuner, clock, seconds=1.0)  # one more operation per second each round
+    assert tuner.limit == 5
+    run_round(tuner, clock, seconds=2.0)  # more operations, but fewer per second: no gain
+    assert tuner.limit == 5
+    assert tuner.report()["increases"] == 3
+
+
+def test_throttling_halves_the_limit_once_per_round():
+    clock = Clock()
+    tuner = AIMDTuner(maximum=16, initial=8, clock=clock)
+    in_flight = [Slot(tuner._epoch, clock.now) for _ in range(3)]
+    for slot in in_flight:
+        slot.throttled = True
+        tuner.record(slot)
+    assert tuner.limit == 4
+    assert tuner.throttled == 3 and tuner.decreases == 1
+
+    tuner.record(Slot(tuner._epoch, clock.now), ok=False)
+    assert tuner.limit == 2
+
+
+def test_latency_spike_backs_off():
+    clock = Clock()
+    tuner = AIMDTuner(maximum=16, initial=4, clock=clock)
+    run_round(tuner, clock, seconds=1.0)
+    assert tuner.limit == 5
+    run_round(tuner, clock, seconds=10.0)
+    assert tuner.limit == 2
+    assert tuner.latency_spikes == 1
+
+
+def test_upload_session_keeps_uploads_within_the_limit(tmp_path):
+    files = []
+    for i in range(12):
+        path = tmp_path / f"frame{i}.nc"
+        path.write_bytes(b"x" * 1000)
+        files.append(str(path))
+
+    active = []
+    peak = [0]
+
+    class Counting(FakeIRODS):
+        def put_data_object_to_dataset(self, **kwargs):
+            with self._lock:
+                active.append(1)
+                peak[0] = max(peak[0], len(active))
+            super().put_data_object_to_dataset(**kwargs)
+            with self._lock:
+                active.pop()
+
+    irods = Counting(latency=0.01)
+    tuner = AIMDTuner(maximum=4, name="uploads")
+    session = UploadSession(lambda: irods, size=4, tuner=tuner)
+    threads = [threading.Thread(target=session.put_data_object_to_dataset, kwargs={"local_filepath": f, "dataset_filepath": "", "dataset_id": "ds"}) for f in files]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert irods.put_calls == 12
+    assert peak[0] <= tuner.peak <= 4
+    assert session.stats()["tuner"]["name"] == "uploads"
+
+
+@pytest.mark.asyncio
+async def test_hash_requests_back_off_on_429():
+    in_flight = [0]
+
+    async def handler(request):
+        if request.url.path.endswith("/staging/hash"):
+            if in_flight[0] >= 2:
+                return httpx.Response(429)
+            in_flight[0] += 1
+            await asyncio.sleep(0.01)
+            in_flight[0] -= 1
+            return httpx.Response(202, json={"request_id": request.url.params["path"]})
+        path = request.url.path.rsplit("/", 1)[-1]
+        return httpx.Response(200, json={"status": "COMPLETED", "result": f"sha2:{path}"})
+
+    files = [RemoteFile(path=f"f{i}", size=1, sha256=f"sha2:f{i}") for i in range(20)]
+    tuner = AIMDTuner(maximum=6, initial=6, name="hash requests")
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        mismatched, unverified = await find_checksum_mismatches(files, "ds", "token", client=client, poll_interval=0, tuner=tuner)
+
+    assert tuner.throttled > 0
+    assert tuner.limit < 6
+    assert mismatched == []
+    assert len(unverified) == tuner.throttled
+
+
+@pytest.mark.asyncio
+async def test_dataset_hash_sweep_runs_requests_concurrently(monkeypatch):
+    irods = FakeIRODS()
+    irods.seed("ds", {f"sim/f{i}.nc": 1 for i in range(12)})
+    running = [0]
+    peak = [0]
+
+    async def fake_hash(dataset_id, path, token, **kwargs):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.01)
+        running[0] -= 1
+        return {"result": f"sha2:{path}", "status": "COMPLETED"}
+
+    monkeypatch.setattr("ida4sims_cli.get_dataset_hashes.get_irods_file_hash_via_poll_async", fake_hash)
+    await fetch_hashes_for_dataset(FakeDatasets(irods), "ds", "token", concurrency=3)
+    assert peak[0] == 3
+
+    peak[0] = 0
+    tuner = AIMDTuner(maximum=3, name="hash requests")
+    await fetch_hashes_for_dataset(FakeDatasets(irods), "ds", "token", tuner=tuner)
+    assert 1 < peak[0] <= 3
+    assert tuner.increases > 0
+
+
+def test_auto_tune_uploads_simulations_file_by_file(tmp_path, monkeypatch):
+    from ida4sims_cli import upload_dataset
+    from ida4sims_cli.api import LexisConnection
+
+    source = tmp_path / "sim"
+    source.mkdir()
+    for i in range(6):
+        (source / f"md{i}.nc").write_bytes(b"x" * 100)
+    irods = FakeIRODS()
+    session = UploadSession(lambda: irods, size=4)
+    monkeypatch.setattr(upload_dataset, "open_lexis_connection", lambda connections: LexisConnection(session, FakeDatasets(irods)))
+
+    upload_dataset.upload_lexis_dataset("Run", str(source), "project", {"dataset_type": "simulation"}, show_progress=False, connections=4, auto_tune=True)
+
+    # One put per file (instead of one directory call), each through a tuner slot.
+    assert irods.put_calls == 6
+    assert session.tuner is not None and session.tuner.report()["name"] == "uploads"
@@ -0,0 +1,60 @@
+import json
+
+from click.testing import CliRunner
+
+from benchmarks.fakes import build_listing
+from ida4sims_cli import get_dataset_content
+from ida4sims_cli.functions.dataset_tree import build_tree, iter_tree_lines, tree_to_dict
+
+LISTING = build_listing({
+    "sim/topology.prmtop": 100,
+    "sim/traj/frame_001.nc": 1000,
+    "sim/traj/frame_002.nc": 2000,
+    "README": 10,
+})
+
+
+def test_totals_are_aggregated_per_directory():
+    root = build_tree(LISTING)
+    assert (root.size, root.files) == (3110, 4)
+    sim = next(c for c in root.children if c.name == "sim")
+    assert (sim.size, sim.files) == (3100, 3)
+
+
+def test_depth_limit_and_size_sort():
+    lines = list(iter_tree_lines(build_tree(LISTING, name="ds"), max_depth=1, sort="size"))
+    assert lines == [
+        "ds  [3.0 KiB, 4 file(s)]",
+        "├── sim/  [3.0 KiB, 3 file(s)] …",
+        "└── README  (10 B)",
+    ]
+
+
+def test_max_entries_summarizes_the_rest():
+    listing = build_listing({f"traj/frame_{i:05d}.nc": 10 for i in range(1000)})
+    lines = list(iter_tree_lines(build_tree(listing), max_entries=3))
+    assert len(lines) == 6
+    assert lines[-1] == "    └── … 997 more (9.7 KiB, 997 file(s))"
+
+
+def test_deep_listing_does_not_recurse():
+    listing = [{"name": "leaf", "type": "file", "size": 1}]
+    for i in range(3000):
+        listing = [{"name": f"d{i}", "type": "directory", "contents": listing}]
+    root = build_tree(listing)
+    assert root.files == 1
+    assert sum(1 for _ in iter_tree_lines(root)) == 3002
+
+
+def test_json_output(monkeypatch):
+    class FakeDatasets:
+        def get_content_of_dataset(self, dataset_id, **kwargs):
+            return {"contents": LISTING}
+
+    monkeypatch.setattr(get_dataset_content, "open_datasets", FakeDatasets)
+    result = CliRunner().invoke(get_dataset_content.cli, ["ds", "--format", "json", "--max-depth", "1"])
+
+    assert result.exit_code == 0, result.output
+    data = json.loads(result.stdout)
+    assert data == tree_to_dict(build_tree(LISTING, name="ds"), max_depth=1)
+    assert data["contents"][0] == {"name": "sim", "type": "directory", "size": 3100, "files": 3}
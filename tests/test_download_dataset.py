@@ -0,0 +1,181 @@
+import base64
+import hashlib
+
+import httpx
+import pytest
+
+from benchmarks.fakes import FakeDatasets, FakeIRODS, make_staging_transport
+from ida4sims_cli import download_dataset
+from ida4sims_cli.functions.download_dataset_content import (
+    download_dataset_content,
+    filter_files,
+    find_checksum_mismatches,
+    flatten_listing,
+    local_target,
+)
+from ida4sims_cli.functions.hashing_utils import hash_poll_timeout
+from ida4sims_cli.functions.transfer_progress import TransferProgress
+from ida4sims_cli.download_dataset import SizeParamType, verify_and_refetch
+from ida4sims_cli.helpers.default_data import HASH_POLL_TIMEOUT
+
+FILES = {
+    "sim/topology.prmtop": 120,
+    "sim/traj/frame_001.nc": 300,
+    "sim/traj/frame_002.nc": 310,
+    "README": 5,
+}
+
+
+def make_dataset():
+    irods = FakeIRODS()
+    irods.seed("ds", FILES)
+    listing = FakeDatasets(irods).get_content_of_dataset("ds")["contents"]
+    return irods, flatten_listing(listing)
+
+
+def test_downloads_whole_tree_concurrently(tmp_path):
+    irods, files = make_dataset()
+    progress = TransferProgress(total_files=len(files), show_bar=False)
+
+    failed = download_dataset_content(irods, "ds", files, tmp_path, workers=3, progress=progress)
+
+    assert failed == []
+    for path, size in FILES.items():
+        assert (tmp_path / path).read_bytes() == FakeIRODS.content("ds", path, size)
+    assert progress.files_done == len(FILES)
+    assert not list(tmp_path.rglob("*.part"))
+
+
+def test_resume_skips_files_with_matching_size(tmp_path):
+    irods, files = make_dataset()
+    (tmp_path / "sim").mkdir()
+    (tmp_path / "sim" / "topology.prmtop").write_bytes(b"x" * 120)
+    (tmp_path / "README").write_bytes(b"bad")  # wrong size, fetched again
+    progress = TransferProgress(show_bar=False)
+
+    download_dataset_content(irods, "ds", files, tmp_path, workers=2, progress=progress)
+
+    assert irods.get_calls == 3
+    assert progress.files_skipped == 1
+    assert (tmp_path / "README").read_bytes() == FakeIRODS.content("ds", "README", 5)
+
+
+def test_failed_transfer_leaves_no_partial_file(tmp_path):
+    irods, files = make_dataset()
+    del irods.objects["ds"]["sim/traj/frame_002.nc"]
+
+    failed = download_dataset_content(irods, "ds", files, tmp_path, workers=2)
+
+    assert [f.path for f in failed] == ["sim/traj/frame_002.nc"]
+    assert not (tmp_path / "sim" / "traj" / "frame_002.nc").exists()
+    assert not list(tmp_path.rglob("*.part"))
+
+
+def test_unsafe_paths_are_rejected(tmp_path):
+    with pytest.raises(ValueError):
+        local_target(tmp_path, "../etc/passwd")
+
+
+def test_filters_select_subset():
+    files = flatten_listing([
+        {"name": "sim", "type": "directory", "contents": [
+            {"name": "topology.prmtop", "type": "file", "size": 10},
+            {"name": "traj", "type": "directory", "contents": [
+                {"name": f"frame_{i:03d}.nc", "type": "file", "size": 1000} for i in range(1, 31)
+            ]},
+        ]},
+        {"name": "big.tar", "type": "file", "size": 10 ** 9},
+    ])
+
+    selected = filter_files(files, include=["*.prmtop", "sim/traj/frame_*0.nc"])
+    assert [f.path for f in selected] == [
+        "sim/topology.prmtop", "sim/traj/frame_010.nc", "sim/traj/frame_020.nc", "sim/traj/frame_030.nc",
+    ]
+    assert [f.path for f in filter_files(files, exclude=["*.nc"], max_size=100)] == ["sim/topology.prmtop"]
+    assert [f.path for f in filter_files(files, max_depth=1)] == ["big.tar"]
+
+
+def test_size_option_parsing():
+    size = SizeParamType()
+    assert size.convert("500", None, None) == 500
+    assert size.convert("2K", None, None) == 2048
+    assert size.convert("1.5GiB", None, None) == int(1.5 * 1024 ** 3)
+
+
+class CorruptingIRODS(FakeIRODS):
+    """Flips a byte of the first download of `corrupt_path`."""
+
+    def __init__(self, corrupt_path):
+        super().__init__()
+        self.corrupt_path = corrupt_path
+
+    def download_data_object_from_dataset(self, dataset_id, dataset_filepath, local_filepath, **kwargs):
+        super().download_data_object_from_dataset(dataset_id, dataset_filepath, local_filepath, **kwargs)
+        if dataset_filepath == self.corrupt_path:
+            self.corrupt_path = None
+            with open(local_filepath, "r+b") as f:
+                f.write(b"!")
+
+
+def server_hash(path):
+    remote_path = path.strip("/")
+    data = FakeIRODS.content("ds", remote_path, FILES[remote_path])
+    return "sha2:" + base64.b64encode(hashlib.sha256(data).digest()).decode()
+
+
+@pytest.mark.asyncio
+async def test_checksum_mismatch_is_detected(tmp_path):
+    irods = CorruptingIRODS("sim/traj/frame_001.nc")
+    irods.seed("ds", FILES)
+    files = flatten_listing(FakeDatasets(irods).get_content_of_dataset("ds")["contents"])
+    download_dataset_content(irods, "ds", files, tmp_path, workers=2, checksum=True)
+
+    async with httpx.AsyncClient(transport=make_staging_transport(pending_polls=0, hash_for=server_hash)) as client:
+        mismatched, unverified = await find_checksum_mismatches(files, "ds", "token", client=client, poll_interval=0)
+
+    assert [f.path for f in mismatched] == ["sim/traj/frame_001.nc"]
+    assert unverified == []
+
+
+def test_mismatched_file_is_downloaded_again(tmp_path, monkeypatch):
+    irods = CorruptingIRODS("README")
+    irods.seed("ds", FILES)
+    files = flatten_listing(FakeDatasets(irods).get_content_of_dataset("ds")["contents"])
+    client = httpx.AsyncClient(transport=make_staging_transport(pending_polls=0, hash_for=server_hash))
+
+    async def find_with_fake_staging(files, dataset_id, lexis_token, concurrency=4, tuner=None):
+        return await find_checksum_mismatches(files, dataset_id, lexis_token, concurrency, client=client, poll_interval=0, tuner=tuner)
+
+    monkeypatch.setattr(download_dataset, "find_checksum_mismatches", find_with_fake_staging)
+    download_dataset_content(irods, "ds", files, tmp_path, workers=2, checksum=True)
+
+    failed = verify_and_refetch(irods, "ds", files, tmp_path, "token", workers=2, retries=1)
+
+    assert failed == []
+    assert irods.get_calls == len(FILES) + 1
+    assert (tmp_path / "README").read_bytes() == FakeIRODS.content("ds", "README", 5)
+
+
+def test_file_whose_hash_times_out_is_kept(tmp_path, monkeypatch):
+    irods = FakeIRODS()
+    irods.seed("ds", FILES)
+    files = flatten_listing(FakeDatasets(irods).get_content_of_dataset("ds")["contents"])
+    # The server is still hashing when the poll gives up.
+    client = httpx.AsyncClient(transport=make_staging_transport(pending_polls=10**6, hash_for=server_hash))
+
+    async def find_with_slow_staging(files, dataset_id, lexis_token, concurrency=4, tuner=None):
+        return await find_checksum_mismatches(files, dataset_id, lexis_token, concurrency, client=client, poll_interval=0.01, poll_timeout=0.05, tuner=tuner)
+
+    monkeypatch.setattr(download_dataset, "find_checksum_mismatches", find_with_slow_staging)
+    download_dataset_content(irods, "ds", files, tmp_path, workers=2, checksum=True)
+
+    failed = verify_and_refetch(irods, "ds", files, tmp_path, "token", workers=2, retries=1)
+
+    assert failed == []
+    assert irods.get_calls == len(FILES)
+    assert all((tmp_path / path).is_file() for path in FILES)
+
+
+def test_hash_poll_timeout_grows_with_file_size():
+    assert hash_poll_timeout(0) == HASH_POLL_TIMEOUT
+    assert hash_poll_timeout(200 * 1024 ** 3) > 30 * 60
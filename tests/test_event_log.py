@@ -0,0 +1,69 @@
+import json
+import logging
+import subprocess
+import sys
+
+from ida4sims_cli.functions.event_log import (
+    configure_event_log,
+    flush_item_events,
+    log_event,
+    log_item_event,
+)
+
+
+def read_events(path):
+    return [json.loads(line) for line in path.read_text().splitlines()]
+
+
+def test_events_are_written_as_jsonl(tmp_path, capsys):
+    log_file = tmp_path / "events.jsonl"
+    configure_event_log(log_file=str(log_file))
+
+    log_event("upload.begin", "Starting upload", dataset_id="abc", files=3)
+    log_event("upload.failed", "ERROR: boom", logging.ERROR, error="boom")
+    log_event("debug.detail", "hidden", logging.DEBUG)
+
+    captured = capsys.readouterr()
+    assert "Starting upload" in captured.out
+    assert "ERROR: boom" in captured.err
+    assert "hidden" not in captured.out
+
+    events = read_events(log_file)
+    assert [e["event"] for e in events] == ["upload.begin", "upload.failed"]
+    assert events[0]["dataset_id"] == "abc"
+    assert events[0]["files"] == 3
+    assert events[1]["level"] == "ERROR"
+    configure_event_log()
+
+
+def test_quiet_mode_aggregates_item_events(tmp_path, capsys):
+    log_file = tmp_path / "events.jsonl"
+    configure_event_log(log_file=str(log_file), quiet=True, progress_interval=3600)
+
+    for i in range(100):
+        log_item_event("upload.file_done", f"uploaded {i}")
+    log_item_event("sync.mismatch", "size differs", logging.WARNING)
+    flush_item_events()
+
+    captured = capsys.readouterr()
+    assert "uploaded 5" not in captured.out
+    assert "size differs" in captured.out
+
+    events = read_events(log_file)
+    assert events[-1]["event"] == "progress.final"
+    assert events[-1]["totals"] == {"upload.file_done": 100}
+    configure_event_log()
+
+
+def test_library_use_leaves_output_to_the_application():
+    # Fresh interpreter: the tests above configure the CLI handlers.
+    probe = """
+import logging, sys
+from ida4sims_cli.functions.event_log import log_event
+log_event("upload.retry", "WARNING: not printed without a logging setup", logging.WARNING)
+logging.basicConfig(stream=sys.stdout, format="app: %(message)s", level=logging.INFO)
+log_event("upload.begin", "routed by the application")
+"""
+    result = subprocess.run([sys.executable, "-c", probe], capture_output=True, text=True, check=True)
+    assert result.stdout == "app: routed by the application\n"
+    assert result.stderr == ""
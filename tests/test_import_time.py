@@ -0,0 +1,42 @@
+import json
+import os
+import subprocess
+import sys
+
+HEAVY_MODULES = ["py4lexis", "keyring", "httpx", "asyncio", "http.server"]
+HELP_BUDGET_S = 1.0
+
+# Imports every entry point and prints which heavy modules got loaded and how
+# long `ida-upload-dataset --help` took in a fresh interpreter.
+PROBE = """
+import json, os, sys, time
+environ = dict(os.environ)
+start = time.perf_counter()
+from ida4sims_cli.upload_dataset import cli
+try:
+    cli(["--help"])
+except SystemExit:
+    pass
+elapsed = time.perf_counter() - start
+import ida4sims_cli.get_dataset_hashes, ida4sims_cli.logout, ida4sims_cli.get_all_datasets, ida4sims_cli.get_dataset_content, ida4sims_cli.download_dataset, ida4sims_cli.mirror_dataset, ida4sims_cli.search_datasets, ida4sims_cli.upload_batch, ida4sims_cli.agent, ida4sims_cli.api
+print(json.dumps({"elapsed": elapsed, "loaded": [m for m in %r if m in sys.modules], "environ_changed": dict(os.environ) != environ}))
+""" % (HEAVY_MODULES,)
+
+
+def run_probe():
+    env = {k: v for k, v in os.environ.items() if k != "PY4LEXIS_RERAISE_EXCEPTIONS"}
+    result = subprocess.run([sys.executable, "-c", PROBE], capture_output=True, text=True, check=True, env=env)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def test_entry_points_do_not_import_heavy_modules():
+    assert run_probe()["loaded"] == []
+
+
+def test_entry_points_leave_the_environment_alone():
+    assert run_probe()["environ_changed"] is False
+
+
+def test_upload_help_is_fast():
+    elapsed = min(run_probe()["elapsed"] for _ in range(3))
+    assert elapsed < HELP_BUDGET_S, f"ida-upload-dataset --help took {elapsed:.3f}s"
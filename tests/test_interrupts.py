@@ -0,0 +1,155 @@
+import os
+import signal
+import threading
+
+import pytest
+
+from benchmarks.fakes import FakeDatasets, FakeIRODS
+from ida4sims_cli import upload_batch
+from ida4sims_cli.functions.batch_manifest import read_manifest
+from ida4sims_cli.functions.batch_state import BatchState
+from ida4sims_cli.functions.interrupts import UploadInterrupted, graceful_interrupts, request_stop, stop_requested
+from ida4sims_cli.functions.put_file_to_dataset import put_file_to_dataset
+from ida4sims_cli.functions.transfer_scheduler import TransferJob, run_transfers
+from ida4sims_cli.functions.upload_dataset_content import upload_dataset_content
+from ida4sims_cli.functions.upload_session import UploadSession
+from ida4sims_cli.functions.upload_state import UploadStateStore
+
+
+def test_sigterm_becomes_a_stop_request():
+    previous = signal.getsignal(signal.SIGTERM)
+    with graceful_interrupts():
+        os.kill(os.getpid(), signal.SIGTERM)
+        assert stop_requested()
+        with pytest.raises(UploadInterrupted) as excinfo:
+            put_file_to_dataset(FakeIRODS(), __file__, "", "ds")
+        assert excinfo.value.exit_code == 143
+    assert not stop_requested()
+    assert signal.getsignal(signal.SIGTERM) is previous
+
+
+def test_transfer_in_flight_finishes_and_resume_continues(tmp_path, make_source):
+    source = make_source(frames=3)
+    state = UploadStateStore(tmp_path / "state.sqlite").source(source, "Run")
+    state.set_dataset("ds")
+    state.record_file(str(source / "traj" / "md1.nc"), "done")
+
+    class SignalDuringTransfer(FakeIRODS):
+        def put_data_object_to_dataset(self, **kwargs):
+            request_stop(signal.SIGINT)  # arrives while this file is being sent
+            super().put_data_object_to_dataset(**kwargs)
+
+    irods = SignalDuringTransfer()
+    irods.objects["ds"] = {}
+    with graceful_interrupts(), pytest.raises(UploadInterrupted):
+        upload_dataset_content(irods, FakeDatasets(irods), str(source), "ds", state=state)
+
+    assert irods.put_calls == 1
+    assert state.status_counts() == {"done": 2}
+
+    resumed = FakeIRODS()
+    resumed.objects["ds"] = {}
+    datasets = FakeDatasets(resumed)
+    with graceful_interrupts():
+        upload_dataset_content(resumed, datasets, str(source), "ds", state=state)
+    assert datasets.listing_calls == 0
+    uploaded_before = {"sim_run/traj/md1.nc"} | set(irods.objects["ds"])
+    assert len(uploaded_before) == 2
+    assert set(resumed.objects["ds"]) == {"sim_run/md.in", "sim_run/traj/md2.nc", "sim_run/traj/md3.nc"} - uploaded_before
+
+
+def test_killed_transfer_stays_in_flight(tmp_path, make_source):
+    source = make_source()
+    state = UploadStateStore(tmp_path / "state.sqlite").source(source, "Run")
+
+    class Killed(FakeIRODS):
+        def put_data_object_to_dataset(self, **kwargs):
+            raise KeyboardInterrupt  # second Ctrl-C in the middle of the transfer
+
+    with pytest.raises(KeyboardInterrupt):
+        put_file_to_dataset(Killed(), str(source / "traj" / "md1.nc"), "sim_run/traj", "ds", state=state)
+    assert state.status_counts() == {"in_flight": 1}
+    assert not state.is_done(str(source / "traj" / "md1.nc"))
+
+
+def test_batch_starts_nothing_new_after_a_stop(tmp_path):
+    for i in range(4):
+        (tmp_path / f"rep{i}").mkdir()
+        (tmp_path / f"rep{i}" / "md.out").write_text("out")
+    manifest = tmp_path / "campaign.csv"
+    manifest.write_text("path,title,type\n" + "".join(f"rep{i},Replica {i},simulation\n" for i in range(4)))
+
+    class StopAfterFirst(FakeIRODS):
+        def upload_directory_to_dataset(self, **kwargs):
+            super().upload_directory_to_dataset(**kwargs)
+            request_stop(signal.SIGTERM)
+
+    irods = StopAfterFirst()
+    state = BatchState(str(tmp_path / "state.json"))
+    with graceful_interrupts():
+        results = upload_batch.run_batch(
+            UploadSession(lambda: irods, size=2), FakeDatasets(irods), read_manifest(str(manifest)), state,
+            create_workers=1, max_transfers=1,
+        )
+
+    statuses = [r["status"] for r in results]
+    assert statuses.count("uploaded") == 1
+    assert statuses.count("interrupted") == 3
+    assert [state.get(e.key).get("status") for e in read_manifest(str(manifest))].count("interrupted") == 3
+
+
+def test_stop_requests_are_scoped_to_their_block():
+    stopped = threading.Event()
+    second_done = threading.Event()
+    seen = {}
+
+    def first():
+        with graceful_interrupts():
+            request_stop(signal.SIGTERM)
+            stopped.set()
+            second_done.wait(5)
+            seen["first"] = stop_requested()
+
+    def second():
+        stopped.wait(5)
+        with graceful_interrupts():
+            seen["second"] = stop_requested()
+        second_done.set()
+
+    threads = [threading.Thread(target=first), threading.Thread(target=second)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+    # The second upload neither inherited the stop nor cleared it when it ended.
+    assert seen == {"first": True, "second": False}
+
+
+def test_transfer_lanes_follow_the_scope_of_their_upload(make_source):
+    source = make_source(frames=6)
+    jobs = [TransferJob(str(path), "sim_run/traj", path.stat().st_size) for path in sorted((source / "traj").iterdir())]
+
+    class StopOnFirstPut(FakeIRODS):
+        def put_data_object_to_dataset(self, **kwargs):
+            request_stop(signal.SIGINT)
+            super().put_data_object_to_dataset(**kwargs)
+
+    other_running = threading.Event()
+    release_other = threading.Event()
+
+    def other_upload():
+        with graceful_interrupts():
+            other_running.set()
+            release_other.wait(5)
+
+    other = threading.Thread(target=other_upload)
+    other.start()
+    other_running.wait(5)
+    irods = StopOnFirstPut()
+    try:
+        with graceful_interrupts(), pytest.raises(UploadInterrupted):
+            run_transfers(UploadSession(lambda: irods, size=2), jobs, "ds", lanes=2)
+    finally:
+        release_other.set()
+        other.join(5)
+    assert irods.put_calls < len(jobs)
@@ -0,0 +1,83 @@
+import json
+
+from click.testing import CliRunner
+
+from ida4sims_cli import get_all_datasets
+from ida4sims_cli.functions.list_datasets import (
+    dataset_summary,
+    fetch_all_datasets,
+    filter_datasets,
+    format_datasets,
+    paginate,
+)
+
+RECORDS = [
+    {
+        "location": {"internalID": "id-1", "project": "exa4mind_wp4", "access": "project"},
+        "metadata": {"title": "ff19SB parameters", "dataset_type": "forcefield", "creator": "alice"},
+    },
+    {
+        "location": {"internalID": "id-2", "project": "exa4mind_wp4", "access": "project"},
+        "metadata": {"title": "DNA run 5", "additional_metadata": {"dataset_type": "simulation", "molecule": "DNA"}},
+    },
+    {"dataset_id": "id-3", "title": "RNA run 1", "dataset_type": "simulation", "metadata": {"molecule": "RNA"}},
+]
+
+
+class FakeDatasets:
+    def __init__(self):
+        self.calls = 0
+
+    def get_all_datasets(self, **kwargs):
+        self.calls += 1
+        return RECORDS
+
+
+def test_summary_handles_flat_and_nested_records():
+    summaries = [dataset_summary(r) for r in RECORDS]
+    assert [s["dataset_id"] for s in summaries] == ["id-1", "id-2", "id-3"]
+    assert [s["dataset_type"] for s in summaries] == ["forcefield", "simulation", "simulation"]
+    assert summaries[1]["metadata"]["molecule"] == "DNA"
+
+
+def test_filters_and_pages():
+    summaries = [dataset_summary(r) for r in RECORDS]
+    assert [s["dataset_id"] for s in filter_datasets(summaries, dataset_type="Simulation")] == ["id-2", "id-3"]
+    assert [s["dataset_id"] for s in filter_datasets(summaries, metadata=[("molecule", "rna")])] == ["id-3"]
+    assert [s["dataset_id"] for s in filter_datasets(summaries, title="*run*")] == ["id-2", "id-3"]
+    assert paginate(summaries, page=2, page_size=2) == summaries[2:]
+    assert paginate(summaries, page=1, page_size=0) == summaries
+
+
+def test_listing_is_cached(tmp_path, monkeypatch):
+    monkeypatch.setenv("IDA4SIMS_CACHE_DIR", str(tmp_path))
+    datasets = FakeDatasets()
+
+    first = fetch_all_datasets(datasets, "p", "project", cache_ttl=60)
+    second = fetch_all_datasets(datasets, "p", "project", cache_ttl=60)
+    fetch_all_datasets(datasets, "p", "project", cache_ttl=60, refresh=True)
+
+    assert first == second
+    assert datasets.calls == 2
+
+
+def test_csv_output():
+    text = format_datasets([dataset_summary(RECORDS[0])], "csv")
+    assert text.splitlines() == [
+        "dataset_id,title,dataset_type,project,access,created",
+        "id-1,ff19SB parameters,forcefield,exa4mind_wp4,project,",
+    ]
+
+
+def test_json_output_is_clean(tmp_path, monkeypatch):
+    monkeypatch.setenv("IDA4SIMS_CACHE_DIR", str(tmp_path))
+
+    def open_datasets():
+        print("--- Attempting LEXIS Login/Session Creation ---")
+        return FakeDatasets()
+
+    monkeypatch.setattr(get_all_datasets, "open_datasets", open_datasets)
+    result = CliRunner().invoke(get_all_datasets.cli, ["--format", "json", "--type", "simulation"])
+
+    assert result.exit_code == 0, result.output
+    assert [d["dataset_id"] for d in json.loads(result.stdout)] == ["id-2", "id-3"]
@@ -0,0 +1,49 @@
+from ida4sims_cli.functions.listing_cache import CachedListingDatasets, invalidate_listing_snapshot, listing_fingerprint
+
+LISTING = {"contents": [
+    {"name": "sim", "type": "directory", "contents": [
+        {"name": "a.nc", "type": "file", "size": 10, "modified": "2026-01-02T10:00:00"},
+        {"name": "b.nc", "type": "file", "size": 20, "modified": "2026-03-01T08:00:00"},
+    ]},
+    {"name": "README", "type": "file", "size": 5},
+]}
+
+
+class CountingDatasets:
+    def __init__(self, listing):
+        self.listing = listing
+        self.calls = 0
+
+    def get_content_of_dataset(self, dataset_id, **kwargs):
+        self.calls += 1
+        return self.listing
+
+
+def test_fingerprint():
+    assert listing_fingerprint(LISTING["contents"]) == {"files": 3, "total_size": 35, "latest_modified": "2026-03-01T08:00:00"}
+
+
+def test_snapshot_is_reused_across_instances():
+    backend = CountingDatasets(LISTING)
+
+    assert CachedListingDatasets(backend).get_content_of_dataset("ds") == LISTING
+    assert CachedListingDatasets(backend).get_content_of_dataset(dataset_id="ds") == LISTING
+    assert backend.calls == 1
+
+    CachedListingDatasets(backend, refresh=True).get_content_of_dataset("ds")
+    assert backend.calls == 2
+
+
+def test_expired_invalidated_and_missing_listings_are_fetched():
+    backend = CountingDatasets(LISTING)
+    CachedListingDatasets(backend).get_content_of_dataset("ds")
+
+    CachedListingDatasets(backend, ttl=0).get_content_of_dataset("ds")
+    invalidate_listing_snapshot("ds")
+    CachedListingDatasets(backend).get_content_of_dataset("ds")
+    assert backend.calls == 3
+
+    missing = CountingDatasets(None)
+    CachedListingDatasets(missing).get_content_of_dataset("new")
+    CachedListingDatasets(missing).get_content_of_dataset("new")
+    assert missing.calls == 2
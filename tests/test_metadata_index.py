@@ -0,0 +1,61 @@
+import json
+
+from click.testing import CliRunner
+
+from ida4sims_cli import search_datasets
+from ida4sims_cli.functions.metadata_index import open_index, search_index, update_index
+
+
+def summary(dataset_id, title, dataset_type, **metadata):
+    return {
+        "dataset_id": dataset_id, "title": title, "dataset_type": dataset_type,
+        "project": "p", "access": "project", "created": None, "metadata": metadata,
+    }
+
+
+SUMMARIES = [
+    summary("ff-1", "OL3 RNA force field", "forcefield", ff_name="OL3", ff_format="AMBER", molecule_type="R", author_name="Jane Doe"),
+    summary("ff-2", "ff19SB", "forcefield", ff_name="ff19SB", ff_format="AMBER", molecule_type="P"),
+    summary("sim-1", "DNA run 5", "simulation", stripping_mask=":WAT;20-30", description="Equilibration phase"),
+]
+
+
+def test_search_by_words_and_fields(tmp_path):
+    conn = open_index(tmp_path / "index.sqlite")
+    assert update_index(conn, SUMMARIES, project="p", access="project") == (3, 0, 0)
+
+    assert [r["dataset_id"] for r in search_index(conn, "amber", metadata=[("molecule_type", "r")])] == ["ff-1"]
+    assert [r["dataset_id"] for r in search_index(conn, "stripping_mask :WAT")] == ["sim-1"]
+    assert [r["dataset_id"] for r in search_index(conn, "equilib")] == ["sim-1"]
+    assert {r["dataset_id"] for r in search_index(conn, dataset_type="forcefield")} == {"ff-1", "ff-2"}
+    assert search_index(conn, "title:ff19* NOT rna", raw=True)[0]["metadata"]["ff_format"] == "AMBER"
+
+
+def test_refresh_is_incremental(tmp_path):
+    conn = open_index(tmp_path / "index.sqlite")
+    update_index(conn, SUMMARIES, project="p", access="project")
+
+    changed = [SUMMARIES[0], summary("ff-2", "ff19SB", "forcefield", ff_name="ff19SB", ff_format="GROMACS")]
+    assert update_index(conn, changed, project="p", access="project") == (0, 1, 1)
+
+    assert search_index(conn, "gromacs")[0]["dataset_id"] == "ff-2"
+    assert search_index(conn, "equilibration") == []
+
+
+def test_search_command_builds_index_on_first_use(tmp_path, monkeypatch):
+    monkeypatch.setenv("IDA4SIMS_CACHE_DIR", str(tmp_path))
+
+    class FakeDatasets:
+        def get_all_datasets(self, **kwargs):
+            return [{"dataset_id": s["dataset_id"], "title": s["title"], "dataset_type": s["dataset_type"], "metadata": s["metadata"]} for s in SUMMARIES]
+
+    monkeypatch.setattr(search_datasets, "open_datasets", FakeDatasets)
+    runner = CliRunner()
+
+    result = runner.invoke(search_datasets.cli, ["amber", "--format", "json"])
+    assert result.exit_code == 0, result.output
+    assert {d["dataset_id"] for d in json.loads(result.stdout)} == {"ff-1", "ff-2"}
+
+    monkeypatch.setattr(search_datasets, "open_datasets", lambda: None)  # no API access needed any more
+    result = runner.invoke(search_datasets.cli, ["Jane", "--format", "csv"])
+    assert result.stdout.splitlines()[1].startswith("ff-1,")
@@ -0,0 +1,78 @@
+import urllib.request
+
+import click
+from click.testing import CliRunner
+
+from ida4sims_cli.functions.metrics import (
+    Counter,
+    Histogram,
+    Registry,
+    metrics_options,
+    start_metrics_server,
+    write_textfile,
+)
+
+
+def make_registry():
+    registry = Registry()
+    counter = registry.register(Counter("test_files_total", "Files.", ["result"]))
+    histogram = registry.register(Histogram("test_latency_seconds", "Latency.", buckets=(0.1, 1.0)))
+    return registry, counter, histogram
+
+
+def test_render_text_format():
+    registry, counter, histogram = make_registry()
+    counter.inc(result="uploaded")
+    counter.inc(2, result="skipped")
+    histogram.observe(0.05)
+    histogram.observe(0.5)
+    histogram.observe(5)
+
+    text = registry.render()
+    assert "# TYPE test_files_total counter" in text
+    assert 'test_files_total{result="uploaded"} 1' in text
+    assert 'test_files_total{result="skipped"} 2' in text
+    assert 'test_latency_seconds_bucket{le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{le="1"} 2' in text
+    assert 'test_latency_seconds_bucket{le="+Inf"} 3' in text
+    assert "test_latency_seconds_count 3" in text
+    assert "test_latency_seconds_sum 5.55" in text
+
+
+def test_write_textfile(tmp_path):
+    registry, counter, _ = make_registry()
+    counter.inc(result="failed")
+    path = tmp_path / "ida4sims.prom"
+
+    write_textfile(str(path), registry)
+
+    assert 'test_files_total{result="failed"} 1' in path.read_text()
+    assert [p.name for p in tmp_path.iterdir()] == ["ida4sims.prom"]
+
+
+def test_metrics_server():
+    registry, counter, _ = make_registry()
+    counter.inc(result="uploaded")
+    server = start_metrics_server(0, registry=registry)
+    try:
+        port = server.server_address[1]
+        body = urllib.request.urlopen(f"http://127.0.0.1:{port}/metrics").read().decode()
+    finally:
+        server.shutdown()
+        server.server_close()
+    assert 'test_files_total{result="uploaded"} 1' in body
+
+
+def test_metrics_options_records_run(tmp_path):
+    @click.command()
+    @metrics_options("test-command")
+    def command():
+        raise SystemExit(1)
+
+    path = tmp_path / "run.prom"
+    result = CliRunner().invoke(command, ["--metrics-file", str(path)])
+
+    assert result.exit_code == 1
+    text = path.read_text()
+    assert 'ida4sims_run_success{command="test-command"} 0' in text
+    assert 'ida4sims_run_duration_seconds{command="test-command"}' in text
@@ -0,0 +1,88 @@
+import json
+import os
+
+from benchmarks.fakes import FakeDatasets, FakeIRODS
+from ida4sims_cli import mirror_dataset
+from ida4sims_cli.functions.diff_directory_contents import diff_directory_contents
+from ida4sims_cli.helpers.default_data import MIRROR_SNAPSHOT_NAME
+
+FILES = {
+    "sim/topology.prmtop": 120,
+    "sim/traj/frame_001.nc": 300,
+    "README": 5,
+}
+
+
+def test_diff_is_flat_and_file_level():
+    dataset = [
+        {"name": "a.txt", "type": "file", "size": 1},
+        {"name": "sub", "type": "directory", "contents": [
+            {"name": "b.txt", "type": "file", "size": 2},
+            {"name": "c.txt", "type": "file", "size": 3},
+        ]},
+        {"name": "new", "type": "directory", "contents": [{"name": "d.txt", "type": "file", "size": 4}]},
+    ]
+    local = [
+        {"name": "a.txt", "type": "file", "size": 1},
+        {"name": "sub", "type": "directory", "contents": [
+            {"name": "b.txt", "type": "file", "size": 20},
+            {"name": "old.txt", "type": "file", "size": 5},
+        ]},
+    ]
+
+    diffs = diff_directory_contents(dataset, local)
+
+    assert sorted(d["path"] for d in diffs["missing_locally"]) == ["new/d.txt", "sub/c.txt"]
+    assert [d["path"] for d in diffs["mismatches"]] == ["sub/b.txt"]
+    assert [d["path"] for d in diffs["extra_locally"]] == ["sub/old.txt"]
+
+
+def run_mirror(monkeypatch, irods, dest, **kwargs):
+    monkeypatch.setattr(mirror_dataset, "open_download_connection", lambda workers: (irods, FakeDatasets(irods), "token"))
+    return mirror_dataset.mirror_lexis_dataset("ds", dest, workers=2, verify=False, show_progress=False, **kwargs)
+
+
+def test_mirror_is_incremental(tmp_path, monkeypatch):
+    irods = FakeIRODS()
+    irods.seed("ds", FILES)
+
+    assert run_mirror(monkeypatch, irods, tmp_path)
+    assert irods.get_calls == len(FILES)
+    snapshot = json.loads((tmp_path / MIRROR_SNAPSHOT_NAME).read_text())
+    assert snapshot["dataset_id"] == "ds" and set(snapshot["files"]) == set(FILES)
+
+    assert run_mirror(monkeypatch, irods, tmp_path)
+    assert irods.get_calls == len(FILES)  # nothing changed, nothing fetched
+
+
+def test_mirror_fetches_changes_and_deletes_extras(tmp_path, monkeypatch):
+    irods = FakeIRODS()
+    irods.seed("ds", FILES)
+    assert run_mirror(monkeypatch, irods, tmp_path)
+
+    irods.seed("ds", {"sim/traj/frame_002.nc": 310, "README": 7})
+    topology_size = FILES["sim/topology.prmtop"]
+    (tmp_path / "sim" / "topology.prmtop").write_bytes(b"x" * topology_size)  # same size, edited locally
+    os.utime(tmp_path / "sim" / "topology.prmtop", ns=(1, 1))
+    (tmp_path / "sim" / "scratch").mkdir()
+    (tmp_path / "sim" / "scratch" / "notes.txt").write_text("local only")
+    calls_before = irods.get_calls
+
+    assert run_mirror(monkeypatch, irods, tmp_path, delete=True)
+
+    assert irods.get_calls - calls_before == 3
+    assert (tmp_path / "sim" / "topology.prmtop").read_bytes() == FakeIRODS.content("ds", "sim/topology.prmtop", 120)
+    assert (tmp_path / "README").read_bytes() == FakeIRODS.content("ds", "README", 7)
+    assert not (tmp_path / "sim" / "scratch").exists()
+
+
+def test_dry_run_changes_nothing(tmp_path, monkeypatch, capsys):
+    irods = FakeIRODS()
+    irods.seed("ds", FILES)
+    (tmp_path / "extra.txt").write_text("x")
+
+    assert run_mirror(monkeypatch, irods, tmp_path, delete=True, dry_run=True)
+
+    assert irods.get_calls == 0
+    assert (tmp_path / "extra.txt").exists()
+    assert "delete    extra.txt" in capsys.readouterr().out
@@ -0,0 +1,38 @@
+import json
+import time
+
+from ida4sims_cli.functions.profiling import phase, profiling_session
+
+
+@phase("decorated")
+def decorated_step():
+    time.sleep(0.01)
+
+
+def test_phase_is_noop_without_session():
+    with phase("anything"):
+        pass
+    decorated_step()
+
+
+def test_profiling_session_writes_report(tmp_path):
+    report_path = tmp_path / "profile.json"
+
+    with profiling_session(report_path, "test-command", cpu=True, memory=True):
+        with phase("outer"):
+            decorated_step()
+            decorated_step()
+
+    report = json.loads(report_path.read_text())
+    assert report["command"] == "test-command"
+    assert report["phases"]["decorated"]["count"] == 2
+    assert report["phases"]["outer"]["total_s"] >= report["phases"]["decorated"]["total_s"]
+    assert report["memory"]["peak_bytes"] is not None
+    assert report["cpu_top_cumulative"]
+    assert (tmp_path / "profile.pstats").exists()
+
+
+def test_profiling_session_disabled_without_path(tmp_path):
+    with profiling_session(None, "test-command") as profiler:
+        assert profiler is None
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,70 @@
+import json
+import time
+
+import keyring
+import pytest
+
+from conftest import make_jwt
+from ida4sims_cli.functions.token_cache import (
+    clear_cached_access_token,
+    load_cached_access_token,
+    store_access_token,
+    token_expiry,
+)
+from ida4sims_cli.helpers.default_data import KEYRING_ACCESS_TOKEN_USERNAME, KEYRING_SERVICE_NAME
+
+
+@pytest.fixture
+def memory_keyring(monkeypatch):
+    store = {}
+    monkeypatch.setattr(keyring, "get_password", lambda service, user: store.get((service, user)))
+    monkeypatch.setattr(keyring, "set_password", lambda service, user, value: store.__setitem__((service, user), value))
+
+    def delete_password(service, user):
+        del store[(service, user)]
+
+    monkeypatch.setattr(keyring, "delete_password", delete_password)
+    return store
+
+
+def test_token_expiry():
+    assert token_expiry(make_jwt(1700000000)) == 1700000000
+    assert token_expiry("not-a-jwt") is None
+
+
+def test_cached_token_is_reused_until_shortly_before_expiry(memory_keyring):
+    token = make_jwt(time.time() + 300)
+    assert store_access_token(token, "offline-token")
+
+    assert load_cached_access_token("offline-token", min_validity=60) == token
+    assert load_cached_access_token("offline-token", min_validity=600) is None
+
+
+def test_expired_or_cleared_token_is_not_returned(memory_keyring):
+    store_access_token(make_jwt(time.time() - 1), "offline-token")
+    assert load_cached_access_token("offline-token") is None
+
+    store_access_token(make_jwt(time.time() + 300), "offline-token")
+    clear_cached_access_token()
+    assert load_cached_access_token("offline-token") is None
+    clear_cached_access_token()
+
+
+def test_token_cached_for_another_refresh_token_is_ignored(memory_keyring):
+    store_access_token(make_jwt(time.time() + 300), "offline-token")
+
+    assert load_cached_access_token("other-offline-token") is None
+    assert not any("offline-token" in value for value in memory_keyring.values())
+
+
+def test_entry_without_refresh_token_hash_is_ignored(memory_keyring):
+    entry = {"access_token": make_jwt(time.time() + 300), "expires_at": time.time() + 300}
+    memory_keyring[(KEYRING_SERVICE_NAME, KEYRING_ACCESS_TOKEN_USERNAME)] = json.dumps(entry)
+
+    assert load_cached_access_token("offline-token") is None
+
+
+def test_tokens_without_expiry_are_not_cached(memory_keyring):
+    assert not store_access_token("opaque-token", "offline-token")
+    assert not store_access_token(make_jwt(time.time() + 300), None)
+    assert memory_keyring == {}
@@ -0,0 +1,146 @@
+import asyncio
+import base64
+import hashlib
+import sys
+import threading
+import types
+
+import httpx
+import pytest
+
+from conftest import make_jwt
+from ida4sims_cli.functions.hashing_utils import create_hash_request_async
+from ida4sims_cli.functions import LexisAuthManager, token_provider
+from ida4sims_cli.functions.token_provider import TokenProvider, session_token_provider
+
+
+class FakeClock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def make_refresher(clock, lifetime=300):
+    calls = []
+    lock = threading.Lock()
+
+    def refresh():
+        with lock:
+            calls.append(clock())
+            return make_jwt(clock() + lifetime, f"token-{len(calls)}")
+
+    return refresh, calls
+
+
+@pytest.mark.asyncio
+async def test_refreshes_in_background_before_expiry():
+    clock = FakeClock()
+    refresh, calls = make_refresher(clock)
+    initial = make_jwt(clock.now + 300, "initial")
+    provider = TokenProvider(refresh, access_token=initial, refresh_margin=60, clock=clock)
+
+    assert await provider.get_token() == initial
+    assert calls == []
+
+    clock.now += 250  # within the refresh margin, still valid
+    assert await provider.get_token() == initial
+    await provider._refresh_task
+    assert len(calls) == 1
+    assert await provider.get_token() != initial
+
+
+@pytest.mark.asyncio
+async def test_expired_token_is_refreshed_once_for_concurrent_callers():
+    clock = FakeClock()
+    refresh, calls = make_refresher(clock)
+    provider = TokenProvider(refresh, access_token=make_jwt(clock.now - 1, "expired"), clock=clock)
+
+    tokens = await asyncio.gather(*(provider.get_token() for _ in range(20)))
+
+    assert len(calls) == 1
+    assert len(set(tokens)) == 1
+
+
+@pytest.mark.asyncio
+async def test_request_is_retried_once_after_401():
+    clock = FakeClock()
+    refresh, calls = make_refresher(clock)
+    rejected = make_jwt(clock.now + 3600, "revoked")
+    provider = TokenProvider(refresh, access_token=rejected, clock=clock)
+    seen = []
+
+    def handler(request):
+        seen.append(request.headers["Authorization"])
+        if request.headers["Authorization"] == f"Bearer {rejected}":
+            return httpx.Response(401)
+        return httpx.Response(202, json={"request_id": "req-1"})
+
+    async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+        request_id = await create_hash_request_async("ds", "/file", provider, client=client)
+
+    assert request_id == "req-1"
+    assert len(seen) == 2
+    assert len(calls) == 1
+
+
+def test_verify_client_refreshes_the_token_in_every_event_loop(tmp_path, monkeypatch):
+    from benchmarks.fakes import FakeDatasets, FakeIRODS, make_staging_transport
+    from ida4sims_cli.api import LexisConnection, VerifyClient
+
+    irods = FakeIRODS()
+    files = {f"sim/f{i}.nc": 8 for i in range(6)}
+    irods.seed("ds", files)
+    for path, size in files.items():
+        (tmp_path / path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / path).write_bytes(FakeIRODS.content("ds", path, size))
+
+    def server_hash(path):
+        remote_path = path.strip("/")
+        return "sha2:" + base64.b64encode(hashlib.sha256(FakeIRODS.content("ds", remote_path, files[remote_path])).digest()).decode()
+
+    transport = make_staging_transport(pending_polls=0, hash_for=server_hash)
+
+    class MockedClient(httpx.AsyncClient):
+        def __init__(self, **kwargs):
+            super().__init__(transport=transport, **kwargs)
+
+    monkeypatch.setattr(httpx, "AsyncClient", MockedClient)
+    clock = FakeClock()
+    refresh, calls = make_refresher(clock)
+    provider = TokenProvider(refresh, access_token=make_jwt(clock.now - 1, "expired"), clock=clock)
+    verifier = VerifyClient(LexisConnection(irods, FakeDatasets(irods), provider), concurrency=6)
+
+    for run in (1, 2):
+        # Expired: every concurrent hash request waits on the refresh lock of this run's loop.
+        clock.now += 1000
+        result = verifier.verify("ds", str(tmp_path))
+        assert result.ok and len(result.matched) == 6
+        assert len(calls) == run
+
+
+def test_session_without_refresh_method_is_rebuilt_from_the_stored_token(monkeypatch):
+    fresh = make_jwt(10**10, "fresh")
+
+    class LexisSessionToken:
+        # As in py4lexis, `refresh_token` is the offline token string, not a method.
+        def __init__(self, refresh_token, reraise_exceptions=False):
+            self.refresh_token = refresh_token
+
+        def get_access_token(self):
+            return fresh if self.refresh_token == "offline-token" else None
+
+    py4lexis_session = types.ModuleType("py4lexis.session")
+    py4lexis_session.LexisSessionToken = LexisSessionToken
+    monkeypatch.setitem(sys.modules, "py4lexis", types.ModuleType("py4lexis"))
+    monkeypatch.setitem(sys.modules, "py4lexis.session", py4lexis_session)
+    monkeypatch.setattr(LexisAuthManager, "get_stored_token", lambda: "offline-token")
+    monkeypatch.setattr(token_provider, "cache_access_token", lambda token: None)
+
+    stale = make_jwt(1, "stale")
+    session = LexisSessionToken("offline-token")
+    session.get_access_token = lambda: stale
+    provider = session_token_provider(session)
+
+    assert asyncio.run(provider.invalidate(stale)) == fresh
@@ -0,0 +1,84 @@
+import io
+import json
+
+from ida4sims_cli.functions.transfer_progress import TransferProgress, format_bytes, local_totals
+
+
+def test_local_totals(tmp_path):
+    (tmp_path / "a.txt").write_bytes(b"x" * 10)
+    sub = tmp_path / "sub"
+    sub.mkdir()
+    (sub / "b.txt").write_bytes(b"y" * 5)
+
+    assert local_totals(tmp_path) == (15, 2)
+    assert local_totals(tmp_path / "a.txt") == (10, 1)
+
+
+def test_format_bytes():
+    assert format_bytes(512) == "512 B"
+    assert format_bytes(1536) == "1.5 KiB"
+    assert format_bytes(3 * 1024 ** 3) == "3.0 GiB"
+
+
+def test_summary_counts_and_slowest(tmp_path):
+    progress = TransferProgress(total_bytes=300, total_files=4, show_bar=False)
+    progress.record_transfer("fast.dat", 100, 0.5)
+    progress.record_transfer("slow.dat", 100, 2.0)
+    progress.record_transfer("broken.dat", 50, 0.1, ok=False, error="boom")
+    progress.record_skipped("done.dat", 50)
+    progress.close()
+
+    summary = progress.summary()
+    assert summary["bytes_transferred"] == 200
+    assert summary["files_transferred"] == 2
+    assert summary["files_failed"] == 1
+    assert summary["files_skipped"] == 1
+    assert summary["bytes_skipped"] == 50
+    assert summary["slowest_transfers"][0]["path"] == "slow.dat"
+    assert summary["file_duration_s"]["max"] == 2.0
+    assert summary["transfer_mb_per_s"] is not None
+
+    output_file = tmp_path / "summary.json"
+    progress.write_summary(output_file)
+    assert json.loads(output_file.read_text())["files_transferred"] == 2
+
+
+def test_progress_bar_only_on_terminal():
+    stream = io.StringIO()
+    progress = TransferProgress(total_bytes=100, show_bar=True, stream=stream)
+    progress.record_transfer("a.dat", 100, 1.0)
+    progress.close()
+    # StringIO is not a tty, so nothing is rendered
+    assert stream.getvalue() == ""
+
+
+def test_concurrent_records_are_not_lost():
+    import sys
+    import threading
+
+    progress = TransferProgress(show_bar=False)
+    barrier = threading.Barrier(8)
+    switch_interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # switch threads as often as possible to expose lost updates
+
+    def record():
+        barrier.wait()
+        for i in range(2000):
+            progress.record_transfer(f"f{i}", 3, 0.001)
+            progress.record_skipped(f"s{i}", 2)
+
+    try:
+        threads = [threading.Thread(target=record) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        sys.setswitchinterval(switch_interval)
+
+    summary = progress.summary()
+    assert summary["files_transferred"] == 16000
+    assert summary["bytes_transferred"] == 48000
+    assert summary["files_skipped"] == 16000
+    assert summary["bytes_skipped"] == 32000
+    assert len(summary["transfers"]) == 16000
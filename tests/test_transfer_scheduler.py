@@ -0,0 +1,112 @@
+import threading
+
+import pytest
+
+from benchmarks.fakes import FakeIRODS, build_listing
+from ida4sims_cli.functions.diff_directory_contents import diff_directory_contents
+from ida4sims_cli.functions.list_directory_contents import list_directory_contents
+from ida4sims_cli.functions.sync_directory_contents import sync_directory_contents
+from ida4sims_cli.functions.transfer_scheduler import TransferJob, plan_transfers, run_transfers
+from ida4sims_cli.functions.upload_session import UploadSession
+
+
+class RecordingIRODS(FakeIRODS):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.started = []
+
+    def put_data_object_to_dataset(self, local_filepath, **kwargs):
+        with self._lock:
+            self.started.append((local_filepath.rsplit("/", 1)[-1], threading.current_thread().name))
+        super().put_data_object_to_dataset(local_filepath=local_filepath, **kwargs)
+
+
+def test_plan_puts_metadata_on_its_own_lane():
+    jobs = [
+        TransferJob("run/md.in", "run", 100),
+        TransferJob("run/traj1.nc", "run", 5_000),
+        TransferJob("run/system.prmtop", "run", 2_000),
+        TransferJob("run/traj2.nc", "run", 9_000),
+        TransferJob("run/analysis", "run", 50, is_directory=True),
+    ]
+    metadata, bulk = plan_transfers(jobs)
+    assert [j.local_path for j in metadata] == ["run/md.in", "run/system.prmtop"]
+    assert [j.local_path for j in bulk] == ["run/traj2.nc", "run/traj1.nc", "run/analysis"]
+
+
+def test_sync_starts_largest_first_and_drains_metadata_separately(tmp_path):
+    source = tmp_path / "sim_run"
+    source.mkdir()
+    sizes = {"md.in": 10, "mdout": 20, "system.prmtop": 30, "small.nc": 100, "medium.nc": 2_000, "huge.nc": 50_000}
+    for name, size in sizes.items():
+        (source / name).write_bytes(b"x" * size)
+    irods = RecordingIRODS(latency=0.01)
+    irods.seed("ds", {"sim_run/unrelated.txt": 1})
+
+    sync_directory_contents(
+        UploadSession(lambda: irods, size=2), build_listing(irods.objects["ds"]), list_directory_contents(str(source)), "ds", str(source),
+    )
+
+    assert {f"sim_run/{name}" for name in sizes} <= set(irods.objects["ds"])
+    bulk = [name for name, thread in irods.started if thread.startswith("bulk-lane")]
+    metadata = [name for name, thread in irods.started if thread.startswith("metadata-lane")]
+    assert bulk == ["huge.nc", "medium.nc", "small.nc"]
+    assert metadata == ["md.in", "mdout", "system.prmtop"]
+
+
+def test_sync_stays_within_the_lanes_it_is_given(tmp_path):
+    source = tmp_path / "sim_run"
+    source.mkdir()
+    for name in ("md.in", "a.nc", "b.nc", "c.nc"):
+        (source / name).write_bytes(b"x" * 10)
+    irods = RecordingIRODS()
+    irods.seed("ds", {"sim_run/unrelated.txt": 1})
+
+    sync_directory_contents(
+        UploadSession(lambda: irods, size=4), build_listing(irods.objects["ds"]), list_directory_contents(str(source)), "ds", str(source), lanes=1,
+    )
+
+    assert len(irods.started) == 4
+    assert {thread for _, thread in irods.started} == {threading.current_thread().name}
+
+
+def test_sync_uploads_what_the_diff_reports(tmp_path):
+    source = tmp_path / "sim_run"
+    (source / "out").mkdir(parents=True)
+    (source / "new").mkdir()
+    (source / "changed.nc").write_bytes(b"x" * 50)
+    (source / "same.in").write_bytes(b"x" * 2)
+    (source / "out" / "frame.nc").write_bytes(b"x" * 30)  # a file in the dataset, a directory here
+    (source / "new" / "traj.nc").write_bytes(b"x" * 40)
+    irods = RecordingIRODS()
+    seeded = {"sim_run/changed.nc": 10, "sim_run/same.in": 2, "sim_run/out": 3, "sim_run/remote_only.txt": 1}
+    irods.seed("ds", seeded)
+    dataset, local = build_listing(irods.objects["ds"]), list_directory_contents(str(source))
+
+    diffs = diff_directory_contents(dataset, local)
+    result = sync_directory_contents(UploadSession(lambda: irods, size=2), dataset, local, "ds", str(source))
+
+    expected = {d["path"] for d in diffs["mismatches"] + diffs["extra_locally"]}
+    assert expected == {"sim_run/changed.nc", "sim_run/out/frame.nc", "sim_run/new/traj.nc"}
+    assert {path for path, size in irods.objects["ds"].items() if seeded.get(path) != size} == expected
+    assert "same.in" not in {name for name, _ in irods.started}
+    assert [d["path"] for d in result["missing_locally"]] == [d["path"] for d in diffs["missing_locally"]]
+
+
+def test_failure_stops_new_transfers(tmp_path):
+    jobs = []
+    for i in range(6):
+        path = tmp_path / f"traj{i}.nc"
+        path.write_bytes(b"x" * (100 - i))
+        jobs.append(TransferJob(str(path), "", 100 - i))
+
+    class FailsFirst(RecordingIRODS):
+        def put_data_object_to_dataset(self, local_filepath, **kwargs):
+            super().put_data_object_to_dataset(local_filepath=local_filepath, **kwargs)
+            if local_filepath.endswith("traj0.nc"):
+                raise OSError("connection reset")
+
+    irods = FailsFirst(latency=0.02)
+    with pytest.raises(OSError, match="connection reset"):
+        run_transfers(UploadSession(lambda: irods, size=2), jobs, "ds", lanes=2)
+    assert len(irods.started) < 6
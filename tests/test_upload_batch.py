@@ -0,0 +1,154 @@
+import json
+
+import click
+import pytest
+
+from benchmarks.fakes import FakeDatasets, FakeIRODS
+from ida4sims_cli import upload_batch
+from ida4sims_cli.api import transfer_dataset_content
+from ida4sims_cli.functions.batch_manifest import read_manifest
+from ida4sims_cli.functions.batch_state import BatchState
+from ida4sims_cli.functions.rate_limiter import BandwidthLimiter
+from ida4sims_cli.functions.upload_session import UploadSession
+
+
+def make_replicas(tmp_path, count):
+    for i in range(count):
+        run = tmp_path / f"rep{i}"
+        (run / "traj").mkdir(parents=True)
+        (run / "traj" / "md.nc").write_bytes(b"x" * (100 + i))
+        (run / "md.out").write_text(f"replica {i}")
+
+
+def write_csv(tmp_path, rows):
+    manifest = tmp_path / "campaign.csv"
+    manifest.write_text("\n".join(rows) + "\n")
+    return str(manifest)
+
+
+def test_csv_manifest_is_normalized(tmp_path):
+    (tmp_path / "ff").mkdir()
+    manifest = write_csv(tmp_path, [
+        "path,title,type,author_name,ff_format,ff_name,molecule_type,dat_file,library_files,creator_person",
+        "rep0,Replica 0,simulation,Jane,,,,,,",
+        "ff,My FF,forcefield,,AMBER,ff99,R,ff.dat,a.lib;b.lib,\"Doe, Jane|Roe, Rick\"",
+    ])
+    (tmp_path / "rep0").mkdir()
+
+    sim, ff = read_manifest(manifest)
+
+    assert sim.dataset_type == "simulation" and sim.path == str(tmp_path / "rep0")
+    assert sim.metadata == {"author_name": "Jane", "dataset_type": "simulation"}
+    assert ff.dataset_type == "force_field"
+    assert ff.metadata["library_files"] == ["a.lib", "b.lib"]
+    assert [c["family_name"] for c in json.loads(ff.metadata["creators_json"])] == ["Doe", "Roe"]
+
+
+def test_manifest_errors_name_the_entry(tmp_path):
+    (tmp_path / "ff").mkdir()
+    manifest = write_csv(tmp_path, ["path,title,type,ff_name", "ff,My FF,forcefield,ff99"])
+    with pytest.raises(click.ClickException, match="Manifest entry 1 .*ff_format"):
+        read_manifest(manifest)
+
+    manifest = write_csv(tmp_path, ["path,title,type", "missing,Nope,simulation"])
+    with pytest.raises(click.ClickException, match="does not exist"):
+        read_manifest(manifest)
+
+
+def test_yaml_manifest(tmp_path):
+    pytest.importorskip("yaml")
+    (tmp_path / "rep0").mkdir()
+    manifest = tmp_path / "campaign.yaml"
+    manifest.write_text(
+        "datasets:\n"
+        "  - path: rep0\n"
+        "    title: Replica 0\n"
+        "    type: simulation\n"
+        "    metadata:\n"
+        "      description: equilibration\n"
+    )
+    (entry,) = read_manifest(str(manifest))
+    assert entry.metadata == {"description": "equilibration", "dataset_type": "simulation"}
+
+
+def run(tmp_path, irods, state, **kwargs):
+    entries = read_manifest(str(tmp_path / "campaign.csv"))
+    session = UploadSession(lambda: irods, size=4)
+    return upload_batch.run_batch(session, FakeDatasets(irods), entries, state, **kwargs)
+
+
+def test_batch_uploads_every_dataset_and_resumes(tmp_path):
+    make_replicas(tmp_path, 5)
+    write_csv(tmp_path, ["path,title,type"] + [f"rep{i},Replica {i},simulation" for i in range(5)])
+    irods = FakeIRODS()
+    state = BatchState(str(tmp_path / "state.json"))
+
+    results = run(tmp_path, irods, state, create_workers=2, max_transfers=3)
+
+    assert [r["status"] for r in results] == ["uploaded"] * 5
+    assert [r["title"] for r in results] == [f"Replica {i}" for i in range(5)]
+    assert len({r["dataset_id"] for r in results}) == 5
+    assert all(len(irods.objects[r["dataset_id"]]) == 2 for r in results)
+
+    # A second run finds everything done and creates nothing.
+    results = run(tmp_path, irods, BatchState(str(tmp_path / "state.json")))
+    assert [r["status"] for r in results] == ["skipped"] * 5
+    assert len(irods.objects) == 5
+
+
+@pytest.mark.parametrize("entries, max_transfers, lanes", [(5, 2, 1), (2, 4, 2), (1, 3, 3)])
+def test_uploads_share_the_transfer_connections(tmp_path, monkeypatch, entries, max_transfers, lanes):
+    make_replicas(tmp_path, entries)
+    write_csv(tmp_path, ["path,title,type"] + [f"rep{i},Replica {i},simulation" for i in range(entries)])
+    granted = []
+
+    def recording_transfer(*args, lanes=None, **kwargs):
+        granted.append(lanes)
+        return transfer_dataset_content(*args, lanes=lanes, **kwargs)
+
+    monkeypatch.setattr(upload_batch, "transfer_dataset_content", recording_transfer)
+    results = run(tmp_path, FakeIRODS(), BatchState(str(tmp_path / "state.json")), create_workers=1, max_transfers=max_transfers)
+
+    assert [r["status"] for r in results] == ["uploaded"] * entries
+    assert granted == [lanes] * entries
+
+
+def test_failed_entry_is_retried_with_the_same_dataset(tmp_path):
+    make_replicas(tmp_path, 3)
+    write_csv(tmp_path, ["path,title,type"] + [f"rep{i},Replica {i},simulation" for i in range(3)])
+
+    class FlakyIRODS(FakeIRODS):
+        fail = True
+
+        def upload_directory_to_dataset(self, local_directorypath, **kwargs):
+            if self.fail and local_directorypath.endswith("rep1"):
+                raise ConnectionError("link down")
+            return super().upload_directory_to_dataset(local_directorypath=local_directorypath, **kwargs)
+
+    irods = FlakyIRODS()
+    results = run(tmp_path, irods, BatchState(str(tmp_path / "state.json")))
+    assert [r["status"] for r in results] == ["uploaded", "failed", "uploaded"]
+    assert "link down" in results[1]["error"]
+    failed_id = results[1]["dataset_id"]
+
+    irods.fail = False
+    results = run(tmp_path, irods, BatchState(str(tmp_path / "state.json")))
+    assert [r["status"] for r in results] == ["skipped", "uploaded", "skipped"]
+    assert results[1]["dataset_id"] == failed_id
+    assert len(irods.objects) == 3
+
+
+def test_bandwidth_limiter_paces_transfers():
+    now = [0.0]
+    slept = []
+
+    def sleep(seconds):
+        slept.append(seconds)
+        now[0] += seconds
+
+    limiter = BandwidthLimiter(100, clock=lambda: now[0], sleep=sleep)
+    assert limiter.acquire(50) == 0  # the first transfer starts at once
+    assert limiter.acquire(100) == pytest.approx(0.5)
+    now[0] += 5  # idle time is not saved up as a burst
+    assert limiter.acquire(10) == 0
+    assert sum(slept) == pytest.approx(limiter.waited)
@@ -0,0 +1,97 @@
+import asyncio
+
+import pytest
+
+from benchmarks.fakes import FakeDatasets, FakeIRODS
+from ida4sims_cli.exceptions import VerificationError
+from ida4sims_cli.functions import hashing_utils
+from ida4sims_cli.functions.hashing_utils import calculate_sha256
+from ida4sims_cli.functions.transfer_progress import TransferProgress
+from ida4sims_cli.functions.upload_dataset_content import upload_dataset_content
+from ida4sims_cli.functions.upload_pipeline import PipelineConfig, run_upload_pipeline
+from ida4sims_cli.functions.upload_session import UploadSession
+from ida4sims_cli.functions.upload_state import UploadStateStore
+
+
+def test_pipeline_uploads_every_file_and_reports_stages(tmp_path, make_source):
+    source = make_source(frames=5)
+    irods = FakeIRODS()
+    irods.objects["ds"] = {}
+    state = UploadStateStore(tmp_path / "state.sqlite").source(source, "Run")
+    progress = TransferProgress(show_bar=False)
+
+    upload_dataset_content(UploadSession(lambda: irods, size=3), FakeDatasets(irods), str(source), "ds", progress=progress, state=state, pipeline=PipelineConfig(workers=3, checksum=True))
+
+    assert set(irods.objects["ds"]) == {"sim_run/md.in"} | {f"sim_run/traj/md{i}.nc" for i in range(1, 6)}
+    assert set(progress.summary()["pipeline"]) == {"scan", "hash", "upload", "verify"}
+    assert progress.pipeline["upload"]["files"] == 6
+    assert state.status_counts() == {"done": 6}
+    sha = state.store.execute("SELECT sha256 FROM files WHERE rel_path = 'md.in'")[0][0]
+    assert sha == calculate_sha256(source / "md.in")
+
+
+def test_full_queue_stalls_the_scanner(make_source):
+    source = make_source(frames=7)
+    irods = FakeIRODS(latency=0.02)
+    irods.objects["ds"] = {}
+
+    report = asyncio.run(run_upload_pipeline(irods, str(source), "ds", config=PipelineConfig(workers=1, queue_size=1)))
+
+    assert report.stages["scan"].blocked_s > 0.05
+    assert report.stages["upload"].files == 8
+    assert irods.put_calls == 8
+
+
+def test_first_failure_stops_the_pipeline(tmp_path, make_source):
+    source = make_source(frames=7)
+
+    class FailsOnce(FakeIRODS):
+        def put_data_object_to_dataset(self, local_filepath, **kwargs):
+            if local_filepath.endswith("md1.nc"):
+                raise OSError("connection reset")
+            super().put_data_object_to_dataset(local_filepath=local_filepath, **kwargs)
+
+    irods = FailsOnce()
+    state = UploadStateStore(tmp_path / "state.sqlite").source(source, "Run")
+    with pytest.raises(OSError, match="connection reset"):
+        asyncio.run(run_upload_pipeline(irods, str(source), "ds", state=state, config=PipelineConfig(workers=1, queue_size=1)))
+    assert irods.put_calls < 8
+    assert state.status_counts().get("failed") == 1
+
+
+def test_server_hash_mismatch_fails_verification(tmp_path, make_source, monkeypatch):
+    source = make_source(frames=2)
+    irods = FakeIRODS()
+    irods.objects["ds"] = {}
+
+    async def fake_hash(dataset_id, path, lexis_token, **kwargs):
+        local = source.parent / path.lstrip("/")
+        return {"status": "COMPLETED", "result": "sha2:corrupted" if local.name == "md1.nc" else calculate_sha256(local)}
+
+    monkeypatch.setattr(hashing_utils, "get_irods_file_hash_via_poll_async", fake_hash)
+    state = UploadStateStore(tmp_path / "state.sqlite").source(source, "Run")
+    with pytest.raises(VerificationError, match="sim_run/traj/md1.nc"):
+        upload_dataset_content(irods, FakeDatasets(irods), str(source), "ds", state=state, pipeline=PipelineConfig(workers=2, checksum=True, lexis_token="token"))
+    assert state.status_counts() == {"done": 2, "failed": 1}
+
+
+def test_server_hash_timeout_leaves_file_unverified(tmp_path, make_source, monkeypatch):
+    source = make_source(frames=2)
+    irods = FakeIRODS()
+    irods.objects["ds"] = {}
+    timeouts = {}
+
+    async def fake_hash(dataset_id, path, lexis_token, timeout, **kwargs):
+        local = source.parent / path.lstrip("/")
+        timeouts[local.name] = timeout
+        # The server is still hashing md1.nc when the poll gives up.
+        return None if local.name == "md1.nc" else {"status": "COMPLETED", "result": calculate_sha256(local)}
+
+    monkeypatch.setattr(hashing_utils, "get_irods_file_hash_via_poll_async", fake_hash)
+    state = UploadStateStore(tmp_path / "state.sqlite").source(source, "Run")
+    report = asyncio.run(run_upload_pipeline(irods, str(source), "ds", state=state, config=PipelineConfig(workers=2, checksum=True, lexis_token="token")))
+
+    assert report.unverified == ["sim_run/traj/md1.nc"]
+    assert report.mismatched == []
+    assert state.status_counts() == {"done": 3}
+    assert timeouts["md1.nc"] == hashing_utils.hash_poll_timeout(100)
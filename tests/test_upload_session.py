@@ -0,0 +1,76 @@
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from benchmarks.fakes import FakeIRODS
+from ida4sims_cli.functions.upload_session import UploadSession
+
+
+def test_connections_are_reused_across_files(tmp_path):
+    created = []
+
+    def factory():
+        created.append(FakeIRODS())
+        return created[-1]
+
+    session = UploadSession(factory, size=4)
+    for i in range(10):
+        path = tmp_path / f"f{i}.txt"
+        path.write_bytes(b"x" * i)
+        session.put_data_object_to_dataset(local_filepath=str(path), dataset_filepath="", dataset_id="ds")
+
+    assert len(created) == 1
+    assert created[0].put_calls == 10
+    stats = session.stats()
+    assert stats["connections_opened"] == 1
+    assert stats["calls"] == 10
+    assert stats["pool_size"] == 4
+
+
+def test_pool_never_exceeds_its_size():
+    opened = []
+    active = []
+    peak = []
+    lock = threading.Lock()
+
+    class SlowConnection:
+        def put_data_object_to_dataset(self, **kwargs):
+            with lock:
+                active.append(1)
+                peak.append(len(active))
+            time.sleep(0.01)
+            with lock:
+                active.pop()
+
+    def factory():
+        opened.append(1)
+        return SlowConnection()
+
+    session = UploadSession(factory, size=3)
+    with ThreadPoolExecutor(max_workers=8) as pool:
+        list(pool.map(lambda _: session.put_data_object_to_dataset(), range(40)))
+
+    assert len(opened) <= 3
+    assert max(peak) <= 3
+    assert session.stats()["calls"] == 40
+
+
+def test_pool_size_must_be_positive():
+    with pytest.raises(ValueError):
+        UploadSession(FakeIRODS, size=0)
+
+
+def test_fixed_cost_per_put_is_estimated(tmp_path):
+    irods = FakeIRODS(latency=0.02, bandwidth_mb_s=50)
+    session = UploadSession(lambda: irods)
+    for i, size in enumerate([1, 256 * 1024, 512 * 1024, 1024 * 1024]):
+        path = tmp_path / f"f{i}.bin"
+        path.write_bytes(b"x" * size)
+        session.put_data_object_to_dataset(local_filepath=str(path), dataset_filepath="", dataset_id="ds")
+
+    stats = session.stats()
+    assert stats["puts"] == 4
+    assert stats["put_fixed_cost_s"] == pytest.approx(0.02, abs=0.01)
+    assert UploadSession(lambda: irods).stats()["put_fixed_cost_s"] is None
@@ -0,0 +1,139 @@
+import os
+import sqlite3
+
+from benchmarks.fakes import FakeDatasets, FakeIRODS
+from ida4sims_cli.functions.create_dataset import create_lexis_dataset
+from ida4sims_cli.functions.upload_dataset_content import upload_dataset_content
+from ida4sims_cli.functions.upload_state import _SCHEMA, SCHEMA_VERSION, UploadStateStore
+from ida4sims_cli.helpers.default_data import DATASET_ID_FILE_NAME
+
+
+def test_state_is_per_source_and_title(tmp_path, make_source):
+    store = UploadStateStore(tmp_path / "state.sqlite")
+    assert store.execute("PRAGMA journal_mode")[0][0] == "wal"
+    source = make_source(frames=2)
+    state = store.source(source, "Run A")
+    state.set_dataset("ds-a", dataset_type="simulation")
+    state.record_file(str(source / "md.in"), "done")
+    state.record_file(str(source / "traj" / "md1.nc"), "failed")
+
+    other = store.source(source, "Run B")
+    assert other.dataset_id is None and other.completed_files() == {}
+
+    # Reopened from another connection, e.g. the next run.
+    state = UploadStateStore(tmp_path / "state.sqlite").source(str(source) + os.sep, "Run A")
+    assert state.dataset_id == "ds-a"
+    assert set(state.completed_files()) == {"md.in"}
+    assert state.is_done(str(source / "md.in"))
+    (source / "md.in").write_text("changed input")
+    assert not state.is_done(str(source / "md.in"))
+
+    state.set_dataset("ds-other")
+    assert state.completed_files() == {}
+    state.clear()
+    assert state.dataset_id is None
+
+
+def test_create_reuses_and_migrates_dataset_id(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    irods = FakeIRODS()
+    store = UploadStateStore(tmp_path / "state.sqlite")
+    metadata = {"dataset_type": "simulation"}
+
+    first = create_lexis_dataset(irods, "Run", metadata, state=store.source(tmp_path, "Run"))
+    assert create_lexis_dataset(irods, "Run", metadata, state=store.source(tmp_path, "Run")) == first
+    assert not (tmp_path / DATASET_ID_FILE_NAME).exists()
+    assert len(irods.objects) == 1
+
+    (tmp_path / DATASET_ID_FILE_NAME).write_text("legacy-id\n")
+    state = store.source(tmp_path, "Other")
+    assert create_lexis_dataset(irods, "Other", metadata, state=state) == "legacy-id"
+    assert state.dataset_id == "legacy-id"
+
+
+def test_resume_uploads_only_missing_files_without_listing(tmp_path, make_source):
+    source = make_source(frames=2)
+    irods = FakeIRODS()
+    datasets = FakeDatasets(irods)
+    irods.objects["ds"] = {}
+    state = UploadStateStore(tmp_path / "state.sqlite").source(source, "Run")
+    state.set_dataset("ds")
+    state.record_file(str(source / "traj" / "md1.nc"), "done")
+
+    upload_dataset_content(irods, datasets, str(source), "ds", state=state)
+
+    assert datasets.listing_calls == 0
+    assert irods.put_calls == 2
+    assert set(irods.objects["ds"]) == {"sim_run/md.in", "sim_run/traj/md2.nc"}
+    assert set(state.completed_files()) == {"md.in", "traj/md1.nc", "traj/md2.nc"}
+
+
+def test_first_upload_records_every_file(tmp_path, make_source):
+    source = make_source(frames=2)
+    irods = FakeIRODS()
+    # Partly uploaded before the state existed: the sync compares sizes and records both outcomes.
+    irods.seed("ds", {"sim_run/md.in": 5, "sim_run/traj/md1.nc": 1})
+    state = UploadStateStore(tmp_path / "state.sqlite").source(source, "Run")
+    state.set_dataset("ds")
+
+    upload_dataset_content(irods, FakeDatasets(irods), str(source), "ds", state=state)
+
+    assert irods.objects["ds"]["sim_run/traj/md1.nc"] == 100
+    assert set(state.completed_files()) == {"md.in", "traj/md1.nc", "traj/md2.nc"}
+
+
+def test_concurrent_migration_keeps_the_other_process_tables(tmp_path, monkeypatch):
+    path = tmp_path / "state.sqlite"
+    connect = sqlite3.connect
+    old = connect(str(path))
+    old.execute("CREATE TABLE files (rel_path TEXT)")
+    old.close()
+
+    def other_process_migrates():
+        other = connect(str(path), isolation_level=None)
+        other.execute("BEGIN IMMEDIATE")
+        other.execute("DROP TABLE files")
+        for statement in _SCHEMA.split(";"):
+            if statement.strip():
+                other.execute(statement)
+        other.execute("INSERT INTO sources VALUES ('/src', 'Run', 'ds-1', 'simulation', 0, 0)")
+        other.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        other.execute("COMMIT")
+        other.close()
+
+    class StaleResult:
+        def __init__(self, rows):
+            self.rows = rows
+
+        def fetchone(self):
+            return self.rows[0]
+
+    class RacingConnection:
+        """Lets another process migrate right after this one read the old schema version."""
+
+        def __init__(self, conn):
+            self._conn = conn
+            self._raced = False
+
+        def execute(self, sql, *args):
+            cursor = self._conn.execute(sql, *args)
+            if sql == "PRAGMA user_version" and not self._raced:
+                self._raced = True
+                stale = cursor.fetchall()
+                other_process_migrates()
+                return StaleResult(stale)
+            return cursor
+
+        def __getattr__(self, name):
+            return getattr(self._conn, name)
+
+        def __enter__(self):
+            return self._conn.__enter__()
+
+        def __exit__(self, *exc):
+            return self._conn.__exit__(*exc)
+
+    monkeypatch.setattr(sqlite3, "connect", lambda *args, **kwargs: RacingConnection(connect(*args, **kwargs)))
+    store = UploadStateStore(path)
+
+    assert store.source("/src", "Run").dataset_id == "ds-1"